@@ -34,7 +34,11 @@ import inspect
 import logging
 import os
 import re
+import six
 import six.moves.configparser as ConfigParser
+import sys
+import threading
+import types
 import warnings
 
 # keyring is an optional import
@@ -43,6 +47,95 @@ try:
 except ImportError:
     keyring = None
 
+# These names are only imported when they are first accessed, so that a
+# program that uses a single service doesn't pay for importing the others, or
+# novaclient. The values are the import paths of modules or classes.
+_lazy_attributes = {
+        "AutoScaleClient": "pyrax.autoscale.AutoScaleClient",
+        "CloudDatabaseClient": "pyrax.clouddatabases.CloudDatabaseClient",
+        "CloudLoadBalancerClient": (
+            "pyrax.cloudloadbalancers.CloudLoadBalancerClient"),
+        "CloudBlockStorageClient": (
+            "pyrax.cloudblockstorage.CloudBlockStorageClient"),
+        "CloudDNSClient": "pyrax.clouddns.CloudDNSClient",
+        "CloudNetworkClient": "pyrax.cloudnetworks.CloudNetworkClient",
+        "CloudMonitorClient": "pyrax.cloudmonitoring.CloudMonitorClient",
+        "ImageClient": "pyrax.image.ImageClient",
+        "StorageClient": "pyrax.object_storage.StorageClient",
+        "QueueClient": "pyrax.queueing.QueueClient",
+        "CloudServer": "novaclient.v1_1.servers.Server",
+        "_cs_exceptions": "novaclient.exceptions",
+        "_cs_auth_plugin": "novaclient.auth_plugin",
+        "_cs_shell": "novaclient.shell.OpenStackComputeShell",
+        "_cs_client": "novaclient.v1_1.client",
+        }
+
+
+def _import_string(import_str):
+    """Returns the module or module attribute with the given dotted path."""
+    try:
+        __import__(import_str)
+        return sys.modules[import_str]
+    except ImportError:
+        mod_str, _sep, att = import_str.rpartition(".")
+        __import__(mod_str)
+        return getattr(sys.modules[mod_str], att)
+
+
+class _LazyModule(types.ModuleType):
+    """
+    Takes the place of this package in sys.modules, and imports the names in
+    '_lazy_attributes' on first access. All other attributes are read from and
+    written to the package module itself.
+    """
+    _is_lazy_module = True
+
+    def __init__(self, module):
+        super(_LazyModule, self).__init__(module.__name__, module.__doc__)
+        for att in ("__file__", "__path__", "__package__", "__loader__",
+                "__spec__"):
+            if att in module.__dict__:
+                self.__dict__[att] = module.__dict__[att]
+        self.__dict__["_module"] = module
+
+
+    def __getattr__(self, att):
+        module = self.__dict__["_module"]
+        try:
+            return getattr(module, att)
+        except AttributeError:
+            import_str = module.__dict__.get("_lazy_attributes", {}).get(att)
+            if import_str is None:
+                raise
+        val = _import_string(import_str)
+        setattr(module, att, val)
+        return val
+
+
+    def __setattr__(self, att, val):
+        if att in self.__dict__:
+            self.__dict__[att] = val
+        else:
+            setattr(self.__dict__["_module"], att, val)
+
+
+    def __delattr__(self, att):
+        if att in self.__dict__:
+            del self.__dict__[att]
+        else:
+            delattr(self.__dict__["_module"], att)
+
+
+    def __dir__(self):
+        module = self.__dict__["_module"]
+        return sorted(set(dir(module)) | set(module._lazy_attributes))
+
+
+# This has to happen before any submodule is imported, so that their
+# references to this package go through the lazy module as well.
+if not getattr(sys.modules[__name__], "_is_lazy_module", False):
+    sys.modules[__name__] = _LazyModule(sys.modules[__name__])
+
 # The following try block is only needed when first installing pyrax,
 # since importing the version info in setup.py tries to import this
 # entire module.
@@ -53,23 +146,6 @@ try:
     from . import http
     from . import version
     __version__ = version.version
-
-    from novaclient import exceptions as _cs_exceptions
-    from novaclient import auth_plugin as _cs_auth_plugin
-    from novaclient.shell import OpenStackComputeShell as _cs_shell
-    from novaclient.v1_1 import client as _cs_client
-    from novaclient.v1_1.servers import Server as CloudServer
-
-    from .autoscale import AutoScaleClient
-    from .clouddatabases import CloudDatabaseClient
-    from .cloudloadbalancers import CloudLoadBalancerClient
-    from .cloudblockstorage import CloudBlockStorageClient
-    from .clouddns import CloudDNSClient
-    from .cloudnetworks import CloudNetworkClient
-    from .cloudmonitoring import CloudMonitorClient
-    from .image import ImageClient
-    from .object_storage import StorageClient
-    from .queueing import QueueClient
 except ImportError:
     # See if this is the result of the importing of version.py in setup.py
     callstack = inspect.stack()
@@ -113,19 +189,24 @@ _http_debug = False
 regions = tuple()
 services = tuple()
 
+# Client classes for each service, as import strings. They are imported the
+# first time the service is used. Registering a class directly works too.
 _client_classes = {
-        "compute": _cs_client.Client,
-        "object_store": StorageClient,
-        "database": CloudDatabaseClient,
-        "load_balancer": CloudLoadBalancerClient,
-        "volume": CloudBlockStorageClient,
-        "dns": CloudDNSClient,
-        "compute:network": CloudNetworkClient,
-        "monitor": CloudMonitorClient,
-        "autoscale": AutoScaleClient,
-        "image": ImageClient,
-        "queues": QueueClient,
+        "compute": "novaclient.v1_1.client.Client",
+        "object_store": "pyrax.object_storage.StorageClient",
+        "database": "pyrax.clouddatabases.CloudDatabaseClient",
+        "load_balancer": "pyrax.cloudloadbalancers.CloudLoadBalancerClient",
+        "volume": "pyrax.cloudblockstorage.CloudBlockStorageClient",
+        "dns": "pyrax.clouddns.CloudDNSClient",
+        "compute:network": "pyrax.cloudnetworks.CloudNetworkClient",
+        "monitor": "pyrax.cloudmonitoring.CloudMonitorClient",
+        "autoscale": "pyrax.autoscale.AutoScaleClient",
+        "image": "pyrax.image.ImageClient",
+        "queues": "pyrax.queueing.QueueClient",
         }
+# Extensions found by novaclient; discovering them is slow, so it is only done
+# once.
+_cs_extensions = None
 
 
 def _id_type(ityp):
@@ -165,6 +246,19 @@ class Settings(object):
             "debug": "CLOUD_DEBUG",
             "verify_ssl": "CLOUD_VERIFY_SSL",
             "use_servicenet": "USE_SERVICENET",
+            "use_connection_pool": "CLOUD_USE_CONNECTION_POOL",
+            "pool_connections": "CLOUD_POOL_CONNECTIONS",
+            "pool_maxsize": "CLOUD_POOL_MAXSIZE",
+            "pool_idle_timeout": "CLOUD_POOL_IDLE_TIMEOUT",
+            "use_response_cache": "CLOUD_USE_RESPONSE_CACHE",
+            "response_cache_size": "CLOUD_RESPONSE_CACHE_SIZE",
+            "response_cache_ttl": "CLOUD_RESPONSE_CACHE_TTL",
+            "token_cache": "CLOUD_TOKEN_CACHE",
+            "max_retries": "CLOUD_MAX_RETRIES",
+            "retry_backoff": "CLOUD_RETRY_BACKOFF",
+            "use_rate_limiter": "CLOUD_USE_RATE_LIMITER",
+            "use_circuit_breaker": "CLOUD_USE_CIRCUIT_BREAKER",
+            "circuit_breaker_cooldown": "CLOUD_CIRCUIT_BREAKER_COOLDOWN",
             }
     _settings = {"default": dict.fromkeys(list(env_dct.keys()))}
     _default_set = False
@@ -315,6 +409,25 @@ class Settings(object):
             dct["tenant_id"] = safe_get(section, "tenant_id")
             use_servicenet = safe_get(section, "use_servicenet", "False")
             dct["use_servicenet"] = use_servicenet == "True"
+            use_pool = safe_get(section, "use_connection_pool", "True")
+            dct["use_connection_pool"] = use_pool == "True"
+            dct["pool_connections"] = safe_get(section, "pool_connections")
+            dct["pool_maxsize"] = safe_get(section, "pool_maxsize")
+            dct["pool_idle_timeout"] = safe_get(section, "pool_idle_timeout")
+            use_cache = safe_get(section, "use_response_cache", "False")
+            dct["use_response_cache"] = use_cache == "True"
+            dct["response_cache_size"] = safe_get(section,
+                    "response_cache_size")
+            dct["response_cache_ttl"] = safe_get(section, "response_cache_ttl")
+            dct["token_cache"] = safe_get(section, "token_cache")
+            dct["max_retries"] = safe_get(section, "max_retries")
+            dct["retry_backoff"] = safe_get(section, "retry_backoff")
+            use_limiter = safe_get(section, "use_rate_limiter", "False")
+            dct["use_rate_limiter"] = use_limiter == "True"
+            use_breaker = safe_get(section, "use_circuit_breaker", "False")
+            dct["use_circuit_breaker"] = use_breaker == "True"
+            dct["circuit_breaker_cooldown"] = safe_get(section,
+                    "circuit_breaker_cooldown")
             app_agent = safe_get(section, "custom_user_agent")
             if app_agent:
                 # Customize the user-agent string with the app name.
@@ -608,22 +721,191 @@ def _make_agent_name(base):
         return USER_AGENT
 
 
-def connect_to_services(region=None):
-    """Establishes authenticated connections to the various cloud APIs."""
-    global cloudservers, cloudfiles, cloud_loadbalancers, cloud_databases
-    global cloud_blockstorage, cloud_dns, cloud_networks, cloud_monitoring
-    global autoscale, images, queues
-    cloudservers = connect_to_cloudservers(region=region)
-    cloudfiles = connect_to_cloudfiles(region=region)
-    cloud_loadbalancers = connect_to_cloud_loadbalancers(region=region)
-    cloud_databases = connect_to_cloud_databases(region=region)
-    cloud_blockstorage = connect_to_cloud_blockstorage(region=region)
-    cloud_dns = connect_to_cloud_dns(region=region)
-    cloud_networks = connect_to_cloud_networks(region=region)
-    cloud_monitoring = connect_to_cloud_monitoring(region=region)
-    autoscale = connect_to_autoscale(region=region)
-    images = connect_to_images(region=region)
-    queues = connect_to_queues(region=region)
+class _LazyClient(object):
+    """
+    Stands in for a service client created by connect_to_services(). The
+    client is only created the first time one of its attributes is read, and
+    all attribute access is then passed through to it. Attributes set before
+    then are applied to the client once it is created.
+    """
+    def __init__(self, connect_fnc, service, region):
+        self.__dict__.update({"_lazy_connect": connect_fnc,
+                "_lazy_service": service, "_lazy_region": region,
+                "_lazy_client": None, "_lazy_attrs": {},
+                "_lazy_lock": threading.Lock()})
+
+
+    def _lazy_resolve(self):
+        """Returns the client, creating it if needed."""
+        with self._lazy_lock:
+            if self._lazy_client is None:
+                clt = self._lazy_connect(region=self._lazy_region)
+                if clt is not None:
+                    for att, val in self._lazy_attrs.items():
+                        setattr(clt, att, val)
+                    self._lazy_attrs.clear()
+                self.__dict__["_lazy_client"] = clt
+        return self._lazy_client
+
+
+    def __getattr__(self, att):
+        return getattr(self._lazy_resolve(), att)
+
+
+    def __setattr__(self, att, val):
+        with self._lazy_lock:
+            if self._lazy_client is None:
+                self._lazy_attrs[att] = val
+                return
+        setattr(self._lazy_client, att, val)
+
+
+    def __nonzero__(self):
+        # Creating the client just to test it would defeat the purpose, so
+        # until then this only checks that the service has an endpoint.
+        if self._lazy_client is not None:
+            return True
+        return bool(_get_service_endpoint(None, self._lazy_service,
+                self._lazy_region))
+
+    __bool__ = __nonzero__
+
+
+    def __repr__(self):
+        if self._lazy_client is None:
+            return "<Unconnected %s client for region '%s'>" % (
+                    self._lazy_connect.__name__[len("connect_to_"):],
+                    self._lazy_region)
+        return repr(self._lazy_client)
+
+
+
+# The service used by each of the module-level clients, and the function that
+# creates it.
+_service_connections = (
+        ("cloudservers", "compute", "connect_to_cloudservers"),
+        ("cloudfiles", "object_store", "connect_to_cloudfiles"),
+        ("cloud_loadbalancers", "load_balancer",
+            "connect_to_cloud_loadbalancers"),
+        ("cloud_databases", "database", "connect_to_cloud_databases"),
+        ("cloud_blockstorage", "volume", "connect_to_cloud_blockstorage"),
+        ("cloud_dns", "dns", "connect_to_cloud_dns"),
+        ("cloud_networks", "compute", "connect_to_cloud_networks"),
+        ("cloud_monitoring", "monitor", "connect_to_cloud_monitoring"),
+        ("autoscale", "autoscale", "connect_to_autoscale"),
+        ("images", "image", "connect_to_images"),
+        ("queues", "queues", "connect_to_queues"),
+        )
+
+
+def connect_to_services(region=None, regions=None, services=None,
+        parallel=False):
+    """
+    Sets up connections to the various cloud APIs. Each of the module-level
+    clients, such as 'pyrax.cloudfiles', is created the first time it is used,
+    so programs only pay for the services they actually work with. Services
+    that have no endpoint in the region are set to None.
+
+    To create clients ahead of time, pass the service names (either catalog
+    types such as 'object_store' or names such as 'cloudfiles') in 'services'
+    and/or a list of regions in 'regions'; omitting one of them means all of
+    the available services, or the default region, respectively. Those
+    clients are cached on the identity's endpoints, so they are the ones
+    returned by identity.get_client(), and the ones in 'region' are also the
+    ones used by the module-level clients. If 'parallel' is True they are
+    created at the same time, one thread per client. A dict of the created
+    clients, keyed by (service, region), is returned.
+    """
+    region = _safe_region(region)
+    module = sys.modules[__name__]
+    for att, svc, fnc_name in _service_connections:
+        if _get_service_endpoint(None, svc, region):
+            clt = _LazyClient(getattr(module, fnc_name), svc, region)
+        else:
+            clt = None
+        setattr(module, att, clt)
+    if regions or services:
+        return _warm_clients(regions or [region], services, parallel)
+
+
+def _warm_clients(regions, services, parallel):
+    """
+    Creates the clients for each combination of the regions and services, and
+    returns them in a dict keyed by (service, region). Combinations that are
+    not available are skipped. If any client fails to be created, the first
+    such error is raised after all the others have finished.
+
+    Services that have a module-level client in the region are created
+    through it, and the result is cached on the identity's endpoint, so that
+    both give the same client.
+    """
+    module = sys.modules[__name__]
+    proxies = {}
+    for att, svc, fnc_name in _service_connections:
+        proxy = getattr(module, att)
+        if isinstance(proxy, _LazyClient):
+            proxies.setdefault((svc, proxy._lazy_region), proxy)
+    mapping = identity.service_mapping
+    if services is None:
+        services = list(identity.services.keys())
+    pairs = []
+    for service in services:
+        service = mapping.get(service) or service
+        for rgn in regions:
+            if (service, rgn) not in pairs:
+                pairs.append((service, rgn))
+    clients = {}
+    errors = []
+    unavailable = (exc.NoSuchClient, exc.NoClientForService,
+            exc.NoEndpointForService)
+
+    def _connect(service, rgn):
+        try:
+            proxy = proxies.get((service, rgn))
+            if proxy is None:
+                clients[(service, rgn)] = identity.get_client(service, rgn)
+                return
+            clt = proxy._lazy_resolve()
+            if clt is not None:
+                _cache_on_endpoint(service, rgn, clt)
+                clients[(service, rgn)] = clt
+        except unavailable:
+            pass
+        except Exception as e:
+            errors.append(e)
+
+    if parallel:
+        threads = [threading.Thread(target=_connect, args=pair)
+                for pair in pairs]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    else:
+        for pair in pairs:
+            _connect(*pair)
+    if errors:
+        raise errors[0]
+    return clients
+
+
+def _cache_on_endpoint(service, region, clt):
+    """
+    Stores a client created by one of the module-level clients on the
+    identity's endpoint for its service and region, unless that endpoint
+    already has one, so that identity.get_client() returns it.
+    """
+    svc = identity.services.get(service)
+    ep = svc.endpoints.get(region) if svc else None
+    if ep is None:
+        return
+    url = getattr(clt, "management_url", None)
+    if url and url == ep.private_url and url != ep.public_url:
+        client_att = "_client_private"
+    else:
+        client_att = "_client"
+    if getattr(ep, client_att, None) is None:
+        setattr(ep, client_att, clt)
 
 
 def _get_service_endpoint(context, svc, region=None, public=True):
@@ -645,8 +927,20 @@ def _get_service_endpoint(context, svc, region=None, public=True):
     return ep
 
 
+def _discover_cs_extensions():
+    """Returns the novaclient extensions, finding them on the first call."""
+    global _cs_extensions
+    if _cs_extensions is None:
+        from novaclient.shell import OpenStackComputeShell as _cs_shell
+        _cs_extensions = _cs_shell()._discover_extensions("1.1")
+    return _cs_extensions
+
+
 def connect_to_cloudservers(region=None, context=None, **kwargs):
     """Creates a client for working with cloud servers."""
+    from novaclient import auth_plugin as _cs_auth_plugin
+    from novaclient import exceptions as _cs_exceptions
+    from novaclient.v1_1 import client as _cs_client
     context = context or identity
     _cs_auth_plugin.discover_auth_systems()
     id_type = get_setting("identity_type")
@@ -661,8 +955,7 @@ def connect_to_cloudservers(region=None, context=None, **kwargs):
         # Service is not available
         return
     insecure = not get_setting("verify_ssl")
-    cs_shell = _cs_shell()
-    extensions = cs_shell._discover_extensions("1.1")
+    extensions = _discover_cs_extensions()
     cloudservers = _cs_client.Client(context.username, context.password,
             project_id=context.tenant_id, auth_url=context.auth_endpoint,
             auth_system=id_type, region_name=region, service_type="compute",
@@ -735,7 +1028,7 @@ def _create_client(ep_name, region, public=True):
     if not ep:
         return
     verify_ssl = get_setting("verify_ssl")
-    cls = _client_classes[ep_name]
+    cls = client_class_for_service(ep_name)
     client = cls(identity, region_name=region, management_url=ep,
             verify_ssl=verify_ssl, http_log_debug=_http_debug)
     client.user_agent = _make_agent_name(client.user_agent)
@@ -790,9 +1083,13 @@ def connect_to_queues(region=None, public=True):
 def client_class_for_service(service):
     """
     Returns the client class registered for the given service, or None if there
-    is no such service, or if no class has been registered.
+    is no such service, or if no class has been registered. Classes registered
+    as import strings are imported by the first call for their service.
     """
-    return _client_classes.get(service)
+    cls = _client_classes.get(service)
+    if isinstance(cls, six.string_types):
+        cls = _client_classes[service] = _import_string(cls)
+    return cls
 
 
 def get_http_debug():
@@ -808,6 +1105,10 @@ def set_http_debug(val):
     for svc in (cloudservers, cloudfiles, cloud_loadbalancers,
             cloud_blockstorage, cloud_databases, cloud_dns, cloud_networks,
             autoscale, images, queues):
+        if isinstance(svc, _LazyClient):
+            # Clients that haven't been created yet will pick up the new
+            # value when they are.
+            svc = svc._lazy_client
         if svc is not None:
             svc.http_log_debug = val
 
@@ -0,0 +1,285 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c)2014 Rackspace US, Inc.
+
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+asyncio versions of the pyrax clients and managers.
+
+Every method on these classes returns an awaitable instead of blocking. The
+actual work is done by the regular pyrax client, so URI building, exception
+mapping and re-authentication after a 401 behave exactly as they do for
+synchronous code. The calls run on the event loop's executor over the
+client's pooled connections, so many calls can be in flight at once:
+
+    clt = AsyncStorageClient(pyrax.identity, region_name="ORD",
+            management_url=url)
+    containers = await clt.list()
+    metas = await asyncio.gather(*[clt.get_container_metadata(cont)
+            for cont in containers])
+
+If you fan out wider than the 'pool_maxsize' setting, raise it so that the
+extra connections are kept open.
+
+The asyncio module requires Python 3.4 or later; creating any of these
+objects on an older version raises AsyncioNotAvailable.
+"""
+
+from __future__ import absolute_import
+
+import functools
+import inspect
+
+try:
+    import asyncio
+except ImportError:
+    asyncio = None
+
+import pyrax.exceptions as exc
+from pyrax.object_storage import StorageClient
+from pyrax.queueing import QueueClient
+
+
+def _assure_asyncio():
+    if asyncio is None:
+        raise exc.AsyncioNotAvailable("The asyncio module is not available. "
+                "It requires Python 3.4 or later.")
+
+
+
+class _AsyncWrapper(object):
+    """
+    Base class for the objects that expose a synchronous pyrax object's
+    methods as awaitables. Any public method of the wrapped object that is not
+    explicitly defined on the subclass is wrapped automatically.
+    """
+    def __init__(self, wrapped, loop=None, executor=None):
+        _assure_asyncio()
+        self._wrapped = wrapped
+        self._loop = loop
+        self.executor = executor
+
+
+    @property
+    def loop(self):
+        return self._loop or asyncio.get_event_loop()
+
+
+    def run(self, fnc, *args, **kwargs):
+        """
+        Runs any blocking callable on this object's executor, and returns an
+        awaitable for its result. Use this for methods of the resources
+        returned by these calls, which are the regular synchronous objects.
+        """
+        return self.loop.run_in_executor(self.executor,
+                functools.partial(fnc, *args, **kwargs))
+
+
+    def __getattr__(self, att):
+        val = getattr(self._wrapped, att)
+        if att.startswith("_") or not inspect.ismethod(val):
+            return val
+
+        @functools.wraps(val)
+        def _async_method(*args, **kwargs):
+            return self.run(val, *args, **kwargs)
+        return _async_method
+
+
+
+class AsyncBaseManager(_AsyncWrapper):
+    """
+    Wraps a BaseManager so that its calls return awaitables.
+    """
+    def __init__(self, manager, loop=None, executor=None):
+        super(AsyncBaseManager, self).__init__(manager, loop=loop,
+                executor=executor)
+
+
+    @property
+    def manager(self):
+        """The synchronous manager that does the actual work."""
+        return self._wrapped
+
+
+    def list(self, *args, **kwargs):
+        """Returns an awaitable for a list of resource objects."""
+        return self.run(self._wrapped.list, *args, **kwargs)
+
+
+    def get(self, item):
+        """Returns an awaitable for a specific resource."""
+        return self.run(self._wrapped.get, item)
+
+
+    def head(self, item):
+        """Returns an awaitable for the HEAD response for a specific item."""
+        return self.run(self._wrapped.head, item)
+
+
+    def create(self, *args, **kwargs):
+        """Returns an awaitable for a newly-created resource."""
+        return self.run(self._wrapped.create, *args, **kwargs)
+
+
+    def delete(self, item):
+        """Returns an awaitable for the deletion of the specified item."""
+        return self.run(self._wrapped.delete, item)
+
+
+    def find(self, **kwargs):
+        """
+        Returns an awaitable for the single item with attributes matching
+        ``**kwargs``.
+        """
+        return self.run(self._wrapped.find, **kwargs)
+
+
+    def findall(self, **kwargs):
+        """
+        Returns an awaitable for all items with attributes matching
+        ``**kwargs``.
+        """
+        return self.run(self._wrapped.findall, **kwargs)
+
+
+
+class AsyncBaseClient(_AsyncWrapper):
+    """
+    The base class for the asyncio pyrax clients.
+
+    Subclasses set 'client_class' to the synchronous client they mirror, and
+    accept the same arguments as that class, plus the optional 'loop' and
+    'executor'. To wrap a client that already exists, use from_client().
+    """
+    client_class = None
+
+    def __init__(self, *args, **kwargs):
+        loop = kwargs.pop("loop", None)
+        executor = kwargs.pop("executor", None)
+        client = kwargs.pop("client", None)
+        if client is None:
+            if self.client_class is None:
+                raise exc.NoSuchClient("%s does not define a client class; "
+                        "use from_client() instead." % self.__class__.__name__)
+            client = self.client_class(*args, **kwargs)
+        super(AsyncBaseClient, self).__init__(client, loop=loop,
+                executor=executor)
+        self._async_manager = None
+
+
+    @classmethod
+    def from_client(cls, client, loop=None, executor=None):
+        """Returns an async wrapper around an existing client."""
+        return cls(client=client, loop=loop, executor=executor)
+
+
+    @property
+    def client(self):
+        """The synchronous client that does the actual work."""
+        return self._wrapped
+
+
+    @property
+    def manager(self):
+        """An AsyncBaseManager wrapping this client's manager."""
+        if self._async_manager is None:
+            self._async_manager = AsyncBaseManager(self._wrapped._manager,
+                    loop=self._loop, executor=self.executor)
+        return self._async_manager
+
+
+    def list(self, *args, **kwargs):
+        """Returns an awaitable for a list of resource objects."""
+        return self.run(self._wrapped.list, *args, **kwargs)
+
+
+    def get(self, item):
+        """Returns an awaitable for a specific resource."""
+        return self.run(self._wrapped.get, item)
+
+
+    def create(self, *args, **kwargs):
+        """Returns an awaitable for a newly-created resource."""
+        return self.run(self._wrapped.create, *args, **kwargs)
+
+
+    def delete(self, *args, **kwargs):
+        """Returns an awaitable for the deletion of the specified item."""
+        return self.run(self._wrapped.delete, *args, **kwargs)
+
+
+    def find(self, **kwargs):
+        """
+        Returns an awaitable for the single item with attributes matching
+        ``**kwargs``.
+        """
+        return self.run(self._wrapped.find, **kwargs)
+
+
+    def findall(self, **kwargs):
+        """
+        Returns an awaitable for all items with attributes matching
+        ``**kwargs``.
+        """
+        return self.run(self._wrapped.findall, **kwargs)
+
+
+    def method_head(self, uri, **kwargs):
+        """Awaitable HEAD request."""
+        return self.run(self._wrapped.method_head, uri, **kwargs)
+
+
+    def method_get(self, uri, **kwargs):
+        """Awaitable GET request."""
+        return self.run(self._wrapped.method_get, uri, **kwargs)
+
+
+    def method_post(self, uri, **kwargs):
+        """Awaitable POST request."""
+        return self.run(self._wrapped.method_post, uri, **kwargs)
+
+
+    def method_put(self, uri, **kwargs):
+        """Awaitable PUT request."""
+        return self.run(self._wrapped.method_put, uri, **kwargs)
+
+
+    def method_delete(self, uri, **kwargs):
+        """Awaitable DELETE request."""
+        return self.run(self._wrapped.method_delete, uri, **kwargs)
+
+
+    def method_patch(self, uri, **kwargs):
+        """Awaitable PATCH request."""
+        return self.run(self._wrapped.method_patch, uri, **kwargs)
+
+
+
+class AsyncStorageClient(AsyncBaseClient):
+    """
+    asyncio version of StorageClient. Every public StorageClient method is
+    available, and returns an awaitable.
+    """
+    client_class = StorageClient
+
+
+
+class AsyncQueueClient(AsyncBaseClient):
+    """
+    asyncio version of QueueClient. Every public QueueClient method is
+    available, and returns an awaitable.
+    """
+    client_class = QueueClient
@@ -5,9 +5,14 @@ from __future__ import absolute_import
 
 import six.moves.configparser as ConfigParser
 import datetime
+import hashlib
 import json
+import logging
+import os
 import re
 import requests
+import threading
+import time
 import warnings
 
 try:
@@ -38,6 +43,15 @@ _utc_pat = r"""
 API_DATE_PATTERN = re.compile(_pat, re.VERBOSE)
 UTC_API_DATE_PATTERN = re.compile(_utc_pat, re.VERBOSE)
 DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+# Tokens are refreshed when they are within this many seconds of expiring.
+DEFAULT_TOKEN_REFRESH_WINDOW = 300
+# Seconds to wait before retrying a failed background token refresh.
+DEFAULT_TOKEN_REFRESH_RETRY = 30
+# Longest time, in seconds, that proactive refreshes are skipped after they
+# keep failing. The wait starts at DEFAULT_TOKEN_REFRESH_RETRY and doubles.
+DEFAULT_MAX_TOKEN_REFRESH_RETRY = 300
+# Directory used by the token cache when the 'token_cache' setting is True.
+DEFAULT_TOKEN_CACHE_DIR = os.path.join("~", ".pyrax_token_cache")
 
 # Default region for all services. Can be individually overridden if needed
 default_region = None
@@ -259,12 +273,118 @@ class Endpoint(object):
 
 
 
+def _create_token_cache():
+    """
+    Returns a TokenCache if one is enabled by the 'token_cache' setting, which
+    may be True to use the default directory, or the path of a directory.
+    """
+    setting = pyrax.get_setting("token_cache")
+    if not setting or setting in ("False", "false", "0"):
+        return None
+    if setting is True or setting in ("True", "true", "1"):
+        return TokenCache()
+    return TokenCache(setting)
+
+
+
+class TokenCache(object):
+    """
+    Stores authentication responses on disk, so that new processes can
+    re-use a token that is still valid instead of authenticating again.
+
+    Each response is kept in its own file in 'directory', named with a hash
+    of the username, tenant, auth endpoint and secret that produced it; the
+    secret itself is never written. The directory and the files are only
+    accessible by their owner, and files that are readable by anyone else are
+    ignored.
+    """
+    def __init__(self, directory=None):
+        self.directory = os.path.expanduser(directory or
+                DEFAULT_TOKEN_CACHE_DIR)
+        self.hits = 0
+        self.misses = 0
+
+
+    @staticmethod
+    def key(username, tenant, auth_endpoint, secret):
+        """Returns the cache key for a set of credentials."""
+        parts = [username, tenant, auth_endpoint, secret]
+        raw = "\n".join("%s" % (part or "") for part in parts)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+    def _path(self, key):
+        return os.path.join(self.directory, key)
+
+
+    def load(self, key):
+        """
+        Returns the authentication response stored for 'key', or None if
+        there is none or it can't be trusted.
+        """
+        pth = self._path(key)
+        try:
+            stat = os.stat(pth)
+            if stat.st_mode & 0o077:
+                raise ValueError("Permissions are too open")
+            if hasattr(os, "getuid") and stat.st_uid != os.getuid():
+                raise ValueError("Not owned by the current user")
+            with open(pth) as cache_file:
+                body = json.load(cache_file)
+        except (IOError, OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return body
+
+
+    def save(self, key, body):
+        """Stores the authentication response for 'key'."""
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory, 0o700)
+        pth = self._path(key)
+        tmp = "%s.%s.tmp" % (pth, os.getpid())
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        try:
+            with os.fdopen(fd, "w") as cache_file:
+                json.dump(body, cache_file)
+            # Replace the old file in one step, so that other processes
+            # never read a partial file.
+            os.rename(tmp, pth)
+        except OSError:
+            # Windows can't rename over an existing file.
+            self.delete(key)
+            os.rename(tmp, pth)
+
+
+    def delete(self, key):
+        """Removes the response stored for 'key', if any."""
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+
+
+class _TokenRefresh(object):
+    """
+    A re-authentication in progress. Callers that need a new token while one
+    is being fetched wait on 'done' and share its outcome.
+    """
+    def __init__(self):
+        self.done = threading.Event()
+        self.error = None
+
+
+
 class BaseIdentity(object):
     """
     This class handles all of the basic authentication requirements for working
     with an OpenStack Cloud system.
     """
     _creds_style = "password"
+    # Seconds before the token expires that it is replaced with a new one.
+    token_refresh_window = DEFAULT_TOKEN_REFRESH_WINDOW
 
     def __init__(self, username=None, password=None, tenant_id=None,
             tenant_name=None, auth_endpoint=None, api_key=None, token=None,
@@ -291,6 +411,20 @@ class BaseIdentity(object):
         self.user_agent = "pyrax"
         self.http_log_debug = False
         self._default_region = None
+        # Keep-alive connections re-used for calls to the identity service.
+        self.connection_pool = pyrax.http.create_connection_pool()
+        # Ensures that only one re-authentication runs at a time.
+        self._refresh_lock = threading.Lock()
+        self._refresh = None
+        self._refresh_timer = None
+        self.auto_refresh = False
+        self.token_metrics = {"refreshes": 0, "failures": 0, "shared": 0,
+                "proactive": 0, "last_latency": None, "total_latency": 0.0}
+        # Proactive refreshes are skipped until this time after they fail.
+        self._proactive_after = 0
+        self._proactive_failures = 0
+        # Optional on-disk cache of tokens, shared between processes.
+        self.token_cache = _create_token_cache()
         self.service_mapping = {
                 "cloudservers": "compute",
                 "nova": "compute",
@@ -566,6 +700,8 @@ class BaseIdentity(object):
         if "tokens" in uri:
             # We'll handle the exception here
             kwargs["raise_exception"] = False
+        if self.connection_pool is not None:
+            kwargs["connection_pool"] = self.connection_pool
         return pyrax.http.request(mthd, uri, **kwargs)
 
 
@@ -590,6 +726,9 @@ class BaseIdentity(object):
         self.api_key = api_key or self.api_key or self.password
         self.tenant_id = tenant_id or self.tenant_id or pyrax.get_setting(
                 "tenant_id")
+        cache_key = self._token_cache_key()
+        if cache_key and self._auth_from_cache(cache_key):
+            return
         creds = self._format_credentials()
         headers = {"Content-Type": "application/json",
                 "Accept": "application/json",
@@ -620,6 +759,46 @@ class BaseIdentity(object):
             raise exc.AuthenticationFailed(err)
         self._parse_response(resp_body)
         self.authenticated = True
+        if cache_key:
+            try:
+                self.token_cache.save(cache_key, resp_body)
+            except (IOError, OSError) as e:
+                logging.getLogger("pyrax").debug("Could not cache the "
+                        "token: %s" % e)
+
+
+    def _token_cache_key(self):
+        """
+        Returns the token cache key for the current credentials, or None if
+        the token cache is not enabled.
+        """
+        if self.token_cache is None:
+            return None
+        return self.token_cache.key(self.username,
+                self.tenant_id or self.tenant_name, self._get_auth_endpoint(),
+                self.password or self.api_key)
+
+
+    def _auth_from_cache(self, cache_key):
+        """
+        Sets up this identity from a cached authentication response. Returns
+        False if there is no usable response: it is missing, it contains the
+        token that is being replaced, or that token expires soon.
+        """
+        body = self.token_cache.load(cache_key)
+        try:
+            token = body["access"]["token"]
+            expires = self._parse_api_time(token["expires"])
+        except (KeyError, TypeError, AttributeError):
+            return False
+        if token["id"] == self.token:
+            return False
+        window = datetime.timedelta(seconds=self.token_refresh_window)
+        if expires - window <= datetime.datetime.utcnow():
+            return False
+        self._parse_response(body)
+        self.authenticated = True
+        return True
 
 
     def _parse_response(self, resp):
@@ -688,8 +867,14 @@ class BaseIdentity(object):
 
     def unauthenticate(self):
         """
-        Clears out any credentials, tokens, and service catalog info.
+        Clears out any credentials, tokens, and service catalog info. Any
+        copy of the token in the token cache is removed as well.
         """
+        if self.token_cache is not None and self.authenticated:
+            try:
+                self.token_cache.delete(self._token_cache_key())
+            except exc.PyraxException:
+                pass
         self.username = ""
         self.password = ""
         self.tenant_id = ""
@@ -702,6 +887,155 @@ class BaseIdentity(object):
         self.services = utils.DotDict()
         self.regions = utils.DotDict()
         self.authenticated = False
+        self.stop_auto_refresh()
+
+
+    def refresh_token(self, stale_token=None):
+        """
+        Re-authenticates to get a new token, and returns it.
+
+        Only one re-authentication runs at a time: if another thread is
+        already refreshing the token, this waits for it to finish and returns
+        the token it obtained, or raises the same error. If 'stale_token' is
+        given and the current token is different, another thread has already
+        replaced it since the caller used it, so the current token is returned
+        without contacting the auth endpoint.
+        """
+        with self._refresh_lock:
+            flight = self._refresh
+            leader = flight is None
+            if leader:
+                if (stale_token is not None and self.token and
+                        self.token != stale_token):
+                    return self.token
+                flight = self._refresh = _TokenRefresh()
+        if not leader:
+            flight.done.wait()
+            with self._refresh_lock:
+                self.token_metrics["shared"] += 1
+            if flight.error is not None:
+                raise flight.error
+            return self.token
+        start = time.time()
+        try:
+            self.authenticate()
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            elapsed = time.time() - start
+            with self._refresh_lock:
+                self._refresh = None
+                metrics = self.token_metrics
+                if flight.error is None:
+                    metrics["refreshes"] += 1
+                    self._proactive_after = 0
+                    self._proactive_failures = 0
+                else:
+                    metrics["failures"] += 1
+                metrics["last_latency"] = elapsed
+                metrics["total_latency"] += elapsed
+            flight.done.set()
+        if self.auto_refresh:
+            self._schedule_refresh()
+        return self.token
+
+
+    def _token_expiring(self):
+        """
+        Returns True if the token will expire within 'token_refresh_window'
+        seconds. Tokens without a known expiration are never considered to be
+        expiring.
+        """
+        if not (self.token and isinstance(self.expires, datetime.datetime)):
+            return False
+        window = datetime.timedelta(seconds=self.token_refresh_window)
+        return self.expires - window <= datetime.datetime.utcnow()
+
+
+    def ensure_token(self):
+        """
+        Replaces the token before it expires, so that requests don't have to
+        fail with a 401 first. If the refresh fails the current token is kept,
+        since it remains usable until it actually expires, and no further
+        proactive refresh is tried until a backoff has passed; until then
+        only a 401 response makes the token be refreshed.
+        """
+        if not self._token_expiring():
+            return self.token
+        with self._refresh_lock:
+            if time.time() < self._proactive_after:
+                return self.token
+            self.token_metrics["proactive"] += 1
+        try:
+            return self.refresh_token(stale_token=self.token)
+        except Exception as e:
+            logging.getLogger("pyrax").debug("Proactive token refresh "
+                    "failed: %s" % e)
+            with self._refresh_lock:
+                self._proactive_failures += 1
+                backoff = min(DEFAULT_MAX_TOKEN_REFRESH_RETRY,
+                        DEFAULT_TOKEN_REFRESH_RETRY *
+                        2 ** (self._proactive_failures - 1))
+                self._proactive_after = time.time() + backoff
+            return self.token
+
+
+    def get_token_metrics(self):
+        """
+        Returns a dict with the number of successful, failed, shared and
+        proactive token refreshes, and their latency in seconds.
+        """
+        with self._refresh_lock:
+            metrics = dict(self.token_metrics)
+        count = metrics["refreshes"] + metrics["failures"]
+        metrics["average_latency"] = (metrics["total_latency"] / count
+                if count else None)
+        return metrics
+
+
+    def start_auto_refresh(self):
+        """
+        Refreshes the token in a background thread shortly before it expires,
+        for as long as this identity is authenticated.
+        """
+        self.auto_refresh = True
+        self._schedule_refresh()
+
+
+    def stop_auto_refresh(self):
+        """Stops any background token refreshes."""
+        self.auto_refresh = False
+        timer, self._refresh_timer = self._refresh_timer, None
+        if timer is not None:
+            timer.cancel()
+
+
+    def _schedule_refresh(self, delay=None):
+        if not isinstance(self.expires, datetime.datetime):
+            return
+        if delay is None:
+            remaining = self.expires - datetime.datetime.utcnow()
+            delay = max(remaining.total_seconds() -
+                    self.token_refresh_window, 0)
+        timer = threading.Timer(delay, self._background_refresh)
+        timer.daemon = True
+        old, self._refresh_timer = self._refresh_timer, timer
+        if old is not None:
+            old.cancel()
+        timer.start()
+
+
+    def _background_refresh(self):
+        if not self.auto_refresh:
+            return
+        try:
+            self.refresh_token(stale_token=self.token)
+        except Exception as e:
+            logging.getLogger("pyrax").debug("Background token refresh "
+                    "failed: %s" % e)
+            if self.auto_refresh:
+                self._schedule_refresh(DEFAULT_TOKEN_REFRESH_RETRY)
 
 
     def _standard_headers(self):
@@ -741,7 +1075,8 @@ class BaseIdentity(object):
         invalidated on the server, this method may indicate that the token is
         valid when it might actually not be.
         """
-        return bool(self.token and (self.expires > datetime.datetime.now()))
+        return bool(self.token and
+                (self.expires > datetime.datetime.utcnow()))
 
 
     def list_tokens(self):
@@ -24,14 +24,18 @@ OpenStack Client interface. Handles the REST calls and responses.
 
 from __future__ import absolute_import
 
+import collections
 import json
 import logging
 import requests
+import six
+import sys
 import time
 from six.moves import urllib
 
-import pyrax
 import pyrax.exceptions as exc
+from pyrax import http
+from pyrax import instrumentation
 
 
 def _safe_quote(val):
@@ -46,6 +50,37 @@ def _safe_quote(val):
     return ret
 
 
+# Quoted forms of recently requested URIs. Clients make the same requests over
+# and over, so each URI is only parsed and quoted the first time. The cache is
+# emptied when it reaches _QUOTE_CACHE_SIZE entries.
+_QUOTE_CACHE_SIZE = 2048
+_quote_cache = {}
+
+
+def _quote_uri(uri):
+    """
+    Returns the URI with its path and query quoted. For a full URL, the scheme
+    and host are left as they are.
+    """
+    ret = _quote_cache.get(uri)
+    if ret is not None:
+        return ret
+    if uri.startswith("http"):
+        parsed = list(urllib.parse.urlparse(uri))
+        for pos, item in enumerate(parsed):
+            if pos < 2:
+                # Don't escape the scheme or netloc
+                continue
+            parsed[pos] = _safe_quote(parsed[pos])
+        ret = urllib.parse.urlunparse(parsed)
+    else:
+        ret = _safe_quote(uri)
+    if len(_quote_cache) >= _QUOTE_CACHE_SIZE:
+        _quote_cache.clear()
+    _quote_cache[uri] = ret
+    return ret
+
+
 class BaseClient(object):
     """
     The base class for all pyrax clients.
@@ -54,6 +89,18 @@ class BaseClient(object):
     user_agent = None
     # Each client subclass should set their own name.
     name = "base"
+    # (pattern, ttl) pairs that set how long the responses to matching requests
+    # are kept fresh when the response cache is enabled. See
+    # pyrax.http.ResponseCache for how the patterns are matched.
+    response_cache_policies = ()
+    # Values that replace the defaults of this client's
+    # pyrax.http.RetryPolicy, such as {"max_retries": 5}.
+    retry_policy_overrides = {}
+    # Values that replace the defaults of the pyrax.http.CircuitBreaker created
+    # for each endpoint this client uses, such as {"min_requests": 20}.
+    circuit_breaker_overrides = {}
+    # The number of requests kept in the get_timings() history.
+    max_timings = instrumentation.DEFAULT_RING_BUFFER_SIZE
 
     def __init__(self, identity, region_name=None, endpoint_type=None,
             management_url=None, service_name=None, timings=False,
@@ -68,7 +115,33 @@ class BaseClient(object):
         self.verify_ssl = verify_ssl
         self.http_log_debug = http_log_debug
         self.timeout = timeout
-        self.times = []  # [("item", starttime, endtime), ...]
+        # The most recent requests: [("item", starttime, endtime), ...]
+        self.times = collections.deque(maxlen=self.max_timings)
+        # Sinks that receive a pyrax.instrumentation.RequestEvent for each of
+        # this client's requests.
+        self.metrics_sinks = []
+        # Keep-alive connections re-used by all of this client's requests.
+        self.connection_pool = http.create_connection_pool()
+        # When set, a pyrax.http.Transport that sends this client's requests
+        # in place of its connection pool.
+        self.transport = None
+        # Optional cache of GET/HEAD responses; off unless enabled.
+        self.response_cache = http.create_response_cache(
+                self.response_cache_policies)
+        # Decides which failed requests are retried; None disables retries.
+        self.retry_policy = http.create_retry_policy(
+                self.retry_policy_overrides)
+        # Optional throttle that keeps requests within the account's rate
+        # limits; off unless enabled.
+        self.rate_limiter = http.create_rate_limiter()
+        # When True, requests to an endpoint that keeps failing raise
+        # CircuitOpen at once instead of being sent.
+        self.use_circuit_breaker = http.circuit_breakers_enabled()
+        # Management URLs of the same service in other regions, used in order
+        # while the circuit breaker for 'management_url' is open.
+        self.failover_urls = []
+        # The headers sent with every request; see _base_headers().
+        self._cached_headers = None
 
         self._manager = None
         # Hook method for subclasses to create their manager instance
@@ -134,13 +207,189 @@ class BaseClient(object):
 
 
     def get_timings(self):
-        """Returns a list of all execution timings."""
-        return self.times
+        """
+        Returns a list of the execution timings of the most recent requests,
+        up to 'max_timings' of them.
+        """
+        return list(self.times)
 
 
     def reset_timings(self):
         """Clears the timing history."""
-        self.times = []
+        self.times = collections.deque(maxlen=self.max_timings)
+
+
+    def add_metrics_sink(self, sink):
+        """
+        Adds a sink that receives a pyrax.instrumentation.RequestEvent for
+        each request made by this client. A sink is any object with a
+        'record(event)' method, such as the ones in pyrax.instrumentation.
+        """
+        if sink not in self.metrics_sinks:
+            self.metrics_sinks.append(sink)
+
+
+    def remove_metrics_sink(self, sink):
+        """Removes a sink added with add_metrics_sink()."""
+        if sink in self.metrics_sinks:
+            self.metrics_sinks.remove(sink)
+
+
+    def enable_response_cache(self, ttl=None, max_entries=None,
+            policies=None):
+        """
+        Turns on caching of the responses to GET and HEAD requests made by
+        this client. 'ttl' is the number of seconds a response is used
+        without contacting the server, for requests that don't match any of
+        this client's 'response_cache_policies'; 'policies' are added in front
+        of those. 'max_entries' limits the number of responses kept.
+        """
+        policies = list(policies or []) + list(self.response_cache_policies)
+        self.response_cache = http.ResponseCache(
+                max_entries=max_entries, ttl=ttl, policies=policies)
+        return self.response_cache
+
+
+    def disable_response_cache(self):
+        """Turns off response caching, and discards any cached responses."""
+        self.response_cache = None
+
+
+    def get_cache_stats(self):
+        """
+        Returns a dict with the hit, miss, revalidation and eviction counts of
+        the response cache, or None if it is not enabled.
+        """
+        if self.response_cache is None:
+            return None
+        return self.response_cache.stats()
+
+
+    def get_retry_stats(self):
+        """
+        Returns a dict with the number of retries made by this client, the
+        number of failures that were not retried because its retry budget was
+        used up, and the retries left in that budget.
+        """
+        if self.retry_policy is None:
+            return None
+        return self.retry_policy.stats()
+
+
+    def enable_rate_limiter(self, rate_limits=None):
+        """
+        Turns on throttling of this client's requests so that they stay
+        within the account's rate limits. These are fetched with get_limits()
+        before the next request, unless a list of rate limits in the format
+        of the "rate" section of that response is passed in 'rate_limits'.
+        """
+        self.rate_limiter = http.RateLimiter(rate_limits=rate_limits)
+        return self.rate_limiter
+
+
+    def disable_rate_limiter(self):
+        """Turns off throttling of this client's requests."""
+        self.rate_limiter = None
+
+
+    def get_rate_limiter_stats(self):
+        """
+        Returns a dict with the number of rate limits being enforced, the
+        number of requests that had to wait, and the total seconds waited, or
+        None if the rate limiter is not enabled.
+        """
+        if self.rate_limiter is None:
+            return None
+        return self.rate_limiter.stats()
+
+
+    def _fetch_rate_limits(self):
+        """
+        Returns the "rate" section of the account's limits, which is used to
+        configure the rate limiter.
+        """
+        limits = self.get_limits() or {}
+        return limits.get("limits", {}).get("rate", [])
+
+
+    def _throttle(self, uri, method):
+        """
+        Waits if needed to keep the request within the account's rate limits.
+        """
+        limiter = self.rate_limiter
+        if limiter is None:
+            return
+        limiter.ensure_loaded(self._fetch_rate_limits)
+        limiter.acquire(method, self._endpoint_path(uri))
+
+
+    def _circuit_breaker(self, uri):
+        """
+        Returns the circuit breaker for the endpoint of the URI, or None if
+        circuit breakers are not enabled.
+        """
+        if not self.use_circuit_breaker:
+            return None
+        return http.get_circuit_breaker(uri,
+                **self.circuit_breaker_overrides)
+
+
+    def get_circuit_breaker_stats(self):
+        """
+        Returns a dict with the state of the circuit breaker for this client's
+        endpoint and its request and failure counts, or None if circuit
+        breakers are not enabled.
+        """
+        breaker = self._circuit_breaker(self.management_url)
+        if breaker is None:
+            return None
+        return breaker.stats()
+
+
+    def enable_failover(self, regions):
+        """
+        Makes this client send its requests to the same service in the first
+        of 'regions' whose endpoint is working while the circuit breaker for
+        its own endpoint is open. The endpoints are looked up in the identity's
+        service catalog. Circuit breakers are turned on for this client if
+        they aren't already. Returns the URLs that will be used.
+        """
+        svc_eps = url_type = None
+        for svc in self.identity.services.values():
+            endpoints = getattr(svc, "endpoints", None) or {}
+            for ep in endpoints.values():
+                if self.management_url == ep.public_url:
+                    svc_eps, url_type = endpoints, "public"
+                elif self.management_url == ep.private_url:
+                    svc_eps, url_type = endpoints, "private"
+            if svc_eps is not None:
+                break
+        if svc_eps is None:
+            raise exc.EndpointNotFound("The endpoint '%s' is not in the "
+                    "service catalog." % self.management_url)
+        urls = []
+        for region in regions:
+            ep = svc_eps.get(region)
+            url = ep.get(url_type) if ep else None
+            if url and url != self.management_url and url not in urls:
+                urls.append(url)
+        self.failover_urls = urls
+        self.use_circuit_breaker = True
+        return urls
+
+
+    def _active_management_url(self):
+        """
+        Returns the management URL to send requests to: 'management_url',
+        unless its circuit breaker is open and one of the 'failover_urls' is
+        working.
+        """
+        if not (self.failover_urls and self.use_circuit_breaker):
+            return self.management_url
+        for url in [self.management_url] + self.failover_urls:
+            if self._circuit_breaker(url).allows_requests():
+                return url
+        return self.management_url
 
 
     def get_limits(self):
@@ -163,39 +412,222 @@ class BaseClient(object):
         pass
 
 
+    def _base_headers(self):
+        """
+        Returns the headers that are the same for every request. They are
+        only rebuilt when the client's user agent is changed.
+        """
+        cached = self._cached_headers
+        if cached is None or cached["User-Agent"] != self.user_agent:
+            cached = self._cached_headers = {"User-Agent": self.user_agent,
+                    "Accept": "application/json"}
+        return cached
+
+
     def request(self, uri, method, *args, **kwargs):
         """
         Formats the request into a dict representing the headers
         and body that will be used to make the API call.
+
+        Pass `stream=True` to get the body of a successful response back as a
+        pyrax.http.StreamingBody instead of reading it into memory.
+
+        If the response cache is enabled, GET and HEAD requests are answered
+        from it when possible, and other requests invalidate the responses
+        cached for the resource they modify.
         """
         if self.timeout:
             kwargs["timeout"] = self.timeout
         kwargs["verify"] = self.verify_ssl
-        kwargs.setdefault("headers", kwargs.get("headers", {}))
-        kwargs["headers"]["User-Agent"] = self.user_agent
-        kwargs["headers"]["Accept"] = "application/json"
+        headers = kwargs.setdefault("headers", {})
+        headers.update(self._base_headers())
         if ("body" in kwargs) or ("data" in kwargs):
-            if "Content-Type" not in kwargs["headers"]:
-                kwargs["headers"]["Content-Type"] = "application/json"
-            elif kwargs["headers"]["Content-Type"] is None:
-                del kwargs["headers"]["Content-Type"]
+            if "Content-Type" not in headers:
+                headers["Content-Type"] = "application/json"
+            elif headers["Content-Type"] is None:
+                del headers["Content-Type"]
         # Allow subclasses to add their own headers
-        self._add_custom_headers(kwargs["headers"])
-        resp, body = pyrax.http.request(method, uri, *args, **kwargs)
+        self._add_custom_headers(headers)
+        if self.transport is not None:
+            kwargs["transport"] = self.transport
+        elif self.connection_pool is not None:
+            kwargs["connection_pool"] = self.connection_pool
+        if self.response_cache is not None:
+            return self._cached_request(uri, method, *args, **kwargs)
+        resp, body = http.request(method, uri, *args, **kwargs)
         if resp.status_code >= 400:
             raise exc.from_response(resp, body)
         return resp, body
 
 
-    def _time_request(self, uri, method, **kwargs):
-        """Wraps the request call and records the elapsed time."""
-        start_time = time.time()
-        resp, body = self.request(uri, method, **kwargs)
-        self.times.append(("%s %s" % (method, uri),
-                start_time, time.time()))
+    def _endpoint_path(self, uri, query=False):
+        """
+        Returns the path of the URI relative to the service endpoint, without
+        any query string unless 'query' is True. URIs on any of the
+        'failover_urls' give the same path as on 'management_url', so that
+        the response cache, the rate limiter and the metrics treat a request
+        the same whichever endpoint it was sent to.
+        """
+        for url in [self.management_url] + self.failover_urls:
+            if url and uri.startswith(url):
+                path = uri[len(url):]
+                break
+        else:
+            parsed = urllib.parse.urlparse(uri)
+            path = parsed.path
+            if parsed.query:
+                path = "%s?%s" % (path, parsed.query)
+        if not query:
+            path = path.split("?", 1)[0]
+        return path or "/"
+
+
+    def _cached_request(self, uri, method, *args, **kwargs):
+        """
+        Makes the request through the response cache. Only complete JSON or
+        text responses are cached; streamed and raw content is not.
+        """
+        cache = self.response_cache
+        path = self._endpoint_path(uri)
+        key = self._endpoint_path(uri, query=True)
+        mutating = method not in cache.cacheable_methods
+        cacheable = not (mutating or kwargs.get("stream") or
+                kwargs.get("raw_content") or "Range" in kwargs["headers"])
+        entry = None
+        if cacheable:
+            entry = cache.get(method, key)
+            if entry is not None:
+                if entry["fresh"]:
+                    return cache.response(entry)
+                # Copied, so as not to change the caller's headers.
+                kwargs["headers"] = dict(kwargs["headers"],
+                        **cache.conditional_headers(entry))
+        try:
+            resp, body = http.request(method, uri, *args, **kwargs)
+        finally:
+            if mutating:
+                cache.invalidate(path)
+        if entry is not None and resp.status_code == 304:
+            cache.revalidated(entry, path)
+            return cache.response(entry)
+        if resp.status_code >= 400:
+            raise exc.from_response(resp, body)
+        if cacheable and resp.status_code < 300:
+            cache.store(method, key, path, resp, body)
         return resp, body
 
 
+    def _uri_template(self, uri):
+        """
+        Returns the path of the URI with anything that identifies a particular
+        resource replaced, for grouping requests in metrics. Clients whose
+        resources are named rather than numbered can override this.
+        """
+        return instrumentation.uri_template(self._endpoint_path(uri))
+
+
+    def _time_request(self, uri, method, retries=0, **kwargs):
+        """
+        Wraps the request call, records the elapsed time, and passes the
+        details of the request to any metrics sinks. 'retries' is the number
+        of times this request has already been attempted.
+
+        If circuit breakers are enabled, the request is only made if the
+        endpoint's breaker allows it, and its result is recorded there.
+        Requests rejected by the breaker are passed to the metrics sinks with
+        a CircuitOpen error, and each change in the breaker's state is passed
+        to them as a BreakerEvent.
+        """
+        start_time = time.time()
+        resp = error = None
+        breaker = self._circuit_breaker(uri)
+        try:
+            if breaker is not None:
+                self._breaker_changed(breaker, breaker.before_request())
+            resp, body = self.request(uri, method, **kwargs)
+            return resp, body
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            if breaker is not None and not isinstance(error, exc.CircuitOpen):
+                self._breaker_changed(breaker, breaker.record(error))
+            end_time = time.time()
+            self.times.append(("%s %s" % (method, uri), start_time, end_time))
+            if instrumentation.has_sinks(self.metrics_sinks):
+                event = instrumentation.create_event(self.name, method, uri,
+                        self._uri_template(uri), start_time, end_time,
+                        resp=resp, error=error, retries=retries,
+                        streamed=kwargs.get("stream", False))
+                instrumentation.emit(event, self.metrics_sinks)
+
+
+    def _breaker_changed(self, breaker, change):
+        """
+        Passes a BreakerEvent to the metrics sinks if 'change', the result of
+        one of the circuit breaker's methods, is an (old state, new state)
+        tuple.
+        """
+        if change is None or not instrumentation.has_sinks(
+                self.metrics_sinks):
+            return
+        old_state, new_state = change
+        event = instrumentation.BreakerEvent(service=self.name,
+                endpoint=breaker.endpoint, old_state=old_state,
+                new_state=new_state, time=time.time())
+        instrumentation.emit_breaker(event, self.metrics_sinks)
+
+
+    def _retry_request(self, uri, method, retries=0, **kwargs):
+        """
+        Makes the request, retrying it after transient failures as allowed by
+        the client's retry policy. Each attempt first waits for the client's
+        rate limiter, if any. A file-like body is rewound before each
+        retry; any other body that can't be sent again, such as a generator
+        or an iterator, means that the request is not retried.
+        """
+        policy = self.retry_policy
+        data = kwargs.get("data")
+        replayable = True
+        position = None
+        if data is None or isinstance(data, six.string_types +
+                (six.binary_type, dict, list, tuple)):
+            # Requests encodes these afresh for each attempt.
+            pass
+        else:
+            try:
+                position = data.tell()
+                data.seek(position)
+            except Exception:
+                replayable = False
+                position = None
+        if policy is not None:
+            policy.budget.deposit()
+        attempt = 0
+        while True:
+            total = retries + attempt
+            self._throttle(uri, method)
+            try:
+                if total:
+                    return self._time_request(uri, method, retries=total,
+                            **kwargs)
+                return self._time_request(uri, method, **kwargs)
+            except Exception as e:
+                exc_info = sys.exc_info()
+                error = e
+                delay = None
+                if policy is not None and replayable:
+                    delay = policy.retry_delay(method, error, attempt)
+                if delay is None:
+                    six.reraise(*exc_info)
+            logging.getLogger("pyrax").debug("Retrying %s %s in %.2f seconds "
+                    "after: %s" % (method, uri, delay, error))
+            time.sleep(delay)
+            if position is not None:
+                data.seek(position)
+            attempt += 1
+
+
     def _api_request(self, uri, method, **kwargs):
         """
         Manages the request by adding any auth information, and retries
@@ -204,7 +636,9 @@ class BaseClient(object):
         """
         id_svc = self.identity
         if not all((self.management_url, id_svc.token, id_svc.tenant_id)):
-            id_svc.authenticate()
+            id_svc.refresh_token()
+        else:
+            id_svc.ensure_token()
 
         if not self.management_url:
             # We've authenticated but no management_url has been set. This
@@ -212,29 +646,28 @@ class BaseClient(object):
             raise exc.ServiceNotAvailable("The '%s' service is not available."
                     % self)
         if uri.startswith("http"):
-            parsed = list(urllib.parse.urlparse(uri))
-            for pos, item in enumerate(parsed):
-                if pos < 2:
-                    # Don't escape the scheme or netloc
-                    continue
-                parsed[pos] = _safe_quote(parsed[pos])
-            safe_uri = urllib.parse.urlunparse(parsed)
+            safe_uri = _quote_uri(uri)
         else:
-            safe_uri = "%s%s" % (self.management_url, _safe_quote(uri))
+            safe_uri = "%s%s" % (self._active_management_url(),
+                    _quote_uri(uri))
         # Perform the request once. If we get a 401 back then it
         # might be because the auth token expired, so try to
         # re-authenticate and try again. If it still fails, bail.
+        # If several threads get a 401 at once, only one of them actually
+        # re-authenticates; the others wait for and re-use its new token.
+        token = id_svc.token
         try:
-            kwargs.setdefault("headers", {})["X-Auth-Token"] = id_svc.token
+            kwargs.setdefault("headers", {})["X-Auth-Token"] = token
             if id_svc.tenant_id:
                 kwargs["headers"]["X-Auth-Project-Id"] = id_svc.tenant_id
-            resp, body = self._time_request(safe_uri, method, **kwargs)
+            resp, body = self._retry_request(safe_uri, method, **kwargs)
             return resp, body
         except exc.Unauthorized as ex:
             try:
-                id_svc.authenticate()
+                id_svc.refresh_token(stale_token=token)
                 kwargs["headers"]["X-Auth-Token"] = id_svc.token
-                resp, body = self._time_request(safe_uri, method, **kwargs)
+                resp, body = self._retry_request(safe_uri, method, retries=1,
+                        **kwargs)
                 return resp, body
             except exc.Unauthorized:
                 raise ex
@@ -678,6 +678,8 @@ class CloudDatabaseClient(BaseClient):
     This is the primary class for interacting with Cloud Databases.
     """
     name = "Cloud Databases"
+    # Flavors are looked up whenever an instance is created or resized.
+    response_cache_policies = ((r"^GET /flavors", 3600), )
 
     def _configure_manager(self):
         """
@@ -17,8 +17,9 @@
 #    under the License.
 
 from functools import wraps
-import json
+import logging
 import re
+import threading
 import time
 
 import six
@@ -37,6 +38,20 @@ DEFAULT_TIMEOUT = 5
 DEFAULT_DELAY = 0.5
 # How many times to retry a GET before raising an error
 DEFAULT_RETRY = 3
+# How much longer to wait before the next check on async calls after a check
+# in which none of them completed
+DEFAULT_DELAY_BACKOFF = 1.5
+# The longest interval (in seconds) between checks on async calls
+DEFAULT_MAX_DELAY = 5
+# The shortest interval (in seconds) between checks on async calls, however
+# small the delay is set
+MIN_DELAY = 0.01
+# With more async calls outstanding than this, the running jobs are listed in
+# one request instead of checking on each call in turn
+DEFAULT_JOB_LIST_THRESHOLD = 2
+# The longest time (in seconds) to check on each call in turn after listing
+# the running jobs has failed, before trying to list them again
+DEFAULT_MAX_LIST_RETRY = 300
 
 
 def assure_domain(fnc):
@@ -52,6 +67,11 @@ def assure_domain(fnc):
     return _wrapped
 
 
+def _response_body(resp, resp_body):
+    """Handles async calls whose result is the body of their final status."""
+    return resp_body
+
+
 
 class CloudDNSRecord(BaseResource):
     """
@@ -66,12 +86,16 @@ class CloudDNSRecord(BaseResource):
     ttl = None
     comment = None
 
-    def update(self, data=None, priority=None, ttl=None, comment=None):
+    def update(self, data=None, priority=None, ttl=None, comment=None,
+            wait=True):
         """
         Modifies this record.
+
+        Pass False to 'wait' to get a DNSJob for the call at once instead of
+        waiting for it to complete.
         """
         return self.manager.update_record(self.domain_id, self, data=data,
-            priority=priority, ttl=ttl, comment=comment)
+            priority=priority, ttl=ttl, comment=comment, wait=wait)
 
 
     def get(self):
@@ -81,11 +105,14 @@ class CloudDNSRecord(BaseResource):
         return self.manager.get_record(self.domain_id, self)
 
 
-    def delete(self):
+    def delete(self, wait=True):
         """
         Deletes an existing record for this domain.
+
+        Pass False to 'wait' to get a DNSJob for the call at once instead of
+        waiting for it to complete.
         """
-        return self.manager.delete_record(self.domain_id, self)
+        return self.manager.delete_record(self.domain_id, self, wait=wait)
 
 
 
@@ -93,13 +120,17 @@ class CloudDNSDomain(BaseResource):
     """
     This class represents a DNS domain.
     """
-    def delete(self, delete_subdomains=False):
+    def delete(self, delete_subdomains=False, wait=True):
         """
         Deletes this domain and all of its resource records. If this domain has
         subdomains, each subdomain will now become a root domain. If you wish to
         also delete any subdomains, pass True to 'delete_subdomains'.
+
+        Pass False to 'wait' to get a DNSJob for the call at once instead of
+        waiting for it to complete.
         """
-        self.manager.delete(self, delete_subdomains=delete_subdomains)
+        return self.manager.delete(self, delete_subdomains=delete_subdomains,
+                wait=wait)
 
 
     def changes_since(self, date_or_datetime):
@@ -147,16 +178,19 @@ class CloudDNSDomain(BaseResource):
         return self.manager.export_domain(self)
 
 
-    def update(self, emailAddress=None, ttl=None, comment=None):
+    def update(self, emailAddress=None, ttl=None, comment=None, wait=True):
         """
         Provides a way to modify the following attributes of a domain
         entry:
             - email address
             - ttl setting
             - comment
+
+        Pass False to 'wait' to get a DNSJob for the call at once instead of
+        waiting for it to complete.
         """
         return self.manager.update_domain(self, emailAddress=emailAddress,
-                ttl=ttl, comment=comment)
+                ttl=ttl, comment=comment, wait=wait)
 
 
     def list_subdomains(self, limit=None, offset=None):
@@ -200,7 +234,7 @@ class CloudDNSDomain(BaseResource):
         return matches[0]
 
 
-    def add_records(self, records):
+    def add_records(self, records, wait=True):
         """
         Adds the records to this domain. Each record should be a dict with the
         following keys:
@@ -210,8 +244,11 @@ class CloudDNSDomain(BaseResource):
             - ttl (optional)
             - comment (optional)
             - priority (required for MX and SRV records; forbidden otherwise)
+
+        Pass False to 'wait' to get a DNSJob for the call at once instead of
+        waiting for it to complete.
         """
-        return self.manager.add_records(self, records)
+        return self.manager.add_records(self, records, wait=wait)
 
     # Create an alias, so that adding a single record is more intuitive
     add_record = add_records
@@ -225,15 +262,18 @@ class CloudDNSDomain(BaseResource):
 
 
     def update_record(self, record, data=None, priority=None,
-            ttl=None, comment=None):
+            ttl=None, comment=None, wait=True):
         """
         Modifies an existing record for this domain.
+
+        Pass False to 'wait' to get a DNSJob for the call at once instead of
+        waiting for it to complete.
         """
         return self.manager.update_record(self, record, data=data,
-            priority=priority, ttl=ttl, comment=comment)
+            priority=priority, ttl=ttl, comment=comment, wait=wait)
 
 
-    def update_records(self, records):
+    def update_records(self, records, wait=True):
         """
         Modifies multiple existing records for a domain. Each record to be
         updated should be a dict with following required keys:
@@ -246,15 +286,21 @@ class CloudDNSDomain(BaseResource):
             - ttl
             - comment
             - priority (optional for MX and SRV records; forbidden otherwise)
+
+        Pass False to 'wait' to get a DNSJob for the call at once instead of
+        waiting for it to complete.
         """
-        return self.manager.update_records(self, records)
+        return self.manager.update_records(self, records, wait=wait)
 
 
-    def delete_record(self, record):
+    def delete_record(self, record, wait=True):
         """
         Deletes an existing record for this domain.
+
+        Pass False to 'wait' to get a DNSJob for the call at once instead of
+        waiting for it to complete.
         """
-        return self.manager.delete_record(self, record)
+        return self.manager.delete_record(self, record, wait=wait)
 
 
 
@@ -285,6 +331,276 @@ class CloudDNSPTRRecord(object):
 
 
 
+class DNSJob(object):
+    """
+    An asynchronous call to the DNS API that has been made but may not have
+    completed yet; its manager's DNSJobTracker checks on it in the background.
+    Call result() to wait for the outcome of the call.
+    """
+    def __init__(self, manager, uri, callback_url, error_class=None,
+            has_response=True, handler=None):
+        self.manager = manager
+        self.uri = uri
+        self.id = callback_url.split("/status/")[-1]
+        self.status_uri = "/status/%s?showDetails=true" % self.id
+        self.error_class = error_class
+        self.has_response = has_response
+        self.handler = handler
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._callbacks = []
+        self._result = None
+        self._error = None
+
+
+    def __repr__(self):
+        status = "done" if self.done() else "running"
+        return "<DNSJob %s %s>" % (self.id, status)
+
+
+    def done(self):
+        """Returns True once the call has completed or failed."""
+        return self._done.is_set()
+
+
+    def wait(self, timeout=None):
+        """
+        Waits up to 'timeout' seconds, or indefinitely if it is None, for the
+        call to complete. Returns True if it has.
+        """
+        self._done.wait(timeout)
+        return self._done.is_set()
+
+
+    def result(self, timeout=None):
+        """
+        Waits up to 'timeout' seconds, or indefinitely if it is None, for the
+        call to complete, and returns what the waiting form of the call would
+        have returned. If the call failed, its error is raised; if it has not
+        completed in time, DNSCallTimedOut is raised.
+        """
+        if not self.wait(timeout):
+            raise exc.DNSCallTimedOut("The API call to '%s' did not complete "
+                    "after %s seconds." % (self.uri, timeout))
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+
+    def add_done_callback(self, fn):
+        """
+        Arranges for fn(job) to be called from the tracker's thread once the
+        call has completed or failed. If it already has, fn is called at once.
+        """
+        with self._lock:
+            if not self._done.is_set():
+                self._callbacks.append(fn)
+                return
+        fn(self)
+
+
+    def _finish(self, resp, resp_body):
+        """Records the outcome of the call from its final status."""
+        try:
+            if self.error_class and (resp_body["status"] == "ERROR"):
+                # This call will handle raising the error.
+                self.manager._process_async_error(resp_body, self.error_class)
+            if self.has_response:
+                ret = resp, resp_body["response"]
+            else:
+                ret = resp, resp_body
+            if self.handler is not None:
+                ret = self.handler(*ret)
+        except Exception as e:
+            self._set_outcome(error=e)
+        else:
+            self._set_outcome(result=ret)
+
+
+    def _set_outcome(self, result=None, error=None):
+        with self._lock:
+            self._result = result
+            self._error = error
+            self._done.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for fn in callbacks:
+            try:
+                fn(self)
+            except Exception as e:
+                logging.getLogger("pyrax").debug("Callback for DNS job '%s' "
+                        "failed: %s" % (self.id, e))
+
+
+
+class DNSJobTracker(object):
+    """
+    Checks on all the outstanding asynchronous calls of a CloudDNSManager from
+    a single background thread, which only runs while there are calls to
+    check on.
+
+    A call is first checked on as soon as the thread is free to, and the
+    checks are then the manager's delay apart. After each check in which no
+    call completed, the next one waits 'backoff' times longer, up to
+    'max_delay' seconds; a new call or a completed one resets the interval.
+    With more than 'list_threshold' calls outstanding, each check lists the
+    account's running jobs in one request, and only fetches the status of
+    the calls that are no longer running. If that listing fails, each call is
+    checked on in turn until the listing is tried again, first 'max_delay'
+    seconds later, then twice as long after each further failure.
+
+    A call whose check fails with an error fails with that error; the others
+    are unaffected.
+    """
+    def __init__(self, manager, backoff=DEFAULT_DELAY_BACKOFF,
+            max_delay=DEFAULT_MAX_DELAY,
+            list_threshold=DEFAULT_JOB_LIST_THRESHOLD):
+        self.manager = manager
+        self.backoff = backoff
+        self.max_delay = max_delay
+        self.list_threshold = list_threshold
+        self.interval = 0
+        self._cond = threading.Condition()
+        self._jobs = {}
+        self._added = False
+        self._next_check = 0
+        self._thread = None
+        # Listing the running jobs is not tried again before this time.
+        self._list_after = 0
+        self._list_failures = 0
+
+
+    def __len__(self):
+        with self._cond:
+            return len(self._jobs)
+
+
+    def add(self, job):
+        """Starts checking on the job."""
+        with self._cond:
+            self._jobs[job.id] = job
+            self._added = True
+            self.interval = self._min_interval()
+            if self._thread is None:
+                self._next_check = 0
+                self._start()
+            else:
+                self._next_check = min(self._next_check,
+                        time.time() + self.interval)
+                self._cond.notify_all()
+
+
+    def discard(self, job):
+        """Stops checking on the job, if it is still outstanding."""
+        with self._cond:
+            self._jobs.pop(job.id, None)
+            self._cond.notify_all()
+
+
+    def _start(self):
+        """Called with the lock held to start the tracking thread."""
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+
+    def _min_interval(self):
+        return min(self.max_delay, max(self.manager._delay, MIN_DELAY))
+
+
+    def _remove(self, job):
+        with self._cond:
+            return self._jobs.pop(job.id, None) is not None
+
+
+    def _run(self):
+        try:
+            while True:
+                with self._cond:
+                    while self._jobs and self._next_check > time.time():
+                        self._cond.wait(self._next_check - time.time())
+                    if not self._jobs:
+                        self._thread = None
+                        return
+                    jobs = list(self._jobs.values())
+                    self._added = False
+                try:
+                    finished = self._check(jobs)
+                except Exception as e:
+                    logging.getLogger("pyrax").debug("Checking on DNS jobs "
+                            "failed: %s" % e)
+                    finished = 0
+                with self._cond:
+                    if finished or self._added:
+                        self.interval = self._min_interval()
+                    else:
+                        self.interval = min(self.max_delay,
+                                self.interval * self.backoff)
+                    self._next_check = time.time() + self.interval
+        finally:
+            with self._cond:
+                # Should the thread die, hand any outstanding calls on to a
+                # new one, so that add() never relies on a dead thread.
+                if self._thread is threading.current_thread():
+                    self._thread = None
+                    if self._jobs:
+                        self._start()
+
+
+    def _check(self, jobs):
+        """Checks on the jobs, and returns how many of them have finished."""
+        if (len(jobs) > self.list_threshold and
+                time.time() >= self._list_after):
+            running = self._running_job_ids()
+            if running is not None:
+                jobs = [job for job in jobs if job.id not in running]
+        finished = 0
+        for job in jobs:
+            try:
+                resp, resp_body = self.manager._retry_get(job.status_uri)
+                if resp_body["status"] == "RUNNING":
+                    continue
+            except Exception as e:
+                if self._remove(job):
+                    job._set_outcome(error=e)
+                    finished += 1
+                continue
+            if self._remove(job):
+                job._finish(resp, resp_body)
+                finished += 1
+        return finished
+
+
+    def _running_job_ids(self):
+        """
+        Returns the set of ids of the account's running jobs, or None if they
+        could not be listed, in which case listing is not tried again until
+        a backoff has passed.
+        """
+        uri = "/status?showRunning=true&showCompleted=false&showErrors=false"
+        running = set()
+        try:
+            while uri:
+                resp, body = self.manager._retry_get(uri)
+                running.update(item.get("jobId")
+                        for item in body.get("asyncResponses", [])
+                        if item.get("status") == "RUNNING")
+                uri = None
+                for link in body.get("links", []):
+                    if link.get("rel") == "next":
+                        href = link["href"]
+                        uri = href[href.index("/status"):]
+        except Exception as e:
+            logging.getLogger("pyrax").debug("Listing DNS jobs failed: %s" % e)
+            self._list_failures += 1
+            retry = min(DEFAULT_MAX_LIST_RETRY,
+                    self.max_delay * 2 ** (self._list_failures - 1))
+            self._list_after = time.time() + retry
+            return None
+        self._list_failures = 0
+        return running
+
+
+
 class CloudDNSManager(BaseManager):
     def __init__(self, api, resource_class=None, response_key=None,
             plural_response_key=None, uri_base=None):
@@ -295,6 +611,7 @@ class CloudDNSManager(BaseManager):
         self._reset_paging(service="all")
         self._timeout = DEFAULT_TIMEOUT
         self._delay = DEFAULT_DELAY
+        self._tracker = DNSJobTracker(self)
 
 
     def _create_body(self, name, emailAddress, ttl=3600, comment=None,
@@ -448,9 +765,13 @@ class CloudDNSManager(BaseManager):
     def _retry_get(self, uri):
         """
         Handles GET calls to the Cloud DNS API in order to retry on empty
-        body responses.
+        body responses. The retries are spaced out by the client's retry
+        policy; errors are retried by the client itself.
         """
+        policy = self.api.retry_policy
         for i in six.moves.range(DEFAULT_RETRY):
+            if i and policy is not None:
+                time.sleep(policy.backoff_delay(i - 1))
             resp, body = self.api.method_get(uri)
             if body:
                 return resp, body
@@ -470,6 +791,23 @@ class CloudDNSManager(BaseManager):
         and body will be returned to the calling method, which will have
         to handle the result.
         """
+        job = self._start_async_call(uri, body, method, error_class,
+                has_response, None, *args, **kwargs)
+        try:
+            return job.result(self._timeout or None)
+        except exc.DNSCallTimedOut:
+            self._tracker.discard(job)
+            raise
+
+
+    def _start_async_call(self, uri, body=None, method="GET", error_class=None,
+            has_response=True, handler=None, *args, **kwargs):
+        """
+        Makes an asynchronous call to the DNS API, and returns a DNSJob for it
+        without waiting for the call to complete. The job's result is what
+        _async_call() would return or, if a 'handler' is given, what
+        handler(resp, resp_body) returns for those values.
+        """
         api_methods = {
                 "GET": self._retry_get,
                 "POST": self.api.method_post,
@@ -488,33 +826,26 @@ class CloudDNSManager(BaseManager):
             else:
                 raise
 
-        callbackURL = resp_body["callbackUrl"].split("/status/")[-1]
-        massagedURL = "/status/%s?showDetails=true" % callbackURL
-        start = time.time()
-        timed_out = False
-        while (resp_body["status"] == "RUNNING") and not timed_out:
-            resp_body = None
-            while resp_body is None and not timed_out:
-                resp, resp_body = self._retry_get(massagedURL)
-                if self._timeout:
-                    timed_out = ((time.time() - start) > self._timeout)
-                    time.sleep(self._delay)
-
-        if timed_out:
-            raise exc.DNSCallTimedOut("The API call to '%s' did not complete "
-                    "after %s seconds." % (uri, self._timeout))
-        if error_class and (resp_body["status"] == "ERROR"):
-            # This call will handle raising the error.
-            self._process_async_error(resp_body, error_class)
-        if has_response:
-            ret = resp, resp_body["response"]
+        job = DNSJob(self, uri, resp_body["callbackUrl"],
+                error_class=error_class, has_response=has_response,
+                handler=handler)
+        if resp_body["status"] == "RUNNING":
+            self._tracker.add(job)
         else:
-            ret = resp, resp_body
-        try:
-            resp_body = json.loads(resp_body)
-        except Exception:
-            pass
-        return ret
+            job._finish(resp, resp_body)
+        return job
+
+
+    def _run_async(self, wait, handler, uri, **kwargs):
+        """
+        Makes an asynchronous call, and passes the headers and body that
+        _async_call() returns for it to handler(). If 'wait' is True, this
+        waits for the call to complete and returns what the handler returns;
+        otherwise the DNSJob for the call is returned at once.
+        """
+        if wait:
+            return handler(*self._async_call(uri, **kwargs))
+        return self._start_async_call(uri, handler=handler, **kwargs)
 
 
     def _process_async_error(self, resp_body, error_class):
@@ -572,17 +903,21 @@ class CloudDNSManager(BaseManager):
         return self.resource_class(self, response_body)
 
 
-    def delete(self, domain, delete_subdomains=False):
+    def delete(self, domain, delete_subdomains=False, wait=True):
         """
         Deletes the specified domain and all of its resource records. If the
         domain has subdomains, each subdomain will now become a root domain. If
         you wish to also delete any subdomains, pass True to 'delete_subdomains'.
+
+        Pass False to 'wait' to get a DNSJob for the call at once instead of
+        waiting for it to complete.
         """
         uri = "/%s/%s" % (self.uri_base, utils.get_id(domain))
         if delete_subdomains:
             uri = "%s?deleteSubdomains=true" % uri
-        resp, resp_body = self._async_call(uri, method="DELETE",
-                error_class=exc.DomainDeletionFailed, has_response=False)
+        return self._run_async(wait, lambda resp, resp_body: None, uri,
+                method="DELETE", error_class=exc.DomainDeletionFailed,
+                has_response=False)
 
 
     def findall(self, **kwargs):
@@ -672,13 +1007,17 @@ class CloudDNSManager(BaseManager):
         return resp_body
 
 
-    def update_domain(self, domain, emailAddress=None, ttl=None, comment=None):
+    def update_domain(self, domain, emailAddress=None, ttl=None, comment=None,
+            wait=True):
         """
         Provides a way to modify the following attributes of a domain
         record:
             - email address
             - ttl setting
             - comment
+
+        Pass False to 'wait' to get a DNSJob for the call at once instead of
+        waiting for it to complete.
         """
         if not any((emailAddress, ttl, comment)):
             raise exc.MissingDNSSettings(
@@ -692,9 +1031,9 @@ class CloudDNSManager(BaseManager):
                 if val is None]
         for none_key in none_keys:
             body.pop(none_key)
-        resp, resp_body = self._async_call(uri, method="PUT", body=body,
-                error_class=exc.DomainUpdateFailed, has_response=False)
-        return resp_body
+        return self._run_async(wait, _response_body, uri, method="PUT",
+                body=body, error_class=exc.DomainUpdateFailed,
+                has_response=False)
 
 
     def list_subdomains(self, domain, limit=None, offset=None):
@@ -823,7 +1162,7 @@ class CloudDNSManager(BaseManager):
                 for record in records if record]
 
 
-    def add_records(self, domain, records):
+    def add_records(self, domain, records, wait=True):
         """
         Adds the records to this domain. Each record should be a dict with the
         following keys:
@@ -833,6 +1172,9 @@ class CloudDNSManager(BaseManager):
             - ttl (optional)
             - comment (optional)
             - priority (required for MX and SRV records; forbidden otherwise)
+
+        Pass False to 'wait' to get a DNSJob for the call at once instead of
+        waiting for it to complete.
         """
         if isinstance(records, dict):
             # Single record passed
@@ -840,13 +1182,17 @@ class CloudDNSManager(BaseManager):
         dom_id = utils.get_id(domain)
         uri = "/domains/%s/records" % dom_id
         body = {"records": records}
-        resp, resp_body = self._async_call(uri, method="POST", body=body,
-                error_class=exc.DomainRecordAdditionFailed, has_response=False)
-        records = resp_body.get("response", {}).get("records", [])
-        for record in records:
-            record["domain_id"] = dom_id
-        return [CloudDNSRecord(self, record, loaded=False)
-                for record in records if record]
+
+        def _to_records(resp, resp_body):
+            records = resp_body.get("response", {}).get("records", [])
+            for record in records:
+                record["domain_id"] = dom_id
+            return [CloudDNSRecord(self, record, loaded=False)
+                    for record in records if record]
+
+        return self._run_async(wait, _to_records, uri, method="POST",
+                body=body, error_class=exc.DomainRecordAdditionFailed,
+                has_response=False)
 
 
     def get_record(self, domain, record):
@@ -862,9 +1208,12 @@ class CloudDNSManager(BaseManager):
 
 
     def update_record(self, domain, record, data=None, priority=None,
-            ttl=None, comment=None):
+            ttl=None, comment=None, wait=True):
         """
         Modifies an existing record for a domain.
+
+        Pass False to 'wait' to get a DNSJob for the call at once instead of
+        waiting for it to complete.
         """
         rdict = {"id": record.id,
                 "name": record.name,
@@ -875,31 +1224,35 @@ class CloudDNSManager(BaseManager):
                 "comment": comment,
                 }
         utils.params_to_dict(pdict, rdict)
-        return self.update_records(domain, [rdict])
+        return self.update_records(domain, [rdict], wait=wait)
 
 
-    def update_records(self, domain, records):
+    def update_records(self, domain, records, wait=True):
         """
         Modifies an existing records for a domain.
+
+        Pass False to 'wait' to get a DNSJob for the call at once instead of
+        waiting for it to complete.
         """
         if not isinstance(records, list):
             raise TypeError("Expected records of type list")
         uri = "/domains/%s/records" % utils.get_id(domain)
-        resp, resp_body = self._async_call(uri, method="PUT",
+        return self._run_async(wait, _response_body, uri, method="PUT",
                 body={"records": records},
                 error_class=exc.DomainRecordUpdateFailed, has_response=False)
-        return resp_body
 
 
-    def delete_record(self, domain, record):
+    def delete_record(self, domain, record, wait=True):
         """
         Deletes an existing record for a domain.
+
+        Pass False to 'wait' to get a DNSJob for the call at once instead of
+        waiting for it to complete.
         """
         uri = "/domains/%s/records/%s" % (utils.get_id(domain),
                 utils.get_id(record))
-        resp, resp_body = self._async_call(uri, method="DELETE",
+        return self._run_async(wait, _response_body, uri, method="DELETE",
                 error_class=exc.DomainRecordDeletionFailed, has_response=False)
-        return resp_body
 
 
     def _get_ptr_details(self, device, device_type):
@@ -1182,26 +1535,33 @@ class CloudDNSClient(BaseClient):
 
 
     @assure_domain
-    def update_domain(self, domain, emailAddress=None, ttl=None, comment=None):
+    def update_domain(self, domain, emailAddress=None, ttl=None, comment=None,
+            wait=True):
         """
         Provides a way to modify the following attributes of a domain
         record:
             - email address
             - ttl setting
             - comment
+
+        Pass False to 'wait' to get a DNSJob for the call at once instead of
+        waiting for it to complete.
         """
         return domain.update(emailAddress=emailAddress,
-                ttl=ttl, comment=comment)
+                ttl=ttl, comment=comment, wait=wait)
 
 
     @assure_domain
-    def delete(self, domain, delete_subdomains=False):
+    def delete(self, domain, delete_subdomains=False, wait=True):
         """
         Deletes the specified domain and all of its resource records. If the
         domain has subdomains, each subdomain will now become a root domain. If
         you wish to also delete any subdomains, pass True to 'delete_subdomains'.
+
+        Pass False to 'wait' to get a DNSJob for the call at once instead of
+        waiting for it to complete.
         """
-        domain.delete(delete_subdomains=delete_subdomains)
+        return domain.delete(delete_subdomains=delete_subdomains, wait=wait)
 
 
     @assure_domain
@@ -1285,7 +1645,7 @@ class CloudDNSClient(BaseClient):
 
 
     @assure_domain
-    def add_records(self, domain, records):
+    def add_records(self, domain, records, wait=True):
         """
         Adds the records to this domain. Each record should be a dict with the
         following keys:
@@ -1295,8 +1655,11 @@ class CloudDNSClient(BaseClient):
             - ttl (optional)
             - comment (optional)
             - priority (required for MX and SRV records; forbidden otherwise)
+
+        Pass False to 'wait' to get a DNSJob for the call at once instead of
+        waiting for it to complete.
         """
-        return domain.add_records(records)
+        return domain.add_records(records, wait=wait)
 
     # Create an alias, so that adding a single record is more intuitive
     add_record = add_records
@@ -1313,16 +1676,19 @@ class CloudDNSClient(BaseClient):
 
     @assure_domain
     def update_record(self, domain, record, data=None, priority=None, ttl=None,
-            comment=None):
+            comment=None, wait=True):
         """
         Modifies an existing record for a domain.
+
+        Pass False to 'wait' to get a DNSJob for the call at once instead of
+        waiting for it to complete.
         """
         return domain.update_record(record, data=data, priority=priority,
-                ttl=ttl, comment=comment)
+                ttl=ttl, comment=comment, wait=wait)
 
 
     @assure_domain
-    def update_records(self, domain, records):
+    def update_records(self, domain, records, wait=True):
         """
         Modifies multiple existing records for a domain. Each record to be
         updated should be a dict with following required keys:
@@ -1335,16 +1701,22 @@ class CloudDNSClient(BaseClient):
             - ttl
             - comment
             - priority (optional for MX and SRV records; forbidden otherwise)
+
+        Pass False to 'wait' to get a DNSJob for the call at once instead of
+        waiting for it to complete.
         """
-        return domain.update_records(records)
+        return domain.update_records(records, wait=wait)
 
 
     @assure_domain
-    def delete_record(self, domain, record):
+    def delete_record(self, domain, record, wait=True):
         """
         Deletes an existing record for this domain.
+
+        Pass False to 'wait' to get a DNSJob for the call at once instead of
+        waiting for it to complete.
         """
-        return domain.delete_record(record)
+        return domain.delete_record(record, wait=wait)
 
 
     def list_ptr_records(self, device):
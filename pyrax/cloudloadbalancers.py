@@ -1227,6 +1227,11 @@ class CloudLoadBalancerClient(BaseClient):
     This is the primary class for interacting with Cloud Load Balancers.
     """
     name = "Cloud Load Balancers"
+    # These lists only change with new releases of the service.
+    response_cache_policies = (
+            (r"^GET /loadbalancers/(algorithms|protocols|alloweddomains)$",
+                3600),
+            )
 
     def __init__(self, *args, **kwargs):
         # Bring these two classes into the Client namespace
@@ -951,6 +951,10 @@ class CloudMonitorClient(BaseClient):
     """
     This is the base client for creating and managing Cloud Monitoring.
     """
+    # Check types and monitoring zones rarely change.
+    response_cache_policies = (
+            (r"^GET /(check_types|monitoring_zones)", 3600),
+            )
 
     def __init__(self, *args, **kwargs):
         super(CloudMonitorClient, self).__init__(*args, **kwargs)
@@ -28,6 +28,9 @@ class PyraxException(Exception):
 class AccessListIDNotFound(PyraxException):
     pass
 
+class AsyncioNotAvailable(PyraxException):
+    pass
+
 class AuthenticationFailed(PyraxException):
     pass
 
@@ -40,6 +43,9 @@ class AuthSystemNotFound(PyraxException):
 class CDNFailed(PyraxException):
     pass
 
+class CircuitOpen(PyraxException):
+    pass
+
 class DBUpdateUnchanged(PyraxException):
     pass
 
@@ -70,6 +76,9 @@ class DomainRecordUpdateFailed(PyraxException):
 class DomainUpdateFailed(PyraxException):
     pass
 
+class DownloadFailed(PyraxException):
+    pass
+
 class DuplicateQueue(PyraxException):
     pass
 
@@ -190,6 +199,9 @@ class InvalidVirtualIPVersion(PyraxException):
 class InvalidVolumeResize(PyraxException):
     pass
 
+class MessagePostFailed(PyraxException):
+    pass
+
 class MissingAuthSettings(PyraxException):
     pass
 
@@ -364,6 +376,9 @@ class ClientException(PyraxException):
     """
     The base exception class for all exceptions this library raises.
     """
+    # The Retry-After header of the response, if any.
+    retry_after = None
+
     def __init__(self, code, message=None, details=None, request_id=None):
         self.code = code
         self.message = message or "-no error message returned-"
@@ -471,6 +486,7 @@ def from_response(response, body):
 #    pyrax.utils.trace()
 
     request_id = response.headers.get("x-compute-request-id")
+    retry_after = response.headers.get("retry-after")
     if body:
         message = "n/a"
         details = "n/a"
@@ -478,7 +494,9 @@ def from_response(response, body):
             message = body.get("message")
             details = body.get("details")
             if message is details is None:
-                error = body[body.keys()[0]]
+                # Errors are wrapped in a single key naming their type,
+                # such as {"itemNotFound": {"message": ...}}.
+                error = next(iter(body.values()))
                 if isinstance(error, dict):
                     message = error.get("message", None)
                     details = error.get("details", None)
@@ -487,7 +505,9 @@ def from_response(response, body):
                     details = None
         else:
             message = body
-        return cls(code=status, message=message, details=details,
+        ret = cls(code=status, message=message, details=details,
                    request_id=request_id)
     else:
-        return cls(code=status, request_id=request_id)
+        ret = cls(code=status, request_id=request_id)
+    ret.retry_after = retry_after
+    return ret
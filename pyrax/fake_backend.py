@@ -0,0 +1,1067 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c)2014 Rackspace US, Inc.
+
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+In-process fakes of the Object Storage (Swift), Cloud Queues and Cloud DNS
+APIs, for running the real clients without a network.
+
+A FakeBackend is a pyrax.http.Transport that answers requests from in-memory
+state instead of sending them. It implements enough of each API for
+integration tests and for benchmarking the client side of pyrax: container and
+object listings with marker/limit, Range GETs, bulk deletes and large object
+manifests for Swift; queues, messages and claims for Cloud Queues; and domains,
+records and asynchronous jobs for Cloud DNS.
+
+    backend = pyrax.fake_backend.FakeBackend()
+    clt = backend.client("object_store")
+    cont = clt.create("photos")
+    cont.store_object("cat.jpg", b"...")
+
+Clients created by client() send their requests to the backend; to redirect
+every client instead, use the backend as a context manager, or call install()
+and uninstall().
+"""
+
+from __future__ import absolute_import
+
+import collections
+import datetime
+import email.utils
+import hashlib
+import io
+import json
+import threading
+import time
+import uuid
+
+import requests
+from requests.structures import CaseInsensitiveDict
+import six
+from six.moves import http_client
+from six.moves import urllib
+
+import pyrax.http
+
+
+SWIFT_ENDPOINT = "http://swift.fake.local/v1/AUTH_fake"
+QUEUES_ENDPOINT = "http://queues.fake.local/v1"
+DNS_ENDPOINT = "http://dns.fake.local/v1.0/123456"
+
+
+class _RawBody(io.BytesIO):
+    """
+    Stands in for the urllib3 response that `requests` reads a body from, so
+    that streamed and non-streamed responses both work.
+    """
+    def read(self, size=-1, decode_content=False):
+        return super(_RawBody, self).read(size)
+
+
+
+class _Identity(object):
+    """An identity that is always authenticated with a fixed token."""
+    def __init__(self):
+        self.token = "fake-token"
+        self.tenant_id = "123456"
+        self.authenticated = True
+        self.services = {}
+
+
+    def ensure_token(self):
+        pass
+
+
+    def refresh_token(self, stale_token=None):
+        pass
+
+
+
+def _http_date(timestamp):
+    return email.utils.formatdate(timestamp, usegmt=True)
+
+
+def _iso_date(timestamp):
+    return datetime.datetime.utcfromtimestamp(timestamp).strftime(
+            "%Y-%m-%dT%H:%M:%S.%f")
+
+
+def _md5(data):
+    return hashlib.md5(data).hexdigest()
+
+
+
+class FakeService(object):
+    """
+    Base class for the fake APIs. handle() is passed the parts of a request
+    with the path relative to the service's endpoint, and returns a tuple of
+    (status, headers, body); a body that is not bytes is sent as JSON.
+    """
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self._lock = threading.RLock()
+
+
+    def handle(self, method, path, query, headers, data):
+        raise NotImplementedError
+
+
+    @staticmethod
+    def _error(status, message, details=""):
+        return status, {}, {"code": status, "message": message,
+                "details": details}
+
+
+
+class FakeSwift(FakeService):
+    """
+    A fake Object Storage account. Objects, with their metadata, are kept in
+    a dict for each container.
+    """
+    # The most names returned by one listing request.
+    max_listing = 10000
+    # The most names accepted by one bulk delete request.
+    max_bulk_delete = 10000
+
+    def __init__(self, endpoint=SWIFT_ENDPOINT):
+        super(FakeSwift, self).__init__(endpoint)
+        self.account_meta = {}
+        # {container_name: {"meta": {...}, "objects": {name: {...}}}}
+        self.containers = {}
+
+
+    def handle(self, method, path, query, headers, data):
+        path = path.lstrip("/")
+        if not path:
+            if "bulk-delete" in query and method in ("DELETE", "POST"):
+                return self._bulk_delete(data)
+            return self._account(method, query, headers)
+        cname, _, oname = path.partition("/")
+        if not oname:
+            return self._container(method, cname, query, headers)
+        return self._object(method, cname, oname, query, headers, data)
+
+
+    def _account(self, method, query, headers):
+        if method == "POST":
+            self.account_meta.update(_meta_headers(headers,
+                    "x-account-meta-"))
+            return 204, {}, b""
+        if method not in ("GET", "HEAD"):
+            return 405, {}, b"Method Not Allowed"
+        num_objects = num_bytes = 0
+        for cont in self.containers.values():
+            objs = self._live_objects(cont)
+            num_objects += len(objs)
+            num_bytes += sum(obj["bytes"] for obj in objs.values())
+        hdrs = {"X-Account-Container-Count": str(len(self.containers)),
+                "X-Account-Object-Count": str(num_objects),
+                "X-Account-Bytes-Used": str(num_bytes)}
+        hdrs.update(self.account_meta)
+        if method == "HEAD":
+            return 204, hdrs, b""
+        listing = []
+        for name in self._page(sorted(self.containers), query):
+            if isinstance(name, dict):
+                listing.append(name)
+                continue
+            objs = self._live_objects(self.containers[name])
+            listing.append({"name": name, "count": len(objs),
+                    "bytes": sum(obj["bytes"] for obj in objs.values())})
+        return 200, hdrs, listing
+
+
+    def _container(self, method, cname, query, headers):
+        cont = self.containers.get(cname)
+        meta = _meta_headers(headers, "x-container-meta-")
+        if method == "PUT":
+            if cont is None:
+                self.containers[cname] = {"meta": meta, "objects": {}}
+                return 201, {}, b""
+            cont["meta"].update(meta)
+            return 202, {}, b""
+        if cont is None:
+            return 404, {}, b"Not Found"
+        if method == "POST":
+            cont["meta"].update(meta)
+            return 204, {}, b""
+        if method == "DELETE":
+            if self._live_objects(cont):
+                return 409, {}, b"Conflict"
+            del self.containers[cname]
+            return 204, {}, b""
+        objs = self._live_objects(cont)
+        hdrs = {"X-Container-Object-Count": str(len(objs)),
+                "X-Container-Bytes-Used": str(sum(obj["bytes"]
+                    for obj in objs.values()))}
+        hdrs.update(cont["meta"])
+        if method == "HEAD":
+            return 204, hdrs, b""
+        if method != "GET":
+            return 405, {}, b"Method Not Allowed"
+        listing = []
+        for name in self._page(sorted(objs), query):
+            if isinstance(name, dict):
+                listing.append(name)
+                continue
+            obj = objs[name]
+            listing.append({"name": name, "bytes": obj["bytes"],
+                    "hash": obj["etag"],
+                    "last_modified": _iso_date(obj["timestamp"]),
+                    "content_type": obj["content_type"]})
+        return 200, hdrs, listing
+
+
+    def _page(self, names, query):
+        """
+        Applies the 'prefix', 'marker', 'end_marker', 'delimiter' and 'limit'
+        query parameters to a sorted list of names. Names rolled up by the
+        delimiter are returned as {"subdir": ...} dicts.
+        """
+        prefix = query.get("prefix", "")
+        marker = query.get("marker", "")
+        end_marker = query.get("end_marker", "")
+        delimiter = query.get("delimiter", "")
+        try:
+            limit = min(int(query.get("limit", self.max_listing)),
+                    self.max_listing)
+        except ValueError:
+            limit = self.max_listing
+        ret = []
+        for name in names:
+            if len(ret) >= limit:
+                break
+            if (not name.startswith(prefix) or name <= marker or
+                    (end_marker and name >= end_marker)):
+                continue
+            if delimiter:
+                pos = name.find(delimiter, len(prefix))
+                if pos >= 0:
+                    subdir = name[:pos + len(delimiter)]
+                    if not ret or ret[-1] != {"subdir": subdir}:
+                        ret.append({"subdir": subdir})
+                    continue
+            ret.append(name)
+        return ret
+
+
+    def _live_objects(self, cont):
+        """Removes any expired objects, and returns the rest."""
+        objs = cont["objects"]
+        now = time.time()
+        expired = [name for name, obj in objs.items()
+                if obj["delete_at"] and obj["delete_at"] <= now]
+        for name in expired:
+            del objs[name]
+        return objs
+
+
+    def _object(self, method, cname, oname, query, headers, data):
+        cont = self.containers.get(cname)
+        if cont is None:
+            return 404, {}, b"Not Found"
+        objs = self._live_objects(cont)
+        if method == "PUT":
+            return self._put_object(cont, oname, query, headers, data)
+        obj = objs.get(oname)
+        if obj is None:
+            return 404, {}, b"Not Found"
+        if method == "DELETE":
+            del objs[oname]
+            if query.get("multipart-manifest") == "delete" and obj["slo"]:
+                for seg in obj["slo"]:
+                    seg_cont, _, seg_name = seg["path"].lstrip("/").partition(
+                            "/")
+                    self.containers.get(seg_cont, {}).get("objects",
+                            {}).pop(seg_name, None)
+            return 204, {}, b""
+        if method == "POST":
+            obj["meta"] = _meta_headers(headers, "x-object-meta-")
+            return 202, {}, b""
+        if method not in ("GET", "HEAD"):
+            return 405, {}, b"Method Not Allowed"
+        content, etag = self._object_content(obj)
+        hdrs = {"Content-Type": obj["content_type"],
+                "Content-Length": str(len(content)),
+                "ETag": etag,
+                "Last-Modified": _http_date(obj["timestamp"]),
+                "X-Timestamp": "%.5f" % obj["timestamp"],
+                "Accept-Ranges": "bytes"}
+        hdrs.update(obj["meta"])
+        if obj["manifest"]:
+            hdrs["X-Object-Manifest"] = obj["manifest"]
+        if obj["slo"]:
+            hdrs["X-Static-Large-Object"] = "True"
+        if method == "HEAD":
+            return 200, hdrs, b""
+        rng = headers.get("range")
+        if not rng:
+            return 200, hdrs, content
+        byte_range = _parse_range(rng, len(content))
+        if byte_range is None:
+            return 416, {"Content-Range": "bytes */%s" % len(content)}, \
+                    b"Requested Range Not Satisfiable"
+        start, end = byte_range
+        hdrs["Content-Range"] = "bytes %s-%s/%s" % (start, end, len(content))
+        hdrs["Content-Length"] = str(end - start + 1)
+        return 206, hdrs, content[start:end + 1]
+
+
+    def _object_content(self, obj):
+        """
+        Returns the content and ETag of an object, assembling the segments of
+        large objects from their manifests.
+        """
+        if obj["manifest"]:
+            seg_cname, _, prefix = obj["manifest"].partition("/")
+            seg_cont = self.containers.get(seg_cname)
+            segs = []
+            if seg_cont is not None:
+                seg_objs = self._live_objects(seg_cont)
+                segs = [seg_objs[name] for name in sorted(seg_objs)
+                        if name.startswith(prefix)]
+        elif obj["slo"]:
+            segs = []
+            for seg in obj["slo"]:
+                seg_cname, _, seg_name = seg["path"].lstrip("/").partition("/")
+                seg_objs = self.containers.get(seg_cname, {}).get("objects",
+                        {})
+                if seg_name in seg_objs:
+                    segs.append(seg_objs[seg_name])
+        else:
+            return obj["data"], obj["etag"]
+        content = b"".join(seg["data"] for seg in segs)
+        etag = '"%s"' % _md5("".join(seg["etag"] for seg in segs).encode(
+                "ascii"))
+        return content, etag
+
+
+    def _put_object(self, cont, oname, query, headers, data):
+        copy_from = headers.get("x-copy-from")
+        if copy_from:
+            src_cname, _, src_name = urllib.parse.unquote(
+                    copy_from).lstrip("/").partition("/")
+            src_cont = self.containers.get(src_cname)
+            src = None
+            if src_cont is not None:
+                src = self._live_objects(src_cont).get(src_name)
+            if src is None:
+                return 404, {}, b"Not Found"
+            data = self._object_content(src)[0]
+        slo = None
+        if query.get("multipart-manifest") == "put":
+            try:
+                slo = json.loads(data.decode("utf-8"))
+            except ValueError:
+                return 400, {}, b"Invalid manifest"
+            for seg in slo:
+                seg_cname, _, seg_name = seg["path"].lstrip("/").partition("/")
+                seg_obj = self.containers.get(seg_cname, {}).get("objects",
+                        {}).get(seg_name)
+                if (seg_obj is None or
+                        (seg.get("etag") and seg["etag"] != seg_obj["etag"])
+                        or (seg.get("size_bytes") is not None and
+                        int(seg["size_bytes"]) != seg_obj["bytes"])):
+                    return 400, {}, ("Invalid segment: %s" %
+                            seg["path"]).encode("utf-8")
+            data = b""
+        etag = _md5(data)
+        sent_etag = headers.get("etag")
+        if sent_etag and not slo and sent_etag.strip('"') != etag:
+            return 422, {}, b"Unprocessable Entity"
+        now = time.time()
+        delete_at = headers.get("x-delete-at")
+        if headers.get("x-delete-after"):
+            delete_at = now + float(headers["x-delete-after"])
+        cont["objects"][oname] = {
+                "data": data,
+                "bytes": len(data),
+                "etag": etag,
+                "content_type": (headers.get("content-type") or
+                    "application/octet-stream"),
+                "timestamp": now,
+                "meta": _meta_headers(headers, "x-object-meta-"),
+                "manifest": headers.get("x-object-manifest"),
+                "slo": slo,
+                "delete_at": float(delete_at) if delete_at else None,
+                }
+        return 201, {"ETag": etag, "Last-Modified": _http_date(now)}, b""
+
+
+    def _bulk_delete(self, data):
+        paths = [line.strip() for line in data.decode("utf-8").splitlines()
+                if line.strip()]
+        if len(paths) > self.max_bulk_delete:
+            return 413, {}, b"Request Entity Too Large"
+        deleted = not_found = 0
+        errors = []
+        for path in paths:
+            cname, _, oname = urllib.parse.unquote(path).lstrip(
+                    "/").partition("/")
+            cont = self.containers.get(cname)
+            if cont is None:
+                not_found += 1
+            elif not oname:
+                if self._live_objects(cont):
+                    errors.append([path, "409 Conflict"])
+                else:
+                    del self.containers[cname]
+                    deleted += 1
+            elif self._live_objects(cont).pop(oname, None) is None:
+                not_found += 1
+            else:
+                deleted += 1
+        status = "400 Bad Request" if errors else "200 OK"
+        return 200, {}, {"Number Deleted": deleted,
+                "Number Not Found": not_found,
+                "Response Status": status,
+                "Response Body": "",
+                "Errors": errors}
+
+
+
+class FakeQueues(FakeService):
+    """
+    A fake Cloud Queues API. Messages are numbered in the order they are
+    posted, and those numbers are used as the paging markers.
+    """
+    # The most messages that can be listed, claimed or posted at once.
+    max_messages = 20
+    # The number of messages listed or claimed when no limit is given.
+    default_limit = 10
+
+    def __init__(self, endpoint=QUEUES_ENDPOINT):
+        super(FakeQueues, self).__init__(endpoint)
+        # {queue_name: {"metadata": {}, "messages": OrderedDict}}
+        self.queues = {}
+        # {claim_id: {"queue", "ttl", "grace", "expires", "created"}}
+        self.claims = {}
+        self._next_id = 1
+        self._prefix = "/%s" % urllib.parse.urlsplit(endpoint).path.strip("/")
+
+
+    def handle(self, method, path, query, headers, data):
+        parts = path.strip("/").split("/")
+        if parts[0] != "queues":
+            return self._error(404, "Not Found")
+        if len(parts) == 1:
+            return self._list_queues(method, query)
+        qname = parts[1]
+        if len(parts) == 2:
+            return self._queue(method, qname)
+        queue = self.queues.get(qname)
+        if queue is None:
+            return self._error(404, "Queue '%s' does not exist." % qname)
+        if parts[2] == "metadata":
+            if method == "PUT":
+                queue["metadata"] = json.loads(data.decode("utf-8"))
+                return 204, {}, b""
+            return 200, {}, queue["metadata"]
+        if parts[2] == "stats":
+            return 200, {}, {"messages": self._stats(qname, queue)}
+        client_id = headers.get("client-id")
+        if not client_id:
+            return self._error(400, 'The "Client-ID" header is required.')
+        item_id = parts[3] if len(parts) > 3 else None
+        if parts[2] == "messages":
+            return self._messages(method, qname, queue, item_id, query,
+                    client_id, data)
+        if parts[2] == "claims":
+            return self._claims(method, qname, queue, item_id, query, data)
+        return self._error(404, "Not Found")
+
+
+    def _href(self, qname, *parts):
+        return "/".join((self._prefix, "queues", qname) + parts)
+
+
+    def _list_queues(self, method, query):
+        if method != "GET":
+            return self._error(405, "Method Not Allowed")
+        marker = query.get("marker", "")
+        limit = int(query.get("limit", self.default_limit))
+        names = [name for name in sorted(self.queues) if name > marker][:limit]
+        if not names:
+            return 204, {}, b""
+        body = {"queues": [{"name": name, "href": self._href(name)}
+                for name in names],
+                "links": [{"rel": "next",
+                    "href": "%s/queues?marker=%s&limit=%s" % (self._prefix,
+                    names[-1], limit)}]}
+        return 200, {}, body
+
+
+    def _queue(self, method, qname):
+        if method == "PUT":
+            if qname in self.queues:
+                return 204, {}, b""
+            self.queues[qname] = {"metadata": {},
+                    "messages": collections.OrderedDict()}
+            return 201, {"Location": self._href(qname)}, b""
+        if method == "DELETE":
+            self.queues.pop(qname, None)
+            return 204, {}, b""
+        if qname not in self.queues:
+            return self._error(404, "Queue '%s' does not exist." % qname)
+        return 204, {}, b""
+
+
+    def _live_messages(self, queue):
+        """Removes expired messages, and returns the rest."""
+        msgs = queue["messages"]
+        now = time.time()
+        for msg_id in [msg_id for msg_id, msg in msgs.items()
+                if msg["expires"] <= now]:
+            del msgs[msg_id]
+        return msgs
+
+
+    def _claim_of(self, msg):
+        """Returns the ID of the live claim on a message, or None."""
+        claim = self.claims.get(msg["claim_id"])
+        if claim is None or claim["expires"] <= time.time():
+            return None
+        return msg["claim_id"]
+
+
+    def _stats(self, qname, queue):
+        msgs = self._live_messages(queue)
+        claimed = sum(1 for msg in msgs.values() if self._claim_of(msg))
+        return {"free": len(msgs) - claimed, "claimed": claimed,
+                "total": len(msgs)}
+
+
+    def _message_info(self, qname, msg, claim_id=None):
+        href = self._href(qname, "messages", msg["id"])
+        if claim_id:
+            href = "%s?claim_id=%s" % (href, claim_id)
+        return {"href": href, "ttl": msg["ttl"],
+                "age": int(time.time() - msg["created"]), "body": msg["body"]}
+
+
+    def _messages(self, method, qname, queue, msg_id, query, client_id, data):
+        msgs = self._live_messages(queue)
+        if msg_id is not None:
+            msg = msgs.get(msg_id)
+            if method == "DELETE":
+                if msg is None:
+                    return 204, {}, b""
+                claim_id = self._claim_of(msg)
+                if claim_id and query.get("claim_id") != claim_id:
+                    return self._error(403, "The message is claimed.")
+                del msgs[msg_id]
+                return 204, {}, b""
+            if msg is None:
+                return self._error(404, "Message not found.")
+            return 200, {}, self._message_info(qname, msg)
+        if "ids" in query:
+            ids = [msg_id for msg_id in query["ids"].split(",") if msg_id]
+            if method == "DELETE":
+                for msg_id in ids:
+                    msgs.pop(msg_id, None)
+                return 204, {}, b""
+            found = [self._message_info(qname, msgs[msg_id])
+                    for msg_id in ids if msg_id in msgs]
+            return (200, {}, found) if found else (204, {}, b"")
+        if method == "POST":
+            return self._post_messages(qname, queue, client_id, data)
+        if method != "GET":
+            return self._error(405, "Method Not Allowed")
+        limit = int(query.get("limit", self.default_limit))
+        if not 0 < limit <= self.max_messages:
+            return self._error(400, "Limit must be between 1 and %s." %
+                    self.max_messages)
+        marker = int(query.get("marker") or 0)
+        include_claimed = query.get("include_claimed") == "true"
+        echo = query.get("echo") == "true"
+        found = []
+        for msg in msgs.values():
+            if len(found) >= limit:
+                break
+            if (msg["seq"] <= marker or
+                    (not echo and msg["client_id"] == client_id) or
+                    (not include_claimed and self._claim_of(msg))):
+                continue
+            found.append(msg)
+        if not found:
+            return 204, {}, b""
+        next_href = "%s?marker=%s&limit=%s&include_claimed=%s&echo=%s" % (
+                self._href(qname, "messages"), found[-1]["seq"], limit,
+                json.dumps(include_claimed), json.dumps(echo))
+        return 200, {}, {"messages": [self._message_info(qname, msg)
+                for msg in found],
+                "links": [{"rel": "next", "href": next_href}]}
+
+
+    def _post_messages(self, qname, queue, client_id, data):
+        posted = json.loads(data.decode("utf-8"))
+        if not posted or len(posted) > self.max_messages:
+            return self._error(400, "No more than %s messages may be posted "
+                    "at once." % self.max_messages)
+        if not all(isinstance(item.get("ttl"), six.integer_types)
+                for item in posted):
+            return self._error(400, "Each message must have a 'ttl'.")
+        now = time.time()
+        hrefs = []
+        for item in posted:
+            seq = self._next_id
+            self._next_id += 1
+            msg_id = "%024x" % seq
+            queue["messages"][msg_id] = {"id": msg_id, "seq": seq,
+                    "body": item.get("body"), "ttl": item.get("ttl"),
+                    "created": now, "expires": now + item["ttl"],
+                    "client_id": client_id, "claim_id": None}
+            hrefs.append(self._href(qname, "messages", msg_id))
+        return 201, {"Location": self._href(qname, "messages")}, {
+                "partial": False, "resources": hrefs}
+
+
+    def _claims(self, method, qname, queue, claim_id, query, data):
+        msgs = self._live_messages(queue)
+        now = time.time()
+        if claim_id is None:
+            if method != "POST":
+                return self._error(405, "Method Not Allowed")
+            body = json.loads(data.decode("utf-8"))
+            limit = int(query.get("limit", self.default_limit))
+            if not 0 < limit <= self.max_messages:
+                return self._error(400, "Limit must be between 1 and %s." %
+                        self.max_messages)
+            found = [msg for msg in msgs.values()
+                    if not self._claim_of(msg)][:limit]
+            if not found:
+                return 204, {}, b""
+            claim_id = uuid.uuid4().hex
+            ttl, grace = body.get("ttl", 60), body.get("grace", 60)
+            self.claims[claim_id] = {"queue": qname, "ttl": ttl,
+                    "grace": grace, "created": now, "expires": now + ttl}
+            for msg in found:
+                msg["claim_id"] = claim_id
+                msg["expires"] = max(msg["expires"], now + ttl + grace)
+            return 201, {"Location": self._href(qname, "claims", claim_id)}, [
+                    self._message_info(qname, msg, claim_id) for msg in found]
+        claim = self.claims.get(claim_id)
+        if claim is None or claim["expires"] <= now or claim["queue"] != qname:
+            return self._error(404, "Claim not found.")
+        claimed = [msg for msg in msgs.values() if msg["claim_id"] == claim_id]
+        if method == "DELETE":
+            del self.claims[claim_id]
+            for msg in claimed:
+                msg["claim_id"] = None
+            return 204, {}, b""
+        if method == "PATCH":
+            body = json.loads(data.decode("utf-8"))
+            claim["ttl"] = body.get("ttl", claim["ttl"])
+            claim["grace"] = body.get("grace", claim["grace"])
+            claim["expires"] = now + claim["ttl"]
+            for msg in claimed:
+                msg["expires"] = max(msg["expires"],
+                        claim["expires"] + claim["grace"])
+            return 204, {}, b""
+        return 200, {}, {"age": int(now - claim["created"]),
+                "ttl": claim["ttl"],
+                "href": self._href(qname, "claims", claim_id),
+                "messages": [self._message_info(qname, msg, claim_id)
+                    for msg in claimed]}
+
+
+
+class FakeDNS(FakeService):
+    """
+    A fake Cloud DNS API. Changes are applied at once, but are reported through
+    asynchronous jobs that stay RUNNING for 'job_duration' seconds.
+    """
+    # The most domains or records returned in one page.
+    max_limit = 100
+
+    def __init__(self, endpoint=DNS_ENDPOINT, job_duration=0):
+        super(FakeDNS, self).__init__(endpoint)
+        self.job_duration = job_duration
+        # {domain_id: {"info": {...}, "records": OrderedDict}}
+        self.domains = collections.OrderedDict()
+        # {job_id: {"created", "status", "response" or "error"}}
+        self.jobs = {}
+        self._next_id = 1000
+
+
+    def handle(self, method, path, query, headers, data):
+        parts = path.strip("/").split("/")
+        body = json.loads(data.decode("utf-8")) if data else None
+        if parts[0] == "status" and len(parts) == 1:
+            return self._list_jobs(query)
+        if parts[0] == "status" and len(parts) == 2:
+            return self._status(parts[1], query)
+        if parts[0] == "limits":
+            return 200, {}, {"limits": {"rate": [], "absolute": {}}}
+        if parts[0] != "domains":
+            return self._error(404, "Not Found")
+        if len(parts) == 1:
+            if method == "POST":
+                return self._job(self._create_domains, body)
+            return self._list_domains(query)
+        dom = self.domains.get(parts[1])
+        if dom is None:
+            return self._error(404, "Object not Found.")
+        if len(parts) == 2:
+            if method == "DELETE":
+                return self._job(self._delete_domain, parts[1])
+            if method == "PUT":
+                return self._job(self._update_domain, dom, body)
+            return 200, {}, dom["info"]
+        if parts[2] != "records":
+            return self._error(404, "Not Found")
+        if len(parts) == 4:
+            rec = dom["records"].get(parts[3])
+            if rec is None:
+                return self._error(404, "Object not Found.")
+            if method == "DELETE":
+                return self._job(self._delete_records, dom, [parts[3]])
+            return 200, {}, rec
+        if method == "POST":
+            return self._job(self._add_records, dom, body)
+        if method == "PUT":
+            return self._job(self._update_records, dom, body)
+        if method == "DELETE":
+            return self._job(self._delete_records, dom,
+                    query.get("id", "").split(","))
+        return self._list_records(parts[1], dom, query)
+
+
+    def _page(self, items, query, path, key):
+        try:
+            limit = min(int(query.get("limit", self.max_limit)),
+                    self.max_limit)
+            offset = int(query.get("offset", 0))
+        except ValueError:
+            return self._error(400, "Invalid paging parameters.")
+        links = []
+        page_uri = "%s/%s?limit=%s&offset=%%s" % (self.endpoint, path, limit)
+        if offset > 0:
+            links.append({"rel": "previous",
+                    "href": page_uri % max(offset - limit, 0)})
+        if offset + limit < len(items):
+            links.append({"rel": "next", "href": page_uri % (offset + limit)})
+        body = {key: items[offset:offset + limit], "totalEntries": len(items)}
+        if links:
+            body["links"] = links
+        return 200, {}, body
+
+
+    def _list_domains(self, query):
+        doms = [dom["info"] for dom in self.domains.values()]
+        name = query.get("name")
+        if name:
+            doms = [dom for dom in doms if dom["name"] == name or
+                    dom["name"].endswith(".%s" % name)]
+        return self._page(doms, query, "domains", "domains")
+
+
+    def _list_records(self, dom_id, dom, query):
+        recs = list(dom["records"].values())
+        for key in ("type", "name", "data"):
+            if query.get(key):
+                recs = [rec for rec in recs if rec[key] == query[key]]
+        return self._page(recs, query, "domains/%s/records" % dom_id,
+                "records")
+
+
+    def _job(self, func, *args):
+        """
+        Runs a change and records its outcome as a job, returning the body
+        that starts a new asynchronous call.
+        """
+        job_id = uuid.uuid4().hex
+        try:
+            job = {"status": "COMPLETED", "response": func(*args)}
+        except _DNSError as e:
+            job = {"status": "ERROR", "error": {"code": e.code,
+                    "message": e.message, "details": e.details}}
+        if job.get("response") is None:
+            job.pop("response", None)
+        job["created"] = time.time()
+        self.jobs[job_id] = job
+        return 202, {}, {"jobId": job_id, "status": "RUNNING",
+                "callbackUrl": "%s/status/%s" % (self.endpoint, job_id)}
+
+
+    def _status(self, job_id, query):
+        job = self.jobs.get(job_id)
+        if job is None:
+            return self._error(404, "Object not Found.")
+        body = {"jobId": job_id,
+                "callbackUrl": "%s/status/%s" % (self.endpoint, job_id)}
+        if time.time() - job["created"] < self.job_duration:
+            body["status"] = "RUNNING"
+            return 202, {}, body
+        body["status"] = job["status"]
+        if query.get("showDetails") == "true":
+            for key in ("response", "error"):
+                if key in job:
+                    body[key] = job[key]
+        return 200, {}, body
+
+
+    def _list_jobs(self, query):
+        shown = set(status for status, flag in (("RUNNING", "showRunning"),
+                ("COMPLETED", "showCompleted"), ("ERROR", "showErrors"))
+                if query.get(flag, "true") == "true")
+        job_ids = sorted(self.jobs, key=lambda job_id:
+                self.jobs[job_id]["created"])
+        jobs = [self._status(job_id, query)[2] for job_id in job_ids]
+        jobs = [job for job in jobs if job["status"] in shown]
+        return self._page(jobs, query, "status", "asyncResponses")
+
+
+    def _new_id(self):
+        self._next_id += 1
+        return str(self._next_id)
+
+
+    def _create_domains(self, body):
+        created = []
+        names = set(dom["info"]["name"] for dom in self.domains.values())
+        for info in body.get("domains", []):
+            if info["name"] in names:
+                raise _DNSError(409, "Conflict", "Domain already exists")
+            now = _iso_date(time.time())
+            dom_id = self._new_id()
+            dom_info = {"id": dom_id, "name": info["name"],
+                    "accountId": 123456,
+                    "emailAddress": info.get("emailAddress"),
+                    "ttl": info.get("ttl", 3600),
+                    "comment": info.get("comment"),
+                    "created": now, "updated": now}
+            dom = {"info": dom_info, "records": collections.OrderedDict()}
+            self.domains[dom_id] = dom
+            names.add(info["name"])
+            recs = self._add_records(dom, info.get("recordsList", {}))
+            created.append(dict(dom_info, recordsList=recs))
+        return {"domains": created}
+
+
+    def _update_domain(self, dom, body):
+        for key in ("emailAddress", "ttl", "comment"):
+            if key in body:
+                dom["info"][key] = body[key]
+        dom["info"]["updated"] = _iso_date(time.time())
+
+
+    def _delete_domain(self, dom_id):
+        del self.domains[dom_id]
+
+
+    def _add_records(self, dom, body):
+        added = []
+        for info in body.get("records", []):
+            for key in ("type", "name", "data"):
+                if not info.get(key):
+                    raise _DNSError(400, "Validation error",
+                            "Record '%s' is required." % key)
+            now = _iso_date(time.time())
+            rec_type = info["type"].upper()
+            rec = {"id": "%s-%s" % (rec_type, self._new_id()),
+                    "type": rec_type, "name": info["name"],
+                    "data": info["data"], "ttl": info.get("ttl", 3600),
+                    "created": now, "updated": now}
+            for key in ("priority", "comment"):
+                if info.get(key) is not None:
+                    rec[key] = info[key]
+            dom["records"][rec["id"]] = rec
+            added.append(rec)
+        return {"records": added}
+
+
+    def _update_records(self, dom, body):
+        for info in body.get("records", []):
+            rec = dom["records"].get(info.get("id"))
+            if rec is None:
+                raise _DNSError(404, "Not found", "Record '%s' not found." %
+                        info.get("id"))
+            rec.update((key, val) for key, val in info.items() if key != "id")
+            rec["updated"] = _iso_date(time.time())
+
+
+    def _delete_records(self, dom, rec_ids):
+        for rec_id in rec_ids:
+            if dom["records"].pop(rec_id, None) is None:
+                raise _DNSError(404, "Not found", "Record '%s' not found." %
+                        rec_id)
+
+
+
+class _DNSError(Exception):
+    """Raised by a DNS change to report an error through its job."""
+    def __init__(self, code, message, details=""):
+        super(_DNSError, self).__init__(message)
+        self.code = code
+        self.message = message
+        self.details = details
+
+
+
+def _meta_headers(headers, prefix):
+    """Returns the headers that start with 'prefix', such as metadata."""
+    return dict((key.lower(), "%s" % val) for key, val in headers.items()
+            if key.lower().startswith(prefix))
+
+
+def _parse_range(rng, size):
+    """
+    Returns the (start, end) offsets of a 'bytes=' Range header for content of
+    'size' bytes, or None if the range cannot be satisfied. Only single ranges
+    are supported.
+    """
+    try:
+        unit, _, spec = rng.partition("=")
+        first, _, last = spec.split(",")[0].strip().partition("-")
+        if unit.strip() != "bytes":
+            return None
+        if not first:
+            start, end = max(size - int(last), 0), size - 1
+        else:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size or start > end:
+        return None
+    return start, end
+
+
+def _read_data(data):
+    """Returns the body of a request as bytes."""
+    if data is None:
+        return b""
+    if isinstance(data, six.text_type):
+        return data.encode("utf-8")
+    if isinstance(data, six.binary_type):
+        return data
+    if hasattr(data, "read"):
+        content = data.read()
+        if isinstance(content, six.text_type):
+            content = content.encode("utf-8")
+        return content
+    return b"".join(chunk.encode("utf-8")
+            if isinstance(chunk, six.text_type) else chunk for chunk in data)
+
+
+
+class FakeBackend(pyrax.http.Transport):
+    """
+    A transport that answers requests to the fake Object Storage, Cloud Queues
+    and Cloud DNS endpoints from memory. Each request is delayed by 'latency'
+    seconds, if given, to stand in for the network.
+
+    The number of requests made for each (service, method) pair is kept in
+    'request_counts'.
+    """
+    def __init__(self, latency=0, dns_job_duration=0):
+        self.latency = latency
+        self.swift = FakeSwift()
+        self.queues = FakeQueues()
+        self.dns = FakeDNS(job_duration=dns_job_duration)
+        self.services = {"object_store": self.swift, "queues": self.queues,
+                "dns": self.dns}
+        self.request_counts = collections.Counter()
+        self._counts_lock = threading.Lock()
+        self._previous_transport = None
+
+
+    def client(self, service, **kwargs):
+        """
+        Returns a client for 'service' ("object_store", "queues" or "dns")
+        that sends its requests to this backend. Any keyword arguments are
+        passed to the client's constructor.
+        """
+        from pyrax.clouddns import CloudDNSClient
+        from pyrax.object_storage import StorageClient
+        from pyrax.queueing import QueueClient
+        classes = {"object_store": StorageClient, "queues": QueueClient,
+                "dns": CloudDNSClient}
+        kwargs.setdefault("region_name", "FAKE")
+        clt = classes[service](_Identity(),
+                management_url=self.services[service].endpoint, **kwargs)
+        clt.transport = self
+        if service == "queues":
+            clt.client_id = uuid.uuid4().hex
+        return clt
+
+
+    def _service_for(self, uri):
+        for svc_name, svc in self.services.items():
+            if uri.startswith(svc.endpoint):
+                return svc_name, svc
+        return None, None
+
+
+    def request(self, method, uri, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        svc_name, svc = self._service_for(uri)
+        with self._counts_lock:
+            self.request_counts[(svc_name, method)] += 1
+        headers = CaseInsensitiveDict(dict((key, val) for key, val in
+                (kwargs.get("headers") or {}).items() if val is not None))
+        data = _read_data(kwargs.get("data"))
+        if svc is None:
+            status, resp_headers, body = 404, {}, b"Not Found"
+        else:
+            parts = urllib.parse.urlsplit(uri[len(svc.endpoint):])
+            path = urllib.parse.unquote(parts.path)
+            query = dict(urllib.parse.parse_qsl(parts.query,
+                    keep_blank_values=True))
+            with svc._lock:
+                status, resp_headers, body = svc.handle(method, path, query,
+                        headers, data)
+        return self._response(method, uri, status, resp_headers, body)
+
+
+    @staticmethod
+    def _response(method, uri, status, headers, body):
+        resp = requests.Response()
+        resp.status_code = status
+        resp.reason = http_client.responses.get(status, "")
+        resp.url = uri
+        resp.elapsed = datetime.timedelta(0)
+        resp.headers = CaseInsensitiveDict(headers)
+        if not isinstance(body, six.binary_type):
+            body = json.dumps(body).encode("utf-8")
+            resp.headers["Content-Type"] = "application/json; charset=UTF-8"
+            resp.encoding = "utf-8"
+        resp.headers.setdefault("Content-Length", str(len(body)))
+        resp.raw = _RawBody(b"" if method == "HEAD" else body)
+        return resp
+
+
+    def install(self):
+        """Sends the requests of every client to this backend."""
+        self._previous_transport = pyrax.http.get_transport()
+        pyrax.http.set_transport(self)
+
+
+    def uninstall(self):
+        """Undoes install()."""
+        pyrax.http.set_transport(self._previous_transport)
+        self._previous_transport = None
+
+
+    def __enter__(self):
+        self.install()
+        return self
+
+
+    def __exit__(self, *exc_info):
+        self.uninstall()
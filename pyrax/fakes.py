@@ -98,6 +98,9 @@ class FakeResponse(object):
     def json(self):
         return self.content
 
+    def close(self):
+        pass
+
 
 class FakeIterator(utils.ResultsIterator):
     def _init_methods(self):
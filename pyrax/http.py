@@ -17,9 +17,21 @@
 Wrapper around the requests library. Used for making all HTTP calls.
 """
 
+import calendar
+import collections
+import copy
+import email.utils
+import fnmatch
 import logging
 import json
+import random
+import re
+import threading
+import time
+
 import requests
+from requests.adapters import HTTPAdapter
+from six.moves import urllib
 
 import pyrax
 import pyrax.exceptions as exc
@@ -37,6 +49,953 @@ req_methods = {
 # NOTE: FIX THIS!!!
 verify_ssl = False
 
+# Defaults for the pooled connections maintained by each client. These can be
+# changed with the 'pool_connections', 'pool_maxsize' and 'pool_idle_timeout'
+# settings.
+DEFAULT_POOL_CONNECTIONS = 10
+DEFAULT_POOL_MAXSIZE = 10
+# Seconds a pool may sit unused before its connections are discarded.
+DEFAULT_POOL_IDLE_TIMEOUT = 60
+# Default number of bytes returned by each step of iterating a streamed body.
+DEFAULT_STREAM_CHUNKSIZE = 65536
+# Defaults for the optional response cache. These can be changed with the
+# 'response_cache_size' and 'response_cache_ttl' settings.
+DEFAULT_CACHE_MAX_ENTRIES = 256
+DEFAULT_CACHE_TTL = 0
+# Defaults for retrying failed requests. These can be changed with the
+# 'max_retries' and 'retry_backoff' settings.
+DEFAULT_MAX_RETRIES = 3
+# Seconds before the first retry; each later retry waits up to twice as long.
+DEFAULT_RETRY_BACKOFF = 0.5
+# The longest wait between retries, in seconds.
+DEFAULT_RETRY_BACKOFF_MAX = 30
+# A Retry-After value longer than this many seconds is not waited for; the
+# error is raised instead.
+DEFAULT_RETRY_AFTER_MAX = 60
+# Statuses that are retried for idempotent requests.
+DEFAULT_RETRY_STATUSES = (413, 429, 500, 502, 503, 504)
+# Each request adds this fraction of a retry to a client's retry budget...
+DEFAULT_RETRY_BUDGET_RATIO = 0.2
+# ...which holds at most this many retries, and starts out full.
+DEFAULT_RETRY_BUDGET_MAX = 10
+# Defaults for the optional circuit breakers. The cool-down can be changed with
+# the 'circuit_breaker_cooldown' setting.
+# A breaker opens when at least this fraction of the requests...
+DEFAULT_BREAKER_FAILURE_RATE = 0.5
+# ...made in this many seconds have failed...
+DEFAULT_BREAKER_WINDOW = 60
+# ...as long as there were at least this many of them.
+DEFAULT_BREAKER_MIN_REQUESTS = 10
+# Seconds an open breaker waits before letting a trial request through.
+DEFAULT_BREAKER_COOLDOWN = 30
+
+
+class Transport(object):
+    """
+    Sends the requests made by pyrax.http.request(). Subclasses implement
+    request(), which takes the same arguments as `requests.request()` and
+    returns a `requests.Response`; a transport that answers requests without
+    any network I/O can be used to run real clients against a fake service.
+    """
+    def request(self, method, uri, **kwargs):
+        raise NotImplementedError
+
+
+    def close(self):
+        """Releases any connections held by this transport."""
+        pass
+
+
+class RequestsTransport(Transport):
+    """
+    The default transport, which opens a new connection with the requests
+    library for every request.
+    """
+    def request(self, method, uri, **kwargs):
+        return req_methods[method](uri, **kwargs)
+
+
+# Used for requests made without a connection pool or other transport.
+_default_transport = RequestsTransport()
+# When set, the transport used for every request; see set_transport().
+_transport = None
+
+
+def set_transport(transport):
+    """
+    Sends every request through 'transport' in place of the clients' own
+    connection pools, including those of clients that have already been
+    created. Pass None to go back to the normal behavior.
+    """
+    global _transport
+    _transport = transport
+
+
+def get_transport():
+    """Returns the transport set by set_transport(), or None."""
+    return _transport
+
+
+class ConnectionPool(Transport):
+    """
+    Maintains a keep-alive `requests.Session` so that consecutive calls to the
+    same host re-use their TCP/TLS connections instead of opening a new one
+    for every request.
+
+    'pool_connections' is the number of hosts whose connections are cached,
+    and 'pool_maxsize' is the maximum number of connections kept open to any
+    single host. If the pool is not used for 'idle_timeout' seconds, its
+    connections are closed and a fresh session is created on the next request;
+    pass 0 or None to never evict idle connections.
+    """
+    def __init__(self, pool_connections=None, pool_maxsize=None,
+            idle_timeout=None):
+        self.pool_connections = pool_connections or DEFAULT_POOL_CONNECTIONS
+        self.pool_maxsize = pool_maxsize or DEFAULT_POOL_MAXSIZE
+        self.idle_timeout = idle_timeout
+        self._session = None
+        self._last_used = 0
+        self._lock = threading.Lock()
+
+
+    def _create_session(self):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.pool_connections,
+                pool_maxsize=self.pool_maxsize)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+
+    @property
+    def session(self):
+        """
+        Returns the current session, replacing it if it has been idle for
+        longer than 'idle_timeout' seconds.
+        """
+        with self._lock:
+            now = time.time()
+            if (self._session is not None and self.idle_timeout and
+                    (now - self._last_used) > self.idle_timeout):
+                self._session.close()
+                self._session = None
+            if self._session is None:
+                self._session = self._create_session()
+            self._last_used = now
+            return self._session
+
+
+    def request(self, method, uri, **kwargs):
+        """Makes the request using one of the pooled connections."""
+        return self.session.request(method, uri, **kwargs)
+
+
+    def close(self):
+        """Closes all the connections held by this pool."""
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+
+def _bool_setting(val, default):
+    """
+    Settings read from the environment are strings, so convert them to a
+    boolean value.
+    """
+    if val is None:
+        return default
+    if isinstance(val, bool):
+        return val
+    return str(val).strip().lower() not in ("false", "0", "no", "off", "")
+
+
+def _int_setting(val, default):
+    """Converts a setting to an int, falling back to the default."""
+    if val in (None, ""):
+        return default
+    try:
+        return int(val)
+    except (TypeError, ValueError):
+        return default
+
+
+def create_connection_pool():
+    """
+    Returns a new ConnectionPool configured from the current settings, or None
+    if connection pooling has been disabled with the 'use_connection_pool'
+    setting.
+    """
+    if not _bool_setting(pyrax.get_setting("use_connection_pool"), True):
+        return None
+    return ConnectionPool(
+            pool_connections=_int_setting(
+                pyrax.get_setting("pool_connections"),
+                DEFAULT_POOL_CONNECTIONS),
+            pool_maxsize=_int_setting(pyrax.get_setting("pool_maxsize"),
+                DEFAULT_POOL_MAXSIZE),
+            idle_timeout=_int_setting(pyrax.get_setting("pool_idle_timeout"),
+                DEFAULT_POOL_IDLE_TIMEOUT))
+
+
+class ResponseCache(object):
+    """
+    An LRU cache of the responses to GET and HEAD requests, used by a client
+    to avoid re-fetching data that rarely changes.
+
+    How long a response is considered fresh is set by 'policies': a sequence
+    of (pattern, ttl) pairs. Each pattern is a regular expression that is
+    searched for in a string made of the request method and the path relative
+    to the service endpoint, such as "GET /flavors/1"; the ttl of the first
+    pattern that matches is used, and 'ttl' if none match. Once a response is
+    stale, it is kept if it carried an ETag or Last-Modified header, and the
+    next request for it is made conditional; a 304 reply renews the cached
+    copy without transferring the body again. No more than 'max_entries'
+    responses are kept; the least-recently used ones are dropped first.
+
+    Calls that modify a resource invalidate the cached responses for that
+    resource, its sub-resources, and the collection that contains it.
+    """
+    cacheable_methods = ("GET", "HEAD")
+
+    def __init__(self, max_entries=None, ttl=None, policies=None):
+        self.max_entries = max_entries or DEFAULT_CACHE_MAX_ENTRIES
+        self.ttl = ttl or DEFAULT_CACHE_TTL
+        self.policies = [(re.compile(pattern), pttl)
+                for pattern, pttl in (policies or [])]
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.evictions = 0
+
+
+    def ttl_for(self, method, path):
+        """Returns the number of seconds a response should be kept fresh."""
+        target = "%s %s" % (method, path)
+        for pattern, ttl in self.policies:
+            if pattern.search(target):
+                return ttl
+        return self.ttl
+
+
+    def get(self, method, uri):
+        """
+        Returns the cached entry for the request, or None. The entry is a dict
+        whose 'fresh' key indicates whether it can be used without contacting
+        the server.
+        """
+        key = (method, uri)
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                self.misses += 1
+                return None
+            # Re-insert to mark it as the most recently used.
+            self._entries[key] = entry
+            entry["fresh"] = entry["expires"] > time.time()
+            if entry["fresh"]:
+                self.hits += 1
+            return entry
+
+
+    def conditional_headers(self, entry):
+        """
+        Returns the headers that make a request conditional on the cached
+        copy having changed.
+        """
+        hdrs = {}
+        if entry.get("etag"):
+            hdrs["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            hdrs["If-Modified-Since"] = entry["last_modified"]
+        return hdrs
+
+
+    def response(self, entry):
+        """
+        Returns the (resp, body) for a cache entry. The body is copied, so
+        that callers are free to modify it.
+        """
+        return entry["resp"], copy.deepcopy(entry["body"])
+
+
+    def revalidated(self, entry, path):
+        """Records that the server confirmed that 'entry' is still current."""
+        with self._lock:
+            self.hits += 1
+            self.revalidations += 1
+            entry["expires"] = time.time() + self.ttl_for(entry["method"],
+                    path)
+
+
+    def store(self, method, uri, path, resp, body):
+        """
+        Caches the response if it is fresh for some time, or if it can be
+        revalidated later.
+        """
+        ttl = self.ttl_for(method, path)
+        hdrs = resp.headers or {}
+        etag = hdrs.get("etag")
+        last_modified = hdrs.get("last-modified")
+        if ttl <= 0 and not (etag or last_modified):
+            return
+        entry = {"method": method, "path": path, "resp": resp,
+                "body": copy.deepcopy(body), "etag": etag,
+                "last_modified": last_modified,
+                "expires": time.time() + ttl}
+        key = (method, uri)
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+
+    def invalidate(self, path):
+        """
+        Removes the cached responses for the resource at 'path', any of its
+        sub-resources, and its parent collection. A path of "/" clears the
+        whole cache.
+        """
+        path = path.rstrip("/")
+        parent = path.rsplit("/", 1)[0]
+        with self._lock:
+            if not path:
+                self._entries.clear()
+                return
+            for key, entry in list(self._entries.items()):
+                epath = entry["path"].rstrip("/")
+                if (epath == path or epath == parent or
+                        epath.startswith(path + "/")):
+                    del self._entries[key]
+
+
+    def clear(self):
+        """Removes all cached responses."""
+        with self._lock:
+            self._entries.clear()
+
+
+    def stats(self):
+        """Returns a dict with the cache's counters."""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses,
+                    "revalidations": self.revalidations,
+                    "evictions": self.evictions,
+                    "entries": len(self._entries)}
+
+
+def create_response_cache(policies=None):
+    """
+    Returns a new ResponseCache configured from the current settings, or None
+    if the cache has not been enabled with the 'use_response_cache' setting.
+    """
+    if not _bool_setting(pyrax.get_setting("use_response_cache"), False):
+        return None
+    return ResponseCache(
+            max_entries=_int_setting(pyrax.get_setting("response_cache_size"),
+                DEFAULT_CACHE_MAX_ENTRIES),
+            ttl=_int_setting(pyrax.get_setting("response_cache_ttl"),
+                DEFAULT_CACHE_TTL),
+            policies=policies)
+
+
+def _float_setting(val, default):
+    """Converts a setting to a float, falling back to the default."""
+    if val in (None, ""):
+        return default
+    try:
+        return float(val)
+    except (TypeError, ValueError):
+        return default
+
+
+class RetryBudget(object):
+    """
+    Limits retries to a fraction of the requests being made, so that a
+    failing service isn't swamped by retries on top of the regular traffic.
+    Every request adds 'ratio' of a retry to the budget, up to 'max_tokens';
+    every retry spends one. When the budget is empty, failures are raised
+    without being retried.
+    """
+    def __init__(self, ratio=None, max_tokens=None):
+        self.ratio = DEFAULT_RETRY_BUDGET_RATIO if ratio is None else ratio
+        self.max_tokens = max_tokens or DEFAULT_RETRY_BUDGET_MAX
+        self.tokens = float(self.max_tokens)
+        self.exhausted = 0
+        self._lock = threading.Lock()
+
+
+    def deposit(self):
+        """Records that a request is being made."""
+        with self._lock:
+            self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+
+    def withdraw(self):
+        """Returns True if a retry can be made, and spends it."""
+        with self._lock:
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            self.exhausted += 1
+            return False
+
+
+
+class RetryPolicy(object):
+    """
+    Decides whether, and after how long, a failed request is retried.
+
+    Requests are retried up to 'max_retries' times when the server returns one
+    of 'retry_statuses', or when the connection fails. Only the methods in
+    'idempotent_methods' are retried for server errors and dropped
+    connections, since the first attempt may have taken effect; other methods
+    are only retried when the server rejected them for being over a rate
+    limit (413 and 429), or when the connection could not be made at all.
+
+    The wait before each retry is a random time between zero and 'backoff'
+    doubled for each earlier retry, up to 'backoff_max' ("full jitter"), so
+    that many clients failing at once don't retry in step. A Retry-After
+    header on a 413, 429 or 503 response is used instead, unless it is longer
+    than 'retry_after_max', in which case the error is raised immediately.
+    The retries made by a client are also limited by its RetryBudget.
+    """
+    idempotent_methods = ("GET", "HEAD", "PUT", "DELETE", "OPTIONS")
+    retry_after_statuses = (413, 429, 503)
+    rate_limit_statuses = (413, 429)
+
+    def __init__(self, max_retries=None, backoff=None, backoff_max=None,
+            retry_statuses=None, retry_after_max=None, budget=None):
+        self.max_retries = (DEFAULT_MAX_RETRIES if max_retries is None
+                else max_retries)
+        self.backoff = DEFAULT_RETRY_BACKOFF if backoff is None else backoff
+        self.backoff_max = backoff_max or DEFAULT_RETRY_BACKOFF_MAX
+        self.retry_statuses = tuple(retry_statuses or DEFAULT_RETRY_STATUSES)
+        self.retry_after_max = (DEFAULT_RETRY_AFTER_MAX
+                if retry_after_max is None else retry_after_max)
+        self.budget = budget or RetryBudget()
+        self.retries = 0
+        self._lock = threading.Lock()
+
+
+    def backoff_delay(self, attempt):
+        """
+        Returns a random delay for the given retry, counting from zero, with
+        the maximum doubling for each attempt.
+        """
+        ceiling = min(self.backoff_max, self.backoff * (2 ** attempt))
+        return random.uniform(0, ceiling)
+
+
+    @staticmethod
+    def parse_retry_after(val):
+        """
+        Returns the number of seconds to wait from a Retry-After header, which
+        is either a number of seconds or an HTTP date, or None if it can't be
+        parsed.
+        """
+        if val is None:
+            return None
+        try:
+            return max(0.0, float(val))
+        except (TypeError, ValueError):
+            pass
+        parsed = email.utils.parsedate(val)
+        if parsed is None:
+            return None
+        return max(0.0, calendar.timegm(parsed) - time.time())
+
+
+    def retry_delay(self, method, error, attempt):
+        """
+        Returns the number of seconds to wait before retrying the request that
+        failed with 'error', or None if it should not be retried. 'attempt'
+        is the number of retries already made.
+        """
+        if attempt >= self.max_retries:
+            return None
+        idempotent = method.upper() in self.idempotent_methods
+        status = getattr(error, "code", None)
+        if isinstance(error, exc.ClientException):
+            if status not in self.retry_statuses:
+                return None
+            if not (idempotent or status in self.rate_limit_statuses):
+                return None
+            delay = None
+            if status in self.retry_after_statuses:
+                delay = self.parse_retry_after(error.retry_after)
+            if delay is not None and delay > self.retry_after_max:
+                return None
+        elif isinstance(error, requests.exceptions.ConnectTimeout):
+            # The request never reached the server.
+            delay = None
+        elif isinstance(error, (requests.exceptions.ConnectionError,
+                requests.exceptions.Timeout)):
+            if not idempotent:
+                return None
+            delay = None
+        else:
+            return None
+        if not self.budget.withdraw():
+            return None
+        with self._lock:
+            self.retries += 1
+        if delay is None:
+            delay = self.backoff_delay(attempt)
+        return delay
+
+
+    def stats(self):
+        """Returns a dict with the retry counters."""
+        return {"retries": self.retries,
+                "budget_exhausted": self.budget.exhausted,
+                "budget_tokens": self.budget.tokens}
+
+
+def create_retry_policy(overrides=None):
+    """
+    Returns a new RetryPolicy configured from the current settings. Any values
+    in the 'overrides' dict, used by clients whose service needs different
+    behavior, are passed to RetryPolicy in their place.
+    """
+    kwargs = {"max_retries": _int_setting(pyrax.get_setting("max_retries"),
+                DEFAULT_MAX_RETRIES),
+            "backoff": _float_setting(pyrax.get_setting("retry_backoff"),
+                DEFAULT_RETRY_BACKOFF)}
+    kwargs.update(overrides or {})
+    return RetryPolicy(**kwargs)
+
+
+class TokenBucket(object):
+    """
+    Allows 'capacity' requests at once, refilled at 'rate' requests per
+    second. Callers reserve a token and wait until it is due, so a burst of
+    requests is spread out evenly instead of all being sent and rejected.
+    """
+    def __init__(self, rate, capacity, tokens=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = self.capacity if tokens is None else min(
+                self.capacity, float(tokens))
+        self.updated = time.time()
+
+
+    def reserve(self, now):
+        """
+        Takes a token and returns the number of seconds until it is available.
+        The caller must hold the lock that protects the bucket.
+        """
+        elapsed = max(0.0, now - self.updated)
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate
+
+
+
+class RateLimiter(object):
+    """
+    Throttles a client's requests to stay within the account's rate limits,
+    as returned in the "rate" section of a service's /limits response:
+
+        [{"uri": "*", "regex": ".*",
+          "limit": [{"verb": "POST", "value": 10, "unit": "MINUTE",
+                     "remaining": 8}, ...]}, ...]
+
+    Each limit becomes a TokenBucket that holds 'value' requests and refills
+    over one 'unit', starting with the 'remaining' requests. A request uses a
+    token from every limit whose verb matches its method and whose regex is
+    found in its path, and waits until all of them are available. A single
+    limiter is safe to share between threads, and between clients of the
+    same service.
+
+    The limits are loaded on first use by calling the function passed to
+    ensure_loaded(). If that fails, requests are not throttled.
+    """
+    unit_seconds = {"SECOND": 1, "MINUTE": 60, "HOUR": 3600, "DAY": 86400}
+
+    def __init__(self, rate_limits=None):
+        self.rules = []
+        self.loaded = False
+        self.throttled = 0
+        self.wait_time = 0.0
+        self._lock = threading.Lock()
+        self._load_lock = threading.RLock()
+        self._loading = False
+        if rate_limits is not None:
+            self.load(rate_limits)
+
+
+    def load(self, rate_limits):
+        """Replaces the limiter's rules with the given rate limits."""
+        rules = []
+        for rate_limit in rate_limits or []:
+            pattern = rate_limit.get("regex")
+            if not pattern:
+                pattern = fnmatch.translate(rate_limit.get("uri") or "*")
+            try:
+                regex = re.compile(pattern)
+            except re.error:
+                continue
+            for limit in rate_limit.get("limit", []):
+                seconds = self.unit_seconds.get(
+                        str(limit.get("unit", "")).upper())
+                value = limit.get("value")
+                if not (seconds and value):
+                    continue
+                bucket = TokenBucket(float(value) / seconds, value,
+                        limit.get("remaining"))
+                verb = str(limit.get("verb", "*")).upper()
+                rules.append((verb, regex, bucket))
+        with self._lock:
+            self.rules = rules
+        self.loaded = True
+
+
+    def ensure_loaded(self, fetch):
+        """
+        Loads the rate limits returned by calling 'fetch' if they haven't been
+        loaded yet. Only one thread fetches them; requests made by 'fetch'
+        itself are not throttled.
+        """
+        if self.loaded:
+            return
+        with self._load_lock:
+            if self.loaded or self._loading:
+                return
+            self._loading = True
+            try:
+                rate_limits = fetch()
+            except Exception as e:
+                logging.getLogger("pyrax").debug("Could not get the rate "
+                        "limits; requests will not be throttled: %s" % e)
+                rate_limits = []
+            finally:
+                self._loading = False
+            self.load(rate_limits)
+
+
+    def reserve(self, method, path):
+        """
+        Takes a token from every limit that applies to the request, and
+        returns the number of seconds to wait before making it.
+        """
+        method = method.upper()
+        now = time.time()
+        delay = 0.0
+        with self._lock:
+            for verb, regex, bucket in self.rules:
+                if verb not in ("*", method) or not regex.search(path):
+                    continue
+                delay = max(delay, bucket.reserve(now))
+            if delay:
+                self.throttled += 1
+                self.wait_time += delay
+        return delay
+
+
+    def acquire(self, method, path):
+        """
+        Waits until the request can be made without exceeding the rate
+        limits. Returns the number of seconds waited.
+        """
+        delay = self.reserve(method, path)
+        if delay:
+            time.sleep(delay)
+        return delay
+
+
+    def stats(self):
+        """Returns a dict with the limiter's counters."""
+        with self._lock:
+            return {"rules": len(self.rules), "throttled": self.throttled,
+                    "wait_time": self.wait_time}
+
+
+def create_rate_limiter():
+    """
+    Returns a new, unloaded RateLimiter, or None if throttling has not been
+    enabled with the 'use_rate_limiter' setting.
+    """
+    if not _bool_setting(pyrax.get_setting("use_rate_limiter"), False):
+        return None
+    return RateLimiter()
+
+
+class CircuitBreaker(object):
+    """
+    Stops requests to an endpoint that is failing, so that callers get an
+    error at once instead of each waiting for their request to time out.
+
+    The breaker starts out "closed", letting every request through. When at
+    least 'min_requests' were made in the last 'window' seconds and
+    'failure_rate' of them failed, it "opens": requests raise CircuitOpen
+    without being sent. After 'cooldown' seconds it is "half_open", and lets
+    a single trial request through; if that succeeds the breaker closes, and
+    if it fails the breaker opens for another cool-down. Only server errors
+    (5xx), connection errors and timeouts count as failures; any response
+    from the server, even an error, shows that the endpoint is working.
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, endpoint, failure_rate=None, window=None,
+            min_requests=None, cooldown=None):
+        self.endpoint = endpoint
+        self.failure_rate = failure_rate or DEFAULT_BREAKER_FAILURE_RATE
+        self.window = window or DEFAULT_BREAKER_WINDOW
+        self.min_requests = min_requests or DEFAULT_BREAKER_MIN_REQUESTS
+        self.cooldown = (DEFAULT_BREAKER_COOLDOWN if cooldown is None
+                else cooldown)
+        self._state = self.CLOSED
+        self._results = collections.deque()
+        self._opened_at = 0
+        self._trial_in_flight = False
+        self.times_opened = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+
+    @staticmethod
+    def is_failure(error):
+        """
+        Returns True if the request that raised 'error' shows that the
+        endpoint is not working.
+        """
+        if isinstance(error, exc.ClientException):
+            return (error.code or 0) >= 500
+        return isinstance(error, (requests.exceptions.ConnectionError,
+                requests.exceptions.Timeout))
+
+
+    @property
+    def state(self):
+        """Returns the current state, taking the cool-down into account."""
+        with self._lock:
+            return self._current_state(time.time())
+
+
+    def _current_state(self, now):
+        if (self._state == self.OPEN and
+                now - self._opened_at >= self.cooldown):
+            return self.HALF_OPEN
+        return self._state
+
+
+    def allows_requests(self):
+        """
+        Returns True if a request would be let through now. This doesn't
+        reserve the trial request of a half-open breaker.
+        """
+        with self._lock:
+            state = self._current_state(time.time())
+            return state == self.CLOSED or (state == self.HALF_OPEN and
+                    not self._trial_in_flight)
+
+
+    def before_request(self):
+        """
+        Raises CircuitOpen if the request should not be made. If the breaker
+        is half-open, the request is the trial, and any others are rejected
+        until its result is recorded. Returns an (old state, new state)
+        tuple if this moved the breaker out of the open state, and None
+        otherwise.
+        """
+        with self._lock:
+            state = self._current_state(time.time())
+            if state == self.HALF_OPEN and not self._trial_in_flight:
+                old_state = self._state
+                self._state = self.HALF_OPEN
+                self._trial_in_flight = True
+                if old_state != self.HALF_OPEN:
+                    return (old_state, self.HALF_OPEN)
+                return
+            if state != self.CLOSED:
+                self.rejected += 1
+                raise exc.CircuitOpen("Requests to '%s' are failing; not "
+                        "retrying for up to %s seconds." % (self.endpoint,
+                        self.cooldown))
+
+
+    def record(self, error=None):
+        """
+        Records the result of a request that was let through: 'error' is the
+        exception it raised, or None if it succeeded. Returns an (old state,
+        new state) tuple if the result opened or closed the breaker, and None
+        otherwise.
+        """
+        failed = self.is_failure(error)
+        now = time.time()
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self._trial_in_flight = False
+                if failed:
+                    self._open(now)
+                    return (self.HALF_OPEN, self.OPEN)
+                self._close()
+                return (self.HALF_OPEN, self.CLOSED)
+            self._results.append((now, failed))
+            cutoff = now - self.window
+            while self._results and self._results[0][0] < cutoff:
+                self._results.popleft()
+            if self._state == self.CLOSED and failed:
+                total = len(self._results)
+                failures = len([res for res in self._results if res[1]])
+                if (total >= self.min_requests and
+                        failures >= total * self.failure_rate):
+                    self._open(now)
+                    return (self.CLOSED, self.OPEN)
+
+
+    def _open(self, now):
+        self._state = self.OPEN
+        self._opened_at = now
+        self.times_opened += 1
+        logging.getLogger("pyrax").warning("Circuit breaker for '%s' opened; "
+                "requests will fail for %s seconds." % (self.endpoint,
+                self.cooldown))
+
+
+    def _close(self):
+        self._state = self.CLOSED
+        self._results.clear()
+        logging.getLogger("pyrax").info("Circuit breaker for '%s' closed."
+                % self.endpoint)
+
+
+    def reset(self):
+        """Closes the breaker and forgets the recent results."""
+        with self._lock:
+            self._state = self.CLOSED
+            self._results.clear()
+            self._trial_in_flight = False
+
+
+    def stats(self):
+        """Returns a dict with the breaker's state and counters."""
+        with self._lock:
+            failures = len([res for res in self._results if res[1]])
+            return {"state": self._current_state(time.time()),
+                    "requests": len(self._results), "failures": failures,
+                    "times_opened": self.times_opened,
+                    "rejected": self.rejected}
+
+
+_circuit_breakers = {}
+_circuit_breakers_lock = threading.Lock()
+
+
+def endpoint_for(uri):
+    """Returns the scheme and host of the URI, which identify its endpoint."""
+    parsed = urllib.parse.urlparse(uri)
+    return "%s://%s" % (parsed.scheme, parsed.netloc)
+
+
+def circuit_breakers_enabled():
+    """
+    Returns True if the 'use_circuit_breaker' setting turns on circuit
+    breakers for new clients.
+    """
+    return _bool_setting(pyrax.get_setting("use_circuit_breaker"), False)
+
+
+def get_circuit_breaker(uri, **kwargs):
+    """
+    Returns the CircuitBreaker for the endpoint of the URI, creating it with
+    'kwargs' if there isn't one yet. All the clients that use an endpoint
+    share its breaker.
+    """
+    endpoint = endpoint_for(uri)
+    with _circuit_breakers_lock:
+        breaker = _circuit_breakers.get(endpoint)
+        if breaker is None:
+            kwargs.setdefault("cooldown", _float_setting(
+                    pyrax.get_setting("circuit_breaker_cooldown"),
+                    DEFAULT_BREAKER_COOLDOWN))
+            breaker = _circuit_breakers[endpoint] = CircuitBreaker(endpoint,
+                    **kwargs)
+        return breaker
+
+
+def circuit_breaker_stats():
+    """Returns a dict with the stats of each endpoint's circuit breaker."""
+    with _circuit_breakers_lock:
+        breakers = list(_circuit_breakers.values())
+    return dict([(breaker.endpoint, breaker.stats())
+            for breaker in breakers])
+
+
+def reset_circuit_breakers():
+    """Discards all the circuit breakers."""
+    with _circuit_breakers_lock:
+        _circuit_breakers.clear()
+
+
+class StreamingBody(object):
+    """
+    File-like wrapper around the body of a response made with `stream=True`.
+    The body is read from the connection as it is consumed, so large
+    responses never have to be held in memory.
+
+    Read it with read(), or iterate over it to get chunks of 'chunk_size'
+    bytes. The underlying connection is released back to its pool when the
+    body has been consumed or close() is called; use it as a context manager
+    to make sure that happens.
+    """
+    def __init__(self, resp, chunk_size=None):
+        self.response = resp
+        self.chunk_size = chunk_size or DEFAULT_STREAM_CHUNKSIZE
+        self.closed = False
+
+
+    def read(self, size=-1):
+        """
+        Returns up to 'size' bytes of the body, or the rest of the body if
+        'size' is omitted. Returns an empty string when it is exhausted.
+        """
+        if self.closed:
+            return b""
+        if size is None or size < 0:
+            return b"".join(self.iter_chunks())
+        return self.response.raw.read(size, decode_content=True)
+
+
+    def iter_chunks(self, chunk_size=None):
+        """
+        Returns a generator of the remaining content in pieces of
+        'chunk_size' bytes, or the default chunk size if not specified.
+        """
+        if self.closed:
+            return iter([])
+        return self.response.iter_content(chunk_size or self.chunk_size)
+
+
+    def __iter__(self):
+        return self.iter_chunks()
+
+
+    def close(self):
+        """Releases the connection; any unread content is discarded."""
+        if not self.closed:
+            self.closed = True
+            self.response.close()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
 
 def request(method, uri, *args, **kwargs):
     """
@@ -45,24 +1004,47 @@ def request(method, uri, *args, **kwargs):
 
     Formats the request into a dict representing the headers
     and body that will be used to make the API call.
+
+    The request is sent by the Transport passed as 'transport', or else the
+    one installed with set_transport(). Failing those, if a ConnectionPool is
+    passed as 'connection_pool' the request is made over one of its
+    keep-alive connections; otherwise a new connection is opened for this
+    request.
+
+    If 'stream' is True, the body of a successful response is not read;
+    instead, a StreamingBody that yields chunks of 'chunk_size' bytes is
+    returned in its place. Error responses are always read in full.
     """
-    req_method = req_methods[method.upper()]
+    connection_pool = kwargs.pop("connection_pool", None)
+    transport = (kwargs.pop("transport", None) or _transport or
+            connection_pool or _default_transport)
     raise_exception = kwargs.pop("raise_exception", True)
     raw_content = kwargs.pop("raw_content", False)
-    kwargs["headers"] = kwargs.get("headers", {})
-    http_log_req(method, uri, args, kwargs)
+    stream = kwargs.pop("stream", False)
+    chunk_size = kwargs.pop("chunk_size", None)
+    if stream:
+        kwargs["stream"] = True
+    headers = kwargs.setdefault("headers", {})
+    # Building the debug output is skipped unless it will be logged.
+    debug = pyrax.get_http_debug()
+    if debug:
+        http_log_req(method, uri, args, kwargs)
     data = None
     if "data" in kwargs:
         # The 'data' kwarg is used when you don't want json encoding.
         data = kwargs.pop("data")
     elif "body" in kwargs:
-        if "Content-Type" not in kwargs["headers"]:
-            kwargs["headers"]["Content-Type"] = "application/json"
+        if "Content-Type" not in headers:
+            headers["Content-Type"] = "application/json"
         data = json.dumps(kwargs.pop("body"))
     if data:
-        resp = req_method(uri, data=data, **kwargs)
-    else:
-        resp = req_method(uri, **kwargs)
+        kwargs["data"] = data
+    resp = transport.request(method.upper(), uri, **kwargs)
+    if stream and resp.status_code < 400:
+        body = StreamingBody(resp, chunk_size=chunk_size)
+        if debug:
+            http_log_resp(resp, None)
+        return resp, body
     if raw_content:
         body = resp.content
     else:
@@ -71,7 +1053,8 @@ def request(method, uri, *args, **kwargs):
         except ValueError:
             # No JSON in response
             body = resp.content
-    http_log_resp(resp, body)
+    if debug:
+        http_log_resp(resp, body)
     if resp.status_code >= 400 and raise_exception:
         raise exc.from_response(resp, body)
     return resp, body
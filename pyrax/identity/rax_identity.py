@@ -7,7 +7,6 @@ from six.moves import configparser as ConfigParser
 import pyrax
 from ..base_identity import BaseIdentity
 from ..base_identity import User
-from ..cloudnetworks import CloudNetworkClient
 from .. import exceptions as exc
 from .. import utils as utils
 
@@ -146,7 +145,8 @@ class RaxIdentity(BaseIdentity):
         if service in ("compute:networks", "networks", "network",
                 "cloudnetworks", "cloud_networks"):
             service = "compute"
-            client_class = CloudNetworkClient
+            client_class = pyrax.client_class_for_service(
+                    "compute:network")
         return super(RaxIdentity, self).get_client(service, region,
                 public=public, cached=cached, client_class=client_class)
 
@@ -508,6 +508,8 @@ class ImageClient(BaseClient):
     This is the primary class for interacting with Images.
     """
     name = "Images"
+    # The JSON schemas only change with new releases of the service.
+    response_cache_policies = ((r"^GET /schemas/", 86400), )
 
 
     def _configure_manager(self):
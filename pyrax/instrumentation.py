@@ -0,0 +1,515 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c)2014 Rackspace US, Inc.
+
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Metrics for the API requests made by the pyrax clients.
+
+Every request made by a client produces a RequestEvent, which is passed to the
+sinks added to that client with add_metrics_sink(), and to the sinks added to
+all clients with add_sink() in this module. A sink is any object with a
+'record(event)' method; it is called on the thread that made the request, so
+it should be quick. Errors raised by a sink are logged and otherwise ignored.
+
+    hist = pyrax.instrumentation.HistogramSink()
+    pyrax.instrumentation.add_sink(hist)
+    ...
+    print(hist.percentiles(service="Object Storage"))
+
+Sinks that also have a 'record_breaker(event)' method are passed a
+BreakerEvent each time a circuit breaker opens, becomes half-open or closes.
+
+When no sinks have been added, no events are created.
+"""
+
+from __future__ import absolute_import
+
+import collections
+import logging
+import math
+import re
+import socket
+import threading
+import time
+
+
+# Number of entries kept by a RingBufferSink, and by each client's
+# get_timings() history.
+DEFAULT_RING_BUFFER_SIZE = 1000
+# Number of seconds of requests covered by a HistogramSink.
+DEFAULT_HISTOGRAM_WINDOW = 300
+# The most latencies a HistogramSink keeps for any one kind of request.
+DEFAULT_HISTOGRAM_MAX_SAMPLES = 10000
+DEFAULT_PERCENTILES = (50, 90, 95, 99)
+DEFAULT_STATSD_HOST = "localhost"
+DEFAULT_STATSD_PORT = 8125
+DEFAULT_METRIC_PREFIX = "pyrax"
+# Upper bounds, in seconds, of the buckets of the Prometheus latency histogram.
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0,
+        2.5, 5.0, 10.0)
+
+# Details of a single API request. 'uri_template' is the path of the request
+# with the parts that identify particular resources replaced, so that requests
+# of the same kind can be grouped together. Sizes are in bytes and times in
+# seconds; 'connect_time' and 'ttfb' (time to the first byte of the response)
+# are None when they could not be measured. 'retries' is the number of times
+# the request had been made before this attempt. 'status' is None when no
+# response was received, in which case 'error' holds the exception.
+RequestEvent = collections.namedtuple("RequestEvent", ["service", "method",
+        "uri", "uri_template", "status", "bytes_sent", "bytes_received",
+        "connect_time", "ttfb", "total_time", "retries", "start_time",
+        "end_time", "error"])
+
+# A circuit breaker changing state: 'endpoint' is the scheme and host whose
+# breaker moved from 'old_state' to 'new_state' at 'time', as noticed by a
+# request made by the client for 'service'.
+BreakerEvent = collections.namedtuple("BreakerEvent", ["service", "endpoint",
+        "old_state", "new_state", "time"])
+
+_sinks = []
+_sinks_lock = threading.Lock()
+
+# Path segments that are taken to be resource IDs: numbers, UUIDs and long hex
+# strings.
+_ID_PATTERN = re.compile(r"^(\d+|[0-9a-fA-F]{8}-([0-9a-fA-F]{4}-){3}"
+        r"[0-9a-fA-F]{12}|[0-9a-fA-F]{16,})$")
+_METRIC_NAME_PATTERN = re.compile(r"[^A-Za-z0-9_]")
+
+
+def add_sink(sink):
+    """Adds a sink that receives the events for every client's requests."""
+    with _sinks_lock:
+        if sink not in _sinks:
+            _sinks.append(sink)
+
+
+def remove_sink(sink):
+    """Removes a sink added with add_sink()."""
+    with _sinks_lock:
+        if sink in _sinks:
+            _sinks.remove(sink)
+
+
+def get_sinks():
+    """Returns a list of the sinks added with add_sink()."""
+    return list(_sinks)
+
+
+def has_sinks(client_sinks=None):
+    """
+    Returns True if there is anywhere for an event to go, so that callers can
+    skip creating events that nobody would receive.
+    """
+    return bool(client_sinks or _sinks)
+
+
+def emit(event, client_sinks=None):
+    """Passes the event to the client's sinks and to the global sinks."""
+    for sink in list(client_sinks or []) + _sinks:
+        try:
+            sink.record(event)
+        except Exception as e:
+            logging.getLogger("pyrax").warning("Metrics sink %r failed: %s",
+                    sink, e)
+
+
+def emit_breaker(event, client_sinks=None):
+    """
+    Passes the BreakerEvent to those of the client's sinks and the global
+    sinks that have a 'record_breaker()' method.
+    """
+    for sink in list(client_sinks or []) + _sinks:
+        record = getattr(sink, "record_breaker", None)
+        if record is None:
+            continue
+        try:
+            record(event)
+        except Exception as e:
+            logging.getLogger("pyrax").warning("Metrics sink %r failed: %s",
+                    sink, e)
+
+
+def uri_template(path):
+    """
+    Returns the path with the segments that look like resource IDs replaced
+    by '{id}'. Any query string is removed.
+    """
+    path = path.split("?", 1)[0]
+    return "/".join(["{id}" if _ID_PATTERN.match(seg) else seg
+            for seg in path.split("/")])
+
+
+def _bytes_sent(resp):
+    """Returns the size of the body of the request that produced 'resp'."""
+    try:
+        body = resp.request.body
+        if body is None:
+            return 0
+        return len(body)
+    except Exception:
+        # Streamed uploads have no length.
+        return None
+
+
+def _bytes_received(resp, streamed=False):
+    """
+    Returns the size of the response body. Streamed bodies are not read, so
+    only their Content-Length is used.
+    """
+    try:
+        length = resp.headers.get("content-length")
+        if length is not None:
+            return int(length)
+        if streamed:
+            return None
+        return len(resp.content)
+    except Exception:
+        return None
+
+
+def _ttfb(resp):
+    """
+    Returns the time between sending the request and receiving the response
+    headers, as measured by requests.
+    """
+    try:
+        return resp.elapsed.total_seconds()
+    except Exception:
+        return None
+
+
+def create_event(service, method, uri, template, start_time, end_time,
+        resp=None, error=None, retries=0, streamed=False):
+    """
+    Returns a RequestEvent for a request that produced the response 'resp',
+    or that failed with the exception 'error'. The requests library doesn't
+    report how long it took to connect, so 'connect_time' is always None for
+    the built-in HTTP layer.
+    """
+    if resp is not None:
+        status = resp.status_code
+        bytes_sent = _bytes_sent(resp)
+        bytes_received = _bytes_received(resp, streamed=streamed)
+        ttfb = _ttfb(resp)
+    else:
+        # Errors raised for an HTTP error status carry that status.
+        status = getattr(error, "code", None)
+        bytes_sent = bytes_received = ttfb = None
+    return RequestEvent(service=service, method=method, uri=uri,
+            uri_template=template, status=status, bytes_sent=bytes_sent,
+            bytes_received=bytes_received, connect_time=None, ttfb=ttfb,
+            total_time=end_time - start_time, retries=retries,
+            start_time=start_time, end_time=end_time, error=error)
+
+
+
+class RingBufferSink(object):
+    """
+    Keeps the most recent 'size' events, discarding older ones.
+    """
+    def __init__(self, size=None):
+        self.size = size or DEFAULT_RING_BUFFER_SIZE
+        self._events = collections.deque(maxlen=self.size)
+        self._breaker_events = collections.deque(maxlen=self.size)
+
+
+    def record(self, event):
+        self._events.append(event)
+
+
+    def record_breaker(self, event):
+        self._breaker_events.append(event)
+
+
+    def events(self):
+        """Returns a list of the kept events, oldest first."""
+        return list(self._events)
+
+
+    def breaker_events(self):
+        """Returns a list of the kept circuit breaker events, oldest first."""
+        return list(self._breaker_events)
+
+
+    def clear(self):
+        """Discards all the kept events."""
+        self._events.clear()
+        self._breaker_events.clear()
+
+
+    def __len__(self):
+        return len(self._events)
+
+
+
+class HistogramSink(object):
+    """
+    Keeps the latencies of the requests made in the last 'window' seconds,
+    grouped by service, method and URI template, and reports percentiles of
+    them. No more than 'max_samples' latencies are kept for each group.
+    """
+    def __init__(self, window=None, max_samples=None):
+        self.window = window or DEFAULT_HISTOGRAM_WINDOW
+        self.max_samples = max_samples or DEFAULT_HISTOGRAM_MAX_SAMPLES
+        self._samples = {}
+        self._lock = threading.Lock()
+
+
+    def record(self, event):
+        key = (event.service, event.method, event.uri_template)
+        with self._lock:
+            samples = self._samples.get(key)
+            if samples is None:
+                samples = self._samples[key] = collections.deque(
+                        maxlen=self.max_samples)
+            samples.append((event.end_time, event.total_time))
+            self._expire(samples, event.end_time)
+
+
+    def _expire(self, samples, now):
+        """Drops the samples that have aged out of the window."""
+        cutoff = now - self.window
+        while samples and samples[0][0] < cutoff:
+            samples.popleft()
+
+
+    def _latencies(self, service=None, method=None, uri_template=None):
+        """Returns the sorted latencies of the matching requests."""
+        now = time.time()
+        ret = []
+        with self._lock:
+            for key, samples in list(self._samples.items()):
+                self._expire(samples, now)
+                if not samples:
+                    del self._samples[key]
+                    continue
+                svc, mthd, tmpl = key
+                if ((service is not None and svc != service) or
+                        (method is not None and mthd != method) or
+                        (uri_template is not None and tmpl != uri_template)):
+                    continue
+                ret.extend([latency for end_time, latency in samples])
+        ret.sort()
+        return ret
+
+
+    @staticmethod
+    def _percentile(latencies, pct):
+        """Nearest-rank percentile of a sorted list."""
+        if not latencies:
+            return None
+        rank = int(math.ceil(pct * len(latencies) / 100.0))
+        return latencies[max(1, min(rank, len(latencies))) - 1]
+
+
+    def percentiles(self, service=None, method=None, uri_template=None,
+            percentiles=None):
+        """
+        Returns a dict mapping each of 'percentiles' to the latency at that
+        percentile for the matching requests, or to None if there were none.
+        Omitted filters match everything.
+        """
+        latencies = self._latencies(service=service, method=method,
+                uri_template=uri_template)
+        return dict([(pct, self._percentile(latencies, pct))
+                for pct in (percentiles or DEFAULT_PERCENTILES)])
+
+
+    def summary(self, percentiles=None):
+        """
+        Returns a dict keyed by (service, method, uri_template), with the
+        number of requests, their mean latency, and the latency at each of
+        'percentiles' for each group.
+        """
+        ret = {}
+        with self._lock:
+            keys = list(self._samples.keys())
+        for key in keys:
+            svc, mthd, tmpl = key
+            latencies = self._latencies(service=svc, method=mthd,
+                    uri_template=tmpl)
+            if not latencies:
+                continue
+            info = {"count": len(latencies),
+                    "mean": sum(latencies) / len(latencies)}
+            for pct in (percentiles or DEFAULT_PERCENTILES):
+                info["p%s" % pct] = self._percentile(latencies, pct)
+            ret[key] = info
+        return ret
+
+
+    def clear(self):
+        """Discards all the kept latencies."""
+        with self._lock:
+            self._samples.clear()
+
+
+
+def _metric_name(val):
+    return _METRIC_NAME_PATTERN.sub("_", "%s" % val)
+
+
+class StatsdSink(object):
+    """
+    Sends a request counter, a status counter, the latency and the number of
+    bytes transferred for each request to a StatsD server over UDP. Metric
+    names are '<prefix>.<service>.<method>.requests' and so on. Circuit
+    breaker state changes are counted as '<prefix>.<service>.breaker.<state>'.
+    Send errors are ignored, as is usual for StatsD.
+    """
+    def __init__(self, host=None, port=None, prefix=None):
+        self.address = (host or DEFAULT_STATSD_HOST,
+                port or DEFAULT_STATSD_PORT)
+        self.prefix = prefix or DEFAULT_METRIC_PREFIX
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+
+    def format(self, event):
+        """Returns the StatsD lines for the event."""
+        base = "%s.%s.%s" % (self.prefix, _metric_name(event.service),
+                _metric_name(event.method))
+        status = event.status if event.status is not None else "error"
+        lines = ["%s.requests:1|c" % base,
+                "%s.status.%s:1|c" % (base, status),
+                "%s.latency:%d|ms" % (base, round(event.total_time * 1000))]
+        if event.ttfb is not None:
+            lines.append("%s.ttfb:%d|ms" % (base, round(event.ttfb * 1000)))
+        if event.bytes_sent:
+            lines.append("%s.bytes_sent:%d|c" % (base, event.bytes_sent))
+        if event.bytes_received:
+            lines.append("%s.bytes_received:%d|c" % (base,
+                    event.bytes_received))
+        if event.retries:
+            lines.append("%s.retries:%d|c" % (base, event.retries))
+        return "\n".join(lines)
+
+
+    def format_breaker(self, event):
+        """Returns the StatsD line for a circuit breaker changing state."""
+        return "%s.%s.breaker.%s:1|c" % (self.prefix,
+                _metric_name(event.service), event.new_state)
+
+
+    def _send(self, data):
+        try:
+            self._socket.sendto(data.encode("utf-8"), self.address)
+        except socket.error:
+            pass
+
+
+    def record(self, event):
+        self._send(self.format(event))
+
+
+    def record_breaker(self, event):
+        self._send(self.format_breaker(event))
+
+
+    def close(self):
+        self._socket.close()
+
+
+
+class PrometheusSink(object):
+    """
+    Aggregates request counts, latencies and bytes transferred per service and
+    method, and circuit breaker state changes per endpoint, and renders them
+    in the Prometheus text exposition format, for serving from an
+    application's metrics endpoint.
+    """
+    def __init__(self, prefix=None, buckets=None):
+        self.prefix = _metric_name(prefix or DEFAULT_METRIC_PREFIX)
+        self.buckets = tuple(sorted(buckets or DEFAULT_LATENCY_BUCKETS))
+        self._requests = collections.defaultdict(int)
+        self._bytes = collections.defaultdict(int)
+        self._latency_counts = {}
+        self._latency_sums = collections.defaultdict(float)
+        self._transitions = collections.defaultdict(int)
+        self._lock = threading.Lock()
+
+
+    def record(self, event):
+        key = (event.service, event.method)
+        # Kept as a string, so that the keys can be sorted alongside "error".
+        status = "%s" % event.status if event.status is not None else "error"
+        with self._lock:
+            self._requests[key + (status, )] += 1
+            self._bytes[key + ("out", )] += event.bytes_sent or 0
+            self._bytes[key + ("in", )] += event.bytes_received or 0
+            counts = self._latency_counts.get(key)
+            if counts is None:
+                counts = self._latency_counts[key] = [0] * (
+                        len(self.buckets) + 1)
+            for pos, bound in enumerate(self.buckets):
+                if event.total_time <= bound:
+                    counts[pos] += 1
+            # The +Inf bucket
+            counts[-1] += 1
+            self._latency_sums[key] += event.total_time
+
+
+    def record_breaker(self, event):
+        with self._lock:
+            self._transitions[(event.service, event.endpoint,
+                    event.new_state)] += 1
+
+
+    @staticmethod
+    def _labels(**labels):
+        return ",".join(['%s="%s"' % (nm, ("%s" % val).replace('"', '\\"'))
+                for nm, val in sorted(labels.items())])
+
+
+    def render(self):
+        """Returns the metrics in the Prometheus text format."""
+        pfx = self.prefix
+        lines = []
+        with self._lock:
+            lines.append("# HELP %s_requests_total API requests made." % pfx)
+            lines.append("# TYPE %s_requests_total counter" % pfx)
+            for (svc, mthd, status), val in sorted(self._requests.items()):
+                lines.append("%s_requests_total{%s} %s" % (pfx,
+                        self._labels(service=svc, method=mthd,
+                        status=status), val))
+            lines.append("# HELP %s_request_bytes_total Bytes transferred "
+                    "by API requests." % pfx)
+            lines.append("# TYPE %s_request_bytes_total counter" % pfx)
+            for (svc, mthd, direction), val in sorted(self._bytes.items()):
+                lines.append("%s_request_bytes_total{%s} %s" % (pfx,
+                        self._labels(service=svc, method=mthd,
+                        direction=direction), val))
+            name = "%s_request_duration_seconds" % pfx
+            lines.append("# HELP %s API request latency." % name)
+            lines.append("# TYPE %s histogram" % name)
+            for (svc, mthd), counts in sorted(self._latency_counts.items()):
+                bounds = ["%s" % bound for bound in self.buckets] + ["+Inf"]
+                for bound, count in zip(bounds, counts):
+                    lines.append("%s_bucket{%s} %s" % (name,
+                            self._labels(service=svc, method=mthd, le=bound),
+                            count))
+                labels = self._labels(service=svc, method=mthd)
+                lines.append("%s_sum{%s} %s" % (name, labels,
+                        self._latency_sums[(svc, mthd)]))
+                lines.append("%s_count{%s} %s" % (name, labels, counts[-1]))
+            if self._transitions:
+                name = "%s_circuit_breaker_transitions_total" % pfx
+                lines.append("# HELP %s Circuit breaker state changes." % name)
+                lines.append("# TYPE %s counter" % name)
+                for (svc, endpoint, state), val in sorted(
+                        self._transitions.items()):
+                    lines.append("%s{%s} %s" % (name, self._labels(
+                            service=svc, endpoint=endpoint, state=state), val))
+        return "\n".join(lines) + "\n"
@@ -19,10 +19,13 @@
 
 from __future__ import print_function
 from __future__ import absolute_import
+import calendar
+import collections
 import datetime
 from functools import wraps
 import hashlib
 import hmac
+import itertools
 import json
 import logging
 import math
@@ -30,6 +33,7 @@ import mimetypes
 import os
 import re
 import six
+import tempfile
 import threading
 import time
 import uuid
@@ -56,6 +60,26 @@ DEFAULT_CDN_TTL = 86400
 EARLY_DATE_STR = "1900-01-01T00:00:00"
 # Maximum number of objects that can be passed to bulk-delete
 MAX_BULK_DELETE = 10000
+# Maximum number of objects returned by a single container listing.
+MAX_LISTING_LIMIT = 10000
+# Default number of segments of a large object that are uploaded in parallel.
+DEFAULT_SEGMENT_WORKERS = 4
+# Default number of times an individual segment upload is retried.
+DEFAULT_SEGMENT_RETRIES = 3
+# Default size in bytes of the ranges fetched by parallel downloads.
+DEFAULT_DOWNLOAD_CHUNKSIZE = 8 * 1024 * 1024
+# Default number of ranges of an object that are downloaded in parallel.
+DEFAULT_DOWNLOAD_WORKERS = 4
+# Default number of files uploaded in parallel by upload_folder().
+DEFAULT_FOLDER_UPLOAD_WORKERS = 4
+# Default number of bulk delete requests that are sent in parallel.
+DEFAULT_BULK_DELETE_WORKERS = 4
+
+# Lightweight record for the objects in a container listing, returned instead
+# of StorageObject instances when a listing iterator is created with
+# 'records=True'.
+StorageObjectRecord = collections.namedtuple("StorageObjectRecord",
+        ["name", "bytes", "hash", "last_modified"])
 
 # Used to indicate values that are lazy-loaded
 class Fault_cls(object):
@@ -155,6 +179,23 @@ def get_file_size(fileobj):
     return total_size
 
 
+def _last_modified_timestamp(obj):
+    """
+    Returns the 'last_modified' value of a StorageObject from a container
+    listing as a UTC timestamp, or 0 if there is no object or the value can't
+    be parsed.
+    """
+    last_modified = getattr(obj, "last_modified", None)
+    if not last_modified:
+        return 0
+    fmt = "%Y-%m-%dT%H:%M:%S.%f" if "." in last_modified else "%Y-%m-%dT%H:%M:%S"
+    try:
+        dt = datetime.datetime.strptime(last_modified, fmt)
+    except ValueError:
+        return 0
+    return calendar.timegm(dt.timetuple()) + dt.microsecond / 1000000.0
+
+
 
 class Container(BaseResource):
     def __init__(self, *args, **kwargs):
@@ -346,13 +387,18 @@ class Container(BaseResource):
                     return_raw=return_raw)
 
 
-    def list_all(self, prefix=None):
+    def list_all(self, prefix=None, records=False):
         """
         List all the objects in this container, optionally filtered by an
         initial prefix. Returns an iterator that will yield all the objects in
         the container, even if the number exceeds the absolute limits of Swift.
+
+        If 'records' is True, the iterator yields StorageObjectRecord tuples of
+        (name, bytes, hash, last_modified) instead of StorageObject instances,
+        which is much cheaper for scans of large containers.
         """
-        return self.manager.object_listing_iterator(self, prefix=prefix)
+        return self.manager.object_listing_iterator(self, prefix=prefix,
+                records=records)
 
 
     def list_object_names(self, marker=None, limit=None, prefix=None,
@@ -362,7 +408,7 @@ class Container(BaseResource):
         same pagination parameters apply as in self.list().
         """
         if full_listing:
-            objects = self.list_all(prefix=prefix)
+            objects = self.list_all(prefix=prefix, records=True)
         else:
             objects = self.list(marker=marker, limit=limit, prefix=prefix,
                     delimiter=delimiter, end_marker=end_marker)
@@ -479,15 +525,17 @@ class Container(BaseResource):
 
 
     def fetch(self, obj, include_meta=False, chunk_size=None, size=None,
-            extra_info=None):
+            extra_info=None, stream=False):
         """
         Fetches the object from storage.
 
         If 'include_meta' is False, only the bytes representing the
         stored object are returned.
 
-        Note: if 'chunk_size' is defined, you must fully read the object's
-        contents before making another request.
+        Note: if 'chunk_size' is defined, a generator that returns the
+        object's contents in chunks of that size is returned. The contents are
+        read from a single streamed request, so you must fully read them (or
+        close the generator) before making another request.
 
         If 'size' is specified, only the first 'size' bytes of the object will
         be returned. If the object if smaller than 'size', the entire object is
@@ -498,12 +546,17 @@ class Container(BaseResource):
             Element 0: a dictionary containing metadata about the file.
             Element 1: a stream of bytes representing the object's contents.
 
+        If 'stream' is True, the object's contents are returned as a file-like
+        pyrax.http.StreamingBody that reads the bytes from the connection as
+        they are consumed. Close it when you are done with it to release the
+        connection.
+
         The 'extra_info' parameter is included for backwards compatibility. It
         is no longer used at all, and will not be modified with swiftclient
         info, since swiftclient is not used any more.
         """
         return self.object_manager.fetch(obj, include_meta=include_meta,
-                chunk_size=chunk_size, size=size)
+                chunk_size=chunk_size, size=size, stream=stream)
 
 
     def fetch_object(self, obj_name, include_meta=False, chunk_size=None):
@@ -522,7 +575,7 @@ class Container(BaseResource):
         return self.object_manager.fetch_partial(obj, size)
 
 
-    def download(self, obj, directory, structure=True):
+    def download(self, obj, directory, structure=True, parallel=False):
         """
         Fetches the object from storage, and writes it to the specified
         directory. The directory must exist before calling this method.
@@ -531,16 +584,22 @@ class Container(BaseResource):
         "foo/bar/baz.txt", that folder structure will be created in the target
         directory by default. If you do not want the nested folders to be
         created, pass `structure=False` in the parameters.
+        If 'parallel' is True, the object is fetched as a series of byte ranges
+        by several threads at once, and each range is written directly to its
+        place in the target file. An interrupted parallel download is resumed
+        when it is repeated.
         """
-        return self.object_manager.download(obj, directory, structure=structure)
+        return self.object_manager.download(obj, directory, structure=structure,
+                parallel=parallel)
 
 
-    def download_object(self, obj_name, directory, structure=True):
+    def download_object(self, obj_name, directory, structure=True,
+            parallel=False):
         """
         Alias for self.download(); included for backwards compatibility
         """
         return self.download(obj=obj_name, directory=directory,
-                structure=structure)
+                structure=structure, parallel=parallel)
 
 
     def delete(self, del_objects=False):
@@ -1305,12 +1364,15 @@ class ContainerManager(BaseManager):
 
 
     @assure_container
-    def object_listing_iterator(self, container, prefix=None):
+    def object_listing_iterator(self, container, prefix=None, records=False):
         """
         Returns an iterator that can be used to access the objects within this
-        container. They can be optionally limited by a prefix.
+        container. They can be optionally limited by a prefix. If 'records' is
+        True, StorageObjectRecord tuples are returned instead of StorageObject
+        instances.
         """
-        return StorageObjectIterator(container.object_manager, prefix=prefix)
+        return StorageObjectIterator(container.object_manager, prefix=prefix,
+                records=records)
 
 
     @assure_container
@@ -1379,7 +1441,7 @@ class ContainerManager(BaseManager):
 
     @assure_container
     def fetch_object(self, container, obj, include_meta=False,
-            chunk_size=None, size=None, extra_info=None):
+            chunk_size=None, size=None, extra_info=None, stream=False):
         """
         Fetches the object from storage.
 
@@ -1398,12 +1460,17 @@ class ContainerManager(BaseManager):
             Element 0: a dictionary containing metadata about the file.
             Element 1: a stream of bytes representing the object's contents.
 
+        If 'stream' is True, the object's contents are returned as a file-like
+        pyrax.http.StreamingBody that reads the bytes from the connection as
+        they are consumed. Close it when you are done with it to release the
+        connection.
+
         The 'extra_info' parameter is included for backwards compatibility. It
         is no longer used at all, and will not be modified with swiftclient
         info, since swiftclient is not used any more.
         """
         return container.fetch(obj, include_meta=include_meta,
-                chunk_size=chunk_size, size=size)
+                chunk_size=chunk_size, size=size, stream=stream)
 
 
     @assure_container
@@ -1416,7 +1483,8 @@ class ContainerManager(BaseManager):
 
 
     @assure_container
-    def download_object(self, container, obj, directory, structure=True):
+    def download_object(self, container, obj, directory, structure=True,
+            parallel=False):
         """
         Fetches the object from storage, and writes it to the specified
         directory. The directory must exist before calling this method.
@@ -1425,8 +1493,13 @@ class ContainerManager(BaseManager):
         "foo/bar/baz.txt", that folder structure will be created in the target
         directory by default. If you do not want the nested folders to be
         created, pass `structure=False` in the parameters.
+        If 'parallel' is True, the object is fetched as a series of byte ranges
+        by several threads at once, and each range is written directly to its
+        place in the target file. An interrupted parallel download is resumed
+        when it is repeated.
         """
-        return container.download(obj, directory, structure=structure)
+        return container.download(obj, directory, structure=structure,
+                parallel=parallel)
 
 
     @assure_container
@@ -1621,7 +1694,7 @@ class StorageObject(BaseResource):
     fetch = get
 
 
-    def download(self, directory, structure=True):
+    def download(self, directory, structure=True, parallel=False):
         """
         Fetches the object from storage, and writes it to the specified
         directory. The directory must exist before calling this method.
@@ -1630,8 +1703,13 @@ class StorageObject(BaseResource):
         "foo/bar/baz.txt", that folder structure will be created in the target
         directory by default. If you do not want the nested folders to be
         created, pass `structure=False` in the parameters.
+        If 'parallel' is True, the object is fetched as a series of byte ranges
+        by several threads at once, and each range is written directly to its
+        place in the target file. An interrupted parallel download is resumed
+        when it is repeated.
         """
-        return self.manager.download(self, directory, structure=structure)
+        return self.manager.download(self, directory, structure=structure,
+                parallel=parallel)
 
 
     def copy(self, new_container, new_obj_name=None, extra_info=None):
@@ -1734,13 +1812,41 @@ class StorageObjectIterator(utils.ResultsIterator):
     """
     Allows you to iterate over all the objects in a container, even if they
     exceed the limit for any single listing call.
+
+    Each page is as large as Swift allows, and the next page is requested in
+    the background while the current one is being consumed. If 'records' is
+    True, StorageObjectRecord tuples are returned instead of StorageObject
+    instances.
     """
+    def __init__(self, manager, marker=None, limit=MAX_LISTING_LIMIT,
+            records=False, prefetch=True, **kwargs):
+        self.records = records
+        kwargs.setdefault("prefix", None)
+        super(StorageObjectIterator, self).__init__(manager, marker=marker,
+                limit=limit, prefetch=prefetch, **kwargs)
+
+
     def _init_methods(self):
-        self.list_method = self.manager.list
+        if self.records:
+            self.list_method = self._list_records
+        else:
+            self.list_method = self.manager.list
         # Swift uses the object name as its ID.
         self.marker_att = "name"
 
 
+    def _list_records(self, marker=None, limit=None, prefix=None):
+        """
+        Returns a page of the listing as StorageObjectRecord tuples, skipping
+        the creation of StorageObject instances.
+        """
+        resp_body = self.manager.list(marker=marker, limit=limit,
+                prefix=prefix, return_raw=True)
+        return [StorageObjectRecord(elem.get("name", elem.get("subdir")),
+                elem.get("bytes"), elem.get("hash"),
+                elem.get("last_modified")) for elem in resp_body]
+
+
 
 class StorageObjectManager(BaseManager):
     """
@@ -1877,10 +1983,16 @@ class StorageObjectManager(BaseManager):
 
 
     def _upload(self, obj_name, content, content_type, content_encoding,
-            content_length, etag, chunked, chunk_size, headers):
+            content_length, etag, chunked, chunk_size, headers,
+            segment_size=None, segment_workers=None):
         """
         Handles the uploading of content, including working around the 5GB
         maximum file size.
+
+        Content larger than 'segment_size' bytes is uploaded as a series of
+        segments by 'segment_workers' parallel threads, followed by a manifest.
+        If not specified, the client's 'segment_size' and 'segment_workers'
+        values are used; 'segment_size' can never exceed MAX_FILE_SIZE.
         """
         if content_type is not None:
             headers["Content-Type"] = content_type
@@ -1895,44 +2007,39 @@ class StorageObjectManager(BaseManager):
                 fsize = get_file_size(content)
             else:
                 fsize = content_length
-        if fsize <= MAX_FILE_SIZE:
+        segment_size = min(segment_size or
+                getattr(self.api, "segment_size", None) or MAX_FILE_SIZE,
+                MAX_FILE_SIZE)
+        if fsize is None or fsize <= segment_size:
             # We can just upload it as-is.
             return self._store_object(obj_name, content=content, etag=etag,
                     chunked=chunked, chunk_size=chunk_size, headers=headers)
-        # Files larger than MAX_FILE_SIZE must be segmented
+        # Files larger than the segment size must be segmented
         # and uploaded separately.
-        num_segments = int(math.ceil(float(fsize) / MAX_FILE_SIZE))
-        digits = int(math.log10(num_segments)) + 1
-        # NOTE: This could be greatly improved with threading or other
-        # async design.
-        for segment in range(num_segments):
-            sequence = str(segment + 1).zfill(digits)
-            seg_name = "%s.%s" % (obj_name, sequence)
-            with utils.SelfDeletingTempfile() as tmpname:
-                with open(tmpname, "wb") as tmp:
-                    tmp.write(content.read(MAX_FILE_SIZE))
-                with open(tmpname, "rb") as tmp:
-                    # We have to calculate the etag for each segment
-                    etag = utils.get_checksum(tmp)
-                    self._store_object(seg_name, content=tmp, etag=etag,
-                            chunked=False, headers=headers)
-        # Upload the manifest
-        headers.pop("ETag", "")
-        headers["X-Object-Manifest"] = "%s/%s." % (self.name, obj_name)
-        self._store_object(obj_name, content=None, headers=headers)
+        workers = (segment_workers or getattr(self.api, "segment_workers",
+                None) or DEFAULT_SEGMENT_WORKERS)
+        uploader = SegmentedUploader(self, obj_name, content, fsize,
+                segment_size=segment_size, workers=workers, headers=headers,
+                retries=getattr(self.api, "segment_retries",
+                    DEFAULT_SEGMENT_RETRIES),
+                use_slo=getattr(self.api, "use_slo", False))
+        uploader.upload()
 
 
     def _store_object(self, obj_name, content, etag=None, chunked=False,
-            chunk_size=None, headers=None):
+            chunk_size=None, headers=None, compute_etag=True):
         """
         Handles the low-level creation of a storage object and the uploading of
-        the contents of that object.
+        the contents of that object. Returns the response from the PUT.
+
+        If no 'etag' is supplied, the checksum of the content is calculated
+        before uploading it, unless 'compute_etag' is False.
         """
         head_etag = headers.pop("ETag", "")
         if chunked:
             headers.pop("Content-Length", "")
             headers["Transfer-Encoding"] = "chunked"
-        elif etag is None and content is not None:
+        elif etag is None and content is not None and compute_etag:
             etag = utils.get_checksum(content)
         if etag:
             headers["ETag"] = etag
@@ -1941,11 +2048,12 @@ class StorageObjectManager(BaseManager):
         uri = "/%s/%s" % (self.uri_base, obj_name)
         resp, resp_body = self.api.method_put(uri, data=content,
                 headers=headers)
+        return resp
 
 
     @_handle_object_not_found
     def fetch(self, obj, include_meta=False, chunk_size=None, size=None,
-            extra_info=None):
+            extra_info=None, stream=False):
         """
         Fetches the object from storage.
 
@@ -1964,20 +2072,32 @@ class StorageObjectManager(BaseManager):
             Element 0: a dictionary containing metadata about the file.
             Element 1: a stream of bytes representing the object's contents.
 
+        If 'stream' is True, the object's contents are returned as a file-like
+        pyrax.http.StreamingBody that reads the bytes from the connection as
+        they are consumed. Close it when you are done with it to release the
+        connection.
+
         The 'extra_info' parameter is included for backwards compatibility. It
         is no longer used at all, and will not be modified with swiftclient
         info, since swiftclient is not used any more.
         """
         uri = "/%s/%s" % (self.uri_base, utils.get_name(obj))
-        if chunk_size:
-            # Need the total size of the object
-            if not isinstance(obj, StorageObject):
-                obj = self.get(obj)
-            obj_size = obj.total_bytes
-            return self._fetch_chunker(uri, chunk_size, size, obj_size)
         headers = {}
         if size:
-            headers = {"Range": "bytes=0-%s" % size}
+            # Byte ranges include their last byte.
+            headers = {"Range": "bytes=0-%s" % (size - 1)}
+        if chunk_size:
+            # The request is made now, so that a missing object raises
+            # NoSuchObject here rather than when the chunks are read.
+            resp, resp_body = self.api.method_get(uri, headers=headers,
+                    stream=True, chunk_size=chunk_size)
+            return self._fetch_chunker(resp_body)
+        if stream:
+            resp, resp_body = self.api.method_get(uri, headers=headers,
+                    stream=True)
+            if include_meta:
+                return (resp.headers, resp_body)
+            return resp_body
         resp, resp_body = self.api.method_get(uri, headers=headers,
                 raw_content=True)
         if include_meta:
@@ -1986,27 +2106,16 @@ class StorageObjectManager(BaseManager):
         return resp_body
 
 
-    def _fetch_chunker(self, uri, chunk_size, size, obj_size):
+    @staticmethod
+    def _fetch_chunker(resp_body):
         """
-        Returns a generator that returns an object in chunks.
+        Returns a generator that returns the chunks of a streamed response
+        body. The connection is released once the generator is exhausted or
+        closed.
         """
-        pos = 0
-        total_bytes = 0
-        size = size or obj_size
-        max_size = min(size, obj_size)
-        while True:
-            endpos = min(obj_size, pos + chunk_size - 1)
-            headers = {"Range": "bytes=%s-%s" % (pos, endpos)}
-            resp, resp_body = self.api.method_get(uri, headers=headers,
-                    raw_content=True)
-            pos = endpos + 1
-            if not resp_body:
-                # End of file
-                raise StopIteration
-            yield resp_body
-            total_bytes += len(resp_body)
-            if total_bytes >= max_size:
-                raise StopIteration
+        with resp_body:
+            for chunk in resp_body:
+                yield chunk
 
 
     def fetch_partial(self, obj, size):
@@ -2045,12 +2154,15 @@ class StorageObjectManager(BaseManager):
             errors - a list of any errors returned by the bulk delete call
         """
         if nms is None:
-            nms = self.api.list_object_names(self.name, full_listing=True)
+            # List the objects lazily, so that deletion of the first batches
+            # can start while the rest of the container is being listed.
+            nms = (rec.name for rec in StorageObjectIterator(self,
+                    limit=MAX_BULK_DELETE, records=True))
         return self.api.bulk_delete(self.name, nms, async=async)
 
 
     @_handle_object_not_found
-    def download(self, obj, directory, structure=True):
+    def download(self, obj, directory, structure=True, parallel=False):
         """
         Fetches the object from storage, and writes it to the specified
         directory. The directory must exist before calling this method.
@@ -2059,6 +2171,13 @@ class StorageObjectManager(BaseManager):
         "foo/bar/baz.txt", that folder structure will be created in the target
         directory by default. If you do not want the nested folders to be
         created, pass `structure=False` in the parameters.
+
+        If 'parallel' is True, the object is fetched as a series of byte ranges
+        of the client's 'download_chunk_size' by 'download_workers' threads,
+        and each range is written directly to its place in the target file, so
+        the object is never held in memory. The ETag of the completed file is
+        verified, and an interrupted parallel download is resumed from the
+        ranges already on disk when it is repeated.
         """
         if not os.path.isdir(directory):
             raise exc.FolderNotFound("The directory '%s' does not exist." %
@@ -2072,13 +2191,18 @@ class StorageObjectManager(BaseManager):
             target = os.path.join(fullpath, fname)
         else:
             target = os.path.join(directory, fname)
+        if parallel:
+            downloader = ParallelDownloader(self, obj, target,
+                    chunk_size=getattr(self.api, "download_chunk_size", None),
+                    workers=getattr(self.api, "download_workers", None))
+            return downloader.download()
         with open(target, "wb") as dl:
-            content = self.fetch(obj)
-            try:
-                dl.write(content)
-            except UnicodeEncodeError:
-                encoding = pyrax.get_encoding()
-                dl.write(content.encode(encoding))
+            for content in self.fetch(obj, chunk_size=DEFAULT_CHUNKSIZE):
+                try:
+                    dl.write(content)
+                except UnicodeEncodeError:
+                    encoding = pyrax.get_encoding()
+                    dl.write(content.encode(encoding))
 
 
     @_handle_object_not_found
@@ -2179,12 +2303,49 @@ class StorageClient(BaseClient):
     This is the primary class for interacting with OpenStack Object Storage.
     """
     name = "Object Storage"
+    # Container HEADs are made before many object operations. Their object
+    # counts and sizes change as others write to the container, so they are
+    # only kept briefly.
+    response_cache_policies = ((r"^HEAD /[^/]+$", 10), )
+    # Swift answers 408 when a client is too slow sending an object body, so
+    # that is worth retrying as well.
+    retry_policy_overrides = {"retry_statuses": (408, ) +
+            pyrax.http.DEFAULT_RETRY_STATUSES}
     # Folder upload status dict. Each upload will generate its own UUID key.
     # The app can use that key query the status of the upload. This dict
     # will also be used to hold the flag to interrupt uploads in progress.
     folder_upload_status = {}
-    # Interval in seconds between checks for completion of bulk deletes.
+    # Guards the counters in folder_upload_status, which are updated by
+    # several upload threads at once.
+    _folder_upload_lock = threading.Lock()
+    # Number of files uploaded in parallel by upload_folder() and
+    # sync_folder_to_container().
+    folder_upload_workers = DEFAULT_FOLDER_UPLOAD_WORKERS
+    # Number of threads used by the current sync_folder_to_container() call,
+    # and the ChecksumCache it uses, if any.
+    _sync_workers = DEFAULT_FOLDER_UPLOAD_WORKERS
+    _checksum_cache = None
+    # Files waiting to be uploaded by the current sync; None between syncs.
+    _sync_uploads = None
+    # No longer used; bulk deletes now signal their completion directly. It is
+    # kept for backwards compatibility.
     bulk_delete_interval = 1
+    # Number of bulk delete requests that are sent in parallel.
+    bulk_delete_workers = DEFAULT_BULK_DELETE_WORKERS
+    # Objects larger than this many bytes are uploaded in segments. None means
+    # MAX_FILE_SIZE, which is also the largest value allowed.
+    segment_size = None
+    # Number of segments of a large object that are uploaded in parallel.
+    segment_workers = DEFAULT_SEGMENT_WORKERS
+    # Number of times a failed segment upload is retried.
+    segment_retries = DEFAULT_SEGMENT_RETRIES
+    # When True, large objects get a Static Large Object manifest instead of
+    # the default Dynamic Large Object manifest.
+    use_slo = False
+    # Size of the byte ranges fetched by parallel downloads.
+    download_chunk_size = DEFAULT_DOWNLOAD_CHUNKSIZE
+    # Number of byte ranges of an object that are downloaded in parallel.
+    download_workers = DEFAULT_DOWNLOAD_WORKERS
 
     def __init__(self, *args, **kwargs):
         # Constants used in metadata headers
@@ -2259,6 +2420,18 @@ class StorageClient(BaseClient):
                 response_key="", uri_base="")
 
 
+    def _uri_template(self, uri):
+        """
+        Container and object names are chosen by the user, so they are
+        replaced wholesale rather than only when they look like IDs.
+        """
+        path = self._endpoint_path(uri).strip("/")
+        if not path:
+            return "/"
+        return ["/{container}", "/{container}/{object}"][
+                len(path.split("/", 1)) - 1]
+
+
     def remove_container_from_cache(self, container):
         """
         Not used anymore. Included for backwards compatibility.
@@ -2646,8 +2819,9 @@ class StorageClient(BaseClient):
                 end_marker=end_marker)
 
 
-    def object_listing_iterator(self, container, prefix=None):
-        return self._manager.object_listing_iterator(container, prefix=prefix)
+    def object_listing_iterator(self, container, prefix=None, records=False):
+        return self._manager.object_listing_iterator(container, prefix=prefix,
+                records=records)
 
 
     def delete_object_in_seconds(self, cont, obj, seconds, extra_info=None):
@@ -2759,7 +2933,7 @@ class StorageClient(BaseClient):
 
 
     def fetch_object(self, container, obj, include_meta=False,
-            chunk_size=None, size=None, extra_info=None):
+            chunk_size=None, size=None, extra_info=None, stream=False):
         """
         Fetches the object from storage.
 
@@ -2778,12 +2952,18 @@ class StorageClient(BaseClient):
             Element 0: a dictionary containing metadata about the file.
             Element 1: a stream of bytes representing the object's contents.
 
+        If 'stream' is True, the object's contents are returned as a file-like
+        pyrax.http.StreamingBody that reads the bytes from the connection as
+        they are consumed. Close it when you are done with it to release the
+        connection.
+
         The 'extra_info' parameter is included for backwards compatibility. It
         is no longer used at all, and will not be modified with swiftclient
         info, since swiftclient is not used any more.
         """
         return self._manager.fetch_object(container, obj,
-                include_meta=include_meta, chunk_size=chunk_size, size=size)
+                include_meta=include_meta, chunk_size=chunk_size, size=size,
+                stream=stream)
 
 
     def fetch_partial(self, container, obj, size):
@@ -2841,7 +3021,8 @@ class StorageClient(BaseClient):
         return job
 
 
-    def download_object(self, container, obj, directory, structure=True):
+    def download_object(self, container, obj, directory, structure=True,
+            parallel=False):
         """
         Fetches the object from storage, and writes it to the specified
         directory. The directory must exist before calling this method.
@@ -2850,9 +3031,13 @@ class StorageClient(BaseClient):
         "foo/bar/baz.txt", that folder structure will be created in the target
         directory by default. If you do not want the nested folders to be
         created, pass `structure=False` in the parameters.
+        If 'parallel' is True, the object is fetched as a series of byte ranges
+        by several threads at once, and each range is written directly to its
+        place in the target file. An interrupted parallel download is resumed
+        when it is repeated.
         """
         return self._manager.download_object(container, obj, directory,
-                structure=structure)
+                structure=structure, parallel=parallel)
 
 
     def delete(self, container, del_objects=False):
@@ -2932,7 +3117,8 @@ class StorageClient(BaseClient):
                 new_ctype, guess=guess)
 
 
-    def upload_folder(self, folder_path, container=None, ignore=None, ttl=None):
+    def upload_folder(self, folder_path, container=None, ignore=None, ttl=None,
+            workers=None, journal=None):
         """
         Convenience method for uploading an entire folder, including any
         sub-folders, to Cloud Files.
@@ -2969,33 +3155,49 @@ class StorageClient(BaseClient):
 
         If you specify a `ttl` parameter, the uploaded files will be deleted
         after that number of seconds.
+
+        Files are uploaded by 'workers' threads at once; if not specified, the
+        client's 'folder_upload_workers' value is used. If you pass the path
+        of a 'journal' file, every file that is uploaded is recorded in it. If
+        the upload is interrupted, calling upload_folder() again with the same
+        journal skips the files that were already uploaded, provided they have
+        not been modified since. get_upload_status(uuid) returns a summary of
+        the files and bytes uploaded so far, and any errors.
         """
         if not os.path.isdir(folder_path):
             raise exc.FolderNotFound("No such folder: '%s'" % folder_path)
 
         ignore = utils.coerce_to_list(ignore)
-        total_bytes = utils.folder_size(folder_path, ignore)
         upload_key = str(uuid.uuid4())
         self.folder_upload_status[upload_key] = {"continue": True,
-                "total_bytes": total_bytes,
+                "total_bytes": None,
                 "uploaded": 0,
+                "uploaded_files": 0,
+                "errors": [],
+                "done": False,
                 }
+        # The upload starts right away; the total size is calculated while
+        # the first files are being sent.
         self._upload_folder_in_background(folder_path, container, ignore,
-                upload_key, ttl)
+                upload_key, ttl, workers=workers, journal=journal)
+        total_bytes = utils.folder_size(folder_path, ignore)
+        self.folder_upload_status[upload_key]["total_bytes"] = total_bytes
         return (upload_key, total_bytes)
 
 
     def _upload_folder_in_background(self, folder_path, container, ignore,
-            upload_key, ttl=None):
+            upload_key, ttl=None, workers=None, journal=None):
         """Runs the folder upload in the background."""
         uploader = FolderUploader(folder_path, container, ignore, upload_key,
-                self, ttl=ttl)
+                self, ttl=ttl, workers=workers or self.folder_upload_workers,
+                journal=journal)
         uploader.start()
 
 
     def sync_folder_to_container(self, folder_path, container, delete=False,
             include_hidden=False, ignore=None, ignore_timestamps=False,
-            object_prefix="", verbose=False):
+            object_prefix="", verbose=False, checksum_cache=None,
+            workers=None):
         """
         Compares the contents of the specified folder, and checks to make sure
         that the corresponding object is present in the specified container. If
@@ -3028,9 +3230,21 @@ class StorageClient(BaseClient):
 
         Set `verbose` to True to make it print what is going on. It will
         show which files are being uploaded and which ones are not and why.
+
+        Calculating the checksum of every local file can take a long time for
+        large folders. If you pass the path of a file as 'checksum_cache', the
+        checksums are stored there, and on later syncs only the files whose
+        size, modification time or inode have changed are read again.
+
+        The files that need to be uploaded are sent by 'workers' threads at
+        once; if not specified, the client's 'folder_upload_workers' value is
+        used.
         """
         cont = self.get_container(container)
         self._local_files = []
+        self._sync_workers = workers or self.folder_upload_workers
+        if checksum_cache:
+            self._checksum_cache = utils.ChecksumCache(checksum_cache)
         # Load a list of all the remote objects so we don't have to keep
         # hitting the service
         if verbose:
@@ -3047,12 +3261,18 @@ class StorageClient(BaseClient):
                 "failure_reasons": [],
                 "deleted": 0,
                 }
-        self._sync_folder_to_container(folder_path, cont, prefix="",
-                delete=delete, include_hidden=include_hidden, ignore=ignore,
-                ignore_timestamps=ignore_timestamps,
-                object_prefix=object_prefix, verbose=verbose)
-        # Unset the _remote_files
-        self._remote_files = None
+        try:
+            self._sync_folder_to_container(folder_path, cont, prefix="",
+                    delete=delete, include_hidden=include_hidden,
+                    ignore=ignore, ignore_timestamps=ignore_timestamps,
+                    object_prefix=object_prefix, verbose=verbose)
+        finally:
+            # Unset the _remote_files
+            self._remote_files = None
+            self._sync_uploads = None
+            if self._checksum_cache is not None:
+                self._checksum_cache.close()
+                self._checksum_cache = None
         if verbose:
             # Log the summary
             summary = self._sync_summary
@@ -3073,8 +3293,12 @@ class StorageClient(BaseClient):
             include_hidden, ignore, ignore_timestamps, object_prefix, verbose):
         """
         This is the internal method that is called recursively to handle
-        nested folder structures.
+        nested folder structures. The files that need uploading are collected
+        as the folders are scanned, and the outermost call uploads them.
         """
+        top_level = self._sync_uploads is None
+        if top_level:
+            self._sync_uploads = []
         fnames = os.listdir(folder_path)
         ignore = utils.coerce_to_list(ignore)
         log = logging.getLogger("pyrax")
@@ -3096,7 +3320,10 @@ class StorageClient(BaseClient):
                 continue
             self._local_files.append(os.path.join(object_prefix, prefix,
                     fname))
-            local_etag = utils.get_checksum(pth)
+            if self._checksum_cache is not None:
+                local_etag = self._checksum_cache.get_checksum(pth)
+            else:
+                local_etag = utils.get_checksum(pth)
             if object_prefix:
                 prefix = os.path.join(object_prefix, prefix)
                 object_prefix = ""
@@ -3109,44 +3336,74 @@ class StorageClient(BaseClient):
                 obj_etag = None
             if local_etag != obj_etag:
                 if not ignore_timestamps:
-                    if obj:
-                        obj_time_str = obj.last_modified[:19]
-                    else:
-                        obj_time_str = EARLY_DATE_STR
-                    local_mod = datetime.datetime.utcfromtimestamp(
-                            os.stat(pth).st_mtime)
-                    local_mod_str = local_mod.isoformat()
-                    if obj_time_str >= local_mod_str:
+                    obj_time = _last_modified_timestamp(obj)
+                    local_mod = os.stat(pth).st_mtime
+                    if obj_time >= local_mod:
                         # Remote object is newer
                         self._sync_summary["older"] += 1
                         if verbose:
                             log.info("%s NOT UPLOADED because remote object is "
                                     "newer", fullname_with_prefix)
                             log.info("  Local: %s   Remote: %s" % (
-                                    local_mod_str, obj_time_str))
+                                    time.ctime(local_mod), time.ctime(obj_time)))
                         continue
-                try:
-                    container.upload_file(pth, obj_name=fullname_with_prefix,
-                        etag=local_etag, return_none=True)
-                    self._sync_summary["uploaded"] += 1
-                    if verbose:
-                        log.info("%s UPLOADED", fullname_with_prefix)
-                except Exception as e:
-                    # Record the failure, and move on
-                    self._sync_summary["failed"] += 1
-                    self._sync_summary["failure_reasons"].append("%s" % e)
-                    if verbose:
-                        log.error("%s UPLOAD FAILED. Exception: %s" %
-                                (fullname_with_prefix, e))
+                self._sync_uploads.append((pth, fullname_with_prefix,
+                        local_etag))
             else:
                 self._sync_summary["duplicate"] += 1
                 if verbose:
                     log.info("%s NOT UPLOADED because it already exists",
                             fullname_with_prefix)
+        if top_level:
+            self._upload_sync_files(container, verbose)
         if delete and not prefix:
             self._delete_objects_not_in_list(container, object_prefix)
 
 
+    def _upload_sync_files(self, container, verbose):
+        """
+        Uploads the files collected by _sync_folder_to_container() using a pool
+        of worker threads, and records the results in the sync summary.
+        """
+        log = logging.getLogger("pyrax")
+        upload_queue = six.moves.queue.Queue()
+        for upload in self._sync_uploads:
+            upload_queue.put(upload)
+        self._sync_uploads = None
+        summary_lock = threading.Lock()
+
+        def upload_worker():
+            while True:
+                try:
+                    pth, obj_name, etag = upload_queue.get_nowait()
+                except six.moves.queue.Empty:
+                    return
+                try:
+                    container.upload_file(pth, obj_name=obj_name, etag=etag,
+                            return_none=True)
+                except Exception as e:
+                    # Record the failure, and move on
+                    with summary_lock:
+                        self._sync_summary["failed"] += 1
+                        self._sync_summary["failure_reasons"].append("%s" % e)
+                    if verbose:
+                        log.error("%s UPLOAD FAILED. Exception: %s" %
+                                (obj_name, e))
+                    continue
+                with summary_lock:
+                    self._sync_summary["uploaded"] += 1
+                if verbose:
+                    log.info("%s UPLOADED", obj_name)
+
+        num_threads = min(self._sync_workers, upload_queue.qsize())
+        threads = [threading.Thread(target=upload_worker)
+                for ii in range(num_threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+
     def _delete_objects_not_in_list(self, cont, object_prefix=""):
         """
         Finds all the objects in the specified container that are not present
@@ -3162,10 +3419,15 @@ class StorageClient(BaseClient):
         self._thread = self.bulk_delete(cont, to_delete, async=True)
 
 
-    def bulk_delete(self, container, object_names, async=False):
+    def bulk_delete(self, container, object_names, async=False, workers=None):
         """
         Deletes multiple objects from a container in a single call.
 
+        'object_names' can be any iterable of names, including a generator that
+        lists them lazily. The names are sent in batches of up to
+        MAX_BULK_DELETE, and 'workers' batches are sent at once; if not
+        specified, the client's 'bulk_delete_workers' value is used.
+
         The bulk deletion call does not return until all of the specified
         objects have been processed. For large numbers of objects, this can
         take quite a while, so there is an 'async' parameter to give you the
@@ -3173,7 +3435,8 @@ class StorageClient(BaseClient):
         object is returned with a 'completed' attribute that will be set to
         True as soon as the bulk deletion is complete, and a 'results'
         attribute that will contain a dictionary (described below) with the
-        results of the bulk deletion.
+        results of the bulk deletion. Its wait() method blocks until the
+        deletion is complete, and then returns the results.
 
         When deletion is complete the bulk deletion object's 'results'
         attribute will be populated with the information returned from the API
@@ -3188,13 +3451,12 @@ class StorageClient(BaseClient):
         This isn't available in swiftclient yet, so it's using code patterned
         after the client code in that library.
         """
-        deleter = BulkDeleter(self, container, object_names)
+        deleter = BulkDeleter(self, container, object_names,
+                workers=workers or self.bulk_delete_workers)
         deleter.start()
         if async:
             return deleter
-        while not deleter.completed:
-            time.sleep(self.bulk_delete_interval)
-        return deleter.results
+        return deleter.wait()
 
 
     def cdn_request(self, uri, method, *args, **kwargs):
@@ -3222,7 +3484,23 @@ class StorageClient(BaseClient):
 
     @_valid_upload_key
     def _update_progress(self, upload_key, size):
-        self.folder_upload_status[upload_key]["uploaded"] += size
+        with self._folder_upload_lock:
+            status = self.folder_upload_status[upload_key]
+            status["uploaded"] += size
+            status["uploaded_files"] = status.get("uploaded_files", 0) + 1
+
+
+    @_valid_upload_key
+    def _folder_upload_error(self, upload_key, path, error):
+        with self._folder_upload_lock:
+            status = self.folder_upload_status[upload_key]
+            status.setdefault("errors", []).append((path, error))
+
+
+    @_valid_upload_key
+    def _folder_upload_done(self, upload_key):
+        with self._folder_upload_lock:
+            self.folder_upload_status[upload_key]["done"] = True
 
 
     @_valid_upload_key
@@ -3231,6 +3509,27 @@ class StorageClient(BaseClient):
         return self.folder_upload_status[upload_key]["uploaded"]
 
 
+    @_valid_upload_key
+    def get_upload_status(self, upload_key):
+        """
+        Returns a dict describing the progress of the specified folder upload,
+        with the following keys:
+
+            total_bytes - the size of the folder, or None if it has not been
+                    calculated yet
+            uploaded - the number of bytes uploaded
+            uploaded_files - the number of files uploaded
+            errors - a list of (path, exception) 2-tuples for any files that
+                    could not be uploaded
+            done - True once the upload has finished or been canceled
+        """
+        with self._folder_upload_lock:
+            status = dict(self.folder_upload_status[upload_key])
+            status["errors"] = list(status.get("errors", []))
+        status.pop("continue", None)
+        return status
+
+
     @_valid_upload_key
     def cancel_folder_upload(self, upload_key):
         """
@@ -3252,14 +3551,22 @@ class StorageClient(BaseClient):
 class FolderUploader(threading.Thread):
     """
     Threading class to allow for uploading multiple files in the background.
+
+    This thread scans the folder and passes the files it finds through a
+    bounded queue to 'workers' threads, which upload them concurrently. If a
+    'journal' path is given, each uploaded file is appended to it, and files
+    that are already recorded there with the same size and modification time
+    are skipped, so that an interrupted upload can be resumed.
     """
     def __init__(self, root_folder, container, ignore, upload_key, client,
-            ttl=None):
+            ttl=None, workers=None, journal=None):
         self.root_folder = root_folder.rstrip("/")
         self.ignore = utils.coerce_to_list(ignore)
         self.upload_key = upload_key
         self.ttl = ttl
         self.client = client
+        self.workers = workers or DEFAULT_FOLDER_UPLOAD_WORKERS
+        self.journal = journal
         if container:
             if isinstance(container, six.string_types):
                 self.container = self.client.create(container)
@@ -3268,6 +3575,10 @@ class FolderUploader(threading.Thread):
         else:
             self.container = self.client.create(
                     self.folder_name_from_path(root_folder))
+        self.file_queue = six.moves.queue.Queue(maxsize=self.workers * 2)
+        self.completed = {}
+        self._journal_lock = threading.Lock()
+        self._journal_needs_newline = False
         threading.Thread.__init__(self)
 
 
@@ -3277,8 +3588,49 @@ class FolderUploader(threading.Thread):
         return os.path.basename(pth.rstrip(os.sep))
 
 
+    def load_journal(self):
+        """
+        Reads the journal of a previous upload of this folder, and returns a
+        dict of the files it recorded for this container, mapping each object
+        name to its (size, mtime) at the time it was uploaded.
+        """
+        completed = {}
+        if not self.journal or not os.path.exists(self.journal):
+            return completed
+        cname = utils.get_name(self.container)
+        line = "\n"
+        with open(self.journal) as journal:
+            for line in journal:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Partial line written when the upload was interrupted.
+                    continue
+                if entry.get("container") == cname:
+                    completed[entry["name"]] = (entry["size"], entry["mtime"])
+        # Make sure new entries don't get appended to a partial line.
+        self._journal_needs_newline = not line.endswith("\n")
+        return completed
+
+
+    def _record_upload(self, obj_name, size, mtime):
+        if not self.journal:
+            return
+        entry = json.dumps({"container": utils.get_name(self.container),
+                "name": obj_name, "size": size, "mtime": mtime})
+        with self._journal_lock:
+            with open(self.journal, "a") as journal:
+                if self._journal_needs_newline:
+                    journal.write("\n")
+                    self._journal_needs_newline = False
+                journal.write("%s\n" % entry)
+
+
     def upload_files_in_folder(self, arg, dirname, fnames):
-        """Handles the iteration across files within a folder."""
+        """
+        Queues the files within a folder for uploading. Files recorded in the
+        journal as already uploaded are counted as uploaded and skipped.
+        """
         if utils.match_pattern(dirname, self.ignore):
             return False
         good_names = (nm for nm in fnames
@@ -3291,78 +3643,685 @@ class FolderUploader(threading.Thread):
                 # Skip folders; os.walk will include them in the next pass.
                 continue
             obj_name = os.path.relpath(full_path, self.root_folder)
-            obj_size = os.stat(full_path).st_size
-            self.client.upload_file(self.container, full_path,
-                    obj_name=obj_name, return_none=True, ttl=self.ttl)
-            self.client._update_progress(self.upload_key, obj_size)
+            stat = os.stat(full_path)
+            if self.completed.get(obj_name) == (stat.st_size, stat.st_mtime):
+                self.client._update_progress(self.upload_key, stat.st_size)
+                continue
+            self.file_queue.put((full_path, obj_name, stat.st_size,
+                    stat.st_mtime))
+
+
+    def _upload_worker(self):
+        """Uploads queued files until it receives None."""
+        while True:
+            item = self.file_queue.get()
+            if item is None:
+                return
+            if self.client._should_abort_folder_upload(self.upload_key):
+                # Keep draining the queue so that the scanner isn't blocked.
+                continue
+            full_path, obj_name, size, mtime = item
+            try:
+                self.client.upload_file(self.container, full_path,
+                        obj_name=obj_name, return_none=True, ttl=self.ttl)
+            except Exception as e:
+                logging.getLogger("pyrax").error("Failed to upload '%s': %s" %
+                        (full_path, e))
+                self.client._folder_upload_error(self.upload_key, full_path, e)
+                continue
+            self._record_upload(obj_name, size, mtime)
+            self.client._update_progress(self.upload_key, size)
 
 
     def run(self):
-        """Starts the uploading thread."""
+        """Starts the uploading threads, and scans the folder."""
         root_path, folder_name = os.path.split(self.root_folder)
         self.root_folder = os.path.join(root_path, folder_name)
-        os.path.walk(self.root_folder, self.upload_files_in_folder, None)
+        self.completed = self.load_journal()
+        threads = [threading.Thread(target=self._upload_worker)
+                for ii in range(self.workers)]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+        try:
+            for dirname, dirnames, fnames in os.walk(self.root_folder):
+                if self.client._should_abort_folder_upload(self.upload_key):
+                    break
+                if self.upload_files_in_folder(None, dirname,
+                        fnames) is False:
+                    dirnames[:] = []
+                    continue
+                # Don't descend into ignored folders.
+                dirnames[:] = [nm for nm in dirnames
+                        if not utils.match_pattern(nm, self.ignore)]
+        finally:
+            for thread in threads:
+                self.file_queue.put(None)
+            for thread in threads:
+                thread.join()
+            self.client._folder_upload_done(self.upload_key)
 
 
 
 class BulkDeleter(threading.Thread):
     """
     Threading class to allow for bulk deletion of objects from a container.
+
+    'object_names' may be any iterable. This thread reads it in batches of up
+    to MAX_BULK_DELETE names and passes them to 'workers' threads, so that
+    several bulk delete requests are in flight while the next batch is being
+    read. The results of all the requests are merged into 'results'.
     """
-    def __init__(self, client, container, object_names):
+    key_map = {
+        "Number Not Found": "not_found",
+        "Response Status": "status",
+        "Errors": "errors",
+        "Number Deleted": "deleted",
+        "Response Body": None,
+    }
+
+    def __init__(self, client, container, object_names, workers=None):
         self.client = client
         self.container = container
         self.object_names = object_names
-        self.completed = False
+        self.workers = workers or DEFAULT_BULK_DELETE_WORKERS
+        self.finished = threading.Event()
         self.results = {
             "deleted": 0,
             "not_found": 0,
             "status": "",
             "errors": []
         }
+        self._results_lock = threading.Lock()
         threading.Thread.__init__(self)
 
 
-    def run(self):
-        client = self.client
-        container = self.container
-        object_names = self.object_names
-        cname = utils.get_name(container)
-        ident = self.client.identity
-        headers = {
-            "X-Auth-Token": ident.token,
-            "Content-Type": "text/plain",
-        }
-        uri = "/?bulk-delete=1"
-        key_map = {
-            "Number Not Found": "not_found",
-            "Response Status": "status",
-            "Errors": "errors",
-            "Number Deleted": "deleted",
-            "Response Body": None,
-        }
-        batch = []
-        while object_names:
-            batch[:] = object_names[:MAX_BULK_DELETE]
-            del object_names[:MAX_BULK_DELETE]
+    @property
+    def completed(self):
+        """True once every batch has been processed."""
+        return self.finished.is_set()
 
-            obj_paths = ("%s/%s" % (cname, nm) for nm in batch)
-            body = "\n".join(obj_paths)
-            resp, resp_body = self.client.method_delete(uri, data=body,
-                    headers=headers)
+
+    def wait(self, timeout=None):
+        """
+        Blocks until the deletion is complete, or until 'timeout' seconds have
+        passed, and returns the results.
+        """
+        self.finished.wait(timeout)
+        return self.results
+
+
+    def _batches(self):
+        names = iter(self.object_names)
+        while True:
+            batch = list(itertools.islice(names, MAX_BULK_DELETE))
+            if not batch:
+                return
+            yield batch
+
+
+    def _merge_results(self, resp_body):
+        """Adds the results of one bulk delete request to the totals."""
+        results = self.results
+        with self._results_lock:
             for k, v in six.iteritems(resp_body):
-                if key_map[k] == "errors":
-                    status_code = int(resp_body.get("Response Status", "200")[:3])
+                key = self.key_map[k]
+                if key == "errors":
+                    status_code = int(resp_body.get("Response Status",
+                            "200")[:3])
                     if status_code != 200 and not v:
-                        self.results["errors"].extend([[
+                        results["errors"].extend([[
                             resp_body.get("Response Body"),
                             resp_body.get("Response Status")
                         ]])
                     else:
-                        self.results["errors"].extend(v)
-                elif key_map[k] in ("deleted", "not_found"):
-                    self.results[key_map[k]] += int(v)
-                elif key_map[k]:
-                    self.results[key_map[k]] = v
+                        results["errors"].extend(v)
+                elif key in ("deleted", "not_found"):
+                    results[key] += int(v)
+                elif key == "status":
+                    # Don't let a later success hide an earlier failure.
+                    if not results["status"][:1] in ("4", "5"):
+                        results["status"] = v
+                elif key:
+                    results[key] = v
+
+
+    def _delete_batch(self, batch):
+        cname = utils.get_name(self.container)
+        headers = {"Content-Type": "text/plain"}
+        uri = "/?bulk-delete=1"
+        body = "\n".join("%s/%s" % (cname, nm) for nm in batch)
+        try:
+            resp, resp_body = self.client.method_delete(uri, data=body,
+                    headers=headers)
+        except Exception as e:
+            with self._results_lock:
+                self.results["errors"].append(["%s" % e,
+                        "%s" % getattr(e, "code", "")])
+            return
+        self._merge_results(resp_body)
+
+
+    def _worker(self, batch_queue):
+        while True:
+            batch = batch_queue.get()
+            if batch is None:
+                return
+            self._delete_batch(batch)
+
+
+    def run(self):
+        batch_queue = six.moves.queue.Queue(maxsize=self.workers)
+        threads = [threading.Thread(target=self._worker, args=(batch_queue, ))
+                for ii in range(self.workers)]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+        try:
+            for batch in self._batches():
+                batch_queue.put(batch)
+        except Exception as e:
+            # Listing the object names failed.
+            with self._results_lock:
+                self.results["errors"].append(["%s" % e, ""])
+        finally:
+            for thread in threads:
+                batch_queue.put(None)
+            for thread in threads:
+                thread.join()
+            self.finished.set()
+
+
+
+class _SegmentReader(object):
+    """
+    File-like object that streams a byte range of the source content directly
+    to the upload request, calculating the MD5 checksum of the bytes as they
+    are sent.
+    """
+    def __init__(self, read_at, offset, length):
+        self._read_at = read_at
+        self.offset = offset
+        self.length = length
+        self.reset()
+
+
+    def reset(self):
+        """Rewinds the reader so that the segment can be sent again."""
+        self._pos = 0
+        self._md5 = hashlib.md5()
+
+
+    def __len__(self):
+        return self.length
+
+
+    def read(self, size=-1):
+        remaining = self.length - self._pos
+        if remaining <= 0:
+            return b""
+        if size is None or size < 0 or size > remaining:
+            size = remaining
+        data = self._read_at(self.offset + self._pos, size)
+        self._pos += len(data)
+        self._md5.update(data)
+        return data
+
+
+    @property
+    def etag(self):
+        """The MD5 checksum of the bytes read so far."""
+        return self._md5.hexdigest()
+
+
+
+class SegmentedUploader(object):
+    """
+    Uploads content that is larger than the segment size as a set of
+    segments, using several threads at once, and then writes the manifest.
+
+    Each worker reads its byte range straight from the source file, so no
+    temporary copies are made. The segment's checksum is calculated while it
+    is being sent, and compared with the ETag returned by the server; failed
+    segments are retried up to 'retries' times before UploadFailed is raised.
+    The manifest is only written once every segment has been stored.
+
+    Sources that can't seek, such as pipes and sockets, are read in order
+    instead: each segment is copied to a temporary file and uploaded before
+    the next one is read.
+    """
+    def __init__(self, manager, obj_name, content, size, segment_size=None,
+            workers=None, headers=None, retries=None, use_slo=False):
+        self.manager = manager
+        self.obj_name = obj_name
+        self.content = content
+        self.size = size
+        self.segment_size = segment_size or MAX_FILE_SIZE
+        self.workers = workers or DEFAULT_SEGMENT_WORKERS
+        self.headers = headers or {}
+        if retries is None:
+            retries = DEFAULT_SEGMENT_RETRIES
+        self.retries = retries
+        self.use_slo = use_slo
+        self.num_segments = int(math.ceil(float(size) / self.segment_size))
+        digits = int(math.log10(self.num_segments)) + 1
+        self.segment_names = ["%s.%s" % (obj_name, str(num + 1).zfill(digits))
+                for num in range(self.num_segments)]
+        self.segment_etags = [None] * self.num_segments
+        self._sequential = False
+        self._read_lock = threading.Lock()
+        self._abort = threading.Event()
+        self._errors = []
+        self._setup_source()
+
+
+    def _setup_source(self):
+        """
+        Determines how to read a byte range from the source content. Strings
+        are sliced; files are read with os.pread() where available so that
+        workers don't have to share the file position, and otherwise with a
+        locked seek() and read(). Sources that can't seek are read in order
+        by a single worker.
+        """
+        content = self.content
+        if isinstance(content, six.string_types + (six.binary_type, )):
+            if isinstance(content, six.text_type):
+                content = content.encode(pyrax.get_encoding())
+            self._start = 0
+            self._read_at = lambda pos, size: content[pos:pos + size]
+            return
+        try:
+            self._start = content.tell()
+            content.seek(self._start)
+        except (AttributeError, IOError, OSError, ValueError):
+            self._sequential = True
+            self._start = 0
+            self.workers = 1
+            self._read_at = None
+            return
+        fd = None
+        if hasattr(os, "pread"):
+            try:
+                fd = content.fileno()
+            except (AttributeError, IOError, OSError, ValueError):
+                fd = None
+        if fd is not None:
+            self._read_at = lambda pos, size: os.pread(fd, size, pos)
+        else:
+            self._read_at = self._locked_read
+
+
+    def _locked_read(self, pos, size):
+        with self._read_lock:
+            self.content.seek(pos)
+            return self.content.read(size)
+
+
+    def _segment_reader(self, num):
+        offset = num * self.segment_size
+        length = min(self.segment_size, self.size - offset)
+        return _SegmentReader(self._read_at, self._start + offset, length)
+
+
+    def _buffered_segment_reader(self, num, tmp):
+        """
+        Copies the next segment of a source that can't seek into the
+        temporary file 'tmp', and returns a reader for it, so that the segment
+        can be sent again if needed.
+        """
+        length = len(self._segment_reader(num))
+        remaining = length
+        while remaining:
+            data = self.content.read(min(remaining, DEFAULT_CHUNKSIZE))
+            if not data:
+                raise exc.UploadFailed("The content of '%s' ended before "
+                        "the expected %s bytes." % (self.obj_name, self.size))
+            if isinstance(data, six.text_type):
+                data = data.encode(pyrax.get_encoding())
+            tmp.write(data)
+            remaining -= len(data)
+
+        def read_at(pos, size):
+            tmp.seek(pos)
+            return tmp.read(size)
+
+        return _SegmentReader(read_at, 0, length)
+
 
-        self.completed = True
+    def _upload_segment(self, num):
+        """
+        Uploads a single segment, retrying it if the upload fails or the
+        server's ETag does not match the checksum of the bytes sent.
+        """
+        if self._sequential:
+            with tempfile.TemporaryFile() as tmp:
+                return self._send_segment(num,
+                        self._buffered_segment_reader(num, tmp))
+        return self._send_segment(num, self._segment_reader(num))
+
+
+    def _send_segment(self, num, reader):
+        attempt = 0
+        while True:
+            reader.reset()
+            headers = dict(self.headers)
+            try:
+                resp = self.manager._store_object(self.segment_names[num],
+                        content=reader, chunked=False, headers=headers,
+                        compute_etag=False)
+                server_etag = None
+                if resp is not None:
+                    server_etag = resp.headers.get("etag")
+                if (isinstance(server_etag, six.string_types) and
+                        server_etag.strip('"') != reader.etag):
+                    raise exc.UploadFailed("Checksum mismatch for segment "
+                            "'%s'." % self.segment_names[num])
+                self.segment_etags[num] = reader.etag
+                return
+            except Exception as e:
+                attempt += 1
+                if attempt > self.retries or self._abort.is_set():
+                    raise
+                logging.getLogger("pyrax").debug("Retrying segment '%s' "
+                        "after error: %s" % (self.segment_names[num], e))
+
+
+    def _worker(self, segment_queue):
+        while not self._abort.is_set():
+            try:
+                num = segment_queue.get_nowait()
+            except six.moves.queue.Empty:
+                return
+            try:
+                self._upload_segment(num)
+            except Exception as e:
+                self._errors.append(e)
+                self._abort.set()
+
+
+    def upload(self):
+        """
+        Uploads all the segments and then the manifest. Raises UploadFailed if
+        any segment cannot be uploaded.
+        """
+        segment_queue = six.moves.queue.Queue()
+        for num in range(self.num_segments):
+            segment_queue.put(num)
+        num_threads = min(self.workers, self.num_segments)
+        threads = [threading.Thread(target=self._worker,
+                args=(segment_queue, )) for ii in range(num_threads)]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if self._errors:
+            raise exc.UploadFailed("Upload of '%s' failed: %s" %
+                    (self.obj_name, self._errors[0]))
+        if not self._sequential and hasattr(self.content, "seek"):
+            self.content.seek(self._start + self.size)
+        self._upload_manifest()
+
+
+    def _upload_manifest(self):
+        headers = dict(self.headers)
+        headers.pop("ETag", "")
+        if self.use_slo:
+            cname = self.manager.name
+            manifest = [{"path": "/%s/%s" % (cname, seg_name),
+                    "etag": etag,
+                    "size_bytes": len(self._segment_reader(num)),
+                    } for num, (seg_name, etag) in enumerate(
+                        zip(self.segment_names, self.segment_etags))]
+            self.manager._store_object(
+                    "%s?multipart-manifest=put" % self.obj_name,
+                    content=json.dumps(manifest), headers=headers,
+                    compute_etag=False)
+        else:
+            headers["X-Object-Manifest"] = "%s/%s." % (self.manager.name,
+                    self.obj_name)
+            self.manager._store_object(self.obj_name, content=None,
+                    headers=headers)
+
+
+
+class ParallelDownloader(object):
+    """
+    Downloads an object as a series of byte ranges fetched by several threads
+    at once. Each range is written at its offset into a file preallocated to
+    the size of the object, so at most 'workers' * 'chunk_size' bytes are held
+    in memory.
+
+    The data is written to '<target>.part', and the ranges that have been
+    written are appended to '<target>.part.state', a line for each, once
+    their data has been flushed to disk. To keep the number of flushes down,
+    ranges are recorded in batches of 'workers'. If the download is
+    interrupted, running it again for the same target only fetches the
+    missing ranges, provided that the object's ETag and size are unchanged.
+    Once every range is written the file's MD5 checksum is compared with the
+    object's ETag, and the file is moved to 'target'.
+
+    Failed requests are retried by the client's retry policy; a range that
+    comes back with the wrong number of bytes is requested again up to
+    'retries' times.
+    """
+    def __init__(self, manager, obj, target, chunk_size=None, workers=None,
+            retries=None):
+        self.manager = manager
+        self.obj = obj
+        self.target = target
+        self.chunk_size = chunk_size or DEFAULT_DOWNLOAD_CHUNKSIZE
+        self.workers = workers or DEFAULT_DOWNLOAD_WORKERS
+        if retries is None:
+            retries = DEFAULT_SEGMENT_RETRIES
+        self.retries = retries
+        self.part_file = "%s.part" % target
+        self.state_file = "%s.part.state" % target
+        self.completed = set()
+        self._fd = None
+        self._state = None
+        self._pending = []
+        self._lock = threading.Lock()
+        self._state_lock = threading.Lock()
+        self._abort = threading.Event()
+        self._errors = []
+
+
+    def _load_state(self, etag, size):
+        """
+        Returns the set of chunk numbers already written by an earlier attempt
+        to download the same version of the object.
+        """
+        if not (os.path.exists(self.part_file) and
+                os.path.exists(self.state_file)):
+            return set()
+        try:
+            with open(self.state_file) as state_file:
+                lines = state_file.read().split("\n")
+            state = json.loads(lines[0])
+        except (IOError, ValueError):
+            return set()
+        if ((state.get("etag"), state.get("size"), state.get("chunk_size"))
+                != (etag, size, self.chunk_size)):
+            return set()
+        completed = set()
+        # The last item is whatever follows the final newline: nothing, or a
+        # partial line written when the download was interrupted.
+        for line in lines[1:-1]:
+            try:
+                completed.add(int(line))
+            except ValueError:
+                continue
+        return completed
+
+
+    def _save_state(self):
+        """
+        Replaces the state file with one that records the chunks in
+        'completed'.
+        """
+        state = {"etag": self.etag, "size": self.size,
+                "chunk_size": self.chunk_size}
+        tmp_state = "%s.tmp" % self.state_file
+        with open(tmp_state, "w") as state_file:
+            state_file.write("%s\n" % json.dumps(state))
+            for num in sorted(self.completed):
+                state_file.write("%s\n" % num)
+        if os.path.exists(self.state_file):
+            os.remove(self.state_file)
+        os.rename(tmp_state, self.state_file)
+
+
+    def _record_chunk(self, num):
+        """
+        Adds a chunk whose data has been written to the batch waiting to be
+        recorded, and records the batch once it is full.
+        """
+        with self._lock:
+            self.completed.add(num)
+            self._pending.append(num)
+            if len(self._pending) < self.workers:
+                return
+            pending, self._pending = self._pending, []
+        self._save_chunks(pending)
+
+
+    def _save_chunks(self, nums):
+        """
+        Flushes the data written so far to disk, and then appends the chunk
+        numbers to the state file, so that it never records a chunk whose
+        data could still be lost.
+        """
+        if not nums:
+            return
+        with self._state_lock:
+            os.fsync(self._fd)
+            self._state.write("".join(["%s\n" % num for num in nums]))
+            self._state.flush()
+
+
+    def _write_at(self, pos, data):
+        if hasattr(os, "pwrite"):
+            os.pwrite(self._fd, data, pos)
+            return
+        with self._lock:
+            os.lseek(self._fd, pos, os.SEEK_SET)
+            os.write(self._fd, data)
+
+
+    def _fetch_chunk(self, num):
+        """
+        Fetches a single byte range and writes it into the file. Failed
+        requests have already been retried by the client, so only a response
+        with the wrong number of bytes is retried here.
+        """
+        start = num * self.chunk_size
+        end = min(start + self.chunk_size, self.size) - 1
+        headers = {"Range": "bytes=%s-%s" % (start, end)}
+        attempt = 0
+        while True:
+            resp, resp_body = self.manager.api.method_get(self.uri,
+                    headers=headers, raw_content=True)
+            if len(resp_body) == end - start + 1:
+                break
+            msg = ("Expected %s bytes for range %s-%s of '%s'; received %s." %
+                    (end - start + 1, start, end, self.obj_name,
+                    len(resp_body)))
+            attempt += 1
+            if attempt > self.retries or self._abort.is_set():
+                raise exc.DownloadFailed(msg)
+            logging.getLogger("pyrax").debug("Retrying: %s" % msg)
+        self._write_at(start, resp_body)
+        self._record_chunk(num)
+
+
+    def _worker(self, chunk_queue):
+        while not self._abort.is_set():
+            try:
+                num = chunk_queue.get_nowait()
+            except six.moves.queue.Empty:
+                return
+            try:
+                self._fetch_chunk(num)
+            except Exception as e:
+                self._errors.append(e)
+                self._abort.set()
+
+
+    def _verify(self):
+        """
+        Compares the checksum of the downloaded file with the object's ETag.
+        The ETag of a segmented object is not the checksum of its content;
+        Swift returns those quoted, and they are not checked.
+        """
+        if not self.etag or self.etag.startswith('"'):
+            return
+        checksum = utils.get_checksum(self.part_file,
+                block_size=DEFAULT_CHUNKSIZE)
+        if checksum != self.etag:
+            self._cleanup()
+            raise exc.DownloadFailed("The checksum of the downloaded file "
+                    "'%s' does not match the ETag of the object." %
+                    self.obj_name)
+
+
+    def _cleanup(self):
+        for pth in (self.part_file, self.state_file):
+            if os.path.exists(pth):
+                os.remove(pth)
+
+
+    def download(self):
+        """
+        Downloads the object to the target file. Raises DownloadFailed if the
+        download could not be completed; in that case the partial file is kept
+        so that it can be resumed.
+        """
+        if not isinstance(self.obj, StorageObject):
+            self.obj = self.manager.get(self.obj)
+        self.obj_name = self.obj.name
+        self.uri = "/%s/%s" % (self.manager.uri_base, self.obj_name)
+        self.size = self.obj.total_bytes or 0
+        self.etag = self.obj.etag
+        self.completed = self._load_state(self.etag, self.size)
+        num_chunks = int(math.ceil(float(self.size) / self.chunk_size))
+        chunk_queue = six.moves.queue.Queue()
+        for num in range(num_chunks):
+            if num not in self.completed:
+                chunk_queue.put(num)
+        self._fd = os.open(self.part_file, os.O_RDWR | os.O_CREAT |
+                getattr(os, "O_BINARY", 0), 0o644)
+        try:
+            os.ftruncate(self._fd, self.size)
+            # Start a clean state file, without any partial line left by an
+            # interrupted download.
+            self._save_state()
+            self._state = open(self.state_file, "a")
+            num_threads = min(self.workers, chunk_queue.qsize())
+            threads = [threading.Thread(target=self._worker,
+                    args=(chunk_queue, )) for ii in range(num_threads)]
+            for thread in threads:
+                thread.daemon = True
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            try:
+                if self._state is not None:
+                    # Record the last batch, even if the download failed.
+                    self._save_chunks(self._pending)
+                    self._pending = []
+                    self._state.close()
+                    self._state = None
+            finally:
+                os.close(self._fd)
+                self._fd = None
+        if self._errors:
+            raise exc.DownloadFailed("Download of '%s' failed: %s" %
+                    (self.obj_name, self._errors[0]))
+        self._verify()
+        if os.path.exists(self.target):
+            os.remove(self.target)
+        os.rename(self.part_file, self.target)
+        if os.path.exists(self.state_file):
+            os.remove(self.state_file)
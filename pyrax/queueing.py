@@ -18,9 +18,18 @@
 
 from functools import wraps
 import json
+import logging
 import os
 import re
+import threading
+import time
 
+try:
+    import asyncio
+except ImportError:
+    asyncio = None
+
+import six
 from six.moves import urllib
 
 import pyrax
@@ -34,6 +43,28 @@ import pyrax.utils as utils
 MSG_LIMIT = 10
 # Pattern for extracting the marker value from an href link.
 marker_pat = re.compile(r".+\bmarker=(\d+).*")
+# The most message IDs that can be passed to a single delete_by_ids() call.
+MAX_IDS = 20
+# The most messages that can be posted in a single request.
+MAX_POST_MESSAGES = 10
+# Batches of messages that post_messages() and QueueMessageBuffer send at once.
+DEFAULT_POST_WORKERS = 4
+# Seconds a message put in a QueueMessageBuffer may wait to be posted.
+DEFAULT_BUFFER_DELAY = 0.05
+# Defaults for QueueWatcher: the wait after the first empty claim, the factor
+# it grows by after each further empty claim, and the longest wait.
+DEFAULT_WATCH_MIN_INTERVAL = 0.1
+DEFAULT_WATCH_BACKOFF = 2
+DEFAULT_WATCH_MAX_INTERVAL = 20
+# Defaults for QueueConsumer.
+DEFAULT_CONSUMER_CLAIMS = 4
+DEFAULT_CONSUMER_WORKERS = 8
+DEFAULT_CLAIM_TTL = 300
+DEFAULT_CLAIM_GRACE = 60
+# Seconds a consumer waits before claiming again after finding no messages.
+DEFAULT_CONSUMER_IDLE_DELAY = 1
+# Seconds processed messages may wait to be deleted in a batch.
+DEFAULT_ACK_INTERVAL = 0.1
 
 
 def _parse_marker(body):
@@ -134,6 +165,21 @@ class Queue(BaseResource):
                 echo=echo, marker=marker, limit=limit)
 
 
+    def message_iterator(self, include_claimed=False, echo=False, marker=None,
+            limit=None, prefetch=True):
+        """
+        Returns a generator that yields the messages in this queue one at a
+        time, requesting each page of results only when it is needed. The
+        parameters are the same as for list(); if 'prefetch' is True, the next
+        page is requested in the background once the second message of the
+        current one is taken, so stopping partway through a page may leave
+        one request unused.
+        """
+        return self._message_manager.message_iterator(
+                include_claimed=include_claimed, echo=echo, marker=marker,
+                limit=limit, prefetch=prefetch)
+
+
     def list_by_ids(self, ids):
         """
         If you wish to retrieve a list of messages from this queue and know the
@@ -170,6 +216,39 @@ class Queue(BaseResource):
         return self._message_manager.create(body, ttl)
 
 
+    def post_messages(self, messages, workers=None):
+        """
+        Posts several messages to this queue. 'messages' is an iterable of
+        (body, ttl) pairs. They are posted in batches of up to
+        MAX_POST_MESSAGES, with up to 'workers' batches in flight at once, and
+        the IDs of the new messages are returned in the same order.
+        """
+        return self._message_manager.post_messages(messages, workers=workers)
+
+
+    def buffer_messages(self, **kwargs):
+        """
+        Starts a QueueMessageBuffer that posts the messages put in it to this
+        queue in batches, and returns it. The keyword arguments are passed to
+        QueueMessageBuffer.
+        """
+        buf = QueueMessageBuffer(self, **kwargs)
+        buf.start()
+        return buf
+
+
+    def subscribe(self, callback=None, **kwargs):
+        """
+        Subscribes to the claims made on this queue by the QueueWatcher that
+        its client shares among all of the queue's subscribers, and returns a
+        QueueSubscription. If 'callback' is given, it is called in a thread of
+        its own with each claim; otherwise, iterate over the subscription or
+        call its get() method. The keyword arguments are passed to the
+        QueueWatcher if one has to be started.
+        """
+        return self.manager.api.subscribe(self, callback=callback, **kwargs)
+
+
     def claim_messages(self, ttl, grace, count=None):
         """
         Claims up to `count` unclaimed messages from this queue. If count is
@@ -216,6 +295,17 @@ class Queue(BaseResource):
         return self._claim_manager.delete(claim)
 
 
+    def consume(self, handler, **kwargs):
+        """
+        Starts a QueueConsumer that passes the messages in this queue to
+        'handler', and returns it. The keyword arguments are passed to
+        QueueConsumer.
+        """
+        consumer = QueueConsumer(self, handler, **kwargs)
+        consumer.start()
+        return consumer
+
+
     @property
     def id(self):
         return self.name
@@ -302,24 +392,99 @@ class QueueMessageManager(BaseQueueManager):
         return body
 
 
+    def _post_batch(self, batch):
+        """
+        Posts a list of up to MAX_POST_MESSAGES (body, ttl) pairs in a single
+        request, and returns the IDs of the new messages in the same order.
+        """
+        body = [{"body": msg, "ttl": ttl} for msg, ttl in batch]
+        self.run_hooks("modify_body_for_create", body)
+        resp, resp_body = self.api.method_post("/%s" % self.uri_base,
+                body=body)
+        resp_body = resp_body or {}
+        hrefs = resp_body.get("resources", [])
+        if resp_body.get("partial") or len(hrefs) != len(batch):
+            raise exc.MessagePostFailed("Only %s of the %s messages were "
+                    "posted." % (len(hrefs), len(batch)))
+        return [href.rsplit("/", 1)[-1] for href in hrefs]
+
+
+    def post_messages(self, messages, workers=None):
+        """
+        Posts the (body, ttl) pairs in 'messages' in batches of up to
+        MAX_POST_MESSAGES, sending up to 'workers' batches at once over the
+        client's pooled connections, and returns the IDs of the new messages
+        in the same order as 'messages'. If any batch fails, no more batches
+        are started, and the first error is raised once the batches in flight
+        have finished.
+        """
+        messages = list(messages)
+        batches = [messages[pos:pos + MAX_POST_MESSAGES]
+                for pos in range(0, len(messages), MAX_POST_MESSAGES)]
+        workers = min(workers or DEFAULT_POST_WORKERS, len(batches))
+        if workers <= 1:
+            return [msg_id for batch in batches
+                    for msg_id in self._post_batch(batch)]
+        results = [None] * len(batches)
+        errors = []
+        batch_queue = six.moves.queue.Queue()
+        for item in enumerate(batches):
+            batch_queue.put(item)
+
+        def post():
+            while not errors:
+                try:
+                    num, batch = batch_queue.get_nowait()
+                except six.moves.queue.Empty:
+                    return
+                try:
+                    results[num] = self._post_batch(batch)
+                except Exception as e:
+                    errors.append(e)
+
+        threads = [threading.Thread(target=post) for ii in range(workers)]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if errors:
+            raise errors[0]
+        return [msg_id for ids in results for msg_id in ids]
+
+
     def list(self, include_claimed=False, echo=False, marker=None, limit=None):
         """
         Need to form the URI differently, so we can't use the default list().
         """
+        return list(self._iterate_list(include_claimed=include_claimed,
+                echo=echo, marker=marker, limit=limit))
+
+
+    def message_iterator(self, include_claimed=False, echo=False, marker=None,
+            limit=None, prefetch=True):
+        """
+        Returns a generator that yields the messages in this queue one at a
+        time, without building a list of all of them. The parameters are the
+        same as for list(). If 'prefetch' is True, the next page of messages is
+        requested in the background once the second message of the current
+        page is taken, so stopping partway through a page may leave one
+        request unused.
+        """
         return self._iterate_list(include_claimed=include_claimed, echo=echo,
-                marker=marker, limit=limit)
+                marker=marker, limit=limit, prefetch=prefetch)
 
 
-    def _iterate_list(self, include_claimed, echo, marker, limit):
+    def _list_page(self, include_claimed, echo, marker, limit):
         """
-        Recursive method to work around the hard limit of 10 items per call.
+        Makes a single listing request for up to MSG_LIMIT messages, and
+        returns a list of those messages along with the marker for the next
+        page, which is None if there are no more.
         """
-        ret = []
         if limit is None:
             this_limit = MSG_LIMIT
         else:
             this_limit = min(MSG_LIMIT, limit)
-            limit = limit - this_limit
         uri = "/%s?include_claimed=%s&echo=%s" % (self.uri_base,
                 json.dumps(include_claimed), json.dumps(echo))
         qs_parts = []
@@ -331,16 +496,62 @@ class QueueMessageManager(BaseQueueManager):
             uri = "%s&%s" % (uri, "&".join(qs_parts))
         resp, resp_body = self._list(uri, return_raw=True)
         if not resp_body:
-            return ret
+            return [], None
         messages = resp_body.get(self.plural_response_key, [])
-        ret = [QueueMessage(manager=self, info=item) for item in messages]
-        marker = _parse_marker(resp_body)
-
-        loop = 0
-        if ((limit is None) or limit > 0) and marker:
-            loop += 1
-            ret.extend(self._iterate_list(include_claimed, echo, marker, limit))
-        return ret
+        return ([QueueMessage(manager=self, info=item) for item in messages],
+                _parse_marker(resp_body))
+
+
+    def _iterate_list(self, include_claimed, echo, marker, limit,
+            prefetch=True):
+        """
+        Generator that works around the hard limit of 10 items per call by
+        following the 'next' link of each page until 'limit' messages have been
+        returned or there are no more. Without 'prefetch', each page is only
+        requested once the previous one has been used up. With it, the next
+        page is requested in the background as soon as the caller asks for
+        the second message of the current one, so a caller that stops partway
+        through a page may leave one request whose results go unused.
+        """
+        pending = None
+        page, marker = self._list_page(include_claimed, echo, marker, limit)
+        while page:
+            if limit is not None:
+                limit -= len(page)
+            more = marker and (limit is None or limit > 0)
+            for msg in page:
+                yield msg
+                if more and prefetch and pending is None:
+                    pending = self._start_prefetch(include_claimed, echo,
+                            marker, limit)
+            if not more:
+                return
+            if pending is None:
+                page, marker = self._list_page(include_claimed, echo, marker,
+                        limit)
+                continue
+            pending["thread"].join()
+            if "error" in pending:
+                raise pending["error"]
+            page, marker = pending["results"]
+            pending = None
+
+
+    def _start_prefetch(self, *args):
+        """Starts requesting a page of messages in a background thread."""
+        pending = {}
+
+        def fetch():
+            try:
+                pending["results"] = self._list_page(*args)
+            except Exception as e:
+                pending["error"] = e
+
+        thread = threading.Thread(target=fetch)
+        thread.daemon = True
+        pending["thread"] = thread
+        thread.start()
+        return pending
 
 
     def delete(self, msg, claim_id=None):
@@ -421,10 +632,16 @@ class QueueClaimManager(BaseQueueManager):
         if resp.status_code == 204:
             # Nothing available to claim
             return None
-        # Get the claim ID from the first message in the list.
+        # Get the claim ID from the first message in the list. The response
+        # holds everything else a claim needs, so it isn't fetched again.
         href = resp_body[0]["href"]
         claim_id = href.split("claim_id=")[-1]
-        return self.get(claim_id)
+        info = {"href": "/%s/%s" % (self.uri_base, claim_id),
+                "ttl": ttl,
+                "age": 0,
+                "messages": resp_body,
+                }
+        return QueueClaim(self, info, loaded=True)
 
 
     def update(self, claim, ttl=None, grace=None):
@@ -516,6 +733,762 @@ class QueueManager(BaseQueueManager):
 
 
 
+class _ClaimState(object):
+    """Tracks the messages of a claim that a QueueConsumer is processing."""
+    def __init__(self, claim, ttl):
+        self.claim = claim
+        self.pending = len(claim.messages)
+        self.expires = time.time() + ttl
+        self.done = threading.Event()
+        if not self.pending:
+            self.done.set()
+
+
+
+class QueueConsumer(object):
+    """
+    Processes the messages in a queue at a high rate.
+
+    Up to 'claims' claims of 'count' messages each are kept in flight at once;
+    as soon as all the messages of one claim have been handled, another claim
+    is made. Each message is passed to 'handler', and the messages it handles
+    without raising an exception are deleted in batches of up to MAX_IDS,
+    at least every 'ack_interval' seconds. A message whose handler raises is
+    left alone, so that it is claimed again after the claim expires.
+
+    Messages are handled by 'workers' threads. If 'loop' is an asyncio event
+    loop, 'handler' must instead be a coroutine function, and each message is
+    handled by a coroutine scheduled on that loop.
+
+    Claims are made with the given 'ttl' and 'grace'. A claim whose messages
+    are still being handled when less than 'renew_margin' seconds of its TTL
+    are left is renewed for another 'ttl' seconds, so handlers can take longer
+    than the TTL; the default margin is a third of the TTL.
+
+    After a claim finds no messages, that claimer waits 'idle_delay' seconds
+    before trying again, or stops if 'exit_when_empty' is True; once all the
+    claimers have stopped, the consumer stops as well.
+    """
+    def __init__(self, queue, handler, ttl=DEFAULT_CLAIM_TTL,
+            grace=DEFAULT_CLAIM_GRACE, count=MSG_LIMIT,
+            claims=DEFAULT_CONSUMER_CLAIMS, workers=DEFAULT_CONSUMER_WORKERS,
+            loop=None, ack_interval=DEFAULT_ACK_INTERVAL, renew_margin=None,
+            idle_delay=DEFAULT_CONSUMER_IDLE_DELAY, exit_when_empty=False):
+        if loop is not None and asyncio is None:
+            raise exc.AsyncioNotAvailable("The asyncio module is not "
+                    "available. It requires Python 3.4 or later.")
+        self.queue = queue
+        self.handler = handler
+        self.ttl = ttl
+        self.grace = grace
+        self.count = count
+        self.claims = claims
+        self.workers = workers
+        self.loop = loop
+        self.ack_interval = ack_interval
+        if renew_margin is None:
+            renew_margin = ttl / 3.0
+        self.renew_margin = renew_margin
+        self.idle_delay = idle_delay
+        self.exit_when_empty = exit_when_empty
+        self._stopping = threading.Event()
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+        self._work = six.moves.queue.Queue()
+        self._acks = []
+        self._active_claims = set()
+        self._threads = []
+        self._claimers = []
+        self._started = None
+        self._stats = {"claims": 0, "empty_claims": 0, "claimed": 0,
+                "processed": 0, "failed": 0, "ack_requests": 0,
+                "renewals": 0, "errors": 0}
+
+
+    def start(self):
+        """Starts claiming and handling messages."""
+        if self._started is not None:
+            return
+        self._started = time.time()
+        self._claimers = [threading.Thread(target=self._claimer)
+                for ii in range(self.claims)]
+        threads = list(self._claimers)
+        if self.loop is None:
+            threads.extend(threading.Thread(target=self._worker)
+                    for ii in range(self.workers))
+        self._threads = threads
+        self._housekeeper = threading.Thread(target=self._housekeeping)
+        for thread in threads + [self._housekeeper]:
+            thread.daemon = True
+            thread.start()
+
+
+    def stop(self, wait=True):
+        """
+        Stops making new claims. The messages that have already been claimed
+        are still handled and deleted; if 'wait' is True, this waits for that
+        to finish.
+        """
+        self._stopping.set()
+        if wait:
+            self.join()
+
+
+    def join(self, timeout=None):
+        """
+        Waits for the consumer to stop, which it does after stop() is called
+        or, with 'exit_when_empty', once the queue is empty. Returns True if it
+        has stopped, or False if 'timeout' seconds passed first.
+        """
+        if timeout is None:
+            # Waiting without a timeout can't be interrupted in Python 2.
+            while not self._stopped.wait(3600):
+                pass
+            return True
+        return self._stopped.wait(timeout)
+
+
+    def __enter__(self):
+        self.start()
+        return self
+
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+    def stats(self):
+        """
+        Returns a dict of counts of the claims made, claims that found no
+        messages, messages claimed, processed (handled and deleted) and
+        failed, delete requests, claim renewals and failed API calls, along
+        with the number of messages 'in_flight' and the rate of processed
+        messages per second.
+        """
+        with self._lock:
+            ret = dict(self._stats)
+            ret["in_flight"] = sum(state.pending
+                    for state in self._active_claims)
+        elapsed = time.time() - (self._started or time.time())
+        ret["rate"] = ret["processed"] / elapsed if elapsed else 0.0
+        return ret
+
+
+    def _count(self, key, num=1):
+        with self._lock:
+            self._stats[key] += num
+
+
+    def _claimer(self):
+        claim_manager = self.queue._claim_manager
+        while not self._stopping.is_set():
+            try:
+                claim = claim_manager.claim(self.ttl, self.grace,
+                        count=self.count)
+            except Exception as e:
+                logging.getLogger("pyrax").debug("Claim failed: %s" % e)
+                self._count("errors")
+                self._stopping.wait(self.idle_delay)
+                continue
+            if claim is None or not claim.messages:
+                self._count("empty_claims")
+                if self.exit_when_empty:
+                    break
+                self._stopping.wait(self.idle_delay)
+                continue
+            state = _ClaimState(claim, self.ttl)
+            with self._lock:
+                self._stats["claims"] += 1
+                self._stats["claimed"] += state.pending
+                self._active_claims.add(state)
+            for msg in claim.messages:
+                self._dispatch(msg, state)
+            while not state.done.wait(3600):
+                pass
+        with self._lock:
+            self._claimers.remove(threading.current_thread())
+            if self._claimers:
+                return
+        self._finish()
+
+
+    def _dispatch(self, msg, state):
+        if self.loop is None:
+            self._work.put((msg, state))
+            return
+        future = asyncio.run_coroutine_threadsafe(self.handler(msg),
+                self.loop)
+        future.add_done_callback(lambda fut: self._future_done(msg, state,
+                fut))
+
+
+    def _future_done(self, msg, state, future):
+        """
+        Records the outcome of a handler run on the event loop. A handler
+        that was cancelled, such as by the loop shutting down, counts as a
+        failure.
+        """
+        if future.cancelled():
+            error = asyncio.CancelledError("The handler was cancelled.")
+        else:
+            error = future.exception()
+        self._handled(msg, state, error)
+
+
+    def _worker(self):
+        while True:
+            item = self._work.get()
+            if item is None:
+                return
+            msg, state = item
+            try:
+                self.handler(msg)
+            except Exception as e:
+                self._handled(msg, state, e)
+            else:
+                self._handled(msg, state, None)
+
+
+    def _handled(self, msg, state, error):
+        """
+        Records the outcome of handling a message. Successful messages are
+        queued for deletion, and a full batch is deleted at once.
+        """
+        batch = None
+        with self._lock:
+            if error is None:
+                self._acks.append(msg.id)
+                if len(self._acks) >= MAX_IDS:
+                    batch, self._acks = self._acks, []
+            else:
+                self._stats["failed"] += 1
+            state.pending -= 1
+            if not state.pending:
+                self._active_claims.discard(state)
+        if error is not None:
+            logging.getLogger("pyrax").debug("Handler failed for message "
+                    "'%s': %s" % (msg.id, error))
+        if batch:
+            self._ack(batch)
+        if not state.pending:
+            state.done.set()
+
+
+    def _ack(self, ids):
+        try:
+            self.queue.delete_by_ids(ids)
+        except Exception as e:
+            logging.getLogger("pyrax").debug("Deleting processed messages "
+                    "failed: %s" % e)
+            self._count("errors")
+            return
+        with self._lock:
+            self._stats["ack_requests"] += 1
+            self._stats["processed"] += len(ids)
+
+
+    def _flush_acks(self):
+        with self._lock:
+            batch, self._acks = self._acks, []
+        for pos in range(0, len(batch), MAX_IDS):
+            self._ack(batch[pos:pos + MAX_IDS])
+
+
+    def _renew_claims(self):
+        """Extends the claims that are about to expire."""
+        now = time.time()
+        with self._lock:
+            expiring = [state for state in self._active_claims
+                    if state.expires - now < self.renew_margin]
+        for state in expiring:
+            try:
+                self.queue._claim_manager.update(state.claim, ttl=self.ttl,
+                        grace=self.grace)
+            except Exception as e:
+                logging.getLogger("pyrax").debug("Renewing claim '%s' "
+                        "failed: %s" % (state.claim.id, e))
+                self._count("errors")
+                # Don't try again; the messages will be claimed again.
+                state.expires = float("inf")
+                continue
+            state.expires = now + self.ttl
+            self._count("renewals")
+
+
+    def _housekeeping(self):
+        while not self._stopped.wait(self.ack_interval):
+            self._flush_acks()
+            self._renew_claims()
+
+
+    def _finish(self):
+        """Called by the last claimer to exit, once its claim is done."""
+        for ii in range(len(self._threads)):
+            self._work.put(None)
+        self._flush_acks()
+        self._stopping.set()
+        self._stopped.set()
+
+
+
+class QueueMessageBuffer(object):
+    """
+    Collects messages and posts them to a queue in batches in the background.
+
+    Messages added with put() are posted as soon as 'batch_size' of them are
+    waiting, or once the oldest of them has waited 'max_delay' seconds. Up to
+    'workers' batches are posted at once; when that many are in flight, put()
+    blocks until one of them finishes.
+
+    The posting threads are started by start(), or else by the first put()
+    or flush(). flush() posts the messages that are waiting, and blocks until
+    everything put so far has been posted. close() flushes the buffer and
+    stops its threads. The 'ids' attribute lists the IDs of the posted
+    messages in the order they were put, with None for the messages of any
+    batch that could not be posted; the errors for those batches are kept in
+    'errors'.
+    """
+    def __init__(self, queue, batch_size=MAX_POST_MESSAGES,
+            max_delay=DEFAULT_BUFFER_DELAY, workers=DEFAULT_POST_WORKERS):
+        self.queue = queue
+        self.batch_size = max(1, min(batch_size, MAX_POST_MESSAGES))
+        self.max_delay = max_delay
+        self.workers = workers
+        self.errors = []
+        self._pending = []
+        self._oldest = None
+        self._results = []
+        self._outstanding = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._batches = six.moves.queue.Queue(maxsize=workers)
+        self._threads = []
+
+
+    def start(self):
+        """Starts the threads that post the buffered messages."""
+        with self._cond:
+            if self._threads or self._closed:
+                return
+            self._threads = [threading.Thread(target=self._worker)
+                    for ii in range(self.workers)]
+            self._threads.append(threading.Thread(target=self._timer))
+            for thread in self._threads:
+                thread.daemon = True
+                thread.start()
+
+
+    def put(self, body, ttl):
+        """
+        Adds a message to the buffer. The value of ttl must be between 60 and
+        1209600 seconds (14 days).
+        """
+        self.start()
+        with self._cond:
+            if self._closed:
+                raise ValueError("The message buffer has been closed.")
+            self._pending.append((body, ttl))
+            if self._oldest is None:
+                self._oldest = time.time()
+                self._cond.notify_all()
+            if len(self._pending) < self.batch_size:
+                return
+            item = self._take_batch()
+        self._batches.put(item)
+
+
+    def flush(self):
+        """
+        Posts the messages that are waiting, blocks until every message put so
+        far has been posted, and returns the 'ids' list.
+        """
+        self.start()
+        item = None
+        with self._cond:
+            if self._pending:
+                item = self._take_batch()
+        if item:
+            self._batches.put(item)
+        with self._cond:
+            while self._outstanding:
+                self._cond.wait(3600)
+        return self.ids
+
+
+    def close(self):
+        """Flushes the buffer, and stops its threads."""
+        self.flush()
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        for ii in range(self.workers):
+            self._batches.put(None)
+        for thread in self._threads:
+            thread.join()
+
+
+    def __enter__(self):
+        self.start()
+        return self
+
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+    @property
+    def ids(self):
+        """The IDs of the posted messages, in the order they were put."""
+        with self._cond:
+            return [msg_id for ids in self._results for msg_id in ids]
+
+
+    def _take_batch(self):
+        """Called with the lock held to hand the waiting messages off."""
+        batch, self._pending = self._pending, []
+        self._oldest = None
+        num = len(self._results)
+        self._results.append([None] * len(batch))
+        self._outstanding += 1
+        return num, batch
+
+
+    def _timer(self):
+        while True:
+            with self._cond:
+                while not self._closed:
+                    if self._oldest is None:
+                        self._cond.wait(3600)
+                        continue
+                    wait = self._oldest + self.max_delay - time.time()
+                    if wait <= 0:
+                        break
+                    self._cond.wait(wait)
+                if self._closed:
+                    return
+                item = self._take_batch()
+            self._batches.put(item)
+
+
+    def _worker(self):
+        manager = self.queue._message_manager
+        while True:
+            item = self._batches.get()
+            if item is None:
+                return
+            num, batch = item
+            error = None
+            try:
+                ids = manager._post_batch(batch)
+            except Exception as e:
+                logging.getLogger("pyrax").debug("Posting %s buffered "
+                        "messages failed: %s" % (len(batch), e))
+                error = e
+            with self._cond:
+                if error is None:
+                    self._results[num] = ids
+                else:
+                    self.errors.append(error)
+                self._outstanding -= 1
+                self._cond.notify_all()
+
+
+
+class QueueSubscription(object):
+    """
+    A subscriber to the claims made by a QueueWatcher. Each claim is handed to
+    just one subscriber, which is responsible for deleting its messages or
+    releasing it, as with claim_messages().
+
+    get() waits for the next claim; iterating over the subscription yields
+    claims until it is closed. If a 'callback' was given, a thread calls it
+    with each claim instead.
+    """
+    def __init__(self, watcher, callback=None):
+        self.watcher = watcher
+        self.callback = callback
+        self.closed = False
+        self._thread = None
+
+
+    def get(self, timeout=None):
+        """
+        Returns the next claim, waiting up to 'timeout' seconds for one if
+        given. Returns None if there is none by then, or once the
+        subscription has been closed.
+        """
+        return self.watcher._get(self, timeout)
+
+
+    def close(self):
+        """Stops receiving claims."""
+        self.watcher._unsubscribe(self)
+        if (self._thread is not None and
+                self._thread is not threading.current_thread()):
+            self._thread.join()
+
+
+    def __iter__(self):
+        while True:
+            claim = self.get()
+            if claim is None:
+                return
+            yield claim
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+    def _start(self):
+        """Starts the thread that passes each claim to the callback."""
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+
+    def _run(self):
+        for claim in self:
+            try:
+                self.callback(claim)
+            except Exception as e:
+                logging.getLogger("pyrax").debug("Subscriber failed to "
+                        "handle claim '%s': %s" % (claim.id, e))
+
+
+
+class QueueWatcher(object):
+    """
+    Polls a queue for messages on behalf of any number of local subscribers,
+    so that they share a single stream of claim requests.
+
+    A claim of up to 'count' messages, with the given 'ttl' and 'grace', is
+    only requested while a subscriber is waiting for one. While the queue is
+    busy the next claim is requested as soon as it is wanted. Each claim that
+    finds no messages makes the watcher wait longer before the next: first
+    'min_interval' seconds, then 'backoff' times longer each time, up to
+    'max_interval' seconds. As soon as a claim returns messages, it goes back
+    to claiming without a pause. Calling wake() cuts a wait short, such as
+    after posting to the queue from this process.
+
+    A claim that arrives after its subscriber has stopped waiting is kept for
+    the next one. If none takes it within half its 'ttl', it is released
+    instead, so subscribers are not handed claims that are about to expire.
+    The watcher stops once its last subscriber closes; any claims that were
+    made but not handed to a subscriber are then released.
+    """
+    def __init__(self, queue, ttl=DEFAULT_CLAIM_TTL, grace=DEFAULT_CLAIM_GRACE,
+            count=MSG_LIMIT, min_interval=DEFAULT_WATCH_MIN_INTERVAL,
+            backoff=DEFAULT_WATCH_BACKOFF,
+            max_interval=DEFAULT_WATCH_MAX_INTERVAL):
+        self.queue = queue
+        self.ttl = ttl
+        self.grace = grace
+        self.count = count
+        self.min_interval = min_interval
+        self.backoff = backoff
+        self.max_interval = max_interval
+        self.interval = 0
+        self.stopped = False
+        self._cond = threading.Condition()
+        self._wake = threading.Event()
+        # (time claimed, claim) for the claims not yet handed out.
+        self._claims = []
+        # Claims to release, as they waited too long for a subscriber.
+        self._stale = []
+        self._subscribers = set()
+        self._waiting = 0
+        self._thread = None
+        self._stats = {"polls": 0, "empty_polls": 0, "claims": 0,
+                "messages": 0, "errors": 0, "stale_claims": 0,
+                "claim_time": 0.0,
+                "wait_time": 0.0}
+
+
+    def start(self):
+        """Starts polling."""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._poll)
+        self._thread.daemon = True
+        self._thread.start()
+
+
+    def subscribe(self, callback=None):
+        """Adds a subscriber, and returns its QueueSubscription."""
+        with self._cond:
+            if self.stopped:
+                raise ValueError("The queue watcher has been stopped.")
+            sub = QueueSubscription(self, callback=callback)
+            self._subscribers.add(sub)
+        if callback is not None:
+            sub._start()
+        return sub
+
+
+    def wake(self):
+        """Claims again right away, ending any wait from an idle queue."""
+        with self._cond:
+            self.interval = 0
+        self._wake.set()
+
+
+    def stop(self):
+        """
+        Stops polling, closes every subscription and releases any claims that
+        were not handed to a subscriber.
+        """
+        with self._cond:
+            if self.stopped:
+                return
+            self.stopped = True
+            for sub in self._subscribers:
+                sub.closed = True
+            self._subscribers.clear()
+            claims = [claim for claimed, claim in self._claims] + self._stale
+            self._claims = []
+            self._stale = []
+            self._cond.notify_all()
+        self._wake.set()
+        for claim in claims:
+            self._release(claim)
+        if (self._thread is not None and
+                self._thread is not threading.current_thread()):
+            self._thread.join()
+
+
+    def stats(self):
+        """
+        Returns a dict with the number of claim requests ('polls'), those that
+        found no messages, the claims and messages handed out and failed
+        requests, the claims released unused as stale ('stale_claims'), along
+        with the 'empty_poll_ratio', the mean seconds a claim request took
+        ('claim_latency') and the mean seconds subscribers waited for a claim
+        ('wait_latency'), the current 'interval' between polls and the number
+        of 'subscribers'.
+        """
+        with self._cond:
+            ret = dict(self._stats)
+            ret["interval"] = self.interval
+            ret["subscribers"] = len(self._subscribers)
+        polls = ret["polls"]
+        ret["empty_poll_ratio"] = ret["empty_polls"] / float(polls or 1)
+        ret["claim_latency"] = ret.pop("claim_time") / (polls or 1)
+        ret["wait_latency"] = ret.pop("wait_time") / (ret["claims"] or 1)
+        return ret
+
+
+    def _release(self, claim):
+        try:
+            self.queue._claim_manager.delete(claim)
+        except Exception as e:
+            logging.getLogger("pyrax").debug("Releasing claim '%s' failed: "
+                    "%s" % (claim.id, e))
+
+
+    def _unsubscribe(self, sub):
+        with self._cond:
+            sub.closed = True
+            self._subscribers.discard(sub)
+            last = not self._subscribers
+            self._cond.notify_all()
+        if last:
+            self.stop()
+
+
+    def _get(self, sub, timeout):
+        """
+        Waits for a claim for the subscriber. Claims that have waited for a
+        subscriber for half their TTL are not handed out, as they may expire
+        before they are used; the poller releases them and claims again.
+        """
+        start = time.time()
+        with self._cond:
+            self._waiting += 1
+            self._cond.notify_all()
+            try:
+                while True:
+                    oldest = time.time() - self.ttl / 2.0
+                    while self._claims and self._claims[0][0] < oldest:
+                        self._stale.append(self._claims.pop(0)[1])
+                        self._stats["stale_claims"] += 1
+                        self._cond.notify_all()
+                    if self._claims or sub.closed:
+                        break
+                    if timeout is None:
+                        self._cond.wait(3600)
+                        continue
+                    remaining = start + timeout - time.time()
+                    if remaining <= 0:
+                        return None
+                    self._cond.wait(remaining)
+                if sub.closed:
+                    return None
+                self._stats["wait_time"] += time.time() - start
+                return self._claims.pop(0)[1]
+            finally:
+                self._waiting -= 1
+
+
+    def _poll(self):
+        claim_manager = self.queue._claim_manager
+        while True:
+            with self._cond:
+                # Only claim messages that a subscriber is waiting for.
+                while (not self.stopped and not self._stale and
+                        len(self._claims) >= self._waiting):
+                    self._cond.wait(3600)
+                if self.stopped:
+                    return
+                stale, self._stale = self._stale, []
+            if stale:
+                # Free the messages before claiming them again.
+                for claim in stale:
+                    self._release(claim)
+                continue
+            self._wake.clear()
+            start = time.time()
+            try:
+                claim = claim_manager.claim(self.ttl, self.grace,
+                        count=self.count)
+                error = None
+            except Exception as e:
+                logging.getLogger("pyrax").debug("Claim failed: %s" % e)
+                claim, error = None, e
+            release = False
+            with self._cond:
+                self._stats["polls"] += 1
+                self._stats["claim_time"] += time.time() - start
+                if error is not None:
+                    self._stats["errors"] += 1
+                elif claim is None or not claim.messages:
+                    self._stats["empty_polls"] += 1
+                elif self.stopped:
+                    # Every subscriber left while the claim was being made.
+                    release = True
+                else:
+                    self._stats["claims"] += 1
+                    self._stats["messages"] += len(claim.messages)
+                    self.interval = 0
+                    self._claims.append((time.time(), claim))
+                    self._cond.notify_all()
+                    continue
+                self.interval = min(self.max_interval,
+                        max(self.min_interval, self.interval * self.backoff))
+                interval = self.interval
+            if release:
+                self._release(claim)
+                return
+            self._wake.wait(interval)
+
+
+
 class QueueClient(BaseClient):
     """
     This is the primary class for interacting with Cloud Queues.
@@ -531,6 +1504,8 @@ class QueueClient(BaseClient):
         self._manager = QueueManager(self,
                 resource_class=Queue, response_key="queue",
                 uri_base="queues")
+        self._watchers = {}
+        self._watchers_lock = threading.Lock()
 
 
     def _add_custom_headers(self, dct):
@@ -671,6 +1646,21 @@ class QueueClient(BaseClient):
                 marker=marker, limit=limit)
 
 
+    @assure_queue
+    def message_iterator(self, queue, include_claimed=False, echo=False,
+            marker=None, limit=None, prefetch=True):
+        """
+        Returns a generator that yields the messages in the specified queue one
+        at a time, requesting each page of results only when it is needed. The
+        parameters are the same as for list_messages(); if 'prefetch' is True,
+        the next page is requested in the background once the second message
+        of the current one is taken, so stopping partway through a page may
+        leave one request unused.
+        """
+        return queue.message_iterator(include_claimed=include_claimed,
+                echo=echo, marker=marker, limit=limit, prefetch=prefetch)
+
+
     @assure_queue
     def list_messages_by_ids(self, queue, ids):
         """
@@ -709,6 +1699,62 @@ class QueueClient(BaseClient):
         return queue.post_message(body, ttl)
 
 
+    @assure_queue
+    def post_messages(self, queue, messages, workers=None):
+        """
+        Posts several messages to the specified queue. 'messages' is an
+        iterable of (body, ttl) pairs. They are posted in batches of up to
+        MAX_POST_MESSAGES, with up to 'workers' batches in flight at once, and
+        the IDs of the new messages are returned in the same order.
+        """
+        return queue.post_messages(messages, workers=workers)
+
+
+    @assure_queue
+    def buffer_messages(self, queue, **kwargs):
+        """
+        Starts a QueueMessageBuffer that posts the messages put in it to the
+        specified queue in batches, and returns it. The keyword arguments are
+        passed to QueueMessageBuffer.
+        """
+        return queue.buffer_messages(**kwargs)
+
+
+    @assure_queue
+    def get_watcher(self, queue, **kwargs):
+        """
+        Returns the QueueWatcher that this client shares among the subscribers
+        to the specified queue, starting one with the given keyword arguments
+        if there is none running.
+        """
+        with self._watchers_lock:
+            watcher = self._watchers.get(queue.id)
+            if watcher is None or watcher.stopped:
+                watcher = QueueWatcher(queue, **kwargs)
+                watcher.start()
+                self._watchers[queue.id] = watcher
+            return watcher
+
+
+    @assure_queue
+    def subscribe(self, queue, callback=None, **kwargs):
+        """
+        Subscribes to the claims made on the specified queue by the
+        QueueWatcher that this client shares among all of the queue's
+        subscribers, and returns a QueueSubscription. If 'callback' is given,
+        it is called in a thread of its own with each claim; otherwise,
+        iterate over the subscription or call its get() method. The keyword
+        arguments are passed to the QueueWatcher if one has to be started.
+        """
+        while True:
+            watcher = self.get_watcher(queue, **kwargs)
+            try:
+                return watcher.subscribe(callback)
+            except ValueError:
+                # Its last subscriber closed in the meantime.
+                continue
+
+
     @assure_queue
     def claim_messages(self, queue, ttl, grace, count=None):
         """
@@ -757,3 +1803,13 @@ class QueueClient(BaseClient):
         by this claim as available for processing by other workers.
         """
         return queue.release_claim(claim)
+
+
+    @assure_queue
+    def consume(self, queue, handler, **kwargs):
+        """
+        Starts a QueueConsumer that passes the messages in the specified queue
+        to 'handler', and returns it. The keyword arguments are passed to
+        QueueConsumer.
+        """
+        return queue.consume(handler, **kwargs)
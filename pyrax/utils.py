@@ -2,6 +2,7 @@
 
 from __future__ import print_function
 
+import collections
 import datetime
 import email.utils
 import fnmatch
@@ -11,6 +12,7 @@ import os
 import random
 import re
 import shutil
+import sqlite3
 import string
 from subprocess import Popen, PIPE
 import sys
@@ -155,23 +157,31 @@ class ResultsIterator(object):
     By default the marker will be unspecified, and the limit will be 1000. You
     can override either by specifying them during instantiation.
 
+    If 'prefetch' is True, the request for the next page of results is made in
+    a background thread as soon as the current page arrives, so that the
+    network call overlaps with the processing of the current page.
+
     The 'kwargs' will be converted to attributes. E.g., in this call:
         rit = ResultsIterator(mgr, foo="bar")
     will result in the object having a 'foo' attribute with the value of 'bar'.
     """
-    def __init__(self, manager, marker=None, limit=1000, **kwargs):
+    def __init__(self, manager, marker=None, limit=1000, prefetch=False,
+            **kwargs):
         self.manager = manager
         self.marker = marker
         self.limit = limit
+        self.prefetch = prefetch
         for att, val in list(kwargs.items()):
             setattr(self, att, val)
-        self.results = []
+        self.results = collections.deque()
         self.list_method = None
         self._list_method = None
         self.marker_att = "id"
         self.extra_args = tuple()
         self._init_methods()
         self.next_uri = ""
+        self._pending = None
+        self._exhausted = False
 
 
     def _init_methods(self):
@@ -191,33 +201,69 @@ class ResultsIterator(object):
         return self
 
 
+    def _fetch_page(self):
+        """Makes the API call for the next page of results."""
+        if not self.next_uri:
+            return self.list_method(marker=self.marker, limit=self.limit,
+                    prefix=self.prefix)
+        return self._list_method(self.next_uri, *self.extra_args)
+
+
+    def _start_prefetch(self):
+        """Starts fetching the next page in a background thread."""
+        pending = {}
+
+        def fetch():
+            try:
+                pending["results"] = self._fetch_page()
+            except Exception as e:
+                pending["error"] = e
+
+        thread = threading.Thread(target=fetch)
+        thread.daemon = True
+        pending["thread"] = thread
+        self._pending = pending
+        thread.start()
+
+
+    def _next_page(self):
+        """
+        Returns the next page of results, either from the prefetch thread or
+        by calling the API directly. Returns None when there are no more.
+        """
+        pending, self._pending = self._pending, None
+        if pending is not None:
+            pending["thread"].join()
+            if "error" in pending:
+                raise pending["error"]
+            return pending["results"]
+        if self.next_uri is None:
+            return None
+        return self._fetch_page()
+
+
     def next(self):
         """
         Return the next available item. If there are no more items in the
-        local 'results' list, check if there is a 'next_uri' value. If so,
+        local 'results' queue, check if there is a 'next_uri' value. If so,
         use that to get the next page of results from the API, and return
         the first item from that query.
         """
-        try:
-            return self.results.pop(0)
-        except IndexError:
-            if self.next_uri is None:
+        if not self.results:
+            if self._exhausted:
                 raise StopIteration()
-            else:
-                if not self.next_uri:
-                    self.results = self.list_method(marker=self.marker,
-                            limit=self.limit, prefix=self.prefix)
-                else:
-                    args = self.extra_args
-                    self.results = self._list_method(self.next_uri, *args)
-                if self.results:
-                    last_res = self.results[-1]
-                    self.marker = getattr(last_res, self.marker_att)
-        # We should have more results.
-        try:
-            return self.results.pop(0)
-        except IndexError:
-            raise StopIteration()
+            page = self._next_page()
+            if not page:
+                self._exhausted = True
+                raise StopIteration()
+            self.marker = getattr(page[-1], self.marker_att)
+            self.results = collections.deque(page)
+            if self.prefetch and self.next_uri is not None:
+                self._start_prefetch()
+        return self.results.popleft()
+
+    # Python 3 calls this method __next__().
+    __next__ = next
 
 
 def get_checksum(content, encoding="utf8", block_size=8192):
@@ -266,6 +312,71 @@ def get_checksum(content, encoding="utf8", block_size=8192):
     return md.hexdigest()
 
 
+class ChecksumCache(object):
+    """
+    Persistent cache of the MD5 checksums of local files, stored in a sqlite
+    database at 'db_path'. A file's checksum is only recalculated when its
+    size, modification time or inode differ from the values recorded when it
+    was last calculated.
+
+    The cache may be shared by several threads. Changes are committed every
+    'commit_interval' updates, and when close() is called.
+    """
+    def __init__(self, db_path, commit_interval=1000):
+        self.db_path = db_path
+        self.commit_interval = commit_interval
+        self.hits = 0
+        self.misses = 0
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS checksums "
+                "(path TEXT PRIMARY KEY, size INTEGER, mtime REAL, "
+                "inode INTEGER, checksum TEXT)")
+        self._conn.commit()
+
+
+    def get_checksum(self, pth):
+        """
+        Returns the MD5 checksum of the file at 'pth', calculating it only if
+        the file has changed since it was cached.
+        """
+        pth = os.path.abspath(pth)
+        stat = os.stat(pth)
+        key = (stat.st_size, stat.st_mtime, stat.st_ino)
+        with self._lock:
+            row = self._conn.execute("SELECT size, mtime, inode, checksum "
+                    "FROM checksums WHERE path = ?", (pth, )).fetchone()
+            if row is not None and tuple(row[:3]) == key:
+                self.hits += 1
+                return row[3]
+            self.misses += 1
+        checksum = get_checksum(pth)
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO checksums VALUES "
+                    "(?, ?, ?, ?, ?)", (pth, ) + key + (checksum, ))
+            self._pending += 1
+            if self._pending >= self.commit_interval:
+                self._conn.commit()
+                self._pending = 0
+        return checksum
+
+
+    def close(self):
+        """Saves any pending changes and closes the database."""
+        with self._lock:
+            self._conn.commit()
+            self._conn.close()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
 def _join_chars(chars, length):
     """
     Used by the random character functions.
@@ -322,22 +433,14 @@ def folder_size(pth, ignore=None):
 
     ignore = coerce_to_list(ignore)
 
-    def get_size(total, root, names):
-        paths = [os.path.realpath(os.path.join(root, nm)) for nm in names]
-        for pth in paths[::-1]:
-            if not os.path.exists(pth):
-                paths.remove(pth)
-            elif os.path.isdir(pth):
-                # Don't count folder stat sizes
-                paths.remove(pth)
-            elif match_pattern(pth, ignore):
-                paths.remove(pth)
-        total[0] += sum(os.stat(pth).st_size for pth in paths)
-
-    # Need a mutable to pass
-    total = [0]
-    os.path.walk(pth, get_size, total)
-    return total[0]
+    total = 0
+    for root, dirnames, fnames in os.walk(pth):
+        for nm in fnames:
+            fpath = os.path.realpath(os.path.join(root, nm))
+            if not os.path.isfile(fpath) or match_pattern(fpath, ignore):
+                continue
+            total += os.stat(fpath).st_size
+    return total
 
 
 def add_method(obj, func, name=None):
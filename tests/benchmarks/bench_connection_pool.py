@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Compares the throughput of pyrax.http.request with and without a pooled,
+keep-alive ConnectionPool against a local stub HTTP server.
+
+Usage:
+    python tests/benchmarks/bench_connection_pool.py [-n REQUESTS] [-t THREADS]
+"""
+
+from __future__ import print_function
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+        os.pardir, os.pardir)))
+
+import pyrax
+import pyrax.http
+from tests.benchmarks.stub_server import start_stub_server
+
+
+def run(uri, count, threads, pool=None):
+    """
+    Makes 'count' HEAD requests spread across 'threads' threads, and returns
+    the number of requests per second.
+    """
+    per_thread = count // threads
+
+    def worker():
+        for ii in range(per_thread):
+            pyrax.http.request("HEAD", uri, connection_pool=pool)
+
+    workers = [threading.Thread(target=worker) for ii in range(threads)]
+    start = time.time()
+    for wkr in workers:
+        wkr.start()
+    for wkr in workers:
+        wkr.join()
+    elapsed = time.time() - start
+    return (per_thread * threads) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-n", "--requests", type=int, default=2000,
+            help="Total number of requests to make for each run.")
+    parser.add_argument("-t", "--threads", type=int, default=4,
+            help="Number of concurrent threads making requests.")
+    args = parser.parse_args()
+
+    server, base_url = start_stub_server()
+    uri = "%s/v1/container/object" % base_url
+    try:
+        unpooled = run(uri, args.requests, args.threads)
+        pool = pyrax.http.ConnectionPool(pool_maxsize=args.threads)
+        pooled = run(uri, args.requests, args.threads, pool=pool)
+        pool.close()
+    finally:
+        server.shutdown()
+    print("Requests: %s   Threads: %s" % (args.requests, args.threads))
+    print("Without pooling: %8.1f req/sec" % unpooled)
+    print("With pooling:    %8.1f req/sec" % pooled)
+    print("Speedup:         %8.2fx" % (pooled / unpooled))
+
+
+if __name__ == "__main__":
+    main()
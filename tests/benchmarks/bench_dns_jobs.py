@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Compares adding DNS records one call at a time, waiting for each call to
+complete, with firing all the calls at once and then waiting for their jobs,
+using the in-process fake Cloud DNS backend with a simulated network latency
+and job duration.
+
+Usage:
+    python tests/benchmarks/bench_dns_jobs.py [-n RECORDS] [-j JOB_DURATION]
+"""
+
+from __future__ import print_function
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+        os.pardir, os.pardir)))
+
+from pyrax.fake_backend import FakeBackend
+
+
+def report(label, backend, args, func):
+    backend.dns.domains.clear()
+    clt = backend.client("dns")
+    clt.set_timeout(0)
+    clt.set_delay(args.delay)
+    dom = clt.create(name="example.com", emailAddress="me@example.com")
+    recs = [{"type": "A", "name": "www%s.example.com" % num,
+            "data": "192.0.2.%s" % (num % 250)} for num in range(args.records)]
+    backend.request_counts.clear()
+    start = time.time()
+    func(dom, recs)
+    elapsed = time.time() - start
+    print("%-24s %8.1f records/s %6d requests" % (label,
+            args.records / elapsed, sum(backend.request_counts.values())))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-n", "--records", type=int, default=50,
+            help="Number of records to add in each run.")
+    parser.add_argument("-j", "--job-duration", type=float, default=0.2,
+            help="Seconds each DNS job stays RUNNING.")
+    parser.add_argument("-d", "--delay", type=float, default=0.05,
+            help="Seconds between checks on running jobs.")
+    parser.add_argument("-l", "--latency", type=float, default=0.002,
+            help="Seconds added to every request by the fake backend.")
+    args = parser.parse_args()
+
+    backend = FakeBackend(latency=args.latency,
+            dns_job_duration=args.job_duration)
+
+    def one_at_a_time(dom, recs):
+        for rec in recs:
+            dom.add_records(rec)
+
+    def all_at_once(dom, recs):
+        jobs = [dom.add_records(rec, wait=False) for rec in recs]
+        for job in jobs:
+            job.result()
+
+    report("add_records() loop", backend, args, one_at_a_time)
+    report("add_records(wait=False)", backend, args, all_at_once)
+
+
+if __name__ == "__main__":
+    main()
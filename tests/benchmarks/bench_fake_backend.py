@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Measures the client-side throughput of real pyrax clients running against the
+in-process fake Object Storage, Cloud Queues and Cloud DNS backend.
+
+Usage:
+    python tests/benchmarks/bench_fake_backend.py [-n ITEMS] [-l LATENCY]
+"""
+
+from __future__ import print_function
+
+import argparse
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+        os.pardir, os.pardir)))
+
+from pyrax.fake_backend import FakeBackend
+
+
+def timed(label, func, count):
+    """Runs func() once, and prints the rate at which it handled 'count'."""
+    start = time.time()
+    func()
+    elapsed = time.time() - start
+    print("%-34s %8d items in %6.3fs  %10.1f items/s" % (label, count,
+            elapsed, count / elapsed))
+
+
+def bench_storage(backend, num):
+    clt = backend.client("object_store")
+    cont = clt.create("bench")
+    names = ["obj%06d" % ii for ii in range(num)]
+
+    def upload():
+        for name in names:
+            cont.store_object(name, io.BytesIO(b"x" * 1024),
+                    return_none=True)
+
+    def list_pages():
+        marker = None
+        while True:
+            objs = cont.get_objects(marker=marker, limit=100)
+            if not objs:
+                return
+            marker = objs[-1].name
+
+    def range_gets():
+        for name in names:
+            clt.method_get("/bench/%s" % name,
+                    headers={"Range": "bytes=0-99"}, raw_content=True)
+
+    timed("Object upload", upload, num)
+    timed("Object listing (100 per page)", list_pages, num)
+    timed("Range GET", range_gets, num)
+    timed("Bulk delete", lambda: clt.bulk_delete("bench", names), num)
+
+
+def bench_queues(backend, num):
+    clt = backend.client("queues")
+    queue = clt.create("bench")
+
+    def post():
+        for ii in range(num):
+            queue.post_message({"num": ii}, 300)
+
+    def consume():
+        while True:
+            claim = queue.claim_messages(300, 60, 20)
+            if claim is None:
+                return
+            queue.delete_by_ids([msg.id for msg in claim.messages])
+
+    timed("Queue message post", post, num)
+    timed("Queue claim and delete", consume, num)
+
+
+def bench_dns(backend, num):
+    clt = backend.client("dns")
+    clt.set_delay(0)
+    dom = clt.create(name="bench.example.com", emailAddress="me@example.com")
+
+    def add_records():
+        for ii in range(num):
+            dom.add_records({"type": "A", "name": "h%s.bench.example.com" % ii,
+                    "data": "192.0.2.1"})
+
+    timed("DNS record add", add_records, num)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-n", "--items", type=int, default=2000,
+            help="Number of objects, messages and records in each run.")
+    parser.add_argument("-l", "--latency", type=float, default=0,
+            help="Seconds added to every request by the fake backend.")
+    args = parser.parse_args()
+
+    backend = FakeBackend(latency=args.latency)
+    bench_storage(backend, args.items)
+    bench_queues(backend, args.items)
+    bench_dns(backend, args.items // 10 or 1)
+    print()
+    for (service, method), count in sorted(backend.request_counts.items()):
+        print("%-14s %-7s %8d requests" % (service, method, count))
+
+
+if __name__ == "__main__":
+    main()
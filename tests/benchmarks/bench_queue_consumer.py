@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Compares the rate at which messages are consumed by a claim-and-delete loop
+and by QueueConsumer, using the in-process fake Cloud Queues backend with a
+simulated network latency.
+
+Usage:
+    python tests/benchmarks/bench_queue_consumer.py [-n MESSAGES] [-l LATENCY]
+"""
+
+from __future__ import print_function
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+        os.pardir, os.pardir)))
+
+from pyrax.fake_backend import FakeBackend
+from pyrax.queueing import QueueConsumer
+
+
+def fill(backend, num):
+    """Returns a fresh queue holding 'num' messages."""
+    backend.queues.queues.clear()
+    latency, backend.latency = backend.latency, 0
+    clt = backend.client("queues")
+    queue = clt.create("bench")
+    for ii in range(num):
+        clt.post_message(queue, ii, 300)
+    backend.latency = latency
+    return backend.client("queues").get("bench")
+
+
+def claim_loop(queue):
+    """The consumer loop that the plain client API leads to."""
+    while True:
+        claim = queue.claim_messages(300, 60)
+        if claim is None:
+            return
+        for msg in claim.messages:
+            msg.delete(claim_id=claim.id)
+
+
+def report(label, backend, num, func):
+    backend.request_counts.clear()
+    start = time.time()
+    func()
+    elapsed = time.time() - start
+    print("%-28s %8.1f msgs/s %8d requests" % (label, num / elapsed,
+            sum(backend.request_counts.values())))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-n", "--messages", type=int, default=2000,
+            help="Number of messages to consume in each run.")
+    parser.add_argument("-l", "--latency", type=float, default=0.002,
+            help="Seconds added to every request by the fake backend.")
+    parser.add_argument("-c", "--claims", type=int, default=8,
+            help="Claims kept in flight by QueueConsumer.")
+    args = parser.parse_args()
+
+    backend = FakeBackend(latency=args.latency)
+    num = args.messages
+    queue = fill(backend, num)
+    report("claim + delete loop", backend, num, lambda: claim_loop(queue))
+    queue = fill(backend, num)
+
+    def consume():
+        consumer = QueueConsumer(queue, lambda msg: None, count=20,
+                claims=args.claims, exit_when_empty=True)
+        consumer.start()
+        consumer.join()
+
+    report("QueueConsumer", backend, num, consume)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Measures listing the messages in a deep queue with and without prefetching,
+and how soon the first message is available, using the in-process fake Cloud
+Queues backend with a simulated network latency.
+
+Usage:
+    python tests/benchmarks/bench_queue_listing.py [-n MESSAGES] [-l LATENCY]
+"""
+
+from __future__ import print_function
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+        os.pardir, os.pardir)))
+
+from pyrax.fake_backend import FakeBackend
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-n", "--messages", type=int, default=5000,
+            help="Number of messages in the queue.")
+    parser.add_argument("-l", "--latency", type=float, default=0.002,
+            help="Seconds added to every request by the fake backend.")
+    parser.add_argument("-w", "--work", type=float, default=0.0002,
+            help="Seconds of simulated work for each message listed.")
+    args = parser.parse_args()
+
+    backend = FakeBackend()
+    queue = backend.client("queues").create("bench")
+    queue.post_messages([(ii, 300) for ii in range(args.messages)])
+    backend.latency = args.latency
+
+    for prefetch in (False, True):
+        backend.request_counts.clear()
+        start = time.time()
+        msgs = queue.message_iterator(echo=True, prefetch=prefetch)
+        first = None
+        count = 0
+        for msg in msgs:
+            if first is None:
+                first = time.time() - start
+            time.sleep(args.work)
+            count += 1
+        elapsed = time.time() - start
+        print("prefetch=%-5s %6d msgs in %6.3fs  first after %6.4fs  "
+                "%5d requests" % (prefetch, count, elapsed, first,
+                sum(backend.request_counts.values())))
+
+
+if __name__ == "__main__":
+    main()
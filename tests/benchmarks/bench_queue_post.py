@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Compares the rate at which messages are posted one at a time, with
+post_messages() and with a QueueMessageBuffer, using the in-process fake Cloud
+Queues backend with a simulated network latency.
+
+Usage:
+    python tests/benchmarks/bench_queue_post.py [-n MESSAGES] [-l LATENCY]
+"""
+
+from __future__ import print_function
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+        os.pardir, os.pardir)))
+
+from pyrax.fake_backend import FakeBackend
+
+
+def report(label, backend, num, func):
+    backend.queues.queues.clear()
+    queue = backend.client("queues").create("bench")
+    backend.request_counts.clear()
+    start = time.time()
+    func(queue)
+    elapsed = time.time() - start
+    print("%-28s %8.1f msgs/s %8d requests" % (label, num / elapsed,
+            sum(backend.request_counts.values())))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-n", "--messages", type=int, default=2000,
+            help="Number of messages to post in each run.")
+    parser.add_argument("-l", "--latency", type=float, default=0.002,
+            help="Seconds added to every request by the fake backend.")
+    parser.add_argument("-w", "--workers", type=int, default=4,
+            help="Batches posted at once.")
+    args = parser.parse_args()
+
+    backend = FakeBackend(latency=args.latency)
+    num = args.messages
+    messages = [({"num": ii}, 300) for ii in range(num)]
+
+    def one_at_a_time(queue):
+        for body, ttl in messages:
+            queue.post_message(body, ttl)
+
+    def batched(queue):
+        queue.post_messages(messages, workers=args.workers)
+
+    def buffered(queue):
+        with queue.buffer_messages(workers=args.workers) as buf:
+            for body, ttl in messages:
+                buf.put(body, ttl)
+
+    report("post_message() loop", backend, num, one_at_a_time)
+    report("post_messages()", backend, num, batched)
+    report("QueueMessageBuffer", backend, num, buffered)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Compares the claim requests made and the delay in picking up messages for
+subscribers that each poll a queue in a loop with a fixed sleep, and for
+subscribers that share one QueueWatcher, using the in-process fake Cloud
+Queues backend with a simulated network latency. The queue sits idle, gets a
+burst of messages, and then sits idle again.
+
+Usage:
+    python tests/benchmarks/bench_queue_watch.py [-s SUBSCRIBERS] [-i IDLE]
+"""
+
+from __future__ import print_function
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+        os.pardir, os.pardir)))
+
+from pyrax.fake_backend import FakeBackend
+
+
+def run(backend, args, subscriber):
+    """
+    Runs 'args.subscribers' threads that call subscriber(queue, stop, seen)
+    while the scenario plays out, and prints the results.
+    """
+    backend.queues.queues.clear()
+    clt = backend.client("queues")
+    queue = clt.create("bench")
+    stop = threading.Event()
+    seen = []
+    threads = [threading.Thread(target=subscriber, args=(queue, stop, seen))
+            for ii in range(args.subscribers)]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+    time.sleep(args.idle)
+    backend.request_counts.clear()
+    posted = time.time()
+    poster = backend.client("queues")
+    poster.post_messages("bench", [(posted, 300)
+            for ii in range(args.messages)])
+    while len(seen) < args.messages:
+        time.sleep(0.001)
+    burst = max(seen) - posted
+    burst_requests = backend.request_counts[("queues", "POST")]
+    backend.request_counts.clear()
+    time.sleep(args.idle)
+    idle_requests = backend.request_counts[("queues", "POST")]
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return burst, burst_requests, idle_requests / args.idle
+
+
+def spin(queue, stop, seen):
+    """The loop that claim_messages() leads to."""
+    while not stop.is_set():
+        claim = queue.claim_messages(300, 60)
+        if claim is None:
+            time.sleep(0.05)
+            continue
+        now = time.time()
+        seen.extend(now for msg in claim.messages)
+        queue.delete_by_ids([msg.id for msg in claim.messages])
+
+
+def subscribe(queue, stop, seen):
+    sub = queue.subscribe(min_interval=0.05, max_interval=5)
+    while not stop.is_set():
+        claim = sub.get(0.1)
+        if claim is None:
+            continue
+        now = time.time()
+        seen.extend(now for msg in claim.messages)
+        queue.delete_by_ids([msg.id for msg in claim.messages])
+    sub.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-s", "--subscribers", type=int, default=8,
+            help="Number of local subscribers.")
+    parser.add_argument("-n", "--messages", type=int, default=500,
+            help="Number of messages in the burst.")
+    parser.add_argument("-i", "--idle", type=float, default=3,
+            help="Seconds the queue sits idle before and after the burst.")
+    parser.add_argument("-l", "--latency", type=float, default=0.002,
+            help="Seconds added to every request by the fake backend.")
+    args = parser.parse_args()
+
+    backend = FakeBackend(latency=args.latency)
+    for label, func in (("claim loop, 50ms sleep", spin),
+            ("shared QueueWatcher", subscribe)):
+        burst, burst_requests, idle_rate = run(backend, args, func)
+        print("%-24s burst drained in %6.3fs with %5d claims, "
+                "%6.1f claims/s while idle" % (label, burst, burst_requests,
+                idle_rate))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Measures the client-side overhead of the full BaseClient request path, from
+method_get() down to the transport, using a stub connection pool that answers
+instantly so that only pyrax's own work is timed.
+
+Usage:
+    python tests/benchmarks/bench_request_path.py [-n CALLS] [-r REPEAT]
+"""
+
+from __future__ import print_function
+
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__),
+        os.pardir, os.pardir)))
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+import pyrax
+import pyrax.http
+from pyrax.client import BaseClient
+
+
+class StubPool(object):
+    """
+    Stands in for a pyrax.http.ConnectionPool, returning the same small JSON
+    response to every request without any I/O.
+    """
+    def __init__(self, status=200, content=b'{"metadata": {"a": "1"}}'):
+        resp = requests.Response()
+        resp.status_code = status
+        resp._content = content
+        resp.encoding = "utf-8"
+        resp.headers = CaseInsensitiveDict({
+                "Content-Type": "application/json",
+                "Content-Length": str(len(content))})
+        self.response = resp
+
+    def request(self, method, uri, **kwargs):
+        return self.response
+
+
+class StubIdentity(object):
+    """An identity that is always authenticated."""
+    token = "0123456789abcdef"
+    tenant_id = "123456"
+
+    def ensure_token(self):
+        pass
+
+    def refresh_token(self, stale_token=None):
+        pass
+
+
+class BenchClient(BaseClient):
+    name = "Benchmark"
+
+    def _configure_manager(self):
+        pass
+
+
+def make_client(status=200):
+    clt = BenchClient(StubIdentity(),
+            management_url="https://dfw.example.com/v1/123456")
+    clt.user_agent = "pyrax/benchmark"
+    clt.connection_pool = StubPool(status=status)
+    return clt
+
+
+def bench(label, stmt, number, repeat):
+    """Prints the best time per call of 'stmt', in microseconds."""
+    best = min(timeit.repeat(stmt, number=number, repeat=repeat))
+    print("%-34s %8.2f us/call" % (label, best / number * 1e6))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-n", "--calls", type=int, default=5000,
+            help="Number of calls in each timing run.")
+    parser.add_argument("-r", "--repeat", type=int, default=5,
+            help="Number of timing runs; the best one is reported.")
+    args = parser.parse_args()
+    num, rep = args.calls, args.repeat
+
+    clt = make_client()
+    bench("GET relative path", lambda: clt.method_get("/servers/1/metadata"),
+            num, rep)
+    bench("HEAD relative path",
+            lambda: clt.method_head("/container/some object.txt"), num, rep)
+    bench("GET with query string",
+            lambda: clt.method_get("/domains?limit=100&offset=200"), num, rep)
+    full = "https://dfw.example.com/v1/123456/servers/1/metadata"
+    bench("GET absolute URI", lambda: clt.method_get(full), num, rep)
+    bench("POST with JSON body", lambda: clt.method_post("/servers/1/action",
+            body={"reboot": {"type": "SOFT"}}), num, rep)
+
+    clt.add_metrics_sink(pyrax.instrumentation.RingBufferSink())
+    bench("GET with a metrics sink",
+            lambda: clt.method_get("/servers/1/metadata"), num, rep)
+
+    err_clt = make_client(status=404)
+    err_clt.retry_policy = None
+
+    def not_found():
+        try:
+            err_clt.method_get("/servers/1/metadata")
+        except pyrax.exceptions.NotFound:
+            pass
+
+    bench("GET raising NotFound", not_found, num, rep)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""
+A minimal local HTTP server for benchmarking the client-side request path
+without any network latency or real cloud services.
+"""
+
+import json
+import socket
+import threading
+
+from six.moves import BaseHTTPServer
+from six.moves import socketserver
+
+
+class StubHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """
+    Answers every request with a small JSON body. HTTP/1.1 is used so that
+    clients which support keep-alive can re-use their connections.
+    """
+    protocol_version = "HTTP/1.1"
+    body = json.dumps({"status": "ok"}).encode("utf-8")
+
+    def setup(self):
+        BaseHTTPServer.BaseHTTPRequestHandler.setup(self)
+        # Avoid Nagle/delayed-ACK stalls on re-used connections.
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY,
+                True)
+
+    def _respond(self, send_body=True):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            self.rfile.read(length)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(self.body)))
+        self.end_headers()
+        if send_body:
+            self.wfile.write(self.body)
+
+    def do_GET(self):
+        self._respond()
+
+    def do_HEAD(self):
+        self._respond(send_body=False)
+
+    def do_PUT(self):
+        self._respond()
+
+    def do_POST(self):
+        self._respond()
+
+    def do_DELETE(self):
+        self._respond()
+
+    def log_message(self, *args):
+        # Keep the benchmark output readable.
+        pass
+
+
+class StubServer(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def start_stub_server(handler_class=StubHandler):
+    """
+    Starts a stub server on a random local port in a background thread, and
+    returns a 2-tuple of (server, base_url). Call `server.shutdown()` when
+    finished.
+    """
+    server = StubServer(("127.0.0.1", 0), handler_class)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    base_url = "http://127.0.0.1:%s" % server.server_address[1]
+    return server, base_url
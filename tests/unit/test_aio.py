@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from mock import patch
+from mock import MagicMock as Mock
+
+import pyrax
+from pyrax import aio
+from pyrax import client
+import pyrax.exceptions as exc
+import pyrax.utils as utils
+
+from pyrax import fakes
+
+needs_asyncio = unittest.skipIf(aio.asyncio is None,
+        "asyncio is not available")
+
+
+class FakeSyncClient(object):
+    def __init__(self, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        self.management_url = "http://example.com"
+        self._manager = FakeSyncManager()
+
+    def list(self, limit=None, marker=None):
+        return ["a", "b"]
+
+    def get(self, item):
+        return "got %s" % item
+
+    def delete(self, item):
+        raise exc.NotFound(404)
+
+    def get_container_metadata(self, container, prefix=None):
+        return {"container": container, "prefix": prefix}
+
+    def _private(self):
+        return "private"
+
+
+class FakeSyncManager(object):
+    def get(self, item):
+        return "mgr %s" % item
+
+    def head(self, item):
+        return "head %s" % item
+
+
+class FakeAsyncClient(aio.AsyncBaseClient):
+    client_class = FakeSyncClient
+
+
+
+class AsyncioTest(unittest.TestCase):
+    def __init__(self, *args, **kwargs):
+        super(AsyncioTest, self).__init__(*args, **kwargs)
+
+    def setUp(self):
+        if aio.asyncio is not None:
+            self.loop = aio.asyncio.new_event_loop()
+        else:
+            self.loop = None
+
+    def tearDown(self):
+        if self.loop is not None:
+            self.loop.close()
+
+    def _run(self, awaitable):
+        return self.loop.run_until_complete(awaitable)
+
+    def test_no_asyncio(self):
+        sav = aio.asyncio
+        aio.asyncio = None
+        self.assertRaises(exc.AsyncioNotAvailable, FakeAsyncClient)
+        self.assertRaises(exc.AsyncioNotAvailable, aio.AsyncBaseManager,
+                FakeSyncManager())
+        aio.asyncio = sav
+
+    @needs_asyncio
+    def test_create_sync_client(self):
+        clt = FakeAsyncClient("ident", region_name="ORD", loop=self.loop)
+        self.assertTrue(isinstance(clt.client, FakeSyncClient))
+        self.assertEqual(clt.client.args, ("ident", ))
+        self.assertEqual(clt.client.kwargs, {"region_name": "ORD"})
+        self.assertEqual(clt.loop, self.loop)
+
+    @needs_asyncio
+    def test_no_client_class(self):
+        self.assertRaises(exc.NoSuchClient, aio.AsyncBaseClient,
+                loop=self.loop)
+
+    @needs_asyncio
+    def test_from_client(self):
+        sync = FakeSyncClient()
+        clt = aio.AsyncBaseClient.from_client(sync, loop=self.loop)
+        self.assertTrue(clt.client is sync)
+
+    @needs_asyncio
+    def test_storage_and_queue_classes(self):
+        self.assertTrue(aio.AsyncStorageClient.client_class is
+                pyrax.object_storage.StorageClient)
+        self.assertTrue(aio.AsyncQueueClient.client_class is
+                pyrax.queueing.QueueClient)
+
+    @needs_asyncio
+    def test_list(self):
+        clt = FakeAsyncClient(loop=self.loop)
+        self.assertEqual(self._run(clt.list()), ["a", "b"])
+
+    @needs_asyncio
+    def test_get(self):
+        clt = FakeAsyncClient(loop=self.loop)
+        self.assertEqual(self._run(clt.get("x")), "got x")
+
+    @needs_asyncio
+    def test_exception(self):
+        clt = FakeAsyncClient(loop=self.loop)
+        self.assertRaises(exc.NotFound, self._run, clt.delete("x"))
+
+    @needs_asyncio
+    def test_gather(self):
+        clt = FakeAsyncClient(loop=self.loop)
+        names = [utils.random_ascii() for ii in range(5)]
+        calls = [clt.get(nm) for nm in names]
+        ret = self._run(aio.asyncio.gather(*calls, loop=self.loop))
+        self.assertEqual(ret, ["got %s" % nm for nm in names])
+
+    @needs_asyncio
+    def test_getattr_wraps_method(self):
+        clt = FakeAsyncClient(loop=self.loop)
+        ret = self._run(clt.get_container_metadata("cont", prefix="p"))
+        self.assertEqual(ret, {"container": "cont", "prefix": "p"})
+
+    @needs_asyncio
+    def test_getattr_passthrough(self):
+        clt = FakeAsyncClient(loop=self.loop)
+        self.assertEqual(clt.management_url, "http://example.com")
+        self.assertEqual(clt._private(), "private")
+
+    @needs_asyncio
+    def test_run(self):
+        clt = FakeAsyncClient(loop=self.loop)
+        fnc = Mock(return_value="done")
+        self.assertEqual(self._run(clt.run(fnc, 1, a=2)), "done")
+        fnc.assert_called_once_with(1, a=2)
+
+    @needs_asyncio
+    def test_manager(self):
+        clt = FakeAsyncClient(loop=self.loop)
+        mgr = clt.manager
+        self.assertTrue(isinstance(mgr, aio.AsyncBaseManager))
+        self.assertTrue(mgr is clt.manager)
+        self.assertTrue(mgr.manager is clt.client._manager)
+        self.assertEqual(self._run(mgr.get("x")), "mgr x")
+        self.assertEqual(self._run(mgr.head("x")), "head x")
+
+    @needs_asyncio
+    def test_method_get_reauth(self):
+        save_conf = client.BaseClient._configure_manager
+        client.BaseClient._configure_manager = Mock()
+        ident = fakes.FakeIdentity()
+        sync = client.BaseClient(ident, management_url="http://example.com")
+        client.BaseClient._configure_manager = save_conf
+        ident.token = utils.random_ascii()
+        ident.tenant_id = utils.random_ascii()
+        ident.authenticate = Mock()
+        resp = fakes.FakeResponse()
+        sync.request = Mock(side_effect=[exc.Unauthorized(401),
+                (resp, "body")])
+        clt = aio.AsyncBaseClient.from_client(sync, loop=self.loop)
+        ret = self._run(clt.method_get("/foo"))
+        self.assertEqual(ret, (resp, "body"))
+        self.assertEqual(ident.authenticate.call_count, 1)
+        self.assertEqual(sync.request.call_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -17,6 +17,7 @@ import pyrax
 import pyrax.utils as utils
 import pyrax.exceptions as exc
 from pyrax import client
+from pyrax.client import _quote_uri
 from pyrax.client import _safe_quote
 
 from pyrax import fakes
@@ -50,6 +51,34 @@ class ClientTest(unittest.TestCase):
         expected = "%CF%A8"
         self.assertEqual(ret, expected)
 
+    def test_quote_uri(self):
+        client._quote_cache.clear()
+        self.assertEqual(_quote_uri("/a b/c?d=e f"), "/a%20b/c?d=e%20f")
+        self.assertEqual(_quote_uri("https://ex ample.com/a b?c=d e"),
+                "https://ex ample.com/a%20b?c=d%20e")
+        self.assertEqual(len(client._quote_cache), 2)
+        client._quote_cache["/cached"] = "sentinel"
+        self.assertEqual(_quote_uri("/cached"), "sentinel")
+
+    def test_quote_uri_cache_size(self):
+        client._quote_cache.clear()
+        sav = client._QUOTE_CACHE_SIZE
+        client._QUOTE_CACHE_SIZE = 3
+        for num in range(4):
+            _quote_uri("/things/%s" % num)
+        client._QUOTE_CACHE_SIZE = sav
+        self.assertEqual(list(client._quote_cache.keys()), ["/things/3"])
+
+    def test_base_headers(self):
+        clt = self.client
+        clt.user_agent = "one"
+        headers = clt._base_headers()
+        self.assertEqual(headers, {"User-Agent": "one",
+                "Accept": "application/json"})
+        self.assertTrue(clt._base_headers() is headers)
+        clt.user_agent = "two"
+        self.assertEqual(clt._base_headers()["User-Agent"], "two")
+
     def test_base_client(self):
         tenant_id = "faketenantid"
         auth_url = "fakeauthurl"
@@ -156,6 +185,51 @@ class ClientTest(unittest.TestCase):
         clt.reset_timings()
         self.assertEqual(clt.get_timings(), [])
 
+    def test_timings_bounded(self):
+        clt = self.client
+        clt.times = client.collections.deque(maxlen=2)
+        clt.request = Mock(return_value=(fakes.FakeResponse(), None))
+        for ii in range(3):
+            clt._time_request("%s/%s" % (DUMMY_URL, ii), "GET")
+        timings = clt.get_timings()
+        self.assertEqual(len(timings), 2)
+        self.assertEqual(timings[-1][0], "GET %s/2" % DUMMY_URL)
+
+    def test_time_request_metrics(self):
+        clt = self.client
+        clt.management_url = DUMMY_URL
+        sink = Mock()
+        clt.add_metrics_sink(sink)
+        clt.add_metrics_sink(sink)
+        resp = fakes.FakeResponse()
+        resp.headers = {"content-length": "42"}
+        clt.request = Mock(return_value=(resp, None))
+        clt._time_request("%s/servers/12345" % DUMMY_URL, "GET", retries=1)
+        event = sink.record.call_args[0][0]
+        self.assertEqual(sink.record.call_count, 1)
+        self.assertEqual(event.service, clt.name)
+        self.assertEqual(event.method, "GET")
+        self.assertEqual(event.uri_template, "/servers/{id}")
+        self.assertEqual(event.status, 200)
+        self.assertEqual(event.bytes_received, 42)
+        self.assertEqual(event.retries, 1)
+        clt.remove_metrics_sink(sink)
+        clt._time_request(DUMMY_URL, "GET")
+        self.assertEqual(sink.record.call_count, 1)
+
+    def test_time_request_metrics_error(self):
+        clt = self.client
+        clt.management_url = DUMMY_URL
+        sink = Mock()
+        clt.add_metrics_sink(sink)
+        clt.request = Mock(side_effect=exc.NotFound(404))
+        self.assertRaises(exc.NotFound, clt._time_request,
+                "%s/foo" % DUMMY_URL, "DELETE")
+        event = sink.record.call_args[0][0]
+        self.assertEqual(event.status, 404)
+        self.assertTrue(isinstance(event.error, exc.NotFound))
+        self.assertEqual(len(clt.get_timings()), 1)
+
     def test_get_limits(self):
         clt = self.client
         data = utils.random_unicode()
@@ -163,6 +237,140 @@ class ClientTest(unittest.TestCase):
         ret = clt.get_limits()
         self.assertEqual(ret, data)
 
+    def test_fetch_rate_limits(self):
+        clt = self.client
+        rate = [{"uri": "*", "regex": ".*", "limit": []}]
+        clt.method_get = Mock(return_value=(None,
+                {"limits": {"rate": rate, "absolute": {}}}))
+        self.assertEqual(clt._fetch_rate_limits(), rate)
+
+    @patch("time.sleep")
+    def test_throttle(self, mock_sleep):
+        clt = self.client
+        clt.management_url = "http://example.com/v1"
+        self.assertIsNone(clt.get_rate_limiter_stats())
+        clt._throttle("http://example.com/v1/things", "POST")
+        rate = [{"regex": "^/things", "limit": [{"verb": "POST", "value": 1,
+                "unit": "MINUTE", "remaining": 1}]}]
+        clt.enable_rate_limiter()
+        clt._fetch_rate_limits = Mock(return_value=rate)
+        clt._throttle("http://example.com/v1/things", "POST")
+        clt._throttle("http://example.com/v1/things?a=b", "POST")
+        clt._throttle("http://example.com/v1/other", "POST")
+        clt._fetch_rate_limits.assert_called_once_with()
+        self.assertEqual(mock_sleep.call_count, 1)
+        self.assertEqual(clt.get_rate_limiter_stats()["throttled"], 1)
+        clt.disable_rate_limiter()
+        self.assertIsNone(clt.rate_limiter)
+
+    def test_throttle_each_attempt(self):
+        clt = self.client
+        clt.retry_policy = None
+        clt._throttle = Mock()
+        clt._time_request = Mock(return_value=(None, None))
+        clt._retry_request("http://example.com/v1/things", "GET")
+        clt._throttle.assert_called_once_with("http://example.com/v1/things",
+                "GET")
+
+    def _failover_client(self):
+        clt = self.client
+        svc = fakes.FakeIdentityService(self.identity)
+        for region in ("DFW", "ORD", "IAD"):
+            svc.endpoints[region] = fakes.FakeEndpoint({"publicURL":
+                    "https://%s.example.com/v1/123" % region.lower()},
+                    "fake", region, self.identity)
+        self.identity.services = {"fake": svc}
+        clt.management_url = "https://dfw.example.com/v1/123"
+        return clt
+
+    def test_enable_failover(self):
+        clt = self._failover_client()
+        urls = clt.enable_failover(["DFW", "SYD", "IAD", "ORD"])
+        self.assertEqual(urls, ["https://iad.example.com/v1/123",
+                "https://ord.example.com/v1/123"])
+        self.assertTrue(clt.use_circuit_breaker)
+        clt.management_url = "https://nowhere.example.com"
+        self.assertRaises(exc.EndpointNotFound, clt.enable_failover, ["ORD"])
+
+    def test_active_management_url(self):
+        pyrax.http.reset_circuit_breakers()
+        self.addCleanup(pyrax.http.reset_circuit_breakers)
+        clt = self._failover_client()
+        self.assertEqual(clt._active_management_url(), clt.management_url)
+        clt.enable_failover(["ORD", "IAD"])
+        self.assertEqual(clt._active_management_url(), clt.management_url)
+        for url in ("https://dfw.example.com", "https://ord.example.com"):
+            breaker = clt._circuit_breaker(url)
+            breaker.min_requests = 1
+            breaker.record(exc.ClientException(503))
+        self.assertEqual(clt._active_management_url(),
+                "https://iad.example.com/v1/123")
+
+    def test_time_request_circuit_breaker(self):
+        clt = self.client
+        breaker = Mock()
+        clt._circuit_breaker = Mock(return_value=breaker)
+        clt.request = Mock(return_value=(None, None))
+        clt._time_request("http://example.com/a", "GET")
+        breaker.before_request.assert_called_once_with()
+        breaker.record.assert_called_once_with(None)
+        breaker.reset_mock()
+        breaker.before_request.side_effect = exc.CircuitOpen("")
+        self.assertRaises(exc.CircuitOpen, clt._time_request,
+                "http://example.com/a", "GET")
+        self.assertFalse(breaker.record.called)
+
+    def test_time_request_breaker_events(self):
+        pyrax.http.reset_circuit_breakers()
+        self.addCleanup(pyrax.http.reset_circuit_breakers)
+        clt = self.client
+        clt.use_circuit_breaker = True
+        clt.circuit_breaker_overrides = {"min_requests": 1, "cooldown": 0}
+        sink = pyrax.instrumentation.RingBufferSink()
+        clt.add_metrics_sink(sink)
+        clt.request = Mock(side_effect=exc.ClientException(503))
+        self.assertRaises(exc.ClientException, clt._time_request,
+                "http://example.com/a", "GET")
+        clt.request = Mock(return_value=(None, None))
+        clt._time_request("http://example.com/a", "GET")
+        changes = [(evt.old_state, evt.new_state)
+                for evt in sink.breaker_events()]
+        self.assertEqual(changes, [("closed", "open"), ("open", "half_open"),
+                ("half_open", "closed")])
+        self.assertEqual(sink.breaker_events()[0].endpoint,
+                "http://example.com")
+        self.assertEqual(len(sink.events()), 2)
+
+    def test_endpoint_path_failover(self):
+        clt = self._failover_client()
+        clt.enable_failover(["ORD"])
+        primary = "https://dfw.example.com/v1/123/things/4?limit=2"
+        failover = "https://ord.example.com/v1/123/things/4?limit=2"
+        self.assertEqual(clt._endpoint_path(primary), "/things/4")
+        self.assertEqual(clt._endpoint_path(failover), "/things/4")
+        self.assertEqual(clt._endpoint_path(failover, query=True),
+                "/things/4?limit=2")
+        self.assertEqual(clt._uri_template(failover), "/things/{id}")
+        self.assertEqual(clt._endpoint_path("http://other.com/x/y?z=1"),
+                "/x/y")
+        self.assertEqual(clt._endpoint_path("http://other.com/x/y?z=1",
+                query=True), "/x/y?z=1")
+
+    @patch("pyrax.http.request")
+    def test_cached_request_failover(self, mock_req):
+        clt = self._failover_client()
+        clt.enable_failover(["ORD"])
+        clt.response_cache = pyrax.http.ResponseCache(ttl=60)
+        resp = fakes.FakeResponse()
+        resp.status_code = 200
+        resp.headers = {}
+        mock_req.return_value = (resp, {"a": 1})
+        clt.request("https://dfw.example.com/v1/123/things", "GET")
+        resp_, body = clt.request("https://ord.example.com/v1/123/things",
+                "GET")
+        self.assertEqual(body, {"a": 1})
+        self.assertEqual(mock_req.call_count, 1)
+
     @patch("pyrax.http.request")
     def test_request_ok(self, mock_req):
         clt = self.client
@@ -250,6 +458,102 @@ class ClientTest(unittest.TestCase):
                 fake_method)
         mock_from.assert_called_once_with(fakeresp, "")
 
+    @patch("pyrax.http.request")
+    def test_request_connection_pool(self, mock_req):
+        clt = self.client
+        fakeresp = fakes.FakeResponse()
+        fakeresp.status_code = 200
+        mock_req.return_value = (fakeresp, None)
+        fake_uri = utils.random_unicode()
+        clt.request(fake_uri, "GET")
+        cargs, ckwargs = mock_req.call_args
+        self.assertTrue(ckwargs["connection_pool"] is clt.connection_pool)
+
+    @patch("pyrax.http.request")
+    def test_request_no_connection_pool(self, mock_req):
+        clt = self.client
+        clt.connection_pool = None
+        fakeresp = fakes.FakeResponse()
+        fakeresp.status_code = 200
+        mock_req.return_value = (fakeresp, None)
+        fake_uri = utils.random_unicode()
+        clt.request(fake_uri, "GET")
+        cargs, ckwargs = mock_req.call_args
+        self.assertFalse("connection_pool" in ckwargs)
+
+    @patch("pyrax.http.request")
+    def test_request_response_cache(self, mock_req):
+        clt = self.client
+        clt.management_url = "http://example.com/v1"
+        clt.enable_response_cache(ttl=60)
+        fakeresp = fakes.FakeResponse()
+        body = {"flavors": [1, 2]}
+        mock_req.return_value = (fakeresp, body)
+        uri = "http://example.com/v1/flavors"
+        resp, ret = clt.request(uri, "GET")
+        resp, ret = clt.request(uri, "GET")
+        self.assertEqual(ret, body)
+        self.assertFalse(ret is body)
+        self.assertEqual(mock_req.call_count, 1)
+        stats = clt.get_cache_stats()
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 1)
+        # A change to one of the flavors invalidates the listing.
+        clt.request("%s/1" % uri, "PUT", body={})
+        clt.request(uri, "GET")
+        self.assertEqual(mock_req.call_count, 3)
+        self.assertEqual(clt.get_cache_stats()["misses"], 2)
+
+    @patch("pyrax.http.request")
+    def test_request_response_cache_revalidate(self, mock_req):
+        clt = self.client
+        clt.management_url = "http://example.com/v1"
+        clt.enable_response_cache()
+        fakeresp = fakes.FakeResponse()
+        fakeresp.headers = {"etag": "abc"}
+        notmod = fakes.FakeResponse()
+        notmod.status_code = 304
+        mock_req.side_effect = [(fakeresp, {"a": 1}), (notmod, "")]
+        uri = "http://example.com/v1/schemas/image"
+        clt.request(uri, "GET")
+        resp, body = clt.request(uri, "GET")
+        self.assertTrue(resp is fakeresp)
+        self.assertEqual(body, {"a": 1})
+        hdrs = mock_req.call_args[1]["headers"]
+        self.assertEqual(hdrs["If-None-Match"], "abc")
+        self.assertEqual(clt.get_cache_stats()["revalidations"], 1)
+
+    @patch("pyrax.http.request")
+    def test_cached_request_keeps_caller_headers(self, mock_req):
+        clt = self.client
+        clt.management_url = "http://example.com/v1"
+        clt.enable_response_cache()
+        fakeresp = fakes.FakeResponse()
+        fakeresp.headers = {"etag": "abc"}
+        notmod = fakes.FakeResponse()
+        notmod.status_code = 304
+        mock_req.side_effect = [(fakeresp, {"a": 1}), (notmod, "")]
+        uri = "http://example.com/v1/schemas/image"
+        headers = {"X-Test": "1"}
+        clt._cached_request(uri, "GET", headers=headers)
+        clt._cached_request(uri, "GET", headers=headers)
+        self.assertEqual(headers, {"X-Test": "1"})
+        self.assertEqual(mock_req.call_args[1]["headers"],
+                {"X-Test": "1", "If-None-Match": "abc"})
+
+    @patch("pyrax.http.request")
+    def test_request_response_cache_not_cached(self, mock_req):
+        clt = self.client
+        clt.enable_response_cache(ttl=60)
+        fakeresp = fakes.FakeResponse()
+        mock_req.return_value = (fakeresp, "data")
+        uri = "http://example.com/v1/cont/obj"
+        clt.request(uri, "GET", raw_content=True)
+        clt.request(uri, "GET", raw_content=True)
+        self.assertEqual(mock_req.call_count, 2)
+        clt.disable_response_cache()
+        self.assertEqual(clt.get_cache_stats(), None)
+
     def test_time_request(self):
         clt = self.client
         sav = clt.request
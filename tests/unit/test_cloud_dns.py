@@ -2,6 +2,7 @@
 # -*- coding: utf-8 -*-
 
 import random
+import threading
 import time
 import unittest
 
@@ -16,6 +17,7 @@ from pyrax.clouddns import CloudDNSClient
 from pyrax.clouddns import CloudDNSDomain
 from pyrax.clouddns import CloudDNSManager
 from pyrax.clouddns import CloudDNSRecord
+from pyrax.clouddns import DNSJob
 from pyrax.clouddns import ResultsIterator
 from pyrax.clouddns import DomainResultsIterator
 from pyrax.clouddns import SubdomainResultsIterator
@@ -24,6 +26,7 @@ import pyrax.exceptions as exc
 import pyrax.utils as utils
 
 from pyrax import fakes
+from pyrax.fake_backend import FakeBackend
 
 example_uri = "http://example.com"
 
@@ -306,11 +309,23 @@ class CloudDNSTest(unittest.TestCase):
         BaseManager.findall.assert_called_once_with(foo="bar")
         BaseManager.findall = sav
 
-    def test_manager_empty_get_body_error(self):
+    @patch("time.sleep")
+    def test_manager_empty_get_body_error(self, mock_sleep):
         clt = self.client
         mgr = clt._manager
         mgr.api.method_get = Mock(return_value=(None, None))
         self.assertRaises(exc.ServiceResponseFailure, mgr.list)
+        self.assertEqual(mock_sleep.call_count, 2)
+
+    @patch("time.sleep")
+    def test_manager_empty_get_body_retry(self, mock_sleep):
+        clt = self.client
+        mgr = clt._manager
+        body = {"foo": "bar"}
+        mgr.api.method_get = Mock(side_effect=[(None, None), (None, body)])
+        ret = mgr._retry_get("/fake")
+        self.assertEqual(ret, (None, body))
+        self.assertEqual(mock_sleep.call_count, 1)
 
     def test_create_body(self):
         mgr = self.client._manager
@@ -405,6 +420,119 @@ class CloudDNSTest(unittest.TestCase):
         clt.method_get.assert_called_once_with(massaged_uri)
         mgr._process_async_error.assert_called_once_with(get_resp, err_class)
 
+    def test_async_call_no_timeout_does_not_spin(self):
+        clt = self.client
+        mgr = clt._manager
+        uri = "http://example.com"
+        callback_uri = "https://fake.example.com/status/fake"
+        clt.set_timeout(0)
+        clt.set_delay(0.02)
+        finish = time.time() + 0.2
+
+        def status(uri):
+            if time.time() < finish:
+                return {}, {"callbackUrl": callback_uri, "status": "RUNNING"}
+            return {}, {"status": "COMPLETE", "response": "fake"}
+
+        clt.method_delete = Mock(return_value=({}, {
+                "callbackUrl": callback_uri, "status": "RUNNING"}))
+        clt.method_get = Mock(side_effect=status)
+        ret = mgr._async_call(uri, method="DELETE")
+        self.assertEqual(ret, ({}, "fake"))
+        # Checking every 0.02 seconds would have taken about 10 requests.
+        self.assertTrue(clt.method_get.call_count < 10)
+
+    def test_start_async_call(self):
+        clt = self.client
+        mgr = clt._manager
+        uri = "http://example.com"
+        callback_uri = "https://fake.example.com/status/fake"
+        post_resp = {"callbackUrl": callback_uri, "status": "RUNNING"}
+        get_resp = {"response": {"result": "fake"}, "status": "COMPLETE"}
+        started = threading.Event()
+        release = threading.Event()
+
+        def status(uri):
+            started.set()
+            release.wait(5)
+            return {}, get_resp
+
+        clt.method_post = Mock(return_value=({}, post_resp))
+        clt.method_get = Mock(side_effect=status)
+        handler = Mock(return_value="handled")
+        job = mgr._start_async_call(uri, body={}, method="POST",
+                handler=handler)
+        self.assertTrue(isinstance(job, DNSJob))
+        self.assertEqual(job.id, "fake")
+        self.assertTrue(started.wait(5))
+        self.assertFalse(job.done())
+        self.assertRaises(exc.DNSCallTimedOut, job.result, 0.01)
+        called = []
+        job.add_done_callback(called.append)
+        release.set()
+        self.assertEqual(job.result(5), "handled")
+        handler.assert_called_once_with({}, get_resp["response"])
+        self.assertEqual(called, [job])
+        clt.method_get.assert_called_once_with("/status/fake?showDetails=true")
+
+    def test_start_async_call_error(self):
+        clt = self.client
+        mgr = clt._manager
+        uri = "http://example.com"
+        callback_uri = "https://fake.example.com/status/fake"
+        clt.method_delete = Mock(return_value=({}, {
+                "callbackUrl": callback_uri, "status": "RUNNING"}))
+        clt.method_get = Mock(return_value=({}, {"status": "ERROR",
+                "error": {"details": "fail", "code": 666}}))
+        err_class = exc.DomainRecordDeletionFailed
+        job = mgr._start_async_call(uri, method="DELETE", error_class=err_class)
+        self.assertTrue(job.wait(5))
+        self.assertRaises(err_class, job.result)
+
+    def test_tracker_check_error_fails_only_its_job(self):
+        clt = self.client
+        mgr = clt._manager
+
+        def status(uri):
+            if "bad" in uri:
+                # No status at all.
+                return {}, {"jobId": "bad"}
+            return {}, {"status": "COMPLETE", "response": "fine"}
+
+        clt.method_delete = Mock(side_effect=lambda uri: ({}, {
+                "callbackUrl": "https://fake.example.com/status/%s" % uri,
+                "status": "RUNNING"}))
+        clt.method_get = Mock(side_effect=status)
+        bad = mgr._start_async_call("bad", method="DELETE")
+        good = mgr._start_async_call("good", method="DELETE")
+        self.assertRaises(KeyError, bad.result, 5)
+        self.assertEqual(good.result(5), ({}, "fine"))
+        self.assertEqual(mgr._start_async_call("again",
+                method="DELETE").result(5), ({}, "fine"))
+
+    def test_tracker_survives_failed_check(self):
+        clt = self.client
+        mgr = clt._manager
+        tracker = mgr._tracker
+        check = tracker._check
+        calls = []
+
+        def flaky_check(jobs):
+            calls.append(jobs)
+            if len(calls) == 1:
+                raise RuntimeError("oops")
+            return check(jobs)
+
+        tracker._check = flaky_check
+        clt.method_delete = Mock(return_value=({}, {
+                "callbackUrl": "https://fake.example.com/status/fake",
+                "status": "RUNNING"}))
+        clt.method_get = Mock(return_value=({}, {"status": "COMPLETE",
+                "response": "fine"}))
+        job = mgr._start_async_call("fake", method="DELETE")
+        self.assertEqual(job.result(5), ({}, "fine"))
+        self.assertTrue(len(calls) >= 2)
+
     def test_process_async_error(self):
         clt = self.client
         mgr = clt._manager
@@ -871,10 +999,87 @@ class CloudDNSTest(unittest.TestCase):
     # method_get.
     @patch.object(pyrax.client.BaseClient, "method_get",
             new=lambda x, y: (None, None))
-    def test_client_empty_get_body_error(self):
+    @patch("time.sleep")
+    def test_client_empty_get_body_error(self, mock_sleep):
         clt = self.client
         self.assertRaises(exc.ServiceResponseFailure, clt.get_absolute_limits)
 
 
+
+class CloudDNSJobTest(unittest.TestCase):
+    def setUp(self):
+        self.backend = FakeBackend(dns_job_duration=0.05)
+        self.client = self.backend.client("dns")
+        self.client.set_delay(0.01)
+        self.domain = self.client.create(name="example.com",
+                emailAddress="me@example.com")
+
+    def test_no_wait(self):
+        dom = self.domain
+        self.backend.request_counts.clear()
+        jobs = [dom.add_records({"type": "A", "name": "www%s.example.com" %
+                num, "data": "192.0.2.%s" % num}, wait=False)
+                for num in range(50)]
+        self.assertEqual(self.backend.request_counts[("dns", "POST")], 50)
+        recs = [job.result(5)[0] for job in jobs]
+        self.assertEqual([rec.data for rec in recs],
+                ["192.0.2.%s" % num for num in range(50)])
+        self.assertEqual(len(dom.list_records(limit=100)), 50)
+        # Running jobs are listed together instead of checked one at a time.
+        self.assertTrue(self.backend.request_counts[("dns", "GET")] < 100)
+        jobs = [rec.update(ttl=600, wait=False) for rec in recs[:10]]
+        jobs += [rec.delete(wait=False) for rec in recs[10:]]
+        for job in jobs:
+            job.result(5)
+        self.assertEqual([rec.ttl for rec in dom.list_records()], [600] * 10)
+
+    def test_no_wait_error(self):
+        # A call that the service refuses outright fails at once...
+        self.assertRaises(exc.DomainRecordDeletionFailed,
+                self.domain.delete_record, "A-0", wait=False)
+        # ...while one that fails later fails through its job.
+        job = self.domain.update_records([{"id": "A-0",
+                "name": "www.example.com", "ttl": 600}], wait=False)
+        self.assertRaises(exc.DomainRecordUpdateFailed, job.result, 5)
+        self.assertIsNone(self.domain.delete(wait=False).result(5))
+        self.assertEqual(self.client.list(), [])
+
+    def test_job_listing_retried(self):
+        dns = self.backend.dns
+        tracker = self.client._manager._tracker
+        tracker.max_delay = 0.05
+        list_jobs = dns._list_jobs
+        calls = []
+
+        def flaky_list_jobs(query):
+            calls.append(query)
+            if len(calls) == 1:
+                return dns._error(400, "Bad Request")
+            return list_jobs(query)
+
+        dns._list_jobs = flaky_list_jobs
+        dns.job_duration = 0.3
+        jobs = [self.domain.add_records({"type": "A", "name":
+                "www%s.example.com" % num, "data": "192.0.2.1"}, wait=False)
+                for num in range(5)]
+        for job in jobs:
+            job.result(5)
+        # Listing went on after the first failure, instead of being dropped.
+        self.assertTrue(len(calls) > 1)
+        self.assertEqual(tracker._list_failures, 0)
+
+    def test_tracker_stops_when_idle(self):
+        tracker = self.client._manager._tracker
+        job = self.client.update_domain(self.domain, ttl=600, wait=False)
+        self.assertEqual(len(tracker), 1)
+        job.result(5)
+        self.assertEqual(len(tracker), 0)
+        for num in range(100):
+            if tracker._thread is None:
+                break
+            time.sleep(0.01)
+        self.assertIsNone(tracker._thread)
+
+
 if __name__ == "__main__":
     unittest.main()
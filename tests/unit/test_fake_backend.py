@@ -0,0 +1,254 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+import pyrax
+import pyrax.exceptions as exc
+import pyrax.http
+from pyrax.fake_backend import FakeBackend
+from pyrax.fake_backend import _parse_range
+
+
+class FakeBackendTest(unittest.TestCase):
+    def setUp(self):
+        self.backend = FakeBackend()
+
+    def _container(self, name="cont", count=0):
+        clt = self.backend.client("object_store")
+        cont = clt.create(name)
+        for num in range(count):
+            cont.store_object("obj%03d" % num, io.BytesIO(b"x" * (num + 1)))
+        return clt, cont
+
+    def test_parse_range(self):
+        self.assertEqual(_parse_range("bytes=0-9", 100), (0, 9))
+        self.assertEqual(_parse_range("bytes=90-", 100), (90, 99))
+        self.assertEqual(_parse_range("bytes=-10", 100), (90, 99))
+        self.assertEqual(_parse_range("bytes=50-500", 100), (50, 99))
+        self.assertIsNone(_parse_range("bytes=100-", 100))
+        self.assertIsNone(_parse_range("bytes=9-1", 100))
+        self.assertIsNone(_parse_range("items=0-9", 100))
+
+    def test_swift_listing(self):
+        clt, cont = self._container(count=25)
+        self.assertEqual(len(cont.get_objects()), 25)
+        objs = cont.get_objects(marker="obj009", limit=3)
+        self.assertEqual([obj.name for obj in objs],
+                ["obj010", "obj011", "obj012"])
+        self.assertEqual(objs[0].bytes, 11)
+        self.assertEqual(objs[0].hash, hashlib.md5(b"x" * 11).hexdigest())
+        objs = cont.get_objects(marker="obj020", end_marker="obj023")
+        self.assertEqual([obj.name for obj in objs], ["obj021", "obj022"])
+        clt.create("other")
+        self.assertEqual([c.name for c in clt.list(limit=1)], ["cont"])
+        self.assertEqual([c.name for c in clt.list(marker="cont")], ["other"])
+
+    def test_swift_listing_delimiter(self):
+        clt, cont = self._container()
+        for name in ("a/1", "a/2", "b/1", "c"):
+            cont.store_object(name, io.BytesIO(b"data"))
+        resp, body = clt.method_get("/cont?delimiter=/")
+        self.assertEqual(body, [{"subdir": "a/"}, {"subdir": "b/"},
+                body[2]])
+        self.assertEqual(body[2]["name"], "c")
+
+    def test_swift_container(self):
+        clt, cont = self._container(count=3)
+        cont = clt.get("cont")
+        self.assertEqual(cont.object_count, 3)
+        self.assertEqual(cont.total_bytes, 6)
+        self.assertRaises(exc.ClientException, clt.delete, "cont")
+        self.assertRaises(exc.NoSuchContainer, clt.get, "missing")
+        clt.bulk_delete("cont", ["obj000", "obj001", "obj002"])
+        clt.delete("cont")
+        self.assertEqual(clt.list(), [])
+
+    def test_swift_object(self):
+        clt, cont = self._container()
+        cont.create(obj_name="some file.txt", data=io.BytesIO(b"hello world"),
+                content_type="text/plain", metadata={"color": "blue"})
+        obj = cont.get_object("some file.txt")
+        self.assertEqual(obj.bytes, 11)
+        self.assertEqual(obj.content_type, "text/plain")
+        self.assertEqual(obj.get_metadata(), {"color": "blue"})
+        self.assertEqual(cont.fetch_object("some file.txt"), b"hello world")
+        cont.delete_object("some file.txt")
+        self.assertRaises(exc.NoSuchObject, cont.get_object, "some file.txt")
+
+    def test_swift_object_bad_etag(self):
+        clt, cont = self._container()
+        self.assertRaises(exc.ClientException, cont.store_object, "obj",
+                io.BytesIO(b"data"), etag="0" * 32)
+
+    def test_swift_object_expires(self):
+        clt, cont = self._container()
+        clt.method_put("/cont/obj", data=b"data",
+                headers={"X-Delete-At": str(time.time() - 1)})
+        self.assertEqual(cont.get_objects(), [])
+
+    def test_swift_range_get(self):
+        clt, cont = self._container()
+        cont.store_object("obj", io.BytesIO(b"0123456789"))
+        resp, body = clt.method_get("/cont/obj",
+                headers={"Range": "bytes=2-5"}, raw_content=True)
+        self.assertEqual(resp.status_code, 206)
+        self.assertEqual(body, b"2345")
+        self.assertEqual(resp.headers["Content-Range"], "bytes 2-5/10")
+        self.assertRaises(exc.ClientException, clt.method_get, "/cont/obj",
+                headers={"Range": "bytes=20-"})
+
+    def test_swift_streamed_get(self):
+        clt, cont = self._container()
+        cont.store_object("obj", io.BytesIO(b"0123456789"))
+        resp, body = clt.method_get("/cont/obj", stream=True)
+        self.assertEqual(body.read(4), b"0123")
+        self.assertEqual(b"".join(body.iter_chunks(3)), b"456789")
+
+    def test_swift_bulk_delete(self):
+        clt, cont = self._container(count=5)
+        ret = clt.bulk_delete("cont", ["obj000", "obj001", "missing"])
+        self.assertEqual(ret["deleted"], 2)
+        self.assertEqual(ret["not_found"], 1)
+        self.assertEqual(ret["status"], "200 OK")
+        self.assertEqual(len(cont.get_objects()), 3)
+
+    def test_swift_segmented_upload(self):
+        clt, cont = self._container()
+        clt.segment_size = 1000
+        data = os.urandom(3500)
+        cont.store_object("big", io.BytesIO(data))
+        self.assertEqual(cont.fetch_object("big"), data)
+        clt.use_slo = True
+        cont.store_object("big_slo", io.BytesIO(data))
+        self.assertEqual(cont.fetch_object("big_slo"), data)
+        resp, body = clt.method_head("/cont/big_slo")
+        self.assertEqual(resp.headers["X-Static-Large-Object"], "True")
+
+    def test_swift_parallel_download(self):
+        clt, cont = self._container()
+        data = os.urandom(10000)
+        cont.store_object("obj", io.BytesIO(data))
+        clt.download_chunk_size = 3000
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        clt.download_object("cont", "obj", tmpdir, parallel=True)
+        with open(os.path.join(tmpdir, "obj"), "rb") as ff:
+            self.assertEqual(ff.read(), data)
+        self.assertEqual(self.backend.request_counts[("object_store",
+                "GET")], 4)
+
+    def test_queues_messages(self):
+        clt = self.backend.client("queues")
+        queue = clt.create("jobs")
+        for num in range(25):
+            queue.post_message({"num": num}, 300)
+        self.assertEqual(queue.list(), [])
+        msgs = queue.list(echo=True)
+        self.assertEqual([msg.body["num"] for msg in msgs], list(range(25)))
+        msgs = queue.list(echo=True, limit=5)
+        self.assertEqual(len(msgs), 5)
+        self.assertEqual(clt.get_stats(queue)["total"], 25)
+        msg = queue.get_message(msgs[0].id)
+        self.assertEqual(msg.body, {"num": 0})
+        queue.delete_message(msg.id)
+        self.assertRaises(exc.NotFound, queue.get_message, msg.id)
+        queue.delete_by_ids([msg.id for msg in msgs[1:]])
+        self.assertEqual(clt.get_stats(queue)["total"], 20)
+
+    def test_queues_client_id_required(self):
+        clt = self.backend.client("queues")
+        queue = clt.create("jobs")
+        clt.client_id = ""
+        self.assertRaises(exc.ClientException, queue.post_message, "hi", 300)
+
+    def test_queues_claims(self):
+        clt = self.backend.client("queues")
+        queue = clt.create("jobs")
+        for num in range(15):
+            queue.post_message(num, 300)
+        claim = queue.claim_messages(300, 60, 10)
+        self.assertEqual(len(claim.messages), 10)
+        self.assertEqual(claim.messages[0].claim_id, claim.id)
+        other = queue.claim_messages(300, 60, 10)
+        self.assertEqual(len(other.messages), 5)
+        self.assertIsNone(queue.claim_messages(300, 60))
+        stats = clt.get_stats(queue)
+        self.assertEqual((stats["claimed"], stats["free"]), (15, 0))
+        msg = claim.messages[0]
+        self.assertRaises(exc.Forbidden, msg.delete)
+        msg.delete(claim_id=claim.id)
+        queue.update_claim(claim, ttl=600)
+        self.assertEqual(queue.get_claim(claim).ttl, 600)
+        queue.release_claim(other)
+        self.assertEqual(clt.get_stats(queue)["free"], 5)
+
+    def test_dns_domains(self):
+        clt = self.backend.client("dns")
+        clt.set_delay(0.001)
+        for num in range(5):
+            clt.create(name="example%s.com" % num,
+                    emailAddress="me@example.com")
+        self.assertEqual(len(clt.list()), 5)
+        page = clt.list(limit=2)
+        self.assertEqual([dom.name for dom in page],
+                ["example0.com", "example1.com"])
+        page = clt.list_next_page()
+        self.assertEqual([dom.name for dom in page],
+                ["example2.com", "example3.com"])
+        self.assertRaises(exc.DomainCreationFailed, clt.create,
+                name="example0.com", emailAddress="me@example.com")
+        dom = clt.find(name="example4.com")
+        clt.delete(dom)
+        self.assertEqual(len(clt.list()), 4)
+
+    def test_dns_records(self):
+        clt = self.backend.client("dns")
+        clt.set_delay(0.001)
+        dom = clt.create(name="example.com", emailAddress="me@example.com")
+        recs = dom.add_records([{"type": "A", "name": "www.example.com",
+                "data": "192.0.2.1"}, {"type": "A", "name": "ftp.example.com",
+                "data": "192.0.2.2"}])
+        self.assertEqual(len(recs), 2)
+        self.assertEqual(len(dom.list_records()), 2)
+        found = dom.search_records("A", name="ftp.example.com")
+        self.assertEqual([rec.data for rec in found], ["192.0.2.2"])
+        dom.update_record(recs[0], data="192.0.2.3")
+        self.assertEqual(dom.get_record(recs[0].id).data, "192.0.2.3")
+        dom.delete_record(recs[1])
+        self.assertEqual(len(dom.list_records()), 1)
+
+    def test_dns_running_job(self):
+        backend = FakeBackend(dns_job_duration=0.05)
+        clt = backend.client("dns")
+        clt.set_timeout(5)
+        clt.set_delay(0.01)
+        dom = clt.create(name="example.com", emailAddress="me@example.com")
+        self.assertEqual(dom.name, "example.com")
+        self.assertTrue(backend.request_counts[("dns", "GET")] > 1)
+
+    def test_install(self):
+        clt = self.backend.client("object_store")
+        clt.transport = None
+        with self.backend:
+            self.assertIs(pyrax.http.get_transport(), self.backend)
+            clt.create("cont")
+        self.assertIsNone(pyrax.http.get_transport())
+        self.assertEqual(self.backend.request_counts[("object_store",
+                "PUT")], 1)
+
+    def test_latency(self):
+        backend = FakeBackend(latency=0.02)
+        clt = backend.client("object_store")
+        start = time.time()
+        clt.list()
+        self.assertTrue(time.time() - start >= 0.02)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,10 +1,16 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
+import email.utils
+import io
 import json
 import logging
 import random
+import threading
+import time
 import unittest
 
+from six.moves import BaseHTTPServer
+
 from mock import patch
 from mock import MagicMock as Mock
 
@@ -14,6 +20,60 @@ import pyrax.exceptions as exc
 from pyrax import client
 
 from pyrax import fakes
+from pyrax import instrumentation
+
+
+class FaultInjectingServer(BaseHTTPServer.HTTPServer):
+    """
+    A local HTTP server that answers each request with the next of a
+    scripted list of faults. Each fault is a (status, headers) pair, or None
+    to drop the connection without answering. Once the script runs out,
+    requests get a 200 with a small JSON body.
+    """
+    def __init__(self, faults):
+        self.faults = list(faults)
+        self.received = []
+        BaseHTTPServer.HTTPServer.__init__(self, ("127.0.0.1", 0),
+                FaultInjectingHandler)
+        self.url = "http://127.0.0.1:%s" % self.server_address[1]
+        self.thread = threading.Thread(target=self.serve_forever,
+                kwargs={"poll_interval": 0.01})
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class FaultInjectingHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    def _handle(self):
+        length = int(self.headers.get("content-length") or 0)
+        body = self.rfile.read(length) if length else b""
+        self.server.received.append((self.command, self.path, body))
+        if self.server.faults:
+            fault = self.server.faults.pop(0)
+        else:
+            fault = (200, {})
+        if fault is None:
+            # Simulate a reset connection.
+            self.close_connection = True
+            return
+        status, headers = fault
+        content = json.dumps({"message": "fault", "details": status})
+        content = content.encode("utf-8")
+        self.send_response(status)
+        for key, val in headers.items():
+            self.send_header(key, val)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    do_GET = do_HEAD = do_PUT = do_POST = do_DELETE = _handle
+
+    def log_message(self, *args):
+        pass
 
 
 
@@ -101,6 +161,594 @@ class HttpTest(unittest.TestCase):
                 headers=headers, data=jbody)
         self.http.req_methods[mthd] = sav_method
 
+    def test_request_connection_pool(self):
+        mthd = random.choice(list(self.http.req_methods.keys()))
+        resp = fakes.FakeResponse()
+        pool = Mock()
+        pool.request.return_value = resp
+        uri = utils.random_unicode()
+        headers = {"a": "b"}
+        self.http.request(mthd, uri, headers=headers, connection_pool=pool)
+        pool.request.assert_called_once_with(mthd.upper(), uri,
+                headers=headers)
+
+    @patch("requests.Session")
+    def test_connection_pool_session(self, mock_session):
+        pool = self.http.ConnectionPool(pool_connections=3, pool_maxsize=7)
+        sess = pool.session
+        self.assertEqual(pool.session, sess)
+        self.assertEqual(mock_session.call_count, 1)
+        adapter = sess.mount.call_args[0][1]
+        self.assertEqual(adapter._pool_connections, 3)
+        self.assertEqual(adapter._pool_maxsize, 7)
+
+    @patch("requests.Session")
+    def test_connection_pool_idle_eviction(self, mock_session):
+        pool = self.http.ConnectionPool(idle_timeout=10)
+        sess = pool.session
+        pool._last_used -= 11
+        pool.session
+        sess.close.assert_called_once_with()
+        self.assertEqual(mock_session.call_count, 2)
+
+    @patch("requests.Session")
+    def test_connection_pool_no_idle_eviction(self, mock_session):
+        pool = self.http.ConnectionPool(idle_timeout=0)
+        sess = pool.session
+        pool._last_used -= 1000
+        pool.session
+        self.assertFalse(sess.close.called)
+        self.assertEqual(mock_session.call_count, 1)
+
+    def test_request_stream(self):
+        mthd = random.choice(list(self.http.req_methods.keys()))
+        sav_method = self.http.req_methods[mthd]
+        resp = fakes.FakeResponse()
+        resp.json = Mock()
+        self.http.req_methods[mthd] = Mock(return_value=resp)
+        uri = utils.random_unicode()
+        ret_resp, body = self.http.request(mthd, uri, stream=True,
+                chunk_size=42)
+        self.http.req_methods[mthd].assert_called_once_with(uri, headers={},
+                stream=True)
+        self.assertTrue(isinstance(body, self.http.StreamingBody))
+        self.assertEqual(body.chunk_size, 42)
+        self.assertFalse(resp.json.called)
+        self.http.req_methods[mthd] = sav_method
+
+    def test_request_stream_error(self):
+        mthd = random.choice(list(self.http.req_methods.keys()))
+        sav_method = self.http.req_methods[mthd]
+        resp = fakes.FakeResponse()
+        resp.status_code = 404
+        self.http.req_methods[mthd] = Mock(return_value=resp)
+        uri = utils.random_unicode()
+        self.assertRaises(exc.NotFound, self.http.request, mthd, uri,
+                stream=True)
+        self.http.req_methods[mthd] = sav_method
+
+    def test_streaming_body_iter(self):
+        resp = fakes.FakeResponse()
+        resp.iter_content = Mock(return_value=iter(["ab", "cd"]))
+        body = self.http.StreamingBody(resp, chunk_size=2)
+        self.assertEqual(list(body), ["ab", "cd"])
+        resp.iter_content.assert_called_once_with(2)
+
+    def test_streaming_body_read(self):
+        resp = fakes.FakeResponse()
+        resp.raw = Mock()
+        resp.raw.read = Mock(return_value=b"abc")
+        resp.iter_content = Mock(return_value=iter([b"de", b"f"]))
+        body = self.http.StreamingBody(resp)
+        self.assertEqual(body.read(3), b"abc")
+        resp.raw.read.assert_called_once_with(3, decode_content=True)
+        self.assertEqual(body.read(), b"def")
+        resp.iter_content.assert_called_once_with(
+                self.http.DEFAULT_STREAM_CHUNKSIZE)
+
+    def test_streaming_body_close(self):
+        resp = fakes.FakeResponse()
+        resp.close = Mock()
+        with self.http.StreamingBody(resp) as body:
+            pass
+        body.close()
+        resp.close.assert_called_once_with()
+        self.assertTrue(body.closed)
+        self.assertEqual(body.read(), b"")
+        self.assertEqual(list(body), [])
+
+    def test_connection_pool_request(self):
+        pool = self.http.ConnectionPool()
+        sess = pool._session = Mock()
+        pool._last_used = time.time()
+        uri = utils.random_unicode()
+        pool.request("GET", uri, headers={})
+        sess.request.assert_called_once_with("GET", uri, headers={})
+
+    def test_connection_pool_close(self):
+        pool = self.http.ConnectionPool()
+        sess = pool._session = Mock()
+        pool.close()
+        sess.close.assert_called_once_with()
+        self.assertIsNone(pool._session)
+
+    def test_create_connection_pool(self):
+        sav = pyrax.get_setting
+        settings = {"use_connection_pool": "True", "pool_connections": "4",
+                "pool_maxsize": 20, "pool_idle_timeout": None}
+        pyrax.get_setting = settings.get
+        pool = self.http.create_connection_pool()
+        self.assertEqual(pool.pool_connections, 4)
+        self.assertEqual(pool.pool_maxsize, 20)
+        self.assertEqual(pool.idle_timeout,
+                self.http.DEFAULT_POOL_IDLE_TIMEOUT)
+        pyrax.get_setting = sav
+
+    def test_create_connection_pool_disabled(self):
+        sav = pyrax.get_setting
+        for val in (False, "False", "0"):
+            pyrax.get_setting = {"use_connection_pool": val}.get
+            self.assertIsNone(self.http.create_connection_pool())
+        pyrax.get_setting = sav
+
+    def test_response_cache_policies(self):
+        cache = self.http.ResponseCache(ttl=5,
+                policies=[(r"^GET /flavors", 100), (r"^HEAD /", 0)])
+        self.assertEqual(cache.ttl_for("GET", "/flavors/1"), 100)
+        self.assertEqual(cache.ttl_for("HEAD", "/cont"), 0)
+        self.assertEqual(cache.ttl_for("GET", "/instances"), 5)
+
+    def test_response_cache_store_get(self):
+        cache = self.http.ResponseCache(ttl=60)
+        resp = fakes.FakeResponse()
+        cache.store("GET", "uri", "/x", resp, {"a": 1})
+        entry = cache.get("GET", "uri")
+        self.assertTrue(entry["fresh"])
+        self.assertEqual(cache.response(entry), (resp, {"a": 1}))
+        self.assertIsNone(cache.get("HEAD", "uri"))
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 1)
+
+    def test_response_cache_no_ttl(self):
+        cache = self.http.ResponseCache()
+        resp = fakes.FakeResponse()
+        resp.headers = {}
+        cache.store("GET", "uri", "/x", resp, "body")
+        self.assertEqual(cache.stats()["entries"], 0)
+        resp.headers = {"last-modified": "Tue, 01 Jan 2030 00:00:00 GMT"}
+        cache.store("GET", "uri", "/x", resp, "body")
+        entry = cache.get("GET", "uri")
+        self.assertFalse(entry["fresh"])
+        self.assertEqual(cache.conditional_headers(entry),
+                {"If-Modified-Since": "Tue, 01 Jan 2030 00:00:00 GMT"})
+
+    def test_response_cache_lru(self):
+        cache = self.http.ResponseCache(ttl=60, max_entries=2)
+        resp = fakes.FakeResponse()
+        cache.store("GET", "a", "/a", resp, "a")
+        cache.store("GET", "b", "/b", resp, "b")
+        cache.get("GET", "a")
+        cache.store("GET", "c", "/c", resp, "c")
+        self.assertIsNotNone(cache.get("GET", "a"))
+        self.assertIsNone(cache.get("GET", "b"))
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_response_cache_invalidate(self):
+        cache = self.http.ResponseCache(ttl=60)
+        resp = fakes.FakeResponse()
+        for path in ("/lbs", "/lbs/1", "/lbs/1/nodes", "/lbs/2", "/other"):
+            cache.store("GET", path, path, resp, path)
+        cache.invalidate("/lbs/1")
+        remaining = sorted(entry[1] for entry in cache._entries)
+        self.assertEqual(remaining, ["/lbs/2", "/other"])
+        cache.invalidate("/")
+        self.assertEqual(cache.stats()["entries"], 0)
+
+    def test_create_response_cache(self):
+        sav = pyrax.get_setting
+        pyrax.get_setting = {}.get
+        self.assertIsNone(self.http.create_response_cache())
+        settings = {"use_response_cache": "True", "response_cache_size": "9",
+                "response_cache_ttl": "30"}
+        pyrax.get_setting = settings.get
+        cache = self.http.create_response_cache(policies=[("x", 1)])
+        self.assertEqual(cache.max_entries, 9)
+        self.assertEqual(cache.ttl, 30)
+        self.assertEqual(len(cache.policies), 1)
+        pyrax.get_setting = sav
+
+    def test_retry_backoff_delay(self):
+        policy = self.http.RetryPolicy(backoff=1, backoff_max=5)
+        for attempt, ceiling in ((0, 1), (1, 2), (2, 4), (5, 5)):
+            for ii in range(20):
+                delay = policy.backoff_delay(attempt)
+                self.assertTrue(0 <= delay <= ceiling)
+
+    def test_parse_retry_after(self):
+        parse = self.http.RetryPolicy.parse_retry_after
+        self.assertIsNone(parse(None))
+        self.assertIsNone(parse("soon"))
+        self.assertEqual(parse("7"), 7.0)
+        self.assertEqual(parse("-3"), 0.0)
+        future = email.utils.formatdate(time.time() + 30, usegmt=True)
+        self.assertTrue(25 < parse(future) <= 30)
+
+    def test_retry_delay(self):
+        policy = self.http.RetryPolicy(max_retries=2, backoff=0)
+        err = exc.ClientException(503)
+        self.assertEqual(policy.retry_delay("GET", err, 0), 0)
+        self.assertEqual(policy.retry_delay("DELETE", err, 1), 0)
+        self.assertIsNone(policy.retry_delay("GET", err, 2))
+        # Not idempotent
+        self.assertIsNone(policy.retry_delay("POST", err, 0))
+        # Not a retryable status
+        self.assertIsNone(policy.retry_delay("GET", exc.NotFound(404), 0))
+        # Not an HTTP error
+        self.assertIsNone(policy.retry_delay("GET", ValueError(), 0))
+        self.assertEqual(policy.stats()["retries"], 2)
+
+    def test_retry_delay_rate_limited(self):
+        policy = self.http.RetryPolicy(backoff=0)
+        err = exc.ClientException(429)
+        err.retry_after = "12"
+        self.assertEqual(policy.retry_delay("POST", err, 0), 12)
+        err.retry_after = "120"
+        self.assertIsNone(policy.retry_delay("POST", err, 0))
+        over = exc.OverLimit(413)
+        self.assertEqual(policy.retry_delay("PATCH", over, 0), 0)
+
+    def test_retry_delay_connection_errors(self):
+        policy = self.http.RetryPolicy(backoff=0)
+        conn_err = self.http.requests.exceptions.ConnectionError()
+        timeout = self.http.requests.exceptions.ConnectTimeout()
+        self.assertEqual(policy.retry_delay("GET", conn_err, 0), 0)
+        self.assertIsNone(policy.retry_delay("POST", conn_err, 0))
+        self.assertEqual(policy.retry_delay("POST", timeout, 0), 0)
+
+    def test_retry_budget(self):
+        budget = self.http.RetryBudget(ratio=0.5, max_tokens=2)
+        policy = self.http.RetryPolicy(backoff=0, budget=budget)
+        err = exc.ClientException(500)
+        self.assertEqual(policy.retry_delay("GET", err, 0), 0)
+        self.assertEqual(policy.retry_delay("GET", err, 0), 0)
+        self.assertIsNone(policy.retry_delay("GET", err, 0))
+        self.assertEqual(budget.exhausted, 1)
+        budget.deposit()
+        self.assertIsNone(policy.retry_delay("GET", err, 0))
+        budget.deposit()
+        self.assertEqual(policy.retry_delay("GET", err, 0), 0)
+        for ii in range(10):
+            budget.deposit()
+        self.assertEqual(budget.tokens, 2)
+
+    def test_create_retry_policy(self):
+        sav = pyrax.get_setting
+        settings = {"max_retries": "5", "retry_backoff": "0.25"}
+        pyrax.get_setting = Mock(side_effect=settings.get)
+        policy = self.http.create_retry_policy()
+        self.assertEqual(policy.max_retries, 5)
+        self.assertEqual(policy.backoff, 0.25)
+        policy = self.http.create_retry_policy({"max_retries": 1})
+        self.assertEqual(policy.max_retries, 1)
+        settings.clear()
+        policy = self.http.create_retry_policy()
+        self.assertEqual(policy.max_retries, self.http.DEFAULT_MAX_RETRIES)
+        pyrax.get_setting = sav
+
+    def _stub_client(self, faults, **policy_args):
+        server = FaultInjectingServer(faults)
+        self.addCleanup(server.stop)
+        save_conf = client.BaseClient._configure_manager
+        client.BaseClient._configure_manager = Mock()
+        ident = Mock(token="token", tenant_id="tenant")
+        clt = client.BaseClient(ident, management_url=server.url)
+        client.BaseClient._configure_manager = save_conf
+        policy_args.setdefault("backoff", 0.001)
+        clt.retry_policy = self.http.RetryPolicy(**policy_args)
+        return server, clt
+
+    def test_retry_stub_server_errors(self):
+        server, clt = self._stub_client([(503, {}), (502, {})])
+        resp, body = clt.method_get("/things")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(server.received), 3)
+        self.assertEqual(clt.get_retry_stats()["retries"], 2)
+
+    def test_retry_stub_gives_up(self):
+        server, clt = self._stub_client([(500, {})] * 5, max_retries=2)
+        self.assertRaises(exc.ClientException, clt.method_delete, "/things/1")
+        self.assertEqual(len(server.received), 3)
+
+    def test_retry_stub_post_not_retried(self):
+        server, clt = self._stub_client([(503, {})])
+        self.assertRaises(exc.ClientException, clt.method_post, "/things",
+                body={"a": 1})
+        self.assertEqual(len(server.received), 1)
+
+    def test_retry_stub_post_rate_limited(self):
+        server, clt = self._stub_client([(429, {"Retry-After": "0"})])
+        resp, body = clt.method_post("/things", body={"a": 1})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(server.received), 2)
+
+    def test_retry_stub_retry_after_too_long(self):
+        server, clt = self._stub_client([(503, {"Retry-After": "3600"})])
+        self.assertRaises(exc.ClientException, clt.method_get, "/things")
+        self.assertEqual(len(server.received), 1)
+
+    def test_retry_stub_connection_reset(self):
+        server, clt = self._stub_client([None])
+        resp, body = clt.method_head("/things")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(server.received), 2)
+
+    def test_retry_stub_rewinds_file(self):
+        server, clt = self._stub_client([(500, {})])
+        data = io.BytesIO(b"0123456789")
+        data.seek(2)
+        clt.method_put("/things/1", data=data)
+        self.assertEqual(len(server.received), 2)
+        self.assertEqual(server.received[0][2], b"23456789")
+        self.assertEqual(server.received[1][2], b"23456789")
+
+    def test_retry_stub_generator_not_retried(self):
+        server, clt = self._stub_client([])
+        clt._time_request = Mock(side_effect=exc.ClientException(503))
+
+        def chunks():
+            yield b"0123"
+            yield b"4567"
+
+        self.assertRaises(exc.ClientException, clt._retry_request,
+                "/things/1", "PUT", data=chunks())
+        self.assertEqual(clt._time_request.call_count, 1)
+        self.assertEqual(clt.get_retry_stats()["retries"], 0)
+
+    def test_retry_stub_budget(self):
+        budget = self.http.RetryBudget(ratio=0, max_tokens=1)
+        server, clt = self._stub_client([(503, {})] * 3, budget=budget)
+        self.assertRaises(exc.ClientException, clt.method_get, "/things")
+        self.assertEqual(len(server.received), 2)
+        self.assertEqual(clt.get_retry_stats()["budget_exhausted"], 1)
+
+    def test_token_bucket(self):
+        bucket = self.http.TokenBucket(rate=2, capacity=2, tokens=1)
+        now = bucket.updated
+        self.assertEqual(bucket.reserve(now), 0)
+        self.assertEqual(bucket.reserve(now), 0.5)
+        self.assertEqual(bucket.reserve(now), 1.0)
+        # Refills at 2 per second, but never beyond its capacity.
+        self.assertEqual(bucket.reserve(now + 10), 0)
+        self.assertEqual(bucket.tokens, 1)
+
+    def test_rate_limiter_load(self):
+        rate_limits = [
+                {"uri": "*", "regex": ".*", "limit": [
+                    {"verb": "POST", "value": 10, "unit": "MINUTE",
+                        "remaining": 10},
+                    {"verb": "GET", "value": 5, "unit": "SECOND"},
+                    {"verb": "PUT", "value": 5, "unit": "FORTNIGHT"}]},
+                {"uri": "/domains*", "limit": [
+                    {"verb": "DELETE", "value": 60, "unit": "HOUR"}]},
+                {"uri": "bad", "regex": "(", "limit": [
+                    {"verb": "GET", "value": 1, "unit": "SECOND"}]},
+                ]
+        limiter = self.http.RateLimiter(rate_limits)
+        self.assertTrue(limiter.loaded)
+        self.assertEqual(len(limiter.rules), 3)
+        verb, regex, bucket = limiter.rules[0]
+        self.assertEqual(verb, "POST")
+        self.assertEqual(bucket.rate, 10 / 60.0)
+        verb, regex, bucket = limiter.rules[2]
+        self.assertTrue(regex.search("/domains/1234"))
+        self.assertFalse(regex.search("/limits"))
+
+    def test_rate_limiter_reserve(self):
+        rate_limits = [{"uri": "/domains*", "regex": "^/domains",
+                "limit": [{"verb": "POST", "value": 1, "unit": "SECOND",
+                    "remaining": 1}]}]
+        limiter = self.http.RateLimiter(rate_limits)
+        self.assertEqual(limiter.reserve("GET", "/domains"), 0)
+        self.assertEqual(limiter.reserve("post", "/other"), 0)
+        self.assertEqual(limiter.reserve("POST", "/domains"), 0)
+        delay = limiter.reserve("POST", "/domains/1")
+        self.assertTrue(0.9 < delay <= 1)
+        stats = limiter.stats()
+        self.assertEqual(stats["rules"], 1)
+        self.assertEqual(stats["throttled"], 1)
+        self.assertEqual(stats["wait_time"], delay)
+
+    @patch("time.sleep")
+    def test_rate_limiter_acquire(self, mock_sleep):
+        limiter = self.http.RateLimiter([{"regex": ".*", "limit": [
+                {"verb": "*", "value": 1, "unit": "MINUTE",
+                    "remaining": 0}]}])
+        delay = limiter.acquire("DELETE", "/things/1")
+        mock_sleep.assert_called_once_with(delay)
+        self.assertTrue(59 < delay <= 60)
+
+    def test_rate_limiter_ensure_loaded(self):
+        limiter = self.http.RateLimiter()
+        self.assertFalse(limiter.loaded)
+        rate_limits = [{"regex": ".*", "limit": [{"verb": "GET",
+                "value": 1, "unit": "SECOND"}]}]
+
+        def fetch():
+            # Requests made while fetching must not try to load again.
+            limiter.ensure_loaded(fetch_again)
+            return rate_limits
+
+        fetch_again = Mock()
+        limiter.ensure_loaded(fetch)
+        self.assertFalse(fetch_again.called)
+        self.assertEqual(len(limiter.rules), 1)
+        fetch_once_more = Mock()
+        limiter.ensure_loaded(fetch_once_more)
+        self.assertFalse(fetch_once_more.called)
+
+    def test_rate_limiter_ensure_loaded_fails(self):
+        limiter = self.http.RateLimiter()
+        limiter.ensure_loaded(Mock(side_effect=NotImplementedError))
+        self.assertTrue(limiter.loaded)
+        self.assertEqual(limiter.rules, [])
+        self.assertEqual(limiter.reserve("GET", "/"), 0)
+
+    def test_rate_limiter_threads(self):
+        limiter = self.http.RateLimiter([{"regex": ".*", "limit": [
+                {"verb": "GET", "value": 10, "unit": "SECOND",
+                    "remaining": 0}]}])
+        delays = []
+
+        def reserve():
+            delays.append(limiter.reserve("GET", "/"))
+
+        threads = [threading.Thread(target=reserve) for ii in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # Each request is given its own slot, 0.1 seconds apart.
+        delays.sort()
+        for pos, delay in enumerate(delays):
+            self.assertAlmostEqual(delay, (pos + 1) * 0.1, places=1)
+
+    def test_create_rate_limiter(self):
+        sav = pyrax.get_setting
+        pyrax.get_setting = {}.get
+        self.assertIsNone(self.http.create_rate_limiter())
+        pyrax.get_setting = {"use_rate_limiter": "True"}.get
+        limiter = self.http.create_rate_limiter()
+        self.assertFalse(limiter.loaded)
+        pyrax.get_setting = sav
+
+    def test_circuit_breaker_opens(self):
+        breaker = self.http.CircuitBreaker("http://fake", failure_rate=0.5,
+                min_requests=4, cooldown=30)
+        breaker.record()
+        breaker.record(exc.ClientException(500))
+        breaker.record(exc.NotFound(404))
+        self.assertEqual(breaker.state, breaker.CLOSED)
+        breaker.record(self.http.requests.exceptions.ConnectionError())
+        self.assertEqual(breaker.state, breaker.OPEN)
+        self.assertFalse(breaker.allows_requests())
+        self.assertRaises(exc.CircuitOpen, breaker.before_request)
+        stats = breaker.stats()
+        self.assertEqual(stats["times_opened"], 1)
+        self.assertEqual(stats["rejected"], 1)
+
+    def test_circuit_breaker_min_requests(self):
+        breaker = self.http.CircuitBreaker("http://fake", min_requests=3)
+        breaker.record(exc.ClientException(503))
+        breaker.record(exc.ClientException(503))
+        self.assertEqual(breaker.state, breaker.CLOSED)
+        breaker.before_request()
+
+    def test_circuit_breaker_window(self):
+        breaker = self.http.CircuitBreaker("http://fake", window=10,
+                min_requests=2)
+        breaker.record(exc.ClientException(500))
+        breaker._results[0] = (time.time() - 20, True)
+        breaker.record(exc.ClientException(500))
+        self.assertEqual(breaker.state, breaker.CLOSED)
+        self.assertEqual(breaker.stats()["requests"], 1)
+
+    def test_circuit_breaker_half_open(self):
+        breaker = self.http.CircuitBreaker("http://fake", min_requests=1,
+                cooldown=0)
+        self.assertEqual(breaker.record(exc.ClientException(500)),
+                (breaker.CLOSED, breaker.OPEN))
+        self.assertEqual(breaker.state, breaker.HALF_OPEN)
+        self.assertTrue(breaker.allows_requests())
+        # Only one trial request is let through.
+        self.assertEqual(breaker.before_request(),
+                (breaker.OPEN, breaker.HALF_OPEN))
+        self.assertFalse(breaker.allows_requests())
+        self.assertRaises(exc.CircuitOpen, breaker.before_request)
+        self.assertEqual(breaker.record(exc.ClientException(502)),
+                (breaker.HALF_OPEN, breaker.OPEN))
+        self.assertEqual(breaker.times_opened, 2)
+        breaker.before_request()
+        self.assertEqual(breaker.record(), (breaker.HALF_OPEN, breaker.CLOSED))
+        self.assertEqual(breaker.state, breaker.CLOSED)
+        self.assertEqual(breaker.stats()["requests"], 0)
+        self.assertIsNone(breaker.record())
+
+    def test_circuit_breaker_registry(self):
+        self.http.reset_circuit_breakers()
+        self.addCleanup(self.http.reset_circuit_breakers)
+        sav = pyrax.get_setting
+        pyrax.get_setting = {"circuit_breaker_cooldown": "5"}.get
+        one = self.http.get_circuit_breaker("https://a.example.com/v1/123/x")
+        two = self.http.get_circuit_breaker("https://a.example.com/v2/y")
+        other = self.http.get_circuit_breaker("https://b.example.com/v1")
+        pyrax.get_setting = sav
+        self.assertTrue(one is two)
+        self.assertFalse(one is other)
+        self.assertEqual(one.endpoint, "https://a.example.com")
+        self.assertEqual(one.cooldown, 5)
+        stats = self.http.circuit_breaker_stats()
+        self.assertEqual(sorted(stats.keys()), ["https://a.example.com",
+                "https://b.example.com"])
+
+    def test_circuit_breaker_stub_server(self):
+        self.http.reset_circuit_breakers()
+        self.addCleanup(self.http.reset_circuit_breakers)
+        server, clt = self._stub_client([(500, {})] * 3, max_retries=0)
+        clt.use_circuit_breaker = True
+        clt.circuit_breaker_overrides = {"min_requests": 3, "cooldown": 60}
+        sink = instrumentation.RingBufferSink()
+        clt.add_metrics_sink(sink)
+        for ii in range(3):
+            self.assertRaises(exc.ClientException, clt.method_get, "/things")
+        self.assertRaises(exc.CircuitOpen, clt.method_get, "/things")
+        self.assertEqual(len(server.received), 3)
+        self.assertEqual(clt.get_circuit_breaker_stats()["state"], "open")
+        event = sink.events()[-1]
+        self.assertTrue(isinstance(event.error, exc.CircuitOpen))
+
+    def test_request_transport(self):
+        resp = fakes.FakeResponse()
+        transport = Mock()
+        transport.request.return_value = resp
+        pool = Mock()
+        self.http.request("get", "http://example.com/x", transport=transport,
+                connection_pool=pool, headers={})
+        transport.request.assert_called_once_with("GET",
+                "http://example.com/x", headers={})
+        self.assertFalse(pool.request.called)
+
+    def test_set_transport(self):
+        resp = fakes.FakeResponse()
+        transport = Mock()
+        transport.request.return_value = resp
+        pool = Mock()
+        self.http.set_transport(transport)
+        self.addCleanup(self.http.set_transport, None)
+        self.assertIs(self.http.get_transport(), transport)
+        self.http.request("PUT", "http://example.com/x", connection_pool=pool,
+                data="abc")
+        transport.request.assert_called_once_with("PUT",
+                "http://example.com/x", headers={}, data="abc")
+        self.assertFalse(pool.request.called)
+        self.http.set_transport(None)
+        pool.request.return_value = resp
+        self.http.request("GET", "http://example.com/x", connection_pool=pool)
+        self.assertTrue(pool.request.called)
+
+    def test_client_transport(self):
+        save_conf = client.BaseClient._configure_manager
+        client.BaseClient._configure_manager = Mock()
+        ident = Mock(token="token", tenant_id="tenant")
+        clt = client.BaseClient(ident, management_url="http://example.com")
+        client.BaseClient._configure_manager = save_conf
+        clt.connection_pool = Mock()
+        clt.transport = Mock()
+        clt.transport.request.return_value = fakes.FakeResponse()
+        clt.method_get("/things")
+        self.assertEqual(clt.transport.request.call_args[0],
+                ("GET", "http://example.com/things"))
+        self.assertFalse(clt.connection_pool.request.called)
+
     def test_http_log_req(self):
         args = ("a", "b")
         kwargs = {"headers": {"c": "C"}}
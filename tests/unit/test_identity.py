@@ -6,6 +6,8 @@ import json
 import os
 import random
 import sys
+import threading
+import time
 import unittest
 
 from six import StringIO
@@ -659,7 +661,7 @@ class IdentityTest(unittest.TestCase):
         self.assertEqual(self.password, key)
 
     def test_authenticate(self):
-        savrequest = pyrax.http.request
+        self.addCleanup(setattr, pyrax.http, "request", pyrax.http.request)
         fake_resp = fakes.FakeIdentityResponse()
         fake_body = fakes.fake_identity_response
         pyrax.http.request = Mock(return_value=(fake_resp, fake_body))
@@ -669,64 +671,114 @@ class IdentityTest(unittest.TestCase):
                 # Necessary for testing to avoid NotImplementedError.
                 utils.add_method(ident, lambda self: "", "_get_auth_endpoint")
             ident.authenticate()
-        pyrax.http.request = savrequest
+
+    def test_token_cache(self):
+        with utils.SelfDeletingTempDirectory() as tmpdir:
+            cache = base_identity.TokenCache(os.path.join(tmpdir, "tokens"))
+            key = cache.key("user", "tenant", "http://auth", "secret")
+            self.assertNotEqual(key, cache.key("user", "tenant",
+                    "http://auth", "other"))
+            self.assertIsNone(cache.load(key))
+            cache.save(key, {"a": 1})
+            pth = os.path.join(cache.directory, key)
+            self.assertEqual(os.stat(pth).st_mode & 0o777, 0o600)
+            self.assertEqual(os.stat(cache.directory).st_mode & 0o777, 0o700)
+            self.assertEqual(cache.load(key), {"a": 1})
+            cache.save(key, {"a": 2})
+            self.assertEqual(cache.load(key), {"a": 2})
+            # Files that others can read are not trusted.
+            os.chmod(pth, 0o644)
+            self.assertIsNone(cache.load(key))
+            cache.delete(key)
+            self.assertFalse(os.path.exists(pth))
+            self.assertEqual(cache.hits, 2)
+
+    def test_authenticate_token_cache(self):
+        self.addCleanup(setattr, pyrax.http, "request", pyrax.http.request)
+        fake_resp = fakes.FakeIdentityResponse()
+        fake_body = fakes.fake_identity_response
+        pyrax.http.request = Mock(return_value=(fake_resp, fake_body))
+        with utils.SelfDeletingTempDirectory() as tmpdir:
+            idents = []
+            for ii in range(2):
+                ident = self.rax_identity_class(username=self.username,
+                        password=self.password)
+                ident.token_cache = base_identity.TokenCache(tmpdir)
+                ident.authenticate()
+                idents.append(ident)
+            self.assertEqual(pyrax.http.request.call_count, 1)
+            self.assertEqual(idents[1].token, idents[0].token)
+            self.assertTrue(idents[1].authenticated)
+            self.assertEqual(sorted(idents[1].services.keys()),
+                    sorted(idents[0].services.keys()))
+            # A token that has been rejected isn't taken from the cache.
+            idents[1].authenticate()
+            self.assertEqual(pyrax.http.request.call_count, 2)
+
+    def test_create_token_cache(self):
+        sav = pyrax.get_setting
+        pyrax.get_setting = Mock(return_value=None)
+        self.assertIsNone(base_identity._create_token_cache())
+        pyrax.get_setting = Mock(return_value="True")
+        cache = base_identity._create_token_cache()
+        self.assertEqual(cache.directory, os.path.expanduser(
+                base_identity.DEFAULT_TOKEN_CACHE_DIR))
+        pyrax.get_setting = Mock(return_value="/tmp/tokens")
+        cache = base_identity._create_token_cache()
+        self.assertEqual(cache.directory, "/tmp/tokens")
+        pyrax.get_setting = sav
 
     def test_authenticate_fail_creds(self):
         ident = self.rax_identity_class(username="BAD", password="BAD")
-        savrequest = pyrax.http.request
+        self.addCleanup(setattr, pyrax.http, "request", pyrax.http.request)
         fake_resp = fakes.FakeIdentityResponse()
         fake_resp.status_code = 401
         fake_body = fakes.fake_identity_response
         pyrax.http.request = Mock(return_value=(fake_resp, fake_body))
         self.assertRaises(exc.AuthenticationFailed, ident.authenticate)
-        pyrax.http.request = savrequest
 
     def test_authenticate_fail_other(self):
         ident = self.rax_identity_class(username="BAD", password="BAD")
-        savrequest = pyrax.http.request
+        self.addCleanup(setattr, pyrax.http, "request", pyrax.http.request)
         fake_resp = fakes.FakeIdentityResponse()
         fake_resp.status_code = 500
         fake_body = {u'unauthorized': {
                 u'message': u'Username or api key is invalid', u'code': 500}}
         pyrax.http.request = Mock(return_value=(fake_resp, fake_body))
         self.assertRaises(exc.InternalServerError, ident.authenticate)
-        pyrax.http.request = savrequest
 
     def test_authenticate_fail_no_message(self):
         ident = self.rax_identity_class(username="BAD", password="BAD")
-        savrequest = pyrax.http.request
+        self.addCleanup(setattr, pyrax.http, "request", pyrax.http.request)
         fake_resp = fakes.FakeIdentityResponse()
         fake_resp.status_code = 500
         fake_body = {u'unauthorized': {
                 u'bogus': u'Username or api key is invalid', u'code': 500}}
         pyrax.http.request = Mock(return_value=(fake_resp, fake_body))
         self.assertRaises(exc.InternalServerError, ident.authenticate)
-        pyrax.http.request = savrequest
 
     def test_authenticate_fail_gt_299(self):
         ident = self.rax_identity_class(username="BAD", password="BAD")
-        savrequest = pyrax.http.request
+        self.addCleanup(setattr, pyrax.http, "request", pyrax.http.request)
         fake_resp = fakes.FakeIdentityResponse()
         fake_resp.status_code = 444
         fake_body = {u'unauthorized': {
                 u'message': u'Username or api key is invalid', u'code': 500}}
         pyrax.http.request = Mock(return_value=(fake_resp, fake_body))
         self.assertRaises(exc.AuthenticationFailed, ident.authenticate)
-        pyrax.http.request = savrequest
 
     def test_authenticate_fail_gt_299ino_message(self):
         ident = self.rax_identity_class(username="BAD", password="BAD")
-        savrequest = pyrax.http.request
+        self.addCleanup(setattr, pyrax.http, "request", pyrax.http.request)
         fake_resp = fakes.FakeIdentityResponse()
         fake_resp.status_code = 444
         fake_body = {u'unauthorized': {
                 u'bogus': u'Username or api key is invalid', u'code': 500}}
         pyrax.http.request = Mock(return_value=(fake_resp, fake_body))
         self.assertRaises(exc.AuthenticationFailed, ident.authenticate)
-        pyrax.http.request = savrequest
 
     def test_authenticate_backwards_compatibility_connect_param(self):
-        savrequest = pyrax.http.request
+        self.addCleanup(setattr, pyrax.http, "request", pyrax.http.request)
         fake_resp = fakes.FakeIdentityResponse()
         fake_body = fakes.fake_identity_response
         pyrax.http.request = Mock(return_value=(fake_resp, fake_body))
@@ -736,7 +788,6 @@ class IdentityTest(unittest.TestCase):
                 # Necessary for testing to avoid NotImplementedError.
                 utils.add_method(ident, lambda self: "", "_get_auth_endpoint")
             ident.authenticate(connect=False)
-        pyrax.http.request = savrequest
 
     def test_rax_endpoints(self):
         ident = self.rax_identity_class()
@@ -867,12 +918,12 @@ class IdentityTest(unittest.TestCase):
 
     def test_call(self):
         ident = self.base_identity_class()
-        sav_req = pyrax.http.request
+        self.addCleanup(setattr, pyrax.http, "request", pyrax.http.request)
         pyrax.http.request = Mock()
         sav_debug = ident.http_log_debug
         ident.http_log_debug = True
         uri = "https://%s/%s" % (utils.random_ascii(), utils.random_ascii())
-        sav_stdout = sys.stdout
+        self.addCleanup(setattr, sys, "stdout", sys.stdout)
         out = StringIO()
         sys.stdout = out
         utils.add_method(ident, lambda self: "", "_get_auth_endpoint")
@@ -887,36 +938,50 @@ class IdentityTest(unittest.TestCase):
                 ident.method_post(uri, data=data, headers=headers,
                         std_headers=std_headers, admin=admin)
                 pyrax.http.request.assert_called_with("POST", uri, body=data,
-                        headers=expected_headers)
+                        headers=expected_headers,
+                        connection_pool=ident.connection_pool)
                 self.assertEqual(out.getvalue(), "")
                 out.seek(0)
                 out.truncate()
         out.close()
-        pyrax.http.request = sav_req
         ident.http_log_debug = sav_debug
-        sys.stdout = sav_stdout
 
     def test_call_without_slash(self):
         ident = self.base_identity_class()
         ident._get_auth_endpoint = Mock()
         ident._get_auth_endpoint.return_value = "http://example.com/v2.0"
         ident.verify_ssl = False
+        self.addCleanup(setattr, pyrax.http, "request", pyrax.http.request)
         pyrax.http.request = Mock()
         ident._call("POST", "tokens", False, {}, {}, False)
         pyrax.http.request.assert_called_with("POST",
                 "http://example.com/v2.0/tokens", headers={},
-                raise_exception=False)
+                raise_exception=False, connection_pool=ident.connection_pool)
 
     def test_call_with_slash(self):
         ident = self.base_identity_class()
         ident._get_auth_endpoint = Mock()
         ident._get_auth_endpoint.return_value = "http://example.com/v2.0/"
         ident.verify_ssl = False
+        self.addCleanup(setattr, pyrax.http, "request", pyrax.http.request)
+        pyrax.http.request = Mock()
+        ident._call("POST", "tokens", False, {}, {}, False)
+        pyrax.http.request.assert_called_with("POST",
+                "http://example.com/v2.0/tokens", headers={},
+                raise_exception=False, connection_pool=ident.connection_pool)
+
+    def test_call_no_connection_pool(self):
+        ident = self.base_identity_class()
+        ident._get_auth_endpoint = Mock()
+        ident._get_auth_endpoint.return_value = "http://example.com/v2.0/"
+        ident.connection_pool = None
+        sav_req = pyrax.http.request
         pyrax.http.request = Mock()
         ident._call("POST", "tokens", False, {}, {}, False)
         pyrax.http.request.assert_called_with("POST",
                 "http://example.com/v2.0/tokens", headers={},
                 raise_exception=False)
+        pyrax.http.request = sav_req
 
     def test_list_users(self):
         ident = self.rax_identity_class()
@@ -1290,7 +1355,7 @@ class IdentityTest(unittest.TestCase):
             ident.authenticate = sav_auth
 
     def test_has_valid_token(self):
-        savrequest = pyrax.http.request
+        self.addCleanup(setattr, pyrax.http, "request", pyrax.http.request)
         pyrax.http.request = Mock(return_value=(fakes.FakeIdentityResponse(),
                 fakes.fake_identity_response))
         for cls in self.id_classes.values():
@@ -1307,7 +1372,89 @@ class IdentityTest(unittest.TestCase):
             ident = self._get_clean_identity()
             valid = ident._has_valid_token()
             self.assertFalse(valid)
-        pyrax.http.request = savrequest
+
+    def test_refresh_token_single_flight(self):
+        ident = self.rax_identity_class()
+        ident.token = "old"
+        calls = []
+
+        def slow_auth():
+            calls.append(1)
+            time.sleep(0.1)
+            ident.token = "new"
+
+        ident.authenticate = Mock(side_effect=slow_auth)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(
+                ident.refresh_token(stale_token="old"))) for ii in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ["new"] * 5)
+        metrics = ident.get_token_metrics()
+        self.assertEqual(metrics["refreshes"], 1)
+        self.assertTrue(metrics["average_latency"] >= 0.1)
+
+    def test_refresh_token_already_refreshed(self):
+        ident = self.rax_identity_class()
+        ident.token = "new"
+        ident.authenticate = Mock()
+        self.assertEqual(ident.refresh_token(stale_token="old"), "new")
+        self.assertFalse(ident.authenticate.called)
+
+    def test_refresh_token_failure(self):
+        ident = self.rax_identity_class()
+        ident.authenticate = Mock(side_effect=exc.AuthenticationFailed(""))
+        self.assertRaises(exc.AuthenticationFailed, ident.refresh_token)
+        self.assertEqual(ident.get_token_metrics()["failures"], 1)
+        self.assertIsNone(ident._refresh)
+
+    def test_ensure_token(self):
+        ident = self.rax_identity_class()
+        ident.token = "tok"
+        ident.authenticate = Mock()
+        now = datetime.datetime.utcnow()
+        ident.expires = now + datetime.timedelta(hours=1)
+        ident.ensure_token()
+        self.assertFalse(ident.authenticate.called)
+        ident.expires = now + datetime.timedelta(seconds=10)
+        ident.ensure_token()
+        ident.authenticate.assert_called_once_with()
+        self.assertEqual(ident.get_token_metrics()["proactive"], 1)
+        # A failed proactive refresh keeps the current token.
+        ident.authenticate = Mock(side_effect=exc.AuthenticationFailed(""))
+        self.assertEqual(ident.ensure_token(), "tok")
+        # Until the backoff passes, no more proactive refreshes are tried...
+        self.assertEqual(ident.ensure_token(), "tok")
+        self.assertEqual(ident.authenticate.call_count, 1)
+        # ...but a refresh after a 401 still is, and resets the backoff.
+        ident.authenticate = Mock()
+        ident.refresh_token()
+        ident.authenticate = Mock(side_effect=exc.AuthenticationFailed(""))
+        ident.ensure_token()
+        self.assertEqual(ident.authenticate.call_count, 1)
+        ident._proactive_after = time.time() - 1
+        ident.ensure_token()
+        self.assertEqual(ident.authenticate.call_count, 2)
+        # Each failure doubles the backoff.
+        self.assertTrue(ident._proactive_after - time.time() > 30)
+
+    @patch("threading.Timer")
+    def test_auto_refresh(self, mock_timer):
+        ident = self.rax_identity_class()
+        ident.token = "tok"
+        ident.expires = (datetime.datetime.utcnow() +
+                datetime.timedelta(seconds=1000))
+        ident.start_auto_refresh()
+        delay, fnc = mock_timer.call_args[0]
+        self.assertTrue(690 < delay <= 700)
+        self.assertEqual(fnc, ident._background_refresh)
+        self.assertTrue(mock_timer.return_value.start.called)
+        ident.unauthenticate()
+        self.assertFalse(ident.auto_refresh)
+        self.assertTrue(mock_timer.return_value.cancel.called)
 
     def test_list_token(self):
         for cls in self.id_classes.values():
@@ -0,0 +1,254 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import datetime
+import time
+import unittest
+
+from mock import patch
+from mock import MagicMock as Mock
+
+import pyrax.exceptions as exc
+from pyrax import instrumentation
+from pyrax.instrumentation import RequestEvent
+
+from pyrax import fakes
+
+
+def make_event(service="svc", method="GET", template="/things",
+        status=200, total_time=0.1, end_time=None, **kwargs):
+    end_time = end_time or time.time()
+    vals = dict(service=service, method=method, uri="http://example.com%s"
+            % template, uri_template=template, status=status, bytes_sent=10,
+            bytes_received=20, connect_time=None, ttfb=0.05,
+            total_time=total_time, retries=0,
+            start_time=end_time - total_time, end_time=end_time, error=None)
+    vals.update(kwargs)
+    return RequestEvent(**vals)
+
+
+
+class InstrumentationTest(unittest.TestCase):
+    def __init__(self, *args, **kwargs):
+        super(InstrumentationTest, self).__init__(*args, **kwargs)
+
+    def tearDown(self):
+        for sink in instrumentation.get_sinks():
+            instrumentation.remove_sink(sink)
+
+    def test_add_remove_sink(self):
+        sink = Mock()
+        self.assertFalse(instrumentation.has_sinks())
+        instrumentation.add_sink(sink)
+        instrumentation.add_sink(sink)
+        self.assertEqual(instrumentation.get_sinks(), [sink])
+        self.assertTrue(instrumentation.has_sinks())
+        instrumentation.remove_sink(sink)
+        self.assertEqual(instrumentation.get_sinks(), [])
+        self.assertTrue(instrumentation.has_sinks([sink]))
+
+    def test_emit(self):
+        global_sink = Mock()
+        client_sink = Mock()
+        instrumentation.add_sink(global_sink)
+        event = make_event()
+        instrumentation.emit(event, [client_sink])
+        global_sink.record.assert_called_once_with(event)
+        client_sink.record.assert_called_once_with(event)
+
+    def test_emit_sink_error(self):
+        bad_sink = Mock()
+        bad_sink.record.side_effect = ValueError("boom")
+        good_sink = Mock()
+        event = make_event()
+        instrumentation.emit(event, [bad_sink, good_sink])
+        good_sink.record.assert_called_once_with(event)
+
+    def test_emit_breaker(self):
+        event = instrumentation.BreakerEvent(service="svc",
+                endpoint="http://example.com", old_state="closed",
+                new_state="open", time=time.time())
+        plain_sink = Mock(spec=["record"])
+        bad_sink = Mock()
+        bad_sink.record_breaker.side_effect = ValueError("boom")
+        client_sink = Mock()
+        global_sink = Mock()
+        instrumentation.add_sink(global_sink)
+        instrumentation.emit_breaker(event, [plain_sink, bad_sink,
+                client_sink])
+        self.assertFalse(plain_sink.record.called)
+        client_sink.record_breaker.assert_called_once_with(event)
+        global_sink.record_breaker.assert_called_once_with(event)
+
+    def test_uri_template(self):
+        tmpl = instrumentation.uri_template
+        self.assertEqual(tmpl("/servers/12345/ips?limit=1"),
+                "/servers/{id}/ips")
+        self.assertEqual(tmpl("/queues/myqueue/claims/"
+                "4f1e8a2b3c4d5e6f7a8b9c0d"), "/queues/myqueue/claims/{id}")
+        self.assertEqual(tmpl("/instances/"
+                "d6a1b2c3-aaaa-bbbb-cccc-0123456789ab"), "/instances/{id}")
+        self.assertEqual(tmpl("/flavors"), "/flavors")
+
+    def test_create_event(self):
+        resp = fakes.FakeResponse()
+        resp.headers = {}
+        resp.content = "abcde"
+        resp.request = Mock(body="xyz")
+        resp.elapsed = datetime.timedelta(seconds=0.25)
+        event = instrumentation.create_event("svc", "PUT", "uri", "/tmpl",
+                10.0, 11.5, resp=resp, retries=2)
+        self.assertEqual(event.status, 200)
+        self.assertEqual(event.bytes_sent, 3)
+        self.assertEqual(event.bytes_received, 5)
+        self.assertEqual(event.ttfb, 0.25)
+        self.assertEqual(event.total_time, 1.5)
+        self.assertEqual(event.retries, 2)
+        self.assertIsNone(event.connect_time)
+
+    def test_create_event_streamed(self):
+        resp = fakes.FakeResponse()
+        resp.headers = {}
+        event = instrumentation.create_event("svc", "GET", "uri", "/tmpl",
+                10.0, 11.0, resp=resp, streamed=True)
+        self.assertIsNone(event.bytes_received)
+
+    def test_create_event_error(self):
+        err = exc.ClientException(503)
+        event = instrumentation.create_event("svc", "GET", "uri", "/tmpl",
+                10.0, 11.0, error=err)
+        self.assertEqual(event.status, 503)
+        self.assertTrue(event.error is err)
+        self.assertIsNone(event.bytes_received)
+
+    def test_ring_buffer(self):
+        sink = instrumentation.RingBufferSink(size=3)
+        events = [make_event(retries=ii) for ii in range(5)]
+        for event in events:
+            sink.record(event)
+        self.assertEqual(len(sink), 3)
+        self.assertEqual(sink.events(), events[2:])
+        sink.clear()
+        self.assertEqual(sink.events(), [])
+
+    def test_histogram_percentiles(self):
+        sink = instrumentation.HistogramSink()
+        for ii in range(1, 101):
+            sink.record(make_event(total_time=ii / 100.0))
+        sink.record(make_event(service="other", total_time=5.0))
+        pcts = sink.percentiles(service="svc", percentiles=(50, 99, 100))
+        self.assertEqual(pcts, {50: 0.5, 99: 0.99, 100: 1.0})
+        self.assertEqual(sink.percentiles(percentiles=(100, ))[100], 5.0)
+        self.assertEqual(sink.percentiles(method="DELETE"),
+                dict([(pct, None)
+                for pct in instrumentation.DEFAULT_PERCENTILES]))
+
+    def test_histogram_window(self):
+        sink = instrumentation.HistogramSink(window=60)
+        now = time.time()
+        sink.record(make_event(total_time=9.0, end_time=now - 120))
+        sink.record(make_event(total_time=1.0, end_time=now))
+        self.assertEqual(sink.percentiles(percentiles=(100, )), {100: 1.0})
+
+    def test_histogram_max_samples(self):
+        sink = instrumentation.HistogramSink(max_samples=2)
+        for latency in (3.0, 1.0, 2.0):
+            sink.record(make_event(total_time=latency))
+        self.assertEqual(sink.percentiles(percentiles=(100, )), {100: 2.0})
+
+    def test_histogram_summary(self):
+        sink = instrumentation.HistogramSink()
+        sink.record(make_event(total_time=1.0))
+        sink.record(make_event(total_time=3.0))
+        sink.record(make_event(method="POST", total_time=1.0))
+        summary = sink.summary(percentiles=(50, ))
+        self.assertEqual(summary[("svc", "GET", "/things")],
+                {"count": 2, "mean": 2.0, "p50": 1.0})
+        self.assertEqual(summary[("svc", "POST", "/things")]["count"], 1)
+        sink.clear()
+        self.assertEqual(sink.summary(), {})
+
+    def test_statsd_format(self):
+        sink = instrumentation.StatsdSink(prefix="app")
+        event = make_event(service="Object Storage", total_time=0.25,
+                retries=1)
+        lines = sink.format(event).split("\n")
+        self.assertTrue("app.Object_Storage.GET.requests:1|c" in lines)
+        self.assertTrue("app.Object_Storage.GET.status.200:1|c" in lines)
+        self.assertTrue("app.Object_Storage.GET.latency:250|ms" in lines)
+        self.assertTrue("app.Object_Storage.GET.ttfb:50|ms" in lines)
+        self.assertTrue("app.Object_Storage.GET.bytes_sent:10|c" in lines)
+        self.assertTrue("app.Object_Storage.GET.retries:1|c" in lines)
+        error_event = make_event(status=None)
+        self.assertTrue("app.svc.GET.status.error:1|c" in
+                sink.format(error_event))
+        sink.close()
+
+    def test_statsd_record(self):
+        sink = instrumentation.StatsdSink(host="example.com", port=9999)
+        sink._socket = Mock()
+        event = make_event()
+        sink.record(event)
+        sink._socket.sendto.assert_called_once_with(
+                sink.format(event).encode("utf-8"), ("example.com", 9999))
+        sink._socket.sendto.side_effect = instrumentation.socket.error
+        sink.record(event)
+
+    def test_statsd_breaker(self):
+        sink = instrumentation.StatsdSink(prefix="app")
+        sink._socket = Mock()
+        event = instrumentation.BreakerEvent(service="Object Storage",
+                endpoint="http://example.com", old_state="closed",
+                new_state="open", time=time.time())
+        sink.record_breaker(event)
+        sink._socket.sendto.assert_called_once_with(
+                b"app.Object_Storage.breaker.open:1|c", sink.address)
+
+    def test_prometheus_render_errors(self):
+        sink = instrumentation.PrometheusSink()
+        sink.record(make_event())
+        sink.record(make_event(status=None, error=Exception("boom")))
+        lines = sink.render().splitlines()
+        self.assertTrue('pyrax_requests_total{method="GET",service="svc",'
+                'status="200"} 1' in lines)
+        self.assertTrue('pyrax_requests_total{method="GET",service="svc",'
+                'status="error"} 1' in lines)
+
+    def test_prometheus_render(self):
+        sink = instrumentation.PrometheusSink(buckets=(0.1, 1.0))
+        sink.record(make_event(total_time=0.05))
+        sink.record(make_event(total_time=0.5, status=404))
+        sink.record(make_event(total_time=5.0))
+        text = sink.render()
+        lines = text.splitlines()
+        lbl = 'method="GET",service="svc"'
+        self.assertTrue('pyrax_requests_total{method="GET",service="svc",'
+                'status="200"} 2' in lines)
+        self.assertTrue('pyrax_requests_total{method="GET",service="svc",'
+                'status="404"} 1' in lines)
+        self.assertTrue('pyrax_request_bytes_total{direction="in",'
+                'method="GET",service="svc"} 60' in lines)
+        self.assertTrue('pyrax_request_duration_seconds_bucket{le="0.1",%s} 1'
+                % lbl in lines)
+        self.assertTrue('pyrax_request_duration_seconds_bucket{le="1.0",%s} 2'
+                % lbl in lines)
+        self.assertTrue('pyrax_request_duration_seconds_bucket{le="+Inf",%s} 3'
+                % lbl in lines)
+        self.assertTrue("pyrax_request_duration_seconds_count{%s} 3" % lbl
+                in lines)
+        self.assertTrue("# TYPE pyrax_request_duration_seconds histogram"
+                in lines)
+        self.assertFalse("circuit_breaker" in text)
+        for state in ("open", "half_open", "open"):
+            sink.record_breaker(instrumentation.BreakerEvent(service="svc",
+                    endpoint="http://example.com", old_state=None,
+                    new_state=state, time=time.time()))
+        lines = sink.render().splitlines()
+        self.assertTrue('pyrax_circuit_breaker_transitions_total{'
+                'endpoint="http://example.com",service="svc",state="open"} 2'
+                in lines)
+
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,6 +3,8 @@
 
 import json
 import os
+import subprocess
+import sys
 import unittest
 import warnings
 
@@ -418,11 +420,89 @@ class PyraxInitTest(unittest.TestCase):
 
     def test_connect_to_services(self):
         pyrax.connect_to_services()
-        pyrax.connect_to_cloudservers.assert_called_once_with(region=None)
-        pyrax.connect_to_cloudfiles.assert_called_once_with(region=None)
-        pyrax.connect_to_cloud_loadbalancers.assert_called_once_with(
-                region=None)
-        pyrax.connect_to_cloud_databases.assert_called_once_with(region=None)
+        # Nothing is created until it is used.
+        self.assertFalse(pyrax.connect_to_cloudservers.called)
+        self.assertFalse(pyrax.connect_to_cloudfiles.called)
+        self.assertFalse(pyrax.connect_to_cloud_loadbalancers.called)
+        self.assertFalse(pyrax.connect_to_cloud_databases.called)
+        clt = pyrax.connect_to_cloudfiles.return_value
+        self.assertEqual(pyrax.cloudfiles.list_containers,
+                clt.list_containers)
+        pyrax.connect_to_cloudfiles.assert_called_once_with(region="DFW")
+        pyrax.cloudfiles.get_account_details()
+        pyrax.connect_to_cloudfiles.assert_called_once_with(region="DFW")
+        self.assertFalse(pyrax.connect_to_cloudservers.called)
+        # Setting an attribute or testing the client doesn't create it.
+        pyrax.cloud_databases.foo = "bar"
+        self.assertTrue(pyrax.cloud_loadbalancers)
+        self.assertFalse(pyrax.connect_to_cloud_databases.called)
+        self.assertFalse(pyrax.connect_to_cloud_loadbalancers.called)
+        self.assertEqual(pyrax.cloud_databases.foo, "bar")
+        self.assertEqual(pyrax.connect_to_cloud_databases.return_value.foo,
+                "bar")
+        pyrax.cloud_databases.foo = "baz"
+        self.assertEqual(pyrax.connect_to_cloud_databases.return_value.foo,
+                "baz")
+        pyrax._get_service_endpoint.return_value = None
+        self.assertFalse(pyrax.cloud_loadbalancers)
+
+    def test_connect_to_services_no_endpoint(self):
+        pyrax._get_service_endpoint.return_value = None
+        pyrax.connect_to_services()
+        self.assertIsNone(pyrax.cloudfiles)
+        self.assertIsNone(pyrax.cloudservers)
+
+    @patch("pyrax.connect_to_cloud_dns")
+    def test_connect_to_services_warm(self, mock_dns):
+        ident = pyrax.identity
+        ident.service_mapping = {"cloudfiles": "object_store"}
+        ident.get_client = Mock(side_effect=lambda svc, rgn: (svc, rgn))
+        ret = pyrax.connect_to_services(regions=["ORD", "DFW"],
+                services=["cloudfiles", "object_store", "dns"],
+                parallel=True)
+        # The clients in the default region are made by the module-level
+        # clients.
+        self.assertEqual(len(ident.get_client.call_args_list), 2)
+        self.assertEqual(ret, {("object_store", "ORD"): ("object_store", "ORD"),
+                ("object_store", "DFW"):
+                    pyrax.connect_to_cloudfiles.return_value,
+                ("dns", "ORD"): ("dns", "ORD"),
+                ("dns", "DFW"): mock_dns.return_value})
+        pyrax.connect_to_cloudfiles.assert_called_once_with(region="DFW")
+        mock_dns.assert_called_once_with(region="DFW")
+
+    def test_connect_to_services_warm_shared(self):
+        ident = pyrax.identity
+        ident.service_mapping = {}
+        svc = fakes.FakeIdentityService(ident)
+        svc.endpoints["DFW"] = fakes.FakeEndpoint({"publicURL":
+                "http://example.com/"}, "object_store", "DFW", ident)
+        ident.services = {"object_store": svc}
+        clt = fakes.FakeClient()
+        clt.management_url = "http://example.com/"
+        pyrax.connect_to_cloudfiles.return_value = clt
+        ret = pyrax.connect_to_services(services=["object_store"])
+        self.assertEqual(ret, {("object_store", "DFW"): clt})
+        self.assertIs(pyrax.cloudfiles._lazy_resolve(), clt)
+        self.assertIs(ident.get_client("object_store", "DFW"), clt)
+        pyrax.connect_to_cloudfiles.assert_called_once_with(region="DFW")
+
+    def test_connect_to_services_warm_unavailable(self):
+        ident = pyrax.identity
+        ident.service_mapping = {}
+        clt = object()
+        ident.get_client = Mock(side_effect=[clt, exc.NoSuchClient("")])
+        ret = pyrax.connect_to_services(regions=["ORD"],
+                services=["object_store", "dns"])
+        self.assertEqual(ret, {("object_store", "ORD"): clt})
+
+    def test_connect_to_services_warm_fail(self):
+        ident = pyrax.identity
+        ident.service_mapping = {}
+        ident.get_client = Mock(side_effect=exc.ClientException(500))
+        self.assertRaises(exc.ClientException, pyrax.connect_to_services,
+                regions=["ORD"], services=["object_store", "dns"],
+                parallel=True)
 
     @patch('pyrax._cs_client.Client', new=fakes.FakeCSClient)
     def test_connect_to_cloudservers(self):
@@ -468,6 +548,52 @@ class PyraxInitTest(unittest.TestCase):
         pyrax.cloud_databases = pyrax.connect_to_cloud_databases()
         self.assertIsNotNone(pyrax.cloud_databases)
 
+    def test_lazy_import(self):
+        # Importing pyrax should not import novaclient's shell or any of the
+        # service modules; they are imported when first used.
+        lazy_mods = ["novaclient.shell", "novaclient.v1_1.client",
+                "pyrax.object_storage", "pyrax.clouddns", "pyrax.queueing",
+                "pyrax.cloudnetworks", "pyrax.autoscale"]
+        code = "\n".join(["import sys, time",
+                "start = time.time()",
+                "import pyrax",
+                "elapsed = time.time() - start",
+                "mods = %r" % lazy_mods,
+                "print([mod for mod in mods if mod in sys.modules])",
+                "print(elapsed)",
+                "print(pyrax.StorageClient.__module__)",
+                ])
+        out = subprocess.check_output([sys.executable, "-c", code])
+        loaded, elapsed, storage_mod = out.decode("utf-8").splitlines()[-3:]
+        self.assertEqual(loaded, "[]")
+        self.assertEqual(storage_mod, "pyrax.object_storage")
+        # The bound is generous so that a slow machine doesn't fail it; the
+        # modules checked above are what keeps the import itself small.
+        self.assertTrue(float(elapsed) < 5)
+
+    def test_lazy_attribute_fail(self):
+        self.assertRaises(AttributeError, getattr, pyrax, "NotAnAttribute")
+        self.assertTrue("StorageClient" in dir(pyrax))
+
+    def test_client_class_for_service_import_string(self):
+        sav = pyrax._client_classes.copy()
+        pyrax._client_classes["fake"] = "pyrax.fakes.FakeService"
+        cls = pyrax.client_class_for_service("fake")
+        self.assertTrue(cls is fakes.FakeService)
+        self.assertTrue(pyrax._client_classes["fake"] is fakes.FakeService)
+        pyrax._client_classes = sav
+
+    def test_discover_cs_extensions_once(self):
+        sav = pyrax._cs_extensions
+        pyrax._cs_extensions = None
+        with patch("novaclient.shell.OpenStackComputeShell") as shell:
+            disc = shell.return_value._discover_extensions
+            disc.return_value = ["ext"]
+            self.assertEqual(pyrax._discover_cs_extensions(), ["ext"])
+            self.assertEqual(pyrax._discover_cs_extensions(), ["ext"])
+        disc.assert_called_once_with("1.1")
+        pyrax._cs_extensions = sav
+
     def test_set_http_debug(self):
         pyrax.cloudservers = None
         sav = pyrax.connect_to_cloudservers
@@ -1,13 +1,16 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import json
 import logging
 import mimetypes
 import os
 import random
+import threading
 import time
 import unittest
 
+from six import BytesIO
 from six import StringIO
 
 from mock import patch
@@ -27,7 +30,9 @@ from pyrax.object_storage import get_file_size
 from pyrax.object_storage import _handle_container_not_found
 from pyrax.object_storage import _handle_object_not_found
 from pyrax.object_storage import OBJECT_META_PREFIX
+from pyrax.object_storage import ParallelDownloader
 from pyrax.object_storage import _massage_metakeys
+from pyrax.object_storage import SegmentedUploader
 from pyrax.object_storage import StorageClient
 from pyrax.object_storage import StorageObject
 from pyrax.object_storage import StorageObjectIterator
@@ -335,7 +340,7 @@ class ObjectStorageTest(unittest.TestCase):
                 delimiter=delimiter, end_marker=end_marker,
                 full_listing=full_listing, return_raw=return_raw)
         cont.manager.object_listing_iterator.assert_called_once_with(cont,
-                prefix=prefix)
+                prefix=prefix, records=False)
 
     def test_cont_list_all(self):
         cont = self.container
@@ -343,7 +348,7 @@ class ObjectStorageTest(unittest.TestCase):
         cont.manager.object_listing_iterator = Mock()
         cont.list_all(prefix=prefix)
         cont.manager.object_listing_iterator.assert_called_once_with(cont,
-                prefix=prefix)
+                prefix=prefix, records=False)
 
     def test_cont_list_object_names_full(self):
         cont = self.container
@@ -361,7 +366,7 @@ class ObjectStorageTest(unittest.TestCase):
         nms = cont.list_object_names(marker=marker, limit=limit, prefix=prefix,
                 delimiter=delimiter, end_marker=end_marker,
                 full_listing=full_listing)
-        cont.list_all.assert_called_once_with(prefix=prefix)
+        cont.list_all.assert_called_once_with(prefix=prefix, records=True)
         self.assertEqual(nms, [name1, name2])
 
     def test_cont_list_object_names(self):
@@ -486,10 +491,12 @@ class ObjectStorageTest(unittest.TestCase):
         chunk_size = utils.random_unicode()
         size = utils.random_unicode()
         extra_info = utils.random_unicode()
+        stream = utils.random_unicode()
         cont.fetch(obj, include_meta=include_meta, chunk_size=chunk_size,
-                size=size, extra_info=extra_info)
+                size=size, extra_info=extra_info, stream=stream)
         cont.object_manager.fetch.assert_called_once_with(obj,
-                include_meta=include_meta, chunk_size=chunk_size, size=size)
+                include_meta=include_meta, chunk_size=chunk_size, size=size,
+                stream=stream)
 
     def test_cont_fetch_object(self):
         cont = self.container
@@ -516,9 +523,10 @@ class ObjectStorageTest(unittest.TestCase):
         obj = utils.random_unicode()
         directory = utils.random_unicode()
         structure = utils.random_unicode()
-        cont.download(obj, directory, structure=structure)
+        parallel = utils.random_unicode()
+        cont.download(obj, directory, structure=structure, parallel=parallel)
         cont.object_manager.download.assert_called_once_with(obj, directory,
-                structure=structure)
+                structure=structure, parallel=parallel)
 
     def test_cont_download_object(self):
         cont = self.container
@@ -526,9 +534,11 @@ class ObjectStorageTest(unittest.TestCase):
         obj_name = utils.random_unicode()
         directory = utils.random_unicode()
         structure = utils.random_unicode()
-        cont.download_object(obj_name, directory, structure=structure)
+        parallel = utils.random_unicode()
+        cont.download_object(obj_name, directory, structure=structure,
+                parallel=parallel)
         cont.download.assert_called_once_with(obj=obj_name,
-                directory=directory, structure=structure)
+                directory=directory, structure=structure, parallel=parallel)
 
     def test_cont_delete(self):
         cont = self.container
@@ -1349,11 +1359,13 @@ class ObjectStorageTest(unittest.TestCase):
         chunk_size = utils.random_unicode()
         size = utils.random_unicode()
         extra_info = utils.random_unicode()
+        stream = utils.random_unicode()
         cont.fetch = Mock()
         mgr.fetch_object(cont, obj, include_meta=include_meta,
-                chunk_size=chunk_size, size=size, extra_info=extra_info)
+                chunk_size=chunk_size, size=size, extra_info=extra_info,
+                stream=stream)
         cont.fetch.assert_called_once_with(obj, include_meta=include_meta,
-                chunk_size=chunk_size, size=size)
+                chunk_size=chunk_size, size=size, stream=stream)
 
     def test_cmgr_fetch_partial(self):
         cont = self.container
@@ -1370,10 +1382,12 @@ class ObjectStorageTest(unittest.TestCase):
         obj = utils.random_unicode()
         directory = utils.random_unicode()
         structure = utils.random_unicode()
+        parallel = utils.random_unicode()
         cont.download = Mock()
-        mgr.download_object(cont, obj, directory, structure=structure)
+        mgr.download_object(cont, obj, directory, structure=structure,
+                parallel=parallel)
         cont.download.assert_called_once_with(obj, directory,
-                structure=structure)
+                structure=structure, parallel=parallel)
 
     def test_cmgr_delete_object(self):
         cont = self.container
@@ -1553,9 +1567,10 @@ class ObjectStorageTest(unittest.TestCase):
         mgr.download = Mock()
         directory = utils.random_unicode()
         structure = utils.random_unicode()
-        obj.download(directory, structure=structure)
+        parallel = utils.random_unicode()
+        obj.download(directory, structure=structure, parallel=parallel)
         mgr.download.assert_called_once_with(obj, directory,
-                structure=structure)
+                structure=structure, parallel=parallel)
 
     def test_sobj_copy(self):
         obj = self.obj
@@ -1653,6 +1668,22 @@ class ObjectStorageTest(unittest.TestCase):
         it = StorageObjectIterator(mgr)
         self.assertEqual(it.list_method, mgr.list)
 
+    def test_sobj_iter_records(self):
+        client = self.client
+        mgr = client._manager
+        body = [{"name": "a", "bytes": 1, "hash": "x", "last_modified": "t",
+                "content_type": "text/plain"}, {"subdir": "dir/"}]
+        mgr.list = Mock(side_effect=[body, []])
+        it = StorageObjectIterator(mgr, records=True)
+        recs = list(it)
+        self.assertEqual(recs, [("a", 1, "x", "t"),
+                ("dir/", None, None, None)])
+        self.assertEqual(recs[0].name, "a")
+        self.assertEqual(mgr.list.call_args_list[0][1]["limit"],
+                pyrax.object_storage.MAX_LISTING_LIMIT)
+        self.assertTrue(mgr.list.call_args_list[0][1]["return_raw"])
+        self.assertEqual(mgr.list.call_args_list[1][1]["marker"], "dir/")
+
     def test_sobj_mgr_name(self):
         cont = self.container
         mgr = cont.object_manager
@@ -2041,9 +2072,172 @@ class ObjectStorageTest(unittest.TestCase):
                 ret = mgr._upload(obj_name, content, content_type,
                         content_encoding, content_length, etag, chunked,
                         chunk_size, headers)
-                self.assertEqual(mgr._store_object.call_count, 3)
+                self.assertEqual(len(mgr._store_object.call_args_list), 3)
         pyrax.object_storage.MAX_FILE_SIZE = sav
 
+    def test_sobj_mgr_upload_segment_size(self):
+        obj = self.obj
+        mgr = obj.manager
+        sav = mgr.api.segment_size
+        mgr.api.segment_size = 10
+        obj_name = utils.random_ascii()
+        content = "x" * 25
+        headers = {}
+        mgr._store_object = Mock(return_value=fakes.FakeResponse())
+        mgr._upload(obj_name, content, None, None, None, None, None, None,
+                headers)
+        self.assertEqual(len(mgr._store_object.call_args_list), 4)
+        call_names = sorted([call[0][0]
+                for call in mgr._store_object.call_args_list])
+        self.assertEqual(call_names, [obj_name, "%s.1" % obj_name,
+                "%s.2" % obj_name, "%s.3" % obj_name])
+        # The manifest must be written last.
+        last_call = mgr._store_object.call_args
+        self.assertEqual(last_call[0][0], obj_name)
+        self.assertEqual(last_call[1]["headers"]["X-Object-Manifest"],
+                "%s/%s." % (mgr.name, obj_name))
+        mgr.api.segment_size = sav
+
+    def test_segmented_uploader_file(self):
+        mgr = self.obj.manager
+        obj_name = utils.random_ascii()
+        sent = {}
+
+        def store(name, content=None, headers=None, **kwargs):
+            if content is not None:
+                sent[name] = content.read(3) + content.read()
+            return fakes.FakeResponse()
+
+        mgr._store_object = Mock(side_effect=store)
+        with utils.SelfDeletingTempfile() as tmp:
+            with open(tmp, "wb") as content:
+                content.write(b"0123456789abcdefghij")
+            with open(tmp, "rb") as content:
+                upl = SegmentedUploader(mgr, obj_name, content, 20,
+                        segment_size=8, workers=3)
+                upl.upload()
+                self.assertEqual(content.tell(), 20)
+        self.assertEqual(sent["%s.1" % obj_name], b"01234567")
+        self.assertEqual(sent["%s.2" % obj_name], b"89abcdef")
+        self.assertEqual(sent["%s.3" % obj_name], b"ghij")
+        self.assertEqual(upl.segment_etags[2],
+                utils.get_checksum(b"ghij"))
+
+    def test_segmented_uploader_locked_read(self):
+        mgr = self.obj.manager
+        content = BytesIO(b"0123456789")
+        content.seek(2)
+        upl = SegmentedUploader(mgr, "x", content, 8, segment_size=3)
+        self.assertEqual(upl._read_at, upl._locked_read)
+        reader = upl._segment_reader(2)
+        self.assertEqual(len(reader), 2)
+        self.assertEqual(reader.read(), b"89")
+        self.assertEqual(reader.read(), b"")
+
+    def test_segmented_uploader_retry(self):
+        mgr = self.obj.manager
+        content = b"x" * 10
+        good = fakes.FakeResponse()
+        good.headers = {"etag": utils.get_checksum(b"x" * 5)}
+        bad = fakes.FakeResponse()
+        bad.headers = {"etag": "bogus"}
+        results = [exc.ClientException(500), bad, good, good, good]
+
+        def store(name, content=None, headers=None, **kwargs):
+            if content is not None:
+                content.read()
+            ret = results.pop(0)
+            if isinstance(ret, Exception):
+                raise ret
+            return ret
+
+        mgr._store_object = Mock(side_effect=store)
+        upl = SegmentedUploader(mgr, "x", content, 10, segment_size=5,
+                workers=1, retries=2)
+        upl.upload()
+        self.assertEqual(len(mgr._store_object.call_args_list), 5)
+
+    def test_segmented_uploader_fail(self):
+        mgr = self.obj.manager
+        mgr._store_object = Mock(side_effect=exc.ClientException(500))
+        upl = SegmentedUploader(mgr, "x", "x" * 10, 10, segment_size=5,
+                workers=2, retries=1)
+        self.assertRaises(exc.UploadFailed, upl.upload)
+        # No manifest is written after a failure.
+        names = [call[0][0] for call in mgr._store_object.call_args_list]
+        self.assertFalse("x" in names)
+
+    def test_segmented_uploader_slo(self):
+        mgr = self.obj.manager
+
+        def store(name, content=None, headers=None, **kwargs):
+            if hasattr(content, "read"):
+                content.read()
+            return fakes.FakeResponse()
+
+        mgr._store_object = Mock(side_effect=store)
+        upl = SegmentedUploader(mgr, "x", b"abcdefg", 7, segment_size=4,
+                use_slo=True)
+        upl.upload()
+        name = mgr._store_object.call_args[0][0]
+        manifest = json.loads(mgr._store_object.call_args[1]["content"])
+        self.assertEqual(name, "x?multipart-manifest=put")
+        self.assertEqual(manifest, [
+                {"path": "/%s/x.1" % mgr.name, "size_bytes": 4,
+                    "etag": utils.get_checksum(b"abcd")},
+                {"path": "/%s/x.2" % mgr.name, "size_bytes": 3,
+                    "etag": utils.get_checksum(b"efg")}])
+
+    def test_segmented_uploader_unseekable(self):
+        mgr = self.obj.manager
+        sent = []
+
+        class Stream(object):
+            def __init__(self, data):
+                self.data = BytesIO(data)
+
+            def read(self, size=-1):
+                return self.data.read(size)
+
+            def tell(self):
+                raise IOError("Illegal seek")
+
+        def store(name, content=None, headers=None, **kwargs):
+            if hasattr(content, "read"):
+                data = content.read()
+                if not sent or sent[-1] != (name, data):
+                    sent.append((name, data))
+            return fakes.FakeResponse()
+
+        mgr._store_object = Mock(side_effect=store)
+        upl = SegmentedUploader(mgr, "x", Stream(b"0123456789"), 10,
+                segment_size=4, workers=3)
+        self.assertEqual(upl.workers, 1)
+        upl.upload()
+        self.assertEqual(sent, [("x.1", b"0123"), ("x.2", b"4567"),
+                ("x.3", b"89")])
+        self.assertEqual(upl.segment_etags[1], utils.get_checksum(b"4567"))
+
+    def test_segmented_uploader_unseekable_short(self):
+        mgr = self.obj.manager
+        mgr._store_object = Mock(return_value=fakes.FakeResponse())
+        content = Mock(spec=["read"])
+        content.read.side_effect = [b"0123", b""]
+        upl = SegmentedUploader(mgr, "x", content, 10, segment_size=4,
+                retries=0)
+        self.assertRaises(exc.UploadFailed, upl.upload)
+
+    def test_sobj_mgr_store_object_no_etag(self):
+        mgr = self.obj.manager
+        obj_name = utils.random_unicode()
+        resp = fakes.FakeResponse()
+        mgr.api.method_put = Mock(return_value=(resp, None))
+        headers = {}
+        ret = mgr._store_object(obj_name, "content", headers=headers,
+                compute_etag=False)
+        self.assertTrue(ret is resp)
+        self.assertFalse("ETag" in headers)
+
     def test_sobj_mgr_store_object(self):
         obj = self.obj
         mgr = obj.manager
@@ -2080,7 +2274,7 @@ class ObjectStorageTest(unittest.TestCase):
         resp.headers = hdrs
         resp_body = utils.random_unicode()
         exp_uri = "/%s/%s" % (mgr.uri_base, obj.name)
-        exp_headers = {"Range": "bytes=0-%s" % size}
+        exp_headers = {"Range": "bytes=0-%s" % (size - 1)}
         for include_meta in (True, False):
             mgr.api.method_get = Mock(return_value=(resp, resp_body))
             mgr.api.method_head = Mock(return_value=(resp, resp_body))
@@ -2100,40 +2294,59 @@ class ObjectStorageTest(unittest.TestCase):
         size = random.randint(200, 1000)
         extra_info = utils.random_unicode()
         exp_uri = "/%s/%s" % (mgr.uri_base, obj.name)
+        resp = fakes.FakeResponse()
+        body = pyrax.http.StreamingBody(resp, chunk_size=chunk_size)
         for include_meta in (True, False):
             mgr.get = Mock(return_value=obj)
+            mgr.api.method_get = Mock(return_value=(resp, body))
             mgr._fetch_chunker = Mock()
             mgr.fetch(obj.name, include_meta=include_meta,
                     chunk_size=chunk_size, size=size, extra_info=extra_info)
-            mgr._fetch_chunker.assert_called_once_with(exp_uri, chunk_size,
-                    size, obj.bytes)
+            # The GET is made before any chunk is read.
+            mgr.api.method_get.assert_called_once_with(exp_uri,
+                    headers={"Range": "bytes=0-%s" % (size - 1)},
+                    stream=True, chunk_size=chunk_size)
+            mgr._fetch_chunker.assert_called_once_with(body)
+            self.assertFalse(mgr.get.called)
 
-    def test_sobj_mgr_fetch_chunker(self):
+    def test_sobj_mgr_fetch_chunk_not_found(self):
+        obj = self.obj
+        mgr = obj.manager
+        mgr.api.method_get = Mock(side_effect=exc.NotFound(404))
+        self.assertRaises(exc.NoSuchObject, mgr.fetch, obj.name,
+                chunk_size=10)
+
+    def test_sobj_mgr_fetch_stream(self):
         obj = self.obj
         mgr = obj.manager
-        uri = utils.random_unicode()
-        chunk_size = random.randint(10, 50)
-        num_chunks, remainder = divmod(obj.total_bytes, chunk_size)
-        if remainder:
-            num_chunks += 1
         resp = fakes.FakeResponse()
-        resp_body = "x" * chunk_size
-        mgr.api.method_get = Mock(return_value=(resp, resp_body))
-        ret = mgr._fetch_chunker(uri, chunk_size, None, obj.total_bytes)
-        txt = "".join([part for part in ret])
-        self.assertEqual(mgr.api.method_get.call_count, num_chunks)
+        resp.headers = {"etag": utils.random_unicode()}
+        body = pyrax.http.StreamingBody(resp)
+        exp_uri = "/%s/%s" % (mgr.uri_base, obj.name)
+        for include_meta in (True, False):
+            mgr.api.method_get = Mock(return_value=(resp, body))
+            mgr.api.method_head = Mock()
+            ret = mgr.fetch(obj, include_meta=include_meta, stream=True)
+            mgr.api.method_get.assert_called_once_with(exp_uri, headers={},
+                    stream=True)
+            self.assertFalse(mgr.api.method_head.called)
+            if include_meta:
+                self.assertEqual(ret, (resp.headers, body))
+            else:
+                self.assertTrue(ret is body)
 
-    def test_sobj_mgr_fetch_chunker_eof(self):
+    def test_sobj_mgr_fetch_chunker(self):
         obj = self.obj
         mgr = obj.manager
-        uri = utils.random_unicode()
         chunk_size = random.randint(10, 50)
-        num_chunks = int(obj.total_bytes / chunk_size) + 1
         resp = fakes.FakeResponse()
-        resp_body = ""
-        mgr.api.method_get = Mock(return_value=(resp, resp_body))
-        ret = mgr._fetch_chunker(uri, chunk_size, None, obj.total_bytes)
-        self.assertRaises(StopIteration, ret.next)
+        resp.iter_content = Mock(return_value=iter(["x" * chunk_size] * 3))
+        resp.close = Mock()
+        body = pyrax.http.StreamingBody(resp, chunk_size=chunk_size)
+        ret = mgr._fetch_chunker(body)
+        txt = "".join([part for part in ret])
+        self.assertEqual(txt, "x" * chunk_size * 3)
+        resp.close.assert_called_once_with()
 
     def test_sobj_mgr_fetch_partial(self):
         obj = self.obj
@@ -2170,14 +2383,17 @@ class ObjectStorageTest(unittest.TestCase):
     def test_sobj_mgr_delete_all_objects_no_names(self):
         obj = self.obj
         mgr = obj.manager
-        nms = utils.random_unicode()
+        nms = [utils.random_unicode() for ii in range(3)]
         async = utils.random_unicode()
-        mgr.api.list_object_names = Mock(return_value=nms)
+        mgr.list = Mock(side_effect=[[{"name": nm} for nm in nms], []])
         mgr.api.bulk_delete = Mock()
         mgr.delete_all_objects(None, async=async)
-        mgr.api.list_object_names.assert_called_once_with(mgr.name,
-                                                          full_listing=True)
-        mgr.api.bulk_delete.assert_called_once_with(mgr.name, nms, async=async)
+        args = mgr.api.bulk_delete.call_args[0]
+        self.assertEqual(args[0], mgr.name)
+        # The names are listed lazily, as they are consumed.
+        self.assertFalse(mgr.list.called)
+        self.assertEqual(list(args[1]), nms)
+        self.assertEqual(mgr.api.bulk_delete.call_args[1], {"async": async})
 
     def test_sobj_mgr_download_no_directory(self):
         obj = self.obj
@@ -2188,10 +2404,11 @@ class ObjectStorageTest(unittest.TestCase):
         obj = self.obj
         mgr = obj.manager
         txt = utils.random_unicode()
-        mgr.fetch = Mock(return_value=txt)
+        mgr.fetch = Mock(return_value=[txt])
         with utils.SelfDeletingTempDirectory() as directory:
             mgr.download(obj, directory, structure=False)
-            mgr.fetch.assert_called_once_with(obj)
+            mgr.fetch.assert_called_once_with(obj,
+                    chunk_size=pyrax.object_storage.DEFAULT_CHUNKSIZE)
             fpath = os.path.join(directory, obj.name)
             self.assertTrue(os.path.exists(fpath))
 
@@ -2200,13 +2417,175 @@ class ObjectStorageTest(unittest.TestCase):
         obj.name = "%s/%s/%s" % (obj.name, obj.name, obj.name)
         mgr = obj.manager
         txt = utils.random_unicode()
-        mgr.fetch = Mock(return_value=txt)
+        mgr.fetch = Mock(return_value=[txt])
         with utils.SelfDeletingTempDirectory() as directory:
             mgr.download(obj, directory, structure=True)
-            mgr.fetch.assert_called_once_with(obj)
+            mgr.fetch.assert_called_once_with(obj,
+                    chunk_size=pyrax.object_storage.DEFAULT_CHUNKSIZE)
             fpath = os.path.join(directory, obj.name)
             self.assertTrue(os.path.exists(fpath))
 
+    def _ranged_get(self, content, fail_ranges=None):
+        fail_ranges = fail_ranges or []
+
+        def method_get(uri, headers=None, raw_content=False):
+            rng = headers["Range"]
+            if rng in fail_ranges:
+                fail_ranges.remove(rng)
+                raise exc.ClientException(500)
+            start, end = [int(val) for val in rng.split("=")[1].split("-")]
+            return (fakes.FakeResponse(), content[start:end + 1])
+        return Mock(side_effect=method_get)
+
+    def test_sobj_mgr_download_parallel(self):
+        obj = self.obj
+        mgr = obj.manager
+        content = b"0123456789abcdefghijklmnopqrstuvwxyz"
+        obj.bytes = len(content)
+        obj.hash = utils.get_checksum(content)
+        mgr.api.method_get = self._ranged_get(content)
+        sav = mgr.api.download_chunk_size
+        mgr.api.download_chunk_size = 5
+        with utils.SelfDeletingTempDirectory() as directory:
+            mgr.download(obj, directory, structure=False, parallel=True)
+            fpath = os.path.join(directory, obj.name)
+            with open(fpath, "rb") as dl:
+                self.assertEqual(dl.read(), content)
+            self.assertEqual(os.listdir(directory), [obj.name])
+        self.assertEqual(mgr.api.method_get.call_count, 8)
+        mgr.api.download_chunk_size = sav
+
+    def test_parallel_downloader_resume(self):
+        obj = self.obj
+        mgr = obj.manager
+        content = b"0123456789abcdefghij"
+        obj.bytes = len(content)
+        obj.hash = utils.get_checksum(content)
+        with utils.SelfDeletingTempDirectory() as directory:
+            target = os.path.join(directory, "target")
+            mgr.api.method_get = self._ranged_get(content,
+                    fail_ranges=["bytes=8-11"])
+            dl = ParallelDownloader(mgr, obj, target, chunk_size=4,
+                    workers=1)
+            self.assertRaises(exc.DownloadFailed, dl.download)
+            self.assertFalse(os.path.exists(target))
+            # Request errors are left to the client's retry policy.
+            self.assertEqual(mgr.api.method_get.call_count, 3)
+            self.assertEqual(dl._load_state(dl.etag, dl.size), set([0, 1]))
+            # Simulate a partial line left by an interrupted write.
+            with open(dl.state_file, "a") as state_file:
+                state_file.write("4")
+            self.assertEqual(dl._load_state(dl.etag, dl.size), set([0, 1]))
+            mgr.api.method_get = self._ranged_get(content)
+            dl = ParallelDownloader(mgr, obj, target, chunk_size=4,
+                    workers=2)
+            dl.download()
+            # Only the three missing ranges are fetched the second time.
+            self.assertEqual(mgr.api.method_get.call_count, 3)
+            with open(target, "rb") as dl_file:
+                self.assertEqual(dl_file.read(), content)
+            self.assertFalse(os.path.exists(dl.state_file))
+
+    def test_parallel_downloader_short_read(self):
+        obj = self.obj
+        mgr = obj.manager
+        content = b"0123456789"
+        obj.bytes = len(content)
+        obj.hash = utils.get_checksum(content)
+        ranged_get = self._ranged_get(content)
+        short = ["bytes=4-7"] * 2
+
+        def method_get(uri, headers=None, raw_content=False):
+            resp, body = ranged_get(uri, headers=headers,
+                    raw_content=raw_content)
+            if headers["Range"] in short:
+                short.remove(headers["Range"])
+                body = body[:-1]
+            return resp, body
+
+        mgr.api.method_get = Mock(side_effect=method_get)
+        with utils.SelfDeletingTempDirectory() as directory:
+            target = os.path.join(directory, "target")
+            dl = ParallelDownloader(mgr, obj, target, chunk_size=4,
+                    workers=1, retries=1)
+            self.assertRaises(exc.DownloadFailed, dl.download)
+            self.assertEqual(dl._load_state(dl.etag, dl.size), set([0]))
+            short.append("bytes=4-7")
+            dl = ParallelDownloader(mgr, obj, target, chunk_size=4,
+                    workers=1, retries=1)
+            dl.download()
+            with open(target, "rb") as dl_file:
+                self.assertEqual(dl_file.read(), content)
+
+    def test_parallel_downloader_batches_state(self):
+        obj = self.obj
+        mgr = obj.manager
+        content = b"0123456789abcdefghijklmnopqrstuvwxyz"
+        obj.bytes = len(content)
+        obj.hash = utils.get_checksum(content)
+        mgr.api.method_get = self._ranged_get(content)
+        with utils.SelfDeletingTempDirectory() as directory:
+            target = os.path.join(directory, "target")
+            dl = ParallelDownloader(mgr, obj, target, chunk_size=4,
+                    workers=3)
+            dl._save_state = Mock(wraps=dl._save_state)
+            dl._save_chunks = Mock(wraps=dl._save_chunks)
+            with patch("os.fsync", wraps=os.fsync) as mock_fsync:
+                dl.download()
+            # The state file is written once, and the 9 chunks are then
+            # recorded in batches of 3, each after the data is flushed.
+            dl._save_state.assert_called_once_with()
+            recorded = sum([len(call[0][0])
+                    for call in dl._save_chunks.call_args_list])
+            self.assertEqual(recorded, 9)
+            self.assertEqual(mock_fsync.call_count, 3)
+            with open(target, "rb") as dl_file:
+                self.assertEqual(dl_file.read(), content)
+
+    def test_parallel_downloader_changed_object(self):
+        obj = self.obj
+        mgr = obj.manager
+        content = b"0123456789"
+        obj.bytes = len(content)
+        obj.hash = utils.get_checksum(content)
+        with utils.SelfDeletingTempDirectory() as directory:
+            target = os.path.join(directory, "target")
+            dl = ParallelDownloader(mgr, obj, target, chunk_size=4)
+            dl.etag = "stale"
+            dl.size = obj.bytes
+            dl.completed = set([0, 1])
+            dl._save_state()
+            open(dl.part_file, "w").close()
+            mgr.api.method_get = self._ranged_get(content)
+            dl.download()
+            self.assertEqual(mgr.api.method_get.call_count, 3)
+
+    def test_parallel_downloader_checksum_mismatch(self):
+        obj = self.obj
+        mgr = obj.manager
+        content = b"0123456789"
+        obj.bytes = len(content)
+        obj.hash = utils.get_checksum(b"something else")
+        mgr.api.method_get = self._ranged_get(content)
+        with utils.SelfDeletingTempDirectory() as directory:
+            target = os.path.join(directory, "target")
+            dl = ParallelDownloader(mgr, obj, target, chunk_size=4)
+            self.assertRaises(exc.DownloadFailed, dl.download)
+            self.assertEqual(os.listdir(directory), [])
+
+    def test_parallel_downloader_manifest_etag(self):
+        obj = self.obj
+        mgr = obj.manager
+        content = b"0123456789"
+        obj.bytes = len(content)
+        obj.hash = '"%s"' % utils.get_checksum(b"md5 of segment md5s")
+        mgr.api.method_get = self._ranged_get(content)
+        with utils.SelfDeletingTempDirectory() as directory:
+            target = os.path.join(directory, "target")
+            ParallelDownloader(mgr, obj, target, chunk_size=3).download()
+            with open(target, "rb") as dl_file:
+                self.assertEqual(dl_file.read(), content)
+
     def test_sobj_mgr_purge(self):
         obj = self.obj
         mgr = obj.manager
@@ -2376,6 +2755,16 @@ class ObjectStorageTest(unittest.TestCase):
         # noop
         self.assertIsNone(ret)
 
+    def test_clt_uri_template(self):
+        clt = self.client
+        clt.management_url = "http://example.com/v1/acct"
+        base = clt.management_url
+        self.assertEqual(clt._uri_template(base), "/")
+        self.assertEqual(clt._uri_template("%s/cont?format=json" % base),
+                "/{container}")
+        self.assertEqual(clt._uri_template("%s/cont/a/b.txt" % base),
+                "/{container}/{object}")
+
     def test_clt_get_account_details(self):
         clt = self.client
         mgr = clt._manager
@@ -2777,7 +3166,8 @@ class ObjectStorageTest(unittest.TestCase):
         prefix = utils.random_unicode()
         mgr.object_listing_iterator = Mock()
         clt.object_listing_iterator(cont, prefix=prefix)
-        mgr.object_listing_iterator.assert_called_once_with(cont, prefix=prefix)
+        mgr.object_listing_iterator.assert_called_once_with(cont, prefix=prefix,
+                records=False)
 
     def test_clt_object_listing_iterator(self):
         clt = self.client
@@ -2786,7 +3176,8 @@ class ObjectStorageTest(unittest.TestCase):
         prefix = utils.random_unicode()
         mgr.object_listing_iterator = Mock()
         clt.object_listing_iterator(cont, prefix=prefix)
-        mgr.object_listing_iterator.assert_called_once_with(cont, prefix=prefix)
+        mgr.object_listing_iterator.assert_called_once_with(cont, prefix=prefix,
+                records=False)
 
     def test_clt_delete_object_in_seconds(self):
         clt = self.client
@@ -2899,11 +3290,14 @@ class ObjectStorageTest(unittest.TestCase):
         chunk_size = utils.random_unicode()
         size = utils.random_unicode()
         extra_info = utils.random_unicode()
+        stream = utils.random_unicode()
         mgr.fetch_object = Mock()
         clt.fetch_object(cont, obj, include_meta=include_meta,
-                chunk_size=chunk_size, size=size, extra_info=extra_info)
+                chunk_size=chunk_size, size=size, extra_info=extra_info,
+                stream=stream)
         mgr.fetch_object.assert_called_once_with(cont, obj,
-                include_meta=include_meta, chunk_size=chunk_size, size=size)
+                include_meta=include_meta, chunk_size=chunk_size, size=size,
+                stream=stream)
 
     def test_clt_fetch_partial(self):
         clt = self.client
@@ -2927,8 +3321,13 @@ class ObjectStorageTest(unittest.TestCase):
                 for num in range(num_objs)]
         clt.get_container_objects = Mock(return_value=objs)
         name = utils.random_unicode()
-        clt.method_get = Mock(side_effect=[(None, "aaa"), (None, "bbb"),
-                (None, "ccc"), (None, "")] * num_objs)
+
+        def fake_method_get(uri, **kwargs):
+            resp = fakes.FakeResponse()
+            resp.iter_content = Mock(return_value=iter(["aaa", "bbb", "ccc"]))
+            return (resp, pyrax.http.StreamingBody(resp))
+
+        clt.method_get = Mock(side_effect=fake_method_get)
 
         def fake_get(obj_name):
             return [obj for obj in objs
@@ -2956,10 +3355,12 @@ class ObjectStorageTest(unittest.TestCase):
         obj = self.obj
         directory = utils.random_unicode()
         structure = utils.random_unicode()
+        parallel = utils.random_unicode()
         mgr.download_object = Mock()
-        clt.download_object(cont, obj, directory, structure=structure)
+        clt.download_object(cont, obj, directory, structure=structure,
+                parallel=parallel)
         mgr.download_object.assert_called_once_with(cont, obj, directory,
-                structure=structure)
+                structure=structure, parallel=parallel)
 
     def test_clt_delete(self):
         clt = self.client
@@ -3038,12 +3439,20 @@ class ObjectStorageTest(unittest.TestCase):
         cont = self.container
         ignore = utils.random_unicode()
         ttl = utils.random_unicode()
+        workers = random.randint(1, 10)
+        journal = utils.random_unicode()
         clt._upload_folder_in_background = Mock()
         with utils.SelfDeletingTempDirectory() as folder_path:
+            open(os.path.join(folder_path, "test"), "w").write("faketext")
             key, total = clt.upload_folder(folder_path, container=cont,
-                    ignore=ignore, ttl=ttl)
+                    ignore=ignore, ttl=ttl, workers=workers, journal=journal)
             clt._upload_folder_in_background.assert_called_once_with(
-                    folder_path, cont, [ignore], key, ttl)
+                    folder_path, cont, [ignore], key, ttl, workers=workers,
+                    journal=journal)
+        self.assertEqual(total, 8)
+        self.assertEqual(clt.get_upload_status(key), {"total_bytes": 8,
+                "uploaded": 0, "uploaded_files": 0, "errors": [],
+                "done": False})
 
     @patch("pyrax.object_storage.FolderUploader.start")
     def test_clt_upload_folder_in_background(self, mock_start):
@@ -3285,6 +3694,44 @@ class ObjectStorageTest(unittest.TestCase):
             os.listdir = sav
         self.assertEqual(cont.upload_file.call_count, 3)
 
+    @patch("logging.Logger.info")
+    def test_clt_sync_folder_to_container_checksum_cache(self, mock_log):
+        clt = self.client
+        cont = self.container
+        cont.get_objects = Mock(return_value=[])
+        cont.upload_file = Mock()
+        clt.get_container = Mock(return_value=cont)
+        with utils.SelfDeletingTempDirectory() as cache_dir:
+            db_path = os.path.join(cache_dir, "sync.db")
+            with utils.SelfDeletingTempDirectory() as folder_path:
+                for fname in ("test1", "test2", "test3"):
+                    pth = os.path.join(folder_path, fname)
+                    open(pth, "w").write(fname)
+                clt.sync_folder_to_container(folder_path, cont,
+                        checksum_cache=db_path, workers=2)
+                self.assertEqual(cont.upload_file.call_count, 3)
+                self.assertTrue(clt._checksum_cache is None)
+                self.assertTrue(clt._sync_uploads is None)
+                cache = utils.ChecksumCache(db_path)
+                with patch.object(utils, "get_checksum") as mock_checksum:
+                    cache.get_checksum(os.path.join(folder_path, "test1"))
+                    self.assertFalse(mock_checksum.called)
+                cache.close()
+
+    def test_last_modified_timestamp(self):
+        obj = StorageObject(self.container.object_manager,
+                {"name": "x", "last_modified": "2014-01-01T00:00:01.500000"})
+        ret = pyrax.object_storage._last_modified_timestamp(obj)
+        self.assertEqual(ret, 1388534401.5)
+        obj.last_modified = "2014-01-01T00:00:01"
+        ret = pyrax.object_storage._last_modified_timestamp(obj)
+        self.assertEqual(ret, 1388534401)
+        obj.last_modified = "bogus"
+        ret = pyrax.object_storage._last_modified_timestamp(obj)
+        self.assertEqual(ret, 0)
+        self.assertEqual(pyrax.object_storage._last_modified_timestamp(None),
+                0)
+
     def test_clt_delete_objects_not_in_list(self):
         clt = self.client
         clt._local_files = []
@@ -3371,6 +3818,57 @@ class ObjectStorageTest(unittest.TestCase):
         ret = clt.bulk_delete(cont, obj_names, async=False)
         self.assertEqual(ret, expected)
 
+    def test_clt_bulk_delete_batches(self):
+        clt = self.client
+        cont = self.container
+        sav = pyrax.object_storage.MAX_BULK_DELETE
+        pyrax.object_storage.MAX_BULK_DELETE = 3
+        obj_names = ("obj%s" % ii for ii in range(10))
+        resp = fakes.FakeResponse()
+        bodies = []
+        lock = threading.Lock()
+
+        def fake_bulk_resp(uri, data=None, headers=None):
+            with lock:
+                bodies.append(data)
+            return (resp, {"Number Not Found": 1, "Response Status": "200 OK",
+                    "Errors": [], "Number Deleted": 2, "Response Body": ""})
+
+        clt.method_delete = Mock(side_effect=fake_bulk_resp)
+        ret = clt.bulk_delete(cont, obj_names, workers=3)
+        pyrax.object_storage.MAX_BULK_DELETE = sav
+        self.assertEqual(len(bodies), 4)
+        sent = sorted(nm for body in bodies for nm in body.split("\n"))
+        self.assertEqual(sent, sorted("%s/obj%s" % (cont.name, ii)
+                for ii in range(10)))
+        self.assertEqual(ret["deleted"], 8)
+        self.assertEqual(ret["not_found"], 4)
+        self.assertEqual(ret["status"], "200 OK")
+
+    def test_clt_bulk_delete_wait(self):
+        clt = self.client
+        cont = self.container
+        resp = fakes.FakeResponse()
+        body = {"Number Not Found": 0, "Response Status": "200 OK",
+                "Errors": [], "Number Deleted": 2, "Response Body": ""}
+        clt.method_delete = Mock(return_value=(resp, body))
+        deleter = clt.bulk_delete(cont, ["test1", "test2"], async=True)
+        ret = deleter.wait()
+        self.assertTrue(deleter.completed)
+        self.assertEqual(ret["deleted"], 2)
+
+    def test_bulk_deleter_exception(self):
+        clt = self.client
+        cont = self.container
+        clt.method_delete = Mock(side_effect=exc.ClientException(500,
+                "boom"))
+        deleter = BulkDeleter(clt, cont, ["test1"], workers=2)
+        deleter.start()
+        ret = deleter.wait(5)
+        self.assertTrue(deleter.completed)
+        self.assertEqual(len(ret["errors"]), 1)
+        self.assertEqual(ret["errors"][0][1], "500")
+
     def test_clt_cdn_request_not_enabled(self):
         clt = self.client
         uri = utils.random_unicode()
@@ -3422,6 +3920,18 @@ class ObjectStorageTest(unittest.TestCase):
         new_size = clt.get_uploaded(key)
         self.assertEqual(new_size, curr + size)
 
+    def test_clt_folder_upload_error_and_done(self):
+        clt = self.client
+        key = utils.random_unicode()
+        err = Exception("fake")
+        clt.folder_upload_status = {key: {"continue": True, "uploaded": 0}}
+        clt._folder_upload_error(key, "path", err)
+        clt._folder_upload_done(key)
+        status = clt.get_upload_status(key)
+        self.assertEqual(status["errors"], [("path", err)])
+        self.assertTrue(status["done"])
+        self.assertFalse("continue" in status)
+
     def test_clt_cancel_folder_upload(self):
         clt = self.client
         key = utils.random_unicode()
@@ -3519,29 +4029,96 @@ class ObjectStorageTest(unittest.TestCase):
             clt._should_abort_folder_upload = Mock(return_value=False)
             clt.upload_file = Mock()
             clt._update_progress = Mock()
-            folder_up = FolderUploader(tmpdir, cont, ignore, upload_key, clt)
+            folder_up = FolderUploader(tmpdir, cont, ignore, upload_key, clt,
+                    workers=2)
+            folder_up.completed = {fname3: (8, os.stat(os.path.join(tmpdir,
+                    fname3)).st_mtime)}
             ret = folder_up.upload_files_in_folder(arg, tmpdir, fnames)
-            self.assertEqual(clt.upload_file.call_count, len(fnames) - 1)
+            self.assertEqual(folder_up.file_queue.qsize(), 2)
+            queued = sorted([folder_up.file_queue.get()[1]
+                    for ii in range(2)])
+            self.assertEqual(queued, sorted([fname1, fname2]))
+            # The journaled file counts as uploaded without being sent.
+            clt._update_progress.assert_called_once_with(upload_key, 8)
+            self.assertEqual(clt.upload_file.call_count, 0)
 
     def test_folder_uploader_run(self):
         clt = self.client
         cont = self.container
         ignore = "*FAKE*"
         upload_key = utils.random_unicode()
-        arg = utils.random_unicode()
-        fname1 = utils.random_ascii()
-        fname2 = utils.random_ascii()
-        fname3 = utils.random_ascii()
+        clt.folder_upload_status = {upload_key: {"continue": True,
+                "uploaded": 0, "uploaded_files": 0, "errors": [],
+                "done": False}}
+        fnames = ["a", "b", "FAKEc", os.path.join("sub", "d"),
+                os.path.join("FAKEsub", "e")]
         with utils.SelfDeletingTempDirectory() as tmpdir:
-            fnames = [tmpdir, fname1, fname2, fname3]
-            for fname in fnames[1:]:
+            os.mkdir(os.path.join(tmpdir, "sub"))
+            os.mkdir(os.path.join(tmpdir, "FAKEsub"))
+            for fname in fnames:
                 pth = os.path.join(tmpdir, fname)
                 open(pth, "w").write("faketext")
-            clt._should_abort_folder_upload = Mock(return_value=False)
-            folder_up = FolderUploader(tmpdir, cont, ignore, upload_key, clt)
-            folder_up.upload_files_in_folder = Mock()
+            clt.upload_file = Mock()
+            folder_up = FolderUploader(tmpdir, cont, ignore, upload_key, clt,
+                    workers=3)
+            folder_up.run()
+        self.assertEqual(clt.upload_file.call_count, 3)
+        uploaded = sorted([call[1]["obj_name"]
+                for call in clt.upload_file.call_args_list])
+        self.assertEqual(uploaded, ["a", "b", os.path.join("sub", "d")])
+        status = clt.get_upload_status(upload_key)
+        self.assertEqual(status["uploaded"], 24)
+        self.assertEqual(status["uploaded_files"], 3)
+        self.assertTrue(status["done"])
+
+    def test_folder_uploader_run_errors(self):
+        clt = self.client
+        cont = self.container
+        upload_key = utils.random_unicode()
+        clt.folder_upload_status = {upload_key: {"continue": True,
+                "uploaded": 0, "uploaded_files": 0, "errors": [],
+                "done": False}}
+        err = exc.UploadFailed("fake")
+        with utils.SelfDeletingTempDirectory() as tmpdir:
+            pth = os.path.join(tmpdir, "a")
+            open(pth, "w").write("faketext")
+            clt.upload_file = Mock(side_effect=err)
+            folder_up = FolderUploader(tmpdir, cont, None, upload_key, clt)
             folder_up.run()
-            self.assertEqual(folder_up.upload_files_in_folder.call_count, 1)
+        status = clt.get_upload_status(upload_key)
+        self.assertEqual(status["errors"], [(pth, err)])
+        self.assertEqual(status["uploaded"], 0)
+        self.assertTrue(status["done"])
+
+    def test_folder_uploader_journal_resume(self):
+        clt = self.client
+        cont = self.container
+        upload_key = utils.random_unicode()
+        clt.folder_upload_status = {upload_key: {"continue": True,
+                "uploaded": 0, "uploaded_files": 0, "errors": [],
+                "done": False}}
+        with utils.SelfDeletingTempDirectory() as journal_dir:
+            journal = os.path.join(journal_dir, "journal")
+            with utils.SelfDeletingTempDirectory() as tmpdir:
+                for fname in ("a", "b"):
+                    open(os.path.join(tmpdir, fname), "w").write("faketext")
+                clt.upload_file = Mock(side_effect=[None, Exception("fail")])
+                folder_up = FolderUploader(tmpdir, cont, None, upload_key,
+                        clt, workers=1, journal=journal)
+                folder_up.run()
+                # Simulate a partial line left by an interrupted write.
+                with open(journal, "a") as jfile:
+                    jfile.write('{"container": ')
+                done = folder_up.load_journal()
+                self.assertEqual(len(done), 1)
+                clt.upload_file = Mock()
+                folder_up = FolderUploader(tmpdir, cont, None, upload_key,
+                        clt, workers=1, journal=journal)
+                folder_up.run()
+                self.assertEqual(clt.upload_file.call_count, 1)
+                self.assertFalse(clt.upload_file.call_args[1]["obj_name"]
+                        in done)
+                self.assertEqual(len(folder_up.load_journal()), 2)
 
 
 if __name__ == "__main__":
@@ -3,6 +3,8 @@
 
 import os
 import random
+import threading
+import time
 import unittest
 
 from mock import patch
@@ -11,13 +13,17 @@ from mock import MagicMock as Mock
 import pyrax
 import pyrax.queueing
 from pyrax.queueing import BaseQueueManager
+from pyrax.queueing import MSG_LIMIT
 from pyrax.queueing import Queue
 from pyrax.queueing import QueueClaim
 from pyrax.queueing import QueueClaimManager
 from pyrax.queueing import QueueClient
+from pyrax.queueing import QueueConsumer
 from pyrax.queueing import QueueManager
 from pyrax.queueing import QueueMessage
+from pyrax.queueing import QueueMessageBuffer
 from pyrax.queueing import QueueMessageManager
+from pyrax.queueing import QueueWatcher
 from pyrax.queueing import assure_queue
 from pyrax.queueing import _parse_marker
 
@@ -25,6 +31,7 @@ import pyrax.exceptions as exc
 import pyrax.utils as utils
 
 from pyrax import fakes
+from pyrax.fake_backend import FakeBackend
 
 
 def _safe_id():
@@ -130,6 +137,23 @@ class QueuesTest(unittest.TestCase):
                 include_claimed=include_claimed, echo=echo, marker=marker,
                 limit=limit)
 
+    def test_queue_message_iterator(self):
+        q = self.queue
+        q._message_manager.message_iterator = Mock()
+        marker = utils.random_unicode()
+        q.message_iterator(echo=True, marker=marker, limit=5, prefetch=False)
+        q._message_manager.message_iterator.assert_called_once_with(
+                include_claimed=False, echo=True, marker=marker, limit=5,
+                prefetch=False)
+
+    def test_queue_subscribe(self):
+        q = self.queue
+        q.manager.api.subscribe = Mock()
+        callback = Mock()
+        q.subscribe(callback, max_interval=5)
+        q.manager.api.subscribe.assert_called_once_with(q, callback=callback,
+                max_interval=5)
+
     def test_queue_list_by_ids(self):
         q = self.queue
         q._message_manager.list_by_ids = Mock()
@@ -160,6 +184,23 @@ class QueuesTest(unittest.TestCase):
         q.post_message(body, ttl)
         q._message_manager.create.assert_called_once_with(body, ttl)
 
+    def test_queue_post_messages(self):
+        q = self.queue
+        q._message_manager.post_messages = Mock()
+        msgs = [(utils.random_unicode(), 300), (utils.random_unicode(), 60)]
+        q.post_messages(msgs, workers=2)
+        q._message_manager.post_messages.assert_called_once_with(msgs,
+                workers=2)
+
+    @patch("pyrax.queueing.QueueMessageBuffer.start")
+    def test_queue_buffer_messages(self, mock_start):
+        q = self.queue
+        buf = q.buffer_messages(batch_size=5, max_delay=1)
+        self.assertTrue(isinstance(buf, QueueMessageBuffer))
+        self.assertEqual(buf.batch_size, 5)
+        self.assertEqual(buf.max_delay, 1)
+        mock_start.assert_called_once_with()
+
     def test_queue_claim_messages(self):
         q = self.queue
         q._claim_manager.claim = Mock()
@@ -303,7 +344,37 @@ class QueuesTest(unittest.TestCase):
         self.assertEqual(dct["body"], msg)
         self.assertEqual(dct["ttl"], ttl)
 
-    def test_queue_msg_mgr_list(self):
+    def test_queue_msg_mgr_post_batch(self):
+        q = self.queue
+        mgr = q._message_manager
+        rbody = {"partial": False, "resources": ["/v1/queues/q/messages/a",
+                "/v1/queues/q/messages/b"]}
+        mgr.api.method_post = Mock(return_value=(None, rbody))
+        ret = mgr._post_batch([("x", 60), ("y", 120)])
+        self.assertEqual(ret, ["a", "b"])
+        mgr.api.method_post.assert_called_once_with("/%s" % mgr.uri_base,
+                body=[{"body": "x", "ttl": 60}, {"body": "y", "ttl": 120}])
+
+    def test_queue_msg_mgr_post_batch_partial(self):
+        q = self.queue
+        mgr = q._message_manager
+        rbody = {"partial": True, "resources": ["/v1/queues/q/messages/a"]}
+        mgr.api.method_post = Mock(return_value=(None, rbody))
+        self.assertRaises(exc.MessagePostFailed, mgr._post_batch,
+                [("x", 60), ("y", 120)])
+
+    def test_queue_msg_mgr_post_messages_failure(self):
+        q = self.queue
+        mgr = q._message_manager
+        mgr._post_batch = Mock(side_effect=exc.MessagePostFailed(""))
+        msgs = [(num, 60) for num in range(45)]
+        self.assertRaises(exc.MessagePostFailed, mgr.post_messages, msgs,
+                workers=2)
+        # No batches are started after a failure.
+        self.assertTrue(mgr._post_batch.call_count <= 2)
+
+    @patch("pyrax.queueing._parse_marker")
+    def test_queue_msg_mgr_list(self, mock_parse):
         q = self.queue
         mgr = q._message_manager
         include_claimed = random.choice((True, False))
@@ -311,22 +382,82 @@ class QueuesTest(unittest.TestCase):
         marker = utils.random_unicode()
         limit = random.randint(15, 35)
         rbody = {"links": [], "messages": [{"href": "fake"}]}
-        pyrax.queueing._parse_marker = Mock(return_value="fake")
+        mock_parse.return_value = "fake"
         mgr._list = Mock(return_value=(None, rbody))
         msgs = mgr.list(include_claimed=include_claimed, echo=echo,
                 marker=marker, limit=limit)
 
-    def test_queue_msg_mgr_no_limit_or_body(self):
+    @patch("pyrax.queueing._parse_marker")
+    def test_queue_msg_mgr_no_limit_or_body(self, mock_parse):
         q = self.queue
         mgr = q._message_manager
         include_claimed = random.choice((True, False))
         echo = random.choice((True, False))
         marker = utils.random_unicode()
-        pyrax.queueing._parse_marker = Mock(return_value="fake")
+        mock_parse.return_value = "fake"
         mgr._list = Mock(return_value=(None, None))
         msgs = mgr.list(include_claimed=include_claimed, echo=echo,
                 marker=marker)
 
+    def test_queue_msg_mgr_list_pages(self):
+        q = self.queue
+        mgr = q._message_manager
+
+        def page(start, num, more=True):
+            links = [{"rel": "next", "href": "/v1/q?marker=%s" % (start + num)}]
+            return (None, {"links": links if more else [],
+                    "messages": [{"href": "/v1/q/messages/%s" % ii}
+                    for ii in range(start, start + num)]})
+
+        mgr._list = Mock(side_effect=[page(0, 10), page(10, 10),
+                page(20, 3, more=False)])
+        msgs = mgr.list(echo=True)
+        self.assertEqual([msg.id for msg in msgs],
+                [str(ii) for ii in range(23)])
+        uris = [call[0][0] for call in mgr._list.call_args_list]
+        self.assertEqual(uris, [
+                "/%s?include_claimed=false&echo=true&limit=10" % mgr.uri_base,
+                "/%s?include_claimed=false&echo=true&marker=10&limit=10" %
+                mgr.uri_base,
+                "/%s?include_claimed=false&echo=true&marker=20&limit=10" %
+                mgr.uri_base])
+
+    def test_queue_msg_mgr_list_deep(self):
+        q = self.queue
+        mgr = q._message_manager
+        rbody = {"links": [{"rel": "next", "href": "/v1/q?marker=1"}],
+                "messages": [{"href": "/v1/q/messages/1"}] * MSG_LIMIT}
+        mgr._list = Mock(return_value=(None, rbody))
+        # Far more pages than the recursion limit allows.
+        msgs = mgr.list(limit=20000)
+        self.assertEqual(len(msgs), 20000)
+        self.assertEqual(mgr._list.call_count, 2000)
+
+    def test_queue_msg_mgr_message_iterator(self):
+        backend = FakeBackend()
+        clt = backend.client("queues")
+        queue = clt.create("jobs")
+        queue.post_messages([(num, 300) for num in range(35)])
+        # Nothing is prefetched until the second message of a page is taken.
+        msgs = queue.message_iterator(echo=True)
+        self.assertEqual(next(msgs).body, 0)
+        time.sleep(0.05)
+        msgs.close()
+        self.assertEqual(backend.request_counts[("queues", "GET")], 1)
+        for prefetch, gets in ((False, 1), (True, 2)):
+            backend.request_counts.clear()
+            msgs = queue.message_iterator(echo=True, prefetch=prefetch)
+            self.assertEqual([next(msgs).body for ii in range(3)], [0, 1, 2])
+            msgs.close()
+            # Wait for the prefetch; the pages after it are never requested.
+            deadline = time.time() + 5
+            while (backend.request_counts[("queues", "GET")] < gets and
+                    time.time() < deadline):
+                time.sleep(0.01)
+            self.assertEqual(backend.request_counts[("queues", "GET")], gets)
+        msgs = clt.message_iterator(queue, echo=True, limit=25)
+        self.assertEqual([msg.body for msg in msgs], list(range(25)))
+
     def test_queue_msg_mgr_delete_claim(self):
         q = self.queue
         mgr = q._message_manager
@@ -370,33 +501,42 @@ class QueuesTest(unittest.TestCase):
     def test_queue_claim_mgr_claim(self):
         q = self.queue
         mgr = q._claim_manager
+        # The claim ID is parsed from an href that includes the queue name.
+        mgr.uri_base = "queues/%s/claims" % _safe_id()
         ttl = utils.random_unicode()
         grace = utils.random_unicode()
         count = utils.random_unicode()
-        claim_id = utils.random_unicode()
+        claim_id = _safe_id()
         rbody = [{"href": "http://example.com/foo?claim_id=%s" % claim_id}]
         mgr.api.method_post = Mock(return_value=(fakes.FakeResponse(), rbody))
         mgr.get = Mock()
         exp_uri = "/%s?limit=%s" % (mgr.uri_base, count)
         exp_body = {"ttl": ttl, "grace": grace}
-        mgr.claim(ttl, grace, count=count)
+        claim = mgr.claim(ttl, grace, count=count)
         mgr.api.method_post.assert_called_once_with(exp_uri, body=exp_body)
-        mgr.get.assert_called_once_with(claim_id)
+        self.assertFalse(mgr.get.called)
+        self.assertEqual(claim.id, claim_id)
+        self.assertEqual(claim.ttl, ttl)
+        self.assertEqual(len(claim.messages), 1)
+        self.assertEqual(claim.messages[0].claim_id, claim_id)
 
     def test_queue_claim_mgr_claim_no_count(self):
         q = self.queue
         mgr = q._claim_manager
+        # The claim ID is parsed from an href that includes the queue name.
+        mgr.uri_base = "queues/%s/claims" % _safe_id()
         ttl = utils.random_unicode()
         grace = utils.random_unicode()
-        claim_id = utils.random_unicode()
+        claim_id = _safe_id()
         rbody = [{"href": "http://example.com/foo?claim_id=%s" % claim_id}]
         mgr.api.method_post = Mock(return_value=(fakes.FakeResponse(), rbody))
         mgr.get = Mock()
         exp_uri = "/%s" % mgr.uri_base
         exp_body = {"ttl": ttl, "grace": grace}
-        mgr.claim(ttl, grace)
+        claim = mgr.claim(ttl, grace)
         mgr.api.method_post.assert_called_once_with(exp_uri, body=exp_body)
-        mgr.get.assert_called_once_with(claim_id)
+        self.assertFalse(mgr.get.called)
+        self.assertEqual(claim.id, claim_id)
 
     def test_queue_claim_mgr_claim_empty(self):
         q = self.queue
@@ -693,6 +833,25 @@ class QueuesTest(unittest.TestCase):
         q.list.assert_called_once_with(include_claimed=include_claimed,
                 echo=echo, marker=marker, limit=limit)
 
+    def test_clt_message_iterator(self):
+        clt = self.client
+        q = self.queue
+        q.message_iterator = Mock()
+        clt.message_iterator(q, include_claimed=True, limit=3)
+        q.message_iterator.assert_called_once_with(include_claimed=True,
+                echo=False, marker=None, limit=3, prefetch=True)
+
+    def test_clt_subscribe(self):
+        clt = self.client
+        q = self.queue
+        watcher = Mock()
+        clt.get_watcher = Mock(return_value=watcher)
+        callback = Mock()
+        ret = clt.subscribe(q, callback=callback, min_interval=1)
+        clt.get_watcher.assert_called_once_with(q, min_interval=1)
+        watcher.subscribe.assert_called_once_with(callback)
+        self.assertIs(ret, watcher.subscribe.return_value)
+
     def test_clt_list_messages_by_ids(self):
         clt = self.client
         q = self.queue
@@ -726,6 +885,21 @@ class QueuesTest(unittest.TestCase):
         clt.post_message(q, body, ttl)
         q.post_message.assert_called_once_with(body, ttl)
 
+    def test_clt_post_messages(self):
+        clt = self.client
+        q = self.queue
+        msgs = [(utils.random_unicode(), 300)]
+        q.post_messages = Mock()
+        clt.post_messages(q, msgs, workers=3)
+        q.post_messages.assert_called_once_with(msgs, workers=3)
+
+    def test_clt_buffer_messages(self):
+        clt = self.client
+        q = self.queue
+        q.buffer_messages = Mock()
+        clt.buffer_messages(q, max_delay=2)
+        q.buffer_messages.assert_called_once_with(max_delay=2)
+
     def test_clt_claim_messages(self):
         clt = self.client
         q = self.queue
@@ -762,6 +936,323 @@ class QueuesTest(unittest.TestCase):
         clt.release_claim(q, claim)
         q.release_claim.assert_called_once_with(claim)
 
+    def test_clt_consume(self):
+        clt = self.client
+        q = self.queue
+        handler = Mock()
+        q.consume = Mock()
+        clt.consume(q, handler, claims=2)
+        q.consume.assert_called_once_with(handler, claims=2)
+
+
+class QueuePostMessagesTest(unittest.TestCase):
+    def setUp(self):
+        self.backend = FakeBackend()
+        self.client = self.backend.client("queues")
+        self.queue = self.client.create("jobs")
+
+    def _bodies(self):
+        msgs = self.queue.list(echo=True)
+        return dict((msg.id, msg.body) for msg in msgs)
+
+    def test_post_messages(self):
+        ids = self.queue.post_messages([(num, 300) for num in range(25)],
+                workers=3)
+        self.assertEqual(len(ids), 25)
+        bodies = self._bodies()
+        self.assertEqual([bodies[msg_id] for msg_id in ids], list(range(25)))
+        self.assertEqual(self.backend.request_counts[("queues", "POST")], 3)
+
+    def test_post_messages_empty(self):
+        self.assertEqual(self.queue.post_messages([]), [])
+        self.assertEqual(self.backend.request_counts[("queues", "POST")], 0)
+
+    def test_buffer_flushes_on_size(self):
+        with self.queue.buffer_messages(max_delay=60) as buf:
+            for num in range(23):
+                buf.put(num, 300)
+            deadline = time.time() + 5
+            while (None in buf.ids[:20]) and time.time() < deadline:
+                time.sleep(0.01)
+            self.assertEqual(len(buf.ids), 20)
+            self.assertEqual(self.backend.request_counts[("queues",
+                    "POST")], 2)
+        ids = buf.ids
+        self.assertEqual(len(ids), 23)
+        bodies = self._bodies()
+        self.assertEqual([bodies[msg_id] for msg_id in ids], list(range(23)))
+        self.assertEqual(buf.errors, [])
+        self.assertRaises(ValueError, buf.put, "late", 300)
+
+    def test_buffer_flushes_on_time(self):
+        buf = self.queue.buffer_messages(max_delay=0.05)
+        self.addCleanup(buf.close)
+        buf.put("hello", 300)
+        deadline = time.time() + 5
+        while not any(buf.ids) and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(len(buf.ids), 1)
+        self.assertEqual(self._bodies()[buf.ids[0]], "hello")
+
+    def test_buffer_starts_lazily(self):
+        buf = QueueMessageBuffer(self.queue, workers=2)
+        self.addCleanup(buf.close)
+        # More batches than workers would block put() without the threads.
+        for num in range(45):
+            buf.put(num, 300)
+        ids = buf.flush()
+        bodies = self._bodies()
+        self.assertEqual([bodies[msg_id] for msg_id in ids], list(range(45)))
+        empty = QueueMessageBuffer(self.queue)
+        self.assertEqual(empty.flush(), [])
+        empty.close()
+
+    def test_buffer_errors(self):
+        self.client.client_id = ""
+        buf = self.queue.buffer_messages()
+        buf.put("hello", 300)
+        self.assertEqual(buf.flush(), [None])
+        self.assertEqual(len(buf.errors), 1)
+        buf.close()
+
+
+
+class QueueWatcherTest(unittest.TestCase):
+    def setUp(self):
+        self.backend = FakeBackend()
+        self.client = self.backend.client("queues")
+        self.queue = self.client.create("jobs")
+
+    def _subscribe(self, callback=None, **kwargs):
+        sub = self.client.subscribe(self.queue, callback=callback, **kwargs)
+        self.addCleanup(sub.watcher.stop)
+        return sub
+
+    def test_backoff_while_idle(self):
+        sub = self._subscribe(min_interval=0.01, backoff=2, max_interval=0.08)
+        self.assertIsNone(sub.get(0.5))
+        stats = sub.watcher.stats()
+        self.assertEqual(stats["interval"], 0.08)
+        self.assertEqual(stats["empty_poll_ratio"], 1.0)
+        # Polling every 0.01 seconds would have taken about 50 requests.
+        self.assertTrue(3 < stats["polls"] < 15)
+
+    def test_snap_back_under_load(self):
+        sub = self._subscribe(min_interval=0.01, max_interval=0.05)
+        self.assertIsNone(sub.get(0.3))
+        self.queue.post_messages([(num, 300) for num in range(35)])
+        bodies = []
+        for num in range(4):
+            claim = sub.get(2)
+            bodies.extend(msg.body for msg in claim.messages)
+            self.queue.delete_by_ids([msg.id for msg in claim.messages])
+        self.assertEqual(sorted(bodies), list(range(35)))
+        self.assertEqual(sub.watcher.interval, 0)
+        stats = sub.watcher.stats()
+        self.assertEqual((stats["claims"], stats["messages"]), (4, 35))
+
+    def test_wake(self):
+        sub = self._subscribe(min_interval=30, max_interval=30)
+        self.assertIsNone(sub.get(0.1))
+        self.queue.post_message("hello", 300)
+        sub.watcher.wake()
+        claim = sub.get(2)
+        self.assertEqual(claim.messages[0].body, "hello")
+
+    def test_shared_poller(self):
+        sub1 = self._subscribe()
+        sub2 = self._subscribe()
+        self.assertIs(sub1.watcher, sub2.watcher)
+        self.assertIs(self.client.get_watcher(self.queue), sub1.watcher)
+        self.queue.post_messages([(num, 300) for num in range(20)])
+        claims = [sub1.get(2), sub2.get(2)]
+        ids = [msg.id for claim in claims for msg in claim.messages]
+        self.assertEqual(len(set(ids)), 20)
+        self.assertEqual(sub1.watcher.stats()["subscribers"], 2)
+        sub1.close()
+        self.assertFalse(sub2.watcher.stopped)
+        sub2.close()
+        self.assertTrue(sub2.watcher.stopped)
+        # A new subscriber starts a new watcher.
+        sub3 = self._subscribe()
+        self.assertIsNot(sub3.watcher, sub1.watcher)
+
+    def test_callback(self):
+        got = []
+        done = threading.Event()
+
+        def callback(claim):
+            got.extend(msg.body for msg in claim.messages)
+            if len(got) == 15:
+                done.set()
+
+        sub = self._subscribe(callback)
+        self.queue.post_messages([(num, 300) for num in range(15)])
+        self.assertTrue(done.wait(5))
+        sub.close()
+        self.assertEqual(sorted(got), list(range(15)))
+        self.assertTrue(sub.closed)
+
+    def test_stale_claim_released(self):
+        self.queue.post_messages([(num, 300) for num in range(5)])
+        self.backend.latency = 0.05
+        sub = self._subscribe(ttl=60)
+        watcher = sub.watcher
+        # The claim arrives after this get() has given up.
+        self.assertIsNone(sub.get(0.01))
+        deadline = time.time() + 5
+        while not watcher._claims and time.time() < deadline:
+            time.sleep(0.01)
+        claimed, stale = watcher._claims[0]
+        # Pretend it has waited for longer than half its TTL.
+        watcher._claims[0] = (claimed - 31, stale)
+        claim = sub.get(5)
+        self.assertNotEqual(claim.id, stale.id)
+        self.assertEqual(sorted(msg.body for msg in claim.messages),
+                list(range(5)))
+        self.assertEqual(watcher.stats()["stale_claims"], 1)
+
+    def test_stop_releases_claims(self):
+        self.queue.post_messages([(num, 300) for num in range(5)])
+        watcher = QueueWatcher(self.queue)
+        watcher._claims.append((time.time(),
+                self.queue.claim_messages(300, 60)))
+        self.assertEqual(self.client.get_stats(self.queue)["free"], 0)
+        watcher.stop()
+        self.assertEqual(self.client.get_stats(self.queue)["free"], 5)
+        self.assertRaises(ValueError, watcher.subscribe)
+
+
+
+class QueueConsumerTest(unittest.TestCase):
+    def setUp(self):
+        self.backend = FakeBackend()
+        self.client = self.backend.client("queues")
+        self.queue = self.client.create("jobs")
+
+    def _post(self, num):
+        poster = self.backend.client("queues")
+        for ii in range(num):
+            poster.post_message("jobs", ii, 300)
+
+    def test_consume(self):
+        self._post(95)
+        seen = []
+        lock = threading.Lock()
+
+        def handler(msg):
+            with lock:
+                seen.append(msg.body)
+
+        consumer = self.queue.consume(handler, claims=3, workers=4,
+                ack_interval=60, exit_when_empty=True)
+        self.assertTrue(consumer.join(10))
+        self.assertEqual(sorted(seen), list(range(95)))
+        stats = consumer.stats()
+        self.assertEqual(stats["processed"], 95)
+        self.assertEqual(stats["claimed"], 95)
+        self.assertEqual(stats["in_flight"], 0)
+        self.assertEqual(stats["ack_requests"], 5)
+        # Claimed messages are not fetched again, and are deleted in batches.
+        counts = self.backend.request_counts
+        self.assertEqual(counts[("queues", "GET")], 0)
+        self.assertEqual(counts[("queues", "DELETE")], 5)
+        self.assertEqual(self.client.get_stats(self.queue)["total"], 0)
+
+    def test_consume_failures(self):
+        self._post(10)
+
+        def handler(msg):
+            if msg.body % 2:
+                raise ValueError("odd")
+
+        consumer = QueueConsumer(self.queue, handler, claims=1,
+                exit_when_empty=True)
+        consumer.start()
+        self.assertTrue(consumer.join(10))
+        stats = consumer.stats()
+        self.assertEqual((stats["processed"], stats["failed"]), (5, 5))
+        qstats = self.client.get_stats(self.queue)
+        self.assertEqual((qstats["claimed"], qstats["free"]), (5, 0))
+
+    def test_consume_renews_claims(self):
+        self._post(2)
+        release = threading.Event()
+
+        def handler(msg):
+            release.wait(5)
+
+        consumer = QueueConsumer(self.queue, handler, ttl=60, claims=1,
+                ack_interval=0.01, renew_margin=60, idle_delay=0.01)
+        consumer.start()
+        time.sleep(0.1)
+        self.assertTrue(consumer.stats()["renewals"] > 0)
+        release.set()
+        consumer.stop()
+        self.assertEqual(consumer.stats()["processed"], 2)
+
+    def test_consume_stop(self):
+        self._post(3)
+        with QueueConsumer(self.queue, lambda msg: None, claims=2,
+                idle_delay=0.01) as consumer:
+            deadline = time.time() + 5
+            while (consumer.stats()["processed"] < 3 and
+                    time.time() < deadline):
+                time.sleep(0.01)
+        self.assertTrue(consumer.join(0))
+        self.assertTrue(consumer.stats()["empty_claims"] > 0)
+
+    @unittest.skipIf(pyrax.queueing.asyncio is None, "Requires asyncio")
+    def test_consume_asyncio(self):
+        asyncio = pyrax.queueing.asyncio
+        self._post(30)
+        seen = []
+        loop = asyncio.new_event_loop()
+        thread = threading.Thread(target=loop.run_forever)
+        thread.daemon = True
+        thread.start()
+        self.addCleanup(loop.call_soon_threadsafe, loop.stop)
+
+        @asyncio.coroutine
+        def handler(msg):
+            seen.append(msg.body)
+
+        consumer = QueueConsumer(self.queue, handler, loop=loop,
+                exit_when_empty=True)
+        consumer.start()
+        self.assertTrue(consumer.join(10))
+        self.assertEqual(sorted(seen), list(range(30)))
+        self.assertEqual(consumer.stats()["processed"], 30)
+
+    @unittest.skipIf(pyrax.queueing.asyncio is None, "Requires asyncio")
+    def test_consume_asyncio_cancelled(self):
+        asyncio = pyrax.queueing.asyncio
+        self._post(5)
+        waiting = []
+        loop = asyncio.new_event_loop()
+        thread = threading.Thread(target=loop.run_forever)
+        thread.daemon = True
+        thread.start()
+        self.addCleanup(loop.call_soon_threadsafe, loop.stop)
+
+        @asyncio.coroutine
+        def handler(msg):
+            fut = loop.create_future()
+            waiting.append(fut)
+            return fut
+
+        consumer = QueueConsumer(self.queue, handler, loop=loop,
+                exit_when_empty=True)
+        consumer.start()
+        deadline = time.time() + 5
+        while len(waiting) < 5 and time.time() < deadline:
+            time.sleep(0.01)
+        for fut in waiting:
+            loop.call_soon_threadsafe(fut.cancel)
+        self.assertTrue(consumer.join(10))
+        self.assertEqual(consumer.stats()["failed"], 5)
+        self.assertEqual(consumer.stats()["processed"], 0)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -110,6 +110,60 @@ class UtilsTest(unittest.TestCase):
                 received = utils.get_checksum(testfile)
         self.assertEqual(expected, received)
 
+    def test_results_iterator(self):
+        class Item(object):
+            def __init__(self, id):
+                self.id = id
+
+        pages = [[Item(1), Item(2)], [Item(3)], []]
+        list_method = Mock(side_effect=pages)
+        for prefetch in (False, True):
+            list_method.reset_mock()
+            list_method.side_effect = list(pages)
+            rit = fakes.FakeIterator(Mock(), limit=2, prefix=None,
+                    prefetch=prefetch)
+            rit.list_method = list_method
+            self.assertEqual([item.id for item in rit], [1, 2, 3])
+            self.assertEqual(list_method.call_count, 3)
+            self.assertEqual(list_method.call_args_list[1][1]["marker"], 2)
+            # Once exhausted, it stays exhausted without further calls.
+            self.assertRaises(StopIteration, next, rit)
+            self.assertEqual(list_method.call_count, 3)
+
+    def test_results_iterator_prefetch_error(self):
+        class Item(object):
+            id = 1
+
+        list_method = Mock(side_effect=[[Item()], exc.ClientException(503)])
+        rit = fakes.FakeIterator(Mock(), prefix=None, prefetch=True)
+        rit.list_method = list_method
+        self.assertEqual(rit.next().id, 1)
+        self.assertRaises(exc.ClientException, rit.next)
+
+    def test_checksum_cache(self):
+        with utils.SelfDeletingTempDirectory() as tmpdir:
+            db_path = os.path.join(tmpdir, "cache.db")
+            pth = os.path.join(tmpdir, "file")
+            with open(pth, "wb") as testfile:
+                testfile.write(b"some random text")
+            expected = utils.get_checksum(pth)
+            with utils.ChecksumCache(db_path) as cache:
+                self.assertEqual(cache.get_checksum(pth), expected)
+                self.assertEqual(cache.get_checksum(pth), expected)
+                self.assertEqual((cache.hits, cache.misses), (1, 1))
+            # The checksum is kept between instances.
+            cache = utils.ChecksumCache(db_path)
+            with patch.object(utils, "get_checksum") as mock_checksum:
+                self.assertEqual(cache.get_checksum(pth), expected)
+                self.assertFalse(mock_checksum.called)
+            # Changing the file invalidates the cached value.
+            with open(pth, "wb") as testfile:
+                testfile.write(b"different text")
+            self.assertEqual(cache.get_checksum(pth),
+                    utils.get_checksum(b"different text"))
+            self.assertEqual((cache.hits, cache.misses), (1, 1))
+            cache.close()
+
     def test_random_unicode(self):
         testlen = random.randint(50, 500)
         nm = utils.random_unicode(testlen)